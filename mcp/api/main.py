@@ -8,7 +8,8 @@ import uuid
 
 from fastapi import Depends, FastAPI, HTTPException, Request, WebSocket, WebSocketDisconnect, Response
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.concurrency import iterate_in_threadpool, run_in_threadpool
+from fastapi.responses import JSONResponse, StreamingResponse
 from prometheus_fastapi_instrumentator import Instrumentator
 from pydantic import BaseModel, Field, ValidationError
 from sqlalchemy.orm import Session
@@ -16,12 +17,19 @@ import json
 import asyncio
 
 from mcp.cache.redis_manager import RedisCacheManager
+from mcp.core import bulk_io
 from mcp.core import registry as mcp_registry_service
 from mcp.core.auth import UserRole, require_any_role
+from mcp.core.http_client import close_http_clients
+from mcp.core.kernel_pool import shutdown_kernel_pools
+from mcp.core import llm_cache
+from mcp.core.sandbox import shutdown_fork_servers
 from mcp.core.types import MCPType  # Union of all config types
 from mcp.db.base_models import log_audit_action
-from mcp.db.session import get_db_session
-from mcp.schemas.mcp import (MCPCreate, MCPDetail, MCPListItem, MCPUpdate)
+from mcp.db.operations import get_workflow_run_resource_usage
+from mcp.db.session import SessionLocal, get_db_session
+from mcp.schemas.mcp import (MCPCreate, MCPDetail, MCPListItem, MCPNewVersionRequest,
+                             MCPUpdate)
 
 from ..core.registry import mcp_server_registry
 from .dependencies import get_current_subject
@@ -57,6 +65,14 @@ async def rate_limit_middleware(request: Request, call_next):
     return response
 
 
+@app.middleware("http")
+async def llm_cache_bypass_middleware(request: Request, call_next):
+    # "X-MCP-Cache: bypass" makes the request's LLM prompts skip cached responses
+    bypass = request.headers.get(llm_cache.BYPASS_HEADER, "").lower() == llm_cache.BYPASS_VALUE
+    with llm_cache.cache_bypass(bypass):
+        return await call_next(request)
+
+
 # CORS Middleware
 app.add_middleware(
     CORSMiddleware,
@@ -75,6 +91,41 @@ app.include_router(apikey_router.router)
 app.include_router(execution_router.router)
 
 
+@app.on_event("startup")
+async def start_embedding_worker():
+    mcp_registry_service.start_embedding_worker(SessionLocal)
+
+
+@app.on_event("startup")
+async def start_index_sync():
+    mcp_registry_service.start_index_sync(SessionLocal)
+
+
+@app.on_event("shutdown")
+async def stop_index_sync():
+    mcp_registry_service.stop_index_sync()
+
+
+@app.on_event("shutdown")
+async def stop_embedding_worker():
+    mcp_registry_service.stop_embedding_worker()
+
+
+@app.on_event("shutdown")
+async def stop_fork_servers():
+    shutdown_fork_servers()
+
+
+@app.on_event("shutdown")
+async def stop_kernel_pools():
+    await shutdown_kernel_pools()
+
+
+@app.on_event("shutdown")
+async def close_llm_clients():
+    await close_http_clients()
+
+
 # API Request model for creating MCPs
 class MCPCreationRequest(BaseModel):
     name: str
@@ -96,14 +147,11 @@ async def list_mcp_definitions(
     )  # Assuming this will be paginated in future
     # Convert MCP ORM models to MCPListItem Pydantic models
     # This is a simplified conversion; real implementation might involve fetching latest version string
+    latest_versions = mcp_registry_service.get_latest_mcp_versions(db, db_mcps)
     response_items = []
     for mcp in db_mcps:
-        # Attempt to get latest version string (simplified)
-        latest_version_str = None
-        if mcp.versions:  # MCP model has a 'versions' relationship
-            # Sort versions by created_at or a semantic version field if available
-            # For simplicity, taking the first one if it exists, assuming it's ordered or just any version
-            latest_version_str = mcp.versions[-1].version_str if mcp.versions else "N/A"
+        latest_version = latest_versions.get(mcp.id)
+        latest_version_str = latest_version.version_str if latest_version else None
 
         response_items.append(
             MCPListItem(
@@ -128,8 +176,9 @@ async def create_mcp_definition(
     response: Response = None,
 ):
     """Creates a new MCP definition."""
-    db_mcp = mcp_registry_service.save_mcp_definition_to_db(
-        db=db, mcp_data=mcp_data
+    # Run in the threadpool: an inline embedding encode must not block the event loop.
+    db_mcp = await run_in_threadpool(
+        mcp_registry_service.save_mcp_definition_to_db, db=db, mcp_data=mcp_data
     )
     # Only log audit if subject is a valid UUID
     try:
@@ -147,28 +196,127 @@ async def create_mcp_definition(
     return db_mcp
 
 
-@app.get("/context/{mcp_id}", response_model=MCPDetail)
-async def get_mcp_definition_details(
-    mcp_id: str,
+def get_search_func():
+    return mcp_registry_service.hybrid_search_mcp_definitions
+
+
+# Registered before /context/{mcp_id} so that "search" is not captured as an MCP id.
+@app.get("/context/search", response_model=List[MCPListItem])
+async def search_mcp_definitions(
+    query: str,
     db: Session = Depends(get_db_session),
     current_user_sub: str = Depends(get_current_subject),
+    limit: int = 10,
+    search_func=Depends(get_search_func),
 ):
-    db_mcp = mcp_registry_service.load_mcp_definition_from_db(db=db, mcp_id_str=mcp_id)
-    if db_mcp is None:
-        raise HTTPException(status_code=404, detail="MCP definition not found")
+    """
+    Searches for MCP definitions using hybrid lexical (BM25) and semantic search.
+    Results are ordered by relevance; exact name matches come first.
+    """
+    if not query or not query.strip():
+        raise HTTPException(status_code=400, detail="Search query cannot be empty.")
+
+    # Query encoding, scoring and index syncs are blocking; keep them off the event loop.
+    db_mcps = await run_in_threadpool(search_func, db=db, query_text=query, limit=limit)
+
+    latest_versions = mcp_registry_service.get_latest_mcp_versions(db, db_mcps)
+    response_items = []
+    for mcp in db_mcps:
+        latest_version = latest_versions.get(mcp.id)
+        latest_version_str = latest_version.version_str if latest_version else None
+
+        response_items.append(
+            MCPListItem(
+                id=mcp.id,
+                name=mcp.name,
+                type=MCPType(mcp.type),  # Convert string from DB to Enum
+                description=mcp.description,
+                tags=mcp.tags,
+                latest_version_str=latest_version_str,
+                updated_at=mcp.updated_at,
+                # MCPListItem does not include embedding
+            )
+        )
+    return response_items  # Always return 200 with a list (possibly empty)
+
+
+def get_session_factory():
+    return SessionLocal
+
+
+@app.get("/context/export")
+async def export_mcp_definitions(
+    session_factory=Depends(get_session_factory),
+    current_user_sub: str = Depends(get_current_subject),
+):
+    """Streams all MCP definitions with their current version as NDJSON."""
+
+    def export_lines():
+        # The body is iterated after the handler returns, so the stream owns its session.
+        db = session_factory()
+        try:
+            yield from bulk_io.export_mcps_ndjson(db)
+        finally:
+            db.close()
+
+    return StreamingResponse(
+        iterate_in_threadpool(export_lines()),
+        media_type="application/x-ndjson",
+    )
+
+
+@app.post("/context/import")
+async def import_mcp_definitions(
+    request: Request,
+    batch_size: int = bulk_io.DEFAULT_BATCH_SIZE,
+    db: Session = Depends(get_db_session),
+    current_user_sub: str = Depends(get_current_subject),
+    _: List[str] = Depends(require_any_role([UserRole.DEVELOPER, UserRole.ADMIN])),
+):
+    """
+    Imports MCP definitions from an NDJSON request body (one MCPCreate object per line,
+    optionally with an "id"). The body is consumed incrementally and written in batches;
+    invalid lines are reported and skipped, existing ids are skipped.
+    """
+    if batch_size < 1:
+        raise HTTPException(status_code=400, detail="batch_size must be positive.")
+    importer = bulk_io.MCPImporter(db, batch_size=batch_size)
+    buffer = bytearray()
+    async for chunk in request.stream():
+        # Only the new chunk is scanned for line ends, so long lines stay linear.
+        scan_from = len(buffer)
+        buffer += chunk
+        lines, start = [], 0
+        end = buffer.find(b"\n", scan_from)
+        while end != -1:
+            lines.append(bytes(buffer[start:end]))
+            start = end + 1
+            end = buffer.find(b"\n", start)
+        if lines:
+            del buffer[:start]
+            await run_in_threadpool(importer.feed, lines)
+    if buffer:
+        await run_in_threadpool(importer.feed, [bytes(buffer)])
+    result = await run_in_threadpool(importer.finish)
+
+    try:
+        user_id_val = uuid.UUID(current_user_sub)
+    except Exception:
+        user_id_val = None
+    if user_id_val:
+        log_audit_action(
+            db,
+            user_id=user_id_val,
+            action_type="import_mcps",
+            target_id=user_id_val,  # a bulk import has no single target MCP
+            details={"imported": result.imported, "skipped": result.skipped, "failed": result.failed},
+        )
+    return result.to_dict()
 
-    # Populate latest version info for MCPDetail
-    latest_version_config = None
-    latest_version_str = None
-    if db_mcp.versions:
-        # Assuming versions are ordered by creation or semantic version in the relationship
-        # For simplicity, using the "last" version in the list as latest.
-        # A more robust approach would sort them or have a dedicated 'latest_version' pointer.
-        latest_version = db_mcp.versions[-1] if db_mcp.versions else None
-        if latest_version:
-            latest_version_config = latest_version.config_snapshot
-            latest_version_str = latest_version.version_str
 
+def _mcp_detail(db: Session, db_mcp) -> MCPDetail:
+    # Populate latest version info for MCPDetail
+    latest_version = mcp_registry_service.get_latest_mcp_version(db, db_mcp)
     return MCPDetail(
         id=db_mcp.id,
         name=db_mcp.name,
@@ -177,11 +325,24 @@ async def get_mcp_definition_details(
         tags=db_mcp.tags,
         created_at=db_mcp.created_at,
         updated_at=db_mcp.updated_at,
-        latest_version_config=latest_version_config,
-        latest_version_str=latest_version_str,
+        latest_version_config=latest_version.config_snapshot if latest_version else None,
+        latest_version_str=latest_version.version_str if latest_version else None,
     )
 
 
+@app.get("/context/{mcp_id}", response_model=MCPDetail)
+async def get_mcp_definition_details(
+    mcp_id: str,
+    db: Session = Depends(get_db_session),
+    current_user_sub: str = Depends(get_current_subject),
+):
+    db_mcp = mcp_registry_service.load_mcp_definition_from_db(db=db, mcp_id_str=mcp_id)
+    if db_mcp is None:
+        raise HTTPException(status_code=404, detail="MCP definition not found")
+
+    return _mcp_detail(db, db_mcp)
+
+
 @app.put("/context/{mcp_id}", response_model=MCPDetail)
 async def update_mcp_definition(
     mcp_id: str,
@@ -192,8 +353,11 @@ async def update_mcp_definition(
 ):
     """Updates an existing MCP definition."""
     try:
-        db_mcp = mcp_registry_service.update_mcp_definition_in_db(
-            db=db, mcp_id_str=mcp_id, mcp_data=mcp_data
+        db_mcp = await run_in_threadpool(
+            mcp_registry_service.update_mcp_definition_in_db,
+            db=db,
+            mcp_id_str=mcp_id,
+            mcp_data=mcp_data,
         )
         if not db_mcp:
             raise HTTPException(status_code=404, detail="MCP definition not found for update")
@@ -215,6 +379,36 @@ async def update_mcp_definition(
         raise HTTPException(status_code=400, detail=str(e))
 
 
+@app.post("/context/{mcp_id}/versions", response_model=MCPDetail, status_code=201)
+async def create_mcp_version(
+    mcp_id: str,
+    version_data: MCPNewVersionRequest,
+    db: Session = Depends(get_db_session),
+    current_user_sub: str = Depends(get_current_subject),
+    _: List[str] = Depends(require_any_role([UserRole.DEVELOPER, UserRole.ADMIN])),
+):
+    """Adds a new version to an MCP definition and makes it the current version."""
+    db_version = mcp_registry_service.add_mcp_version_to_db(
+        db=db, mcp_id_str=mcp_id, version_data=version_data
+    )
+    if db_version is None:
+        raise HTTPException(status_code=404, detail="MCP definition not found")
+    try:
+        user_id_val = uuid.UUID(current_user_sub)
+    except Exception:
+        user_id_val = None
+    if user_id_val:
+        log_audit_action(
+            db,
+            user_id=user_id_val,
+            action_type="create_mcp_version",
+            target_id=db_version.mcp_id,
+            details={"version_str": version_data.version_str},
+        )
+    db_mcp = mcp_registry_service.load_mcp_definition_from_db(db=db, mcp_id_str=mcp_id)
+    return _mcp_detail(db, db_mcp)
+
+
 @app.delete("/context/{mcp_id}", status_code=204)
 async def delete_mcp_definition(
     mcp_id: str,
@@ -246,50 +440,6 @@ async def delete_mcp_definition(
         raise HTTPException(status_code=400, detail=str(e))
 
 
-def get_search_func():
-    return mcp_registry_service.search_mcp_definitions_by_text
-
-
-@app.get("/context/search", response_model=List[MCPListItem])
-async def search_mcp_definitions(
-    query: str,
-    db: Session = Depends(get_db_session),
-    current_user_sub: str = Depends(get_current_subject),
-    limit: int = 10,
-    search_func=Depends(get_search_func),
-):
-    """
-    Searches for MCP definitions using semantic text search based on the query.
-    Results are ordered by relevance.
-    """
-    if not query or not query.strip():
-        raise HTTPException(status_code=400, detail="Search query cannot be empty.")
-
-    db_mcps = search_func(db=db, query_text=query, limit=limit)
-
-    response_items = []
-    for mcp in db_mcps:
-        latest_version_str = None
-        if mcp.versions:
-            latest_version_str = (
-                mcp.versions[-1].version_str if mcp.versions else "N/A"
-            )  # Simplified
-
-        response_items.append(
-            MCPListItem(
-                id=mcp.id,
-                name=mcp.name,
-                type=MCPType(mcp.type),  # Convert string from DB to Enum
-                description=mcp.description,
-                tags=mcp.tags,
-                latest_version_str=latest_version_str,
-                updated_at=mcp.updated_at,
-                # MCPListItem does not include embedding
-            )
-        )
-    return response_items  # Always return 200 with a list (possibly empty)
-
-
 @app.get("/health")
 async def health_check():
     health = {
@@ -333,6 +483,7 @@ async def get_stats_summary():
         "total_servers": len(mcp_server_registry),
         "server_types": dict(type_counts),
         "model_usage": dict(model_usage),
+        "llm_response_cache": llm_cache.get_response_cache().get_stats(),
         "timestamp": datetime.now().isoformat(),
     }
 
@@ -504,8 +655,13 @@ async def dashboard_collaborations():
 class ResourceUsageEntry(BaseModel):
     step_id: str
     label: str
-    cpu: float  # percent
-    memory: float  # MB
+    cpu: float  # percent of one core over the step's wall time
+    memory: float  # peak RSS, MB
+    cpu_time_sec: float = 0.0
+    wall_time_sec: float = 0.0
+    io_read_blocks: int = 0
+    io_write_blocks: int = 0
+    exit_reasons: Dict[str, int] = Field(default_factory=dict)
 
 class LogEntry(BaseModel):
     timestamp: str
@@ -522,14 +678,31 @@ class StepHistoryEntry(BaseModel):
     error: str = None
 
 @app.get("/api/execution/runs/{run_id}/resource-usage", response_model=List[ResourceUsageEntry])
-async def get_resource_usage(run_id: str):
-    """Get resource usage (CPU, memory, etc.) for each step in a workflow run. (Mock data)"""
-    # TODO: Integrate with real resource tracking
-    return [
-        ResourceUsageEntry(step_id="step-1", label="Step 1", cpu=32, memory=120),
-        ResourceUsageEntry(step_id="step-2", label="Step 2", cpu=68, memory=210),
-        ResourceUsageEntry(step_id="step-3", label="Step 3", cpu=15, memory=80),
-    ]
+async def get_resource_usage(run_id: str, db: Session = Depends(get_db_session)):
+    """Get resource usage (CPU, memory, I/O, exit reasons) for each step in a workflow run."""
+    try:
+        run_uuid = uuid.UUID(run_id)
+    except ValueError:
+        return []
+    usage = get_workflow_run_resource_usage(db, run_uuid)
+    entries = []
+    for step_id, step_usage in usage["steps"].items():
+        cpu_time = step_usage.get("cpu_user_sec", 0.0) + step_usage.get("cpu_system_sec", 0.0)
+        wall_time = step_usage.get("wall_time_sec", 0.0)
+        entries.append(
+            ResourceUsageEntry(
+                step_id=step_id,
+                label=step_id,
+                cpu=round(100 * cpu_time / wall_time, 1) if wall_time else 0.0,
+                memory=step_usage.get("max_rss_mb", 0.0),
+                cpu_time_sec=round(cpu_time, 6),
+                wall_time_sec=wall_time,
+                io_read_blocks=step_usage.get("io_read_blocks", 0),
+                io_write_blocks=step_usage.get("io_write_blocks", 0),
+                exit_reasons=step_usage.get("exit_reasons", {}),
+            )
+        )
+    return entries
 
 @app.get("/api/execution/runs/{run_id}/logs", response_model=List[LogEntry])
 async def get_run_logs(run_id: str):
@@ -1,8 +1,10 @@
 import json
+import logging
 from pathlib import Path
-from typing import Any, Dict, Optional, Type
+from typing import Any, AsyncIterator, Dict, Optional, Tuple, Type
 
 from fastapi import APIRouter, Body, Depends, HTTPException
+from fastapi.responses import StreamingResponse
 
 from mcp.core.base import BaseMCPServer
 from mcp.core.types import (LLMPromptConfig, JupyterNotebookConfig, MCPConfig,
@@ -10,10 +12,12 @@ from mcp.core.types import (LLMPromptConfig, JupyterNotebookConfig, MCPConfig,
 from mcp.core.llm_prompt import LLMPromptMCP
 from mcp.core.jupyter_notebook import JupyterNotebookMCP
 from mcp.core.python_script import PythonScriptMCP
-# from mcp.core.ai_assistant import AIAssistantMCP # Assuming this will exist
+from mcp.core.ai_assistant import AIAssistantMCP
 
 from ..dependencies import get_current_subject
 
+logger = logging.getLogger(__name__)
+
 # Directory where MCP configuration JSON files are stored
 MCP_CONFIGS_DIR = Path(__file__).resolve().parent.parent.parent.parent / "examples"
 
@@ -24,12 +28,11 @@ router = APIRouter(
 )
 
 # Mapping from MCPType to the corresponding configuration model and server class
-# TODO: Add AIAssistantMCP to this map when available
 MCP_TYPE_MAP: Dict[MCPType, Dict[str, Type]] = {
     MCPType.LLM_PROMPT: {"config": LLMPromptConfig, "server": LLMPromptMCP},
     MCPType.JUPYTER_NOTEBOOK: {"config": JupyterNotebookConfig, "server": JupyterNotebookMCP},
     MCPType.PYTHON_SCRIPT: {"config": PythonScriptConfig, "server": PythonScriptMCP},
-    # MCPType.AI_ASSISTANT: {"config": AIAssistantConfig, "server": AIAssistantMCP},
+    MCPType.AI_ASSISTANT: {"config": AIAssistantConfig, "server": AIAssistantMCP},
 }
 
 def load_mcp_config_from_file(mcp_config_id: str) -> Optional[MCPConfig]:
@@ -53,13 +56,8 @@ def load_mcp_config_from_file(mcp_config_id: str) -> Optional[MCPConfig]:
     return None
 
 
-@router.post("/mcp/{mcp_config_id}", response_model=MCPResult)
-async def execute_single_mcp(
-    mcp_config_id: str,
-    initial_inputs: Optional[Dict[str, Any]] = Body(None, description="Initial inputs for the MCP"),
-    # current_user_sub: str = Depends(get_current_subject), # Already in router dependencies
-):
-    """Executes a single MCP configuration identified by its ID."""
+def _resolve_mcp(mcp_config_id: str) -> Tuple[MCPConfig, Type[BaseMCPServer]]:
+    """The configuration and server class of an MCP; raises HTTPException 404 or 501."""
     mcp_config_instance = load_mcp_config_from_file(mcp_config_id)
 
     if not mcp_config_instance:
@@ -69,7 +67,17 @@ async def execute_single_mcp(
     if mcp_type not in MCP_TYPE_MAP:
         raise HTTPException(status_code=501, detail=f"MCP type '{mcp_type}' is not supported for direct execution yet.")
 
-    server_class = MCP_TYPE_MAP[mcp_type]["server"]
+    return mcp_config_instance, MCP_TYPE_MAP[mcp_type]["server"]
+
+
+@router.post("/mcp/{mcp_config_id}", response_model=MCPResult)
+async def execute_single_mcp(
+    mcp_config_id: str,
+    initial_inputs: Optional[Dict[str, Any]] = Body(None, description="Initial inputs for the MCP"),
+    # current_user_sub: str = Depends(get_current_subject), # Already in router dependencies
+):
+    """Executes a single MCP configuration identified by its ID."""
+    mcp_config_instance, server_class = _resolve_mcp(mcp_config_id)
     
     # Ensure the loaded config instance is of the correct specific type for the server
     # Pydantic's discriminated union should ensure mcp_config_instance is already the correct type
@@ -89,4 +97,39 @@ async def execute_single_mcp(
         # Log the full exception for debugging
         print(f"Error during MCP execution for ID {mcp_config_id}: {type(e).__name__} - {e}")
         # Consider if more specific error details should be exposed to the client
-        raise HTTPException(status_code=500, detail=f"MCP execution failed: {str(e)}") 
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"MCP execution failed: {str(e)}")
+
+
+@router.post("/mcp/{mcp_config_id}/stream")
+async def execute_single_mcp_stream(
+    mcp_config_id: str,
+    initial_inputs: Optional[Dict[str, Any]] = Body(None, description="Initial inputs for the MCP"),
+):
+    """Executes an MCP, relaying its events to the client as server-sent events.
+
+    LLM prompt and AI assistant MCPs send a ``token`` event for each piece of text as the
+    model writes it; every MCP ends with one ``result`` event carrying the execution
+    result. Events are ``event: <type>`` lines with the JSON-encoded event as data.
+    """
+    mcp_config_instance, server_class = _resolve_mcp(mcp_config_id)
+    try:
+        mcp_server: BaseMCPServer = server_class(config=mcp_config_instance)
+    except Exception as e:
+        logger.exception(f"Error during MCP execution for ID {mcp_config_id}")
+        raise HTTPException(status_code=500, detail=f"MCP execution failed: {str(e)}")
+
+    async def events() -> AsyncIterator[str]:
+        try:
+            async for event in mcp_server.execute_stream(inputs=initial_inputs or {}):
+                yield f"event: {event['type']}\ndata: {json.dumps(event, default=str)}\n\n"
+        except Exception as e:
+            logger.exception(f"Error during MCP execution for ID {mcp_config_id}")
+            error = {"type": "error", "error": f"MCP execution failed: {str(e)}"}
+            yield f"event: error\ndata: {json.dumps(error)}\n\n"
+
+    # No buffering by proxies: the first tokens should reach the client at once
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -1,4 +1,5 @@
 import json
+import logging
 import uuid
 from datetime import datetime
 from pathlib import Path
@@ -9,6 +10,8 @@ from sqlalchemy.orm import Session
 
 from mcp.core.types import MCPType, MCPConfig as MCPConfigType  # Modified import
 from mcp.db.base_models import log_audit_action
+from mcp.db.operations import (get_workflow_run_resource_usage,
+                               record_workflow_step_results)
 from mcp.db.models import (  # Workflow models and MCP for checking existence
     WorkflowDefinition, WorkflowRun, WorkflowStepRun)
 from mcp.db.session import get_db_session
@@ -29,6 +32,8 @@ from ...core.workflow_engine import WorkflowEngine  # Added import
 from ..dependencies import \
     get_current_subject  # Changed from get_api_key to get_current_subject
 
+logger = logging.getLogger(__name__)
+
 # --- MCP Configs Directory ---
 MCP_CONFIGS_DIR = Path(__file__).resolve().parent.parent.parent.parent / "examples"
 
@@ -325,8 +330,6 @@ async def execute_workflow(
 
         db.commit()
         db.refresh(db_workflow_run)
-
-        return execution_result
     except Exception as e:
         # Update the WorkflowRun record with error information
         db_workflow_run.status = "FAILED"
@@ -339,6 +342,15 @@ async def execute_workflow(
             status_code=500, detail=f"Workflow execution failed: {str(e)}"
         )
 
+    # Per-step rows carry each step's resource usage; the run itself is already recorded
+    try:
+        record_workflow_step_results(db, db_workflow_run.id, execution_result.step_results)
+    except Exception:
+        db.rollback()
+        logger.exception(f"Failed to save step results of workflow run {db_workflow_run.id}")
+
+    return execution_result
+
 
 # Endpoint to get status of a specific workflow run
 @router.get(
@@ -382,6 +394,7 @@ async def get_workflow_run_status(
         ),  # Ensure it's a list
         final_outputs=db_run.outputs,
         error_message=db_run.error_message,
+        resource_usage=get_workflow_run_resource_usage(db, db_run.id)["total"],
     )
 
 
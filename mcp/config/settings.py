@@ -1,6 +1,6 @@
 import os
 from pathlib import Path
-from typing import Any, Dict, Optional
+from typing import Any, Dict, List, Optional
 
 from pydantic import Field
 from pydantic_settings import BaseSettings
@@ -50,6 +50,117 @@ class LoggingSettings(BaseSettings):
     file: Optional[str] = Field(default=None, validation_alias="LOG_FILE")
 
 
+class EmbeddingSettings(BaseSettings):
+    """Embedding model and semantic search settings."""
+
+    backend: str = Field(default="sentence_transformers", validation_alias="EMBEDDING_BACKEND")
+    model_name: str = Field(default="all-MiniLM-L6-v2", validation_alias="EMBEDDING_MODEL_NAME")
+    onnx_model_dir: str = Field(
+        default=".mcp_data/onnx/all-MiniLM-L6-v2", validation_alias="EMBEDDING_ONNX_MODEL_DIR"
+    )
+    onnx_model_file: str = Field(default="model_quantized.onnx", validation_alias="EMBEDDING_ONNX_MODEL_FILE")
+    onnx_threads: int = Field(default=0, validation_alias="EMBEDDING_ONNX_THREADS")
+    verify_parity: bool = Field(default=False, validation_alias="EMBEDDING_VERIFY_PARITY")
+    parity_tolerance: float = Field(default=0.02, validation_alias="EMBEDDING_PARITY_TOLERANCE")
+    index_dir: str = Field(default=".mcp_data/vector_index", validation_alias="EMBEDDING_INDEX_DIR")
+    index_quantize: bool = Field(default=False, validation_alias="EMBEDDING_INDEX_QUANTIZE")
+    # How often the background index sync applies MCP changes made by other workers.
+    index_resync_sec: float = Field(default=5.0, validation_alias="EMBEDDING_INDEX_RESYNC_SEC")
+    batch_size: int = Field(default=32, validation_alias="EMBEDDING_BATCH_SIZE")
+    batch_max_wait_ms: float = Field(default=10.0, validation_alias="EMBEDDING_BATCH_MAX_WAIT_MS")
+    worker_threads: int = Field(default=1, validation_alias="EMBEDDING_WORKER_THREADS")
+    # Create/update return before the embedding is stored; it is written back once encoded.
+    async_writeback: bool = Field(default=True, validation_alias="EMBEDDING_ASYNC_WRITEBACK")
+    query_cache_size: int = Field(default=1024, validation_alias="EMBEDDING_QUERY_CACHE_SIZE")
+    query_cache_ttl: Optional[float] = Field(default=3600.0, validation_alias="EMBEDDING_QUERY_CACHE_TTL")
+    hybrid_candidates: int = Field(default=100, validation_alias="EMBEDDING_HYBRID_CANDIDATES")
+    hybrid_vector_weight: float = Field(default=0.7, validation_alias="EMBEDDING_HYBRID_VECTOR_WEIGHT")
+
+
+class LLMSettings(BaseSettings):
+    """LLM API client settings (see mcp/core/http_client.py)."""
+
+    api_url: str = Field(default="https://api.anthropic.com/v1/messages", validation_alias="LLM_API_URL")
+    # HTTP/2 needs the h2 package (httpx[http2]); without it connections use HTTP/1.1
+    http2: bool = Field(default=True, validation_alias="LLM_HTTP2")
+    max_connections: int = Field(default=100, validation_alias="LLM_MAX_CONNECTIONS")
+    max_keepalive_connections: int = Field(default=20, validation_alias="LLM_MAX_KEEPALIVE_CONNECTIONS")
+    keepalive_expiry_sec: float = Field(default=30.0, validation_alias="LLM_KEEPALIVE_EXPIRY_SEC")
+    connect_timeout_sec: float = Field(default=10.0, validation_alias="LLM_CONNECT_TIMEOUT_SEC")
+    # Model responses can take minutes; pool_timeout bounds the wait for a free connection
+    read_timeout_sec: float = Field(default=600.0, validation_alias="LLM_READ_TIMEOUT_SEC")
+    pool_timeout_sec: float = Field(default=30.0, validation_alias="LLM_POOL_TIMEOUT_SEC")
+    # Connectivity checks per API key and model (see mcp/core/llm_connectivity.py)
+    connectivity_ttl_sec: float = Field(default=300.0, validation_alias="LLM_CONNECTIVITY_TTL_SEC")
+    circuit_failure_threshold: int = Field(default=3, validation_alias="LLM_CIRCUIT_FAILURE_THRESHOLD")
+    circuit_cooldown_sec: float = Field(default=30.0, validation_alias="LLM_CIRCUIT_COOLDOWN_SEC")
+    # Responses of prompts with response_cache at temperature 0 (see mcp/core/llm_cache.py):
+    # "memory" (per process), "disk" (per host) or "redis" (shared)
+    response_cache_backend: str = Field(default="memory", validation_alias="LLM_RESPONSE_CACHE_BACKEND")
+    response_cache_size: int = Field(default=10000, validation_alias="LLM_RESPONSE_CACHE_SIZE")
+    response_cache_ttl_sec: Optional[float] = Field(default=86400.0, validation_alias="LLM_RESPONSE_CACHE_TTL_SEC")
+    response_cache_dir: str = Field(default=".mcp_data/llm_cache", validation_alias="LLM_RESPONSE_CACHE_DIR")
+
+
+class SandboxSettings(BaseSettings):
+    """Sandboxed script execution settings."""
+
+    memory_limit_mb: int = Field(default=512, validation_alias="SANDBOX_MEMORY_LIMIT_MB")
+    cpu_time_limit_sec: int = Field(default=60, validation_alias="SANDBOX_CPU_TIME_LIMIT_SEC")
+    fork_server_enabled: bool = Field(default=False, validation_alias="SANDBOX_FORK_SERVER_ENABLED")
+    preload_modules: List[str] = Field(
+        default=["json", "numpy", "pandas"], validation_alias="SANDBOX_PRELOAD_MODULES"
+    )
+    fork_server_max_runs: int = Field(default=1000, validation_alias="SANDBOX_FORK_SERVER_MAX_RUNS")
+    fork_server_max_rss_mb: float = Field(default=512.0, validation_alias="SANDBOX_FORK_SERVER_MAX_RSS_MB")
+    io_codec: str = Field(default="json", validation_alias="SANDBOX_IO_CODEC")
+    # Warm Jupyter kernels per API worker for notebook MCPs (see mcp/core/kernel_pool.py);
+    # 0 runs every notebook with papermill. Between runs: "reset" or "restart"
+    kernel_pool_size: int = Field(default=0, validation_alias="SANDBOX_KERNEL_POOL_SIZE")
+    kernel_reset: str = Field(default="reset", validation_alias="SANDBOX_KERNEL_RESET")
+    kernel_max_runs: int = Field(default=100, validation_alias="SANDBOX_KERNEL_MAX_RUNS")
+    kernel_max_rss_mb: float = Field(default=1024.0, validation_alias="SANDBOX_KERNEL_MAX_RSS_MB")
+    # stdout/stderr kept per run and stream (head + tail); the full output of longer
+    # streams is written to SANDBOX_OUTPUT_SPILL_DIR, if set
+    output_limit_kb: int = Field(default=1024, validation_alias="SANDBOX_OUTPUT_LIMIT_KB")
+    output_spill_dir: Optional[str] = Field(default=None, validation_alias="SANDBOX_OUTPUT_SPILL_DIR")
+    output_spill_max_mb: int = Field(default=100, validation_alias="SANDBOX_OUTPUT_SPILL_MAX_MB")
+    # Isolation from the API workers (see mcp/core/isolation.py): CPU list such as
+    # "2-3,6", niceness, I/O class ("idle" or "best-effort") and machine-wide run cap
+    cpu_affinity: Optional[str] = Field(default=None, validation_alias="SANDBOX_CPU_AFFINITY")
+    nice: int = Field(default=0, validation_alias="SANDBOX_NICE")
+    ionice_class: Optional[str] = Field(default=None, validation_alias="SANDBOX_IONICE_CLASS")
+    ionice_level: int = Field(default=7, validation_alias="SANDBOX_IONICE_LEVEL")
+    max_node_runs: int = Field(default=0, validation_alias="SANDBOX_MAX_NODE_RUNS")
+    node_slots_dir: Optional[str] = Field(default=None, validation_alias="SANDBOX_NODE_SLOTS_DIR")
+    # Notebook results (see mcp/core/notebook_outputs.py): longer text outputs and sources
+    # are cut (0 keeps all), with their full text and large rich outputs in the artifact area;
+    # its runs are removed after the retention time or, oldest first, above the size cap (0: no limit)
+    notebook_result_chars: int = Field(default=2000, validation_alias="SANDBOX_NOTEBOOK_RESULT_CHARS")
+    artifact_dir: Optional[str] = Field(default=".mcp_data/artifacts", validation_alias="SANDBOX_ARTIFACT_DIR")
+    artifact_retention_hours: float = Field(default=24, validation_alias="SANDBOX_ARTIFACT_RETENTION_HOURS")
+    artifact_max_mb: int = Field(default=1024, validation_alias="SANDBOX_ARTIFACT_MAX_MB")
+    # Per-run scratch space (see mcp/core/scratch.py); default /dev/shm if it fits, else <tmp>
+    scratch_dir: Optional[str] = Field(default=None, validation_alias="SANDBOX_SCRATCH_DIR")
+    scratch_quota_mb: int = Field(default=1024, validation_alias="SANDBOX_SCRATCH_QUOTA_MB")
+    # Smallest NumPy array passed as a shared .npy file by array_transport scripts
+    array_transport_min_kb: int = Field(default=64, validation_alias="SANDBOX_ARRAY_TRANSPORT_MIN_KB")
+    # File format of tables passed by table_transport scripts: "arrow" (IPC) or "parquet"
+    table_format: str = Field(default="arrow", validation_alias="SANDBOX_TABLE_FORMAT")
+    # Sandboxed runs executing at once per event loop (async runner)
+    max_concurrent_runs: int = Field(default=32, validation_alias="SANDBOX_MAX_CONCURRENT_RUNS")
+    venv_enabled: bool = Field(default=False, validation_alias="SANDBOX_VENV_ENABLED")
+    venv_dir: str = Field(default=".mcp_data/venvs", validation_alias="SANDBOX_VENV_DIR")
+    venv_wheelhouse: Optional[str] = Field(default=None, validation_alias="SANDBOX_VENV_WHEELHOUSE")
+    venv_max_disk_mb: int = Field(default=10240, validation_alias="SANDBOX_VENV_MAX_DISK_MB")
+    venv_build_timeout_sec: float = Field(default=900.0, validation_alias="SANDBOX_VENV_BUILD_TIMEOUT_SEC")
+    venv_build_wait_sec: float = Field(default=300.0, validation_alias="SANDBOX_VENV_BUILD_WAIT_SEC")
+    # Deduplicated, precompiled script_content files (default: <tmp>/mcp_scripts)
+    script_store_dir: Optional[str] = Field(default=None, validation_alias="SANDBOX_SCRIPT_STORE_DIR")
+    # Unreferenced scripts kept compiled for the next instance with the same content
+    script_store_keep_released: int = Field(default=256, validation_alias="SANDBOX_SCRIPT_STORE_KEEP_RELEASED")
+
+
 class Settings(BaseSettings):
     """Main application settings."""
 
@@ -67,6 +178,9 @@ class Settings(BaseSettings):
     redis: RedisSettings = RedisSettings()
     security: SecuritySettings = SecuritySettings()
     logging: LoggingSettings = LoggingSettings()
+    embedding: EmbeddingSettings = EmbeddingSettings()
+    llm: LLMSettings = LLMSettings()
+    sandbox: SandboxSettings = SandboxSettings()
 
     # File paths
     base_dir: Path = Path(__file__).parent.parent.parent
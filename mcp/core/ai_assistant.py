@@ -1,10 +1,13 @@
-from typing import Any, Dict, List, Optional, Union
+import logging
+from typing import Any, AsyncIterator, Dict, List, Optional, Union
 
 from mcp.core.llm_prompt import ClaudeLLM  # Reusing ClaudeLLM for now
 from mcp.core.types import AIAssistantConfig
 
 from .base import BaseMCPServer
 
+logger = logging.getLogger(__name__)
+
 # Placeholder for actual tool execution logic if tools are internal
 # For external tools, this MCP would describe the call, and another system would execute.
 
@@ -135,7 +138,7 @@ class AIAssistantMCP(BaseMCPServer):
             # Let's simplify: for now, AIAssistant is conversational only, ignoring tools.
             # Tools would require ClaudeLLM to be more sophisticated or direct SDK use.
 
-            raw_assistant_response_text = self.llm.call(messages_for_llm)
+            raw_assistant_response_text = await self.llm.call(messages_for_llm)
 
             # Add assistant's response to history
             self._add_to_history(role="assistant", content=raw_assistant_response_text)
@@ -196,6 +199,43 @@ class AIAssistantMCP(BaseMCPServer):
             # Do not add to history if LLM call fails catastrophically before a response
             return {"success": False, "error": error_message, "result": None}
 
+    async def execute_stream(self, inputs: Dict[str, Any]) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Like `execute`, but yields the assistant's reply as it is generated:
+        {"type": "token", "text": ...} events, then {"type": "result", "result": ...}.
+        """
+        user_message_content = inputs.get("message")
+        if not user_message_content:
+            yield {
+                "type": "result",
+                "result": {"success": False, "error": "Input 'message' is required.", "result": None},
+            }
+            return
+
+        self._add_to_history(role="user", content=user_message_content)
+
+        pieces: List[str] = []
+        try:
+            async for text in self.llm.stream(self.history.copy()):
+                pieces.append(text)
+                yield {"type": "token", "text": text}
+        except Exception as e:
+            import traceback
+
+            error_message = (
+                f"Error executing AI Assistant: {str(e)}\n{traceback.format_exc()}"
+            )
+            logger.exception("Error streaming AI Assistant reply")
+            yield {"type": "result", "result": {"success": False, "error": error_message, "result": None}}
+            return
+
+        assistant_response_text = "".join(pieces)
+        self._add_to_history(role="assistant", content=assistant_response_text)
+        yield {
+            "type": "result",
+            "result": {"success": True, "result": assistant_response_text, "error": None},
+        }
+
     @property
     def name(self) -> str:
         return self.config.name
@@ -0,0 +1,108 @@
+"""
+array_transport.py - Passing NumPy arrays between workflow steps through shared files.
+
+Python script MCPs with ``array_transport`` enabled run with the script runner's
+``--array-dir`` option (see mcp/scripts/script_runner.py): arrays in their results are
+saved once as ``.npy`` files and travel through the workflow context as small
+references, and steps that accept references map the files read-only instead of
+parsing JSON. The files live in the ``arrays`` directory of the run's scratch tree
+(mcp/core/scratch.py), which is on tmpfs when available and is removed with the run.
+
+Steps that do not accept references, and the final outputs of a run, receive the
+arrays as lists (``materialize_array_refs``). Step results are stored with the arrays'
+dtype, shape and size only (``summarize_array_refs``), as the files are gone by then.
+
+References can come from anywhere a step's inputs do (e.g. a run's initial inputs), so
+only files in the current run's array directory are read (``run_file_path``); any other
+reference is rejected with ``ValueError``.
+"""
+
+import os
+from typing import Any, Optional
+
+from mcp.scripts.script_runner import ARRAY_REF_KEY, is_array_ref, map_values
+
+from .scratch import current_scratch
+
+
+def run_array_dir() -> Optional[str]:
+    """Returns the array directory of the current run, or None outside a scratch scope."""
+    scratch = current_scratch()
+    if scratch is None:
+        return None
+    path = scratch.root.subpath("arrays")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def run_file_path(path: Any, directory: Optional[str], kind: str) -> str:
+    """The real path of a referenced file, which must be in ``directory`` (a run's directory).
+
+    Raises:
+        ValueError: If the file is not in the directory (or there is no current run).
+    """
+    if directory is not None and isinstance(path, str):
+        real_path, real_directory = os.path.realpath(path), os.path.realpath(directory)
+        if os.path.dirname(real_path) == real_directory:
+            return real_path
+    raise ValueError(f"{kind} reference {path!r} is not a file of the current run; rejected")
+
+
+def _array_path(ref: Any) -> str:
+    path = ref.get("path") if isinstance(ref, dict) else None
+    return run_file_path(path, run_array_dir(), "array")
+
+
+def check_array_refs(obj: Any) -> None:
+    """Raises ValueError if an array reference in ``obj`` is not a file of the current run."""
+    if is_array_ref(obj):
+        _array_path(obj[ARRAY_REF_KEY])
+    elif isinstance(obj, dict):
+        for value in obj.values():
+            check_array_refs(value)
+    elif isinstance(obj, (list, tuple)):
+        for value in obj:
+            check_array_refs(value)
+
+
+def contains_array_refs(obj: Any) -> bool:
+    if is_array_ref(obj):
+        return True
+    if isinstance(obj, dict):
+        return any(contains_array_refs(value) for value in obj.values())
+    if isinstance(obj, (list, tuple)):
+        return any(contains_array_refs(value) for value in obj)
+    return False
+
+
+def materialize_array_refs(obj: Any) -> Any:
+    """Replaces array references with the arrays' contents as (nested) lists."""
+    if not contains_array_refs(obj):
+        return obj
+
+    def convert(value):
+        if is_array_ref(value):
+            import numpy
+
+            return numpy.load(_array_path(value[ARRAY_REF_KEY]), mmap_mode="r").tolist()
+        return value
+
+    return map_values(obj, convert)
+
+
+def summarize_array_refs(obj: Any) -> Any:
+    """Drops the file paths from array references, keeping dtype, shape and size in bytes."""
+    if not contains_array_refs(obj):
+        return obj
+
+    def summarize(value):
+        if is_array_ref(value):
+            import numpy
+
+            ref = value[ARRAY_REF_KEY]
+            dtype, shape = ref.get("dtype"), ref.get("shape") or []
+            nbytes = numpy.dtype(dtype).itemsize * int(numpy.prod(shape)) if dtype else None
+            return {ARRAY_REF_KEY: {"dtype": dtype, "shape": shape, "nbytes": nbytes}}
+        return value
+
+    return map_values(obj, summarize)
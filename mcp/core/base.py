@@ -1,5 +1,5 @@
 from abc import ABC, abstractmethod
-from typing import Any, Dict, Optional
+from typing import Any, AsyncIterator, Dict, Optional
 
 from mcp.core.types import BaseMCPConfig
 
@@ -43,6 +43,22 @@ class BaseMCPServer(ABC):
             Exception: If execution fails for any reason.
         """
 
+    async def execute_stream(self, inputs: Dict[str, Any]) -> AsyncIterator[Dict[str, Any]]:
+        """Execute the MCP server, yielding events while it runs.
+
+        MCPs that produce output incrementally (e.g. LLM tokens) yield
+        ``{"type": "token", "text": ...}`` events as it arrives. The last event is always
+        ``{"type": "result", "result": ...}`` with what ``execute`` returns; by default
+        it is the only one.
+
+        Args:
+            inputs (Dict[str, Any]): Dictionary of input parameters for the MCP server.
+
+        Yields:
+            Dict[str, Any]: Execution events.
+        """
+        yield {"type": "result", "result": await self.execute(inputs)}
+
     def _validate_config(self) -> None:
         """Validate the MCP server configuration.
 
@@ -57,6 +73,24 @@ class BaseMCPServer(ABC):
         if not self.config.type:
             raise ValueError("MCP server type is required")
 
+    @property
+    def accepts_array_refs(self) -> bool:
+        """Whether execute() takes array references in its inputs (see mcp/core/array_transport.py).
+
+        Returns:
+            bool: False unless the MCP maps referenced arrays itself.
+        """
+        return False
+
+    @property
+    def accepts_table_refs(self) -> bool:
+        """Whether execute() takes table references in its inputs (see mcp/core/table_transport.py).
+
+        Returns:
+            bool: False unless the MCP reads referenced tables itself.
+        """
+        return False
+
     @property
     def name(self) -> str:
         """Get the MCP server name.
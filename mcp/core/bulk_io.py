@@ -0,0 +1,269 @@
+"""
+bulk_io.py - Streaming NDJSON import and export of MCP definitions.
+
+Each line of the NDJSON format is one MCP together with its current version, using the
+fields of ``MCPCreate`` plus the MCP ``id`` so that references to MCPs (e.g. from
+workflows) survive a migration between environments:
+
+    {"id": "...", "name": "...", "type": "python_script", "description": "...",
+     "tags": [...], "initial_version_str": "1.0.0", "initial_version_description": null,
+     "initial_config": {...}}
+
+Import validates and inserts in batches: every batch is validated up front, embedded
+with a single model call and written with bulk INSERTs in one transaction. Export
+streams rows with a server-side cursor so memory use does not grow with the catalog.
+"""
+
+import json
+import logging
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from pydantic import ValidationError
+from sqlalchemy import insert, update
+from sqlalchemy.orm import Session
+
+from mcp.db.models import MCP, MCPVersion
+from mcp.schemas.mcp import MCPCreate
+
+from . import registry
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 500
+# Per-line errors kept in the result; further errors are only counted.
+MAX_REPORTED_ERRORS = 100
+
+
+@dataclass
+class ImportResult:
+    """Outcome of an NDJSON import."""
+
+    imported: int = 0
+    skipped: int = 0
+    failed: int = 0
+    errors: List[Dict[str, Any]] = field(default_factory=list)
+
+    def add_error(self, line_no: int, error: str) -> None:
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"line": line_no, "error": error})
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "imported": self.imported,
+            "skipped": self.skipped,
+            "failed": self.failed,
+            "errors": self.errors,
+        }
+
+
+class MCPImporter:
+    """Incremental NDJSON importer.
+
+    Lines are fed in any chunking (``feed``) and written once a batch is full; ``finish``
+    flushes the remainder. MCPs whose id already exists are skipped, so an interrupted
+    import can simply be re-run.
+
+    Args:
+        db: Database session. Each batch is committed separately.
+        batch_size: Number of MCPs validated, embedded and inserted together.
+        embed: Compute embeddings for imported MCPs (requires the embedding model).
+    """
+
+    def __init__(self, db: Session, batch_size: int = DEFAULT_BATCH_SIZE, embed: bool = True):
+        self.db = db
+        self.batch_size = max(1, batch_size)
+        self.embed = embed
+        self.result = ImportResult()
+        self._line_no = 0
+        self._pending: List[Tuple[int, uuid.UUID, MCPCreate, Dict[str, Any]]] = []
+        self._batch_ids: set = set()
+
+    def feed(self, lines: Iterable[Union[str, bytes]]) -> None:
+        """Parses and validates ``lines``, writing every full batch."""
+        for line in lines:
+            self._line_no += 1
+            if isinstance(line, bytes):
+                line = line.decode("utf-8")
+            if not line.strip():
+                continue
+            record = self._validate(self._line_no, line)
+            if record is None:
+                continue
+            if record[1] in self._batch_ids:
+                self.result.skipped += 1
+                continue
+            self._pending.append(record)
+            self._batch_ids.add(record[1])
+            if len(self._pending) >= self.batch_size:
+                self._flush()
+
+    def finish(self) -> ImportResult:
+        """Writes the last partial batch and returns the import result."""
+        self._flush()
+        return self.result
+
+    def _validate(
+        self, line_no: int, line: str
+    ) -> Optional[Tuple[int, uuid.UUID, MCPCreate, Dict[str, Any]]]:
+        try:
+            data = json.loads(line)
+            if not isinstance(data, dict):
+                raise ValueError("each line must be a JSON object")
+            mcp_id = uuid.UUID(str(data.pop("id"))) if data.get("id") else uuid.uuid4()
+            mcp_data = MCPCreate(**data)
+            config_class = registry.config_class_for(mcp_data.type)
+            config = config_class(**mcp_data.initial_config).model_dump()
+        except (ValueError, ValidationError, KeyError, TypeError) as e:
+            self.result.add_error(line_no, str(e))
+            return None
+        return line_no, mcp_id, mcp_data, config
+
+    def _flush(self) -> None:
+        batch, self._pending, self._batch_ids = self._pending, [], set()
+        if not batch:
+            return
+
+        existing = {
+            row.id
+            for row in self.db.query(MCP.id).filter(MCP.id.in_([mcp_id for _, mcp_id, _, _ in batch]))
+        }
+        batch = [record for record in batch if record[1] not in existing]
+        self.result.skipped += len(existing)
+        if not batch:
+            return
+
+        embeddings: Dict[uuid.UUID, List[float]] = {}
+        if self.embed and registry.embedding_model:
+            texts = [
+                (mcp_id, registry.build_embedding_text(mcp_data))
+                for _, mcp_id, mcp_data, _ in batch
+            ]
+            texts = [(mcp_id, text) for mcp_id, text in texts if text]
+            if texts:
+                encoded = registry.encode_texts([text for _, text in texts])
+                embeddings = {mcp_id: vector for (mcp_id, _), vector in zip(texts, encoded)}
+
+        mcp_rows, version_rows, pointers = [], [], []
+        for _, mcp_id, mcp_data, config in batch:
+            version_id = uuid.uuid4()
+            mcp_rows.append(
+                {
+                    "id": mcp_id,
+                    "name": mcp_data.name,
+                    "type": mcp_data.type.value,
+                    "description": mcp_data.description,
+                    "tags": mcp_data.tags,
+                    "embedding": embeddings.get(mcp_id),
+                }
+            )
+            version_rows.append(
+                {
+                    "id": version_id,
+                    "mcp_id": mcp_id,
+                    "version": mcp_data.initial_version_str,
+                    "version_str": mcp_data.initial_version_str,
+                    "description": mcp_data.initial_version_description,
+                    "config_snapshot": config,
+                    "definition": config,
+                }
+            )
+            pointers.append({"id": mcp_id, "current_version_id": version_id})
+
+        try:
+            # MCPs and versions reference each other: insert both, then set the pointers
+            self.db.execute(insert(MCP), mcp_rows)
+            self.db.execute(insert(MCPVersion), version_rows)
+            self.db.execute(update(MCP), pointers)
+            self.db.commit()
+        except Exception as e:
+            self.db.rollback()
+            logger.error(f"Failed to import batch of {len(batch)} MCPs: {e}")
+            for line_no, _, _, _ in batch:
+                self.result.add_error(line_no, f"batch insert failed: {e}")
+            return
+
+        self.result.imported += len(batch)
+        try:
+            registry.get_vector_index().upsert_many(
+                (mcp_id, vector) for mcp_id, vector in embeddings.items()
+            )
+        except Exception as e:
+            logger.warning(f"Failed to update vector index after import: {e}")
+        for _, mcp_id, mcp_data, _ in batch:
+            registry.lexical_index.add(mcp_id, mcp_data.name, mcp_data.description, mcp_data.tags)
+        logger.info(f"Imported {self.result.imported} MCPs so far.")
+
+
+def import_mcps_ndjson(
+    db: Session,
+    lines: Iterable[Union[str, bytes]],
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    embed: bool = True,
+) -> ImportResult:
+    """Imports MCP definitions from NDJSON ``lines``. See MCPImporter."""
+    importer = MCPImporter(db, batch_size=batch_size, embed=embed)
+    importer.feed(lines)
+    return importer.finish()
+
+
+def export_mcps_ndjson(db: Session, batch_size: int = 1000) -> Iterator[str]:
+    """Yields one NDJSON line per MCP with its current version.
+
+    Rows are fetched ``batch_size`` at a time through a server-side cursor (on
+    PostgreSQL), so the whole catalog is never held in memory.
+    """
+    query = (
+        db.query(
+            MCP.id,
+            MCP.name,
+            MCP.type,
+            MCP.description,
+            MCP.tags,
+            MCP.current_version_id,
+            MCPVersion.version_str,
+            MCPVersion.description.label("version_description"),
+            MCPVersion.config_snapshot,
+        )
+        .outerjoin(MCPVersion, MCPVersion.id == MCP.current_version_id)
+        .order_by(MCP.id)
+        .execution_options(stream_results=True, yield_per=batch_size)
+    )
+    batch: List[Any] = []
+    for row in query:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            yield from _export_batch(db, batch)
+            batch = []
+    yield from _export_batch(db, batch)
+
+
+def _export_batch(db: Session, rows: List[Any]) -> Iterator[str]:
+    # MCPs created before current_version_id was maintained, resolved with one query
+    legacy = registry.get_latest_mcp_versions(db, [row for row in rows if row.version_str is None])
+    for row in rows:
+        version_str, version_description, config = (
+            row.version_str,
+            row.version_description,
+            row.config_snapshot,
+        )
+        latest = legacy.get(row.id)
+        if latest is not None:
+            version_str, version_description, config = (
+                latest.version_str,
+                latest.description,
+                latest.config_snapshot,
+            )
+        record = {
+            "id": str(row.id),
+            "name": row.name,
+            "type": getattr(row.type, "value", row.type),
+            "description": row.description,
+            "tags": row.tags or [],
+            "initial_version_str": version_str,
+            "initial_version_description": version_description,
+            "initial_config": config,
+        }
+        yield json.dumps(record, default=str) + "\n"
@@ -0,0 +1,250 @@
+"""
+embedding_backends.py - Interchangeable inference backends for MCP embeddings.
+
+The registry only relies on a SentenceTransformer-compatible ``encode`` method, so the
+model used for MCP embeddings can be swapped through settings:
+
+    sentence_transformers  PyTorch SentenceTransformer (default)
+    onnx                   An exported, int8-quantized ONNX copy of the same model run
+                           by onnxruntime on CPU; much smaller and faster on GPU-less nodes
+
+The ONNX backend needs ``onnxruntime`` and ``tokenizers`` and never imports torch. A model
+directory is produced by ``scripts/export_onnx_embedding_model.py`` and contains the
+quantized graph, ``tokenizer.json`` and an optional ``export_manifest.json``. Because
+stored embeddings and the vector index were produced by the reference model, the ONNX
+backend can be checked against it with ``verify_embedding_parity`` before it is used.
+"""
+
+import json
+import logging
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, List, Optional, Sequence, Union
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_BACKENDS = ("sentence_transformers", "onnx")
+
+# Representative MCP texts used to compare backends.
+PARITY_SENTENCES = [
+    "CSV to JSON converter",
+    "Summarise a support ticket and suggest a reply",
+    "Python script that resizes images in a folder",
+    "Jupyter notebook computing monthly revenue by region",
+    "AI assistant for SQL query optimisation postgres indexes",
+    "weather",
+    "Extracts named entities (people, organisations, places) from news articles "
+    "and returns them grouped by type with confidence scores.",
+    "translate english french german",
+]
+
+
+class OnnxEmbeddingModel:
+    """SentenceTransformer-compatible encoder backed by an ONNX transformer graph.
+
+    Reproduces the sentence-transformers pipeline for mean-pooling models such as
+    all-MiniLM-L6-v2: tokenize, run the transformer, mean-pool the token embeddings
+    over the attention mask and L2-normalise.
+
+    Attributes:
+        model_dir (Path): Directory with the ONNX graph and ``tokenizer.json``.
+        max_seq_length (int): Inputs are truncated to this many tokens.
+    """
+
+    def __init__(
+        self,
+        model_dir: str,
+        model_file: str = "model_quantized.onnx",
+        max_seq_length: Optional[int] = None,
+        num_threads: int = 0,
+    ):
+        try:
+            import onnxruntime as ort
+            from tokenizers import Tokenizer
+        except ImportError as e:
+            raise RuntimeError(
+                "The ONNX embedding backend requires 'onnxruntime' and 'tokenizers' "
+                "(pip install onnxruntime tokenizers)."
+            ) from e
+
+        self.model_dir = Path(model_dir)
+        model_path = self.model_dir / model_file
+        if not model_path.exists():
+            raise FileNotFoundError(
+                f"ONNX embedding model not found at {model_path}; "
+                "run scripts/export_onnx_embedding_model.py first."
+            )
+
+        manifest = {}
+        manifest_path = self.model_dir / "export_manifest.json"
+        if manifest_path.exists():
+            with open(manifest_path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+        self.max_seq_length = max_seq_length or int(manifest.get("max_seq_length", 256))
+
+        self._tokenizer = Tokenizer.from_file(str(self.model_dir / "tokenizer.json"))
+        self._tokenizer.enable_truncation(max_length=self.max_seq_length)
+        pad_token = manifest.get("pad_token", "[PAD]")
+        pad_id = self._tokenizer.token_to_id(pad_token)
+        self._tokenizer.enable_padding(pad_id=pad_id or 0, pad_token=pad_token)
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads > 0:
+            options.intra_op_num_threads = num_threads
+        self._session = ort.InferenceSession(
+            str(model_path), sess_options=options, providers=["CPUExecutionProvider"]
+        )
+        self._input_names = {model_input.name for model_input in self._session.get_inputs()}
+        self._dimension: Optional[int] = manifest.get("dimension")
+        logger.info(f"Loaded ONNX embedding model from {model_path}")
+
+    def get_sentence_embedding_dimension(self) -> int:
+        if self._dimension is None:
+            self._dimension = int(self.encode("dimension probe").shape[0])
+        return self._dimension
+
+    def _encode_batch(self, texts: List[str]) -> np.ndarray:
+        encodings = self._tokenizer.encode_batch(texts)
+        input_ids = np.array([e.ids for e in encodings], dtype=np.int64)
+        attention_mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+        feeds = {"input_ids": input_ids, "attention_mask": attention_mask}
+        if "token_type_ids" in self._input_names:
+            feeds["token_type_ids"] = np.array([e.type_ids for e in encodings], dtype=np.int64)
+        output = self._session.run(None, feeds)[0]
+        if output.ndim == 2:
+            return output.astype(np.float32)  # graph already pools
+        mask = attention_mask[:, :, None].astype(np.float32)
+        summed = (output * mask).sum(axis=1)
+        counts = np.clip(mask.sum(axis=1), 1e-9, None)
+        return (summed / counts).astype(np.float32)
+
+    def encode(
+        self,
+        sentences: Union[str, Sequence[str]],
+        batch_size: int = 32,
+        normalize_embeddings: bool = True,
+        **kwargs: Any,
+    ) -> np.ndarray:
+        """Encodes one text (returns a 1-D array) or a list of texts (returns 2-D)."""
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)  # type: ignore[list-item]
+        if not texts:
+            return np.empty((0, self._dimension or 0), dtype=np.float32)
+
+        # Batch texts of similar length together to keep padding to a minimum
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        batch_size = max(1, batch_size)
+        chunks = [
+            self._encode_batch([texts[i] for i in order[start:start + batch_size]])
+            for start in range(0, len(order), batch_size)
+        ]
+        embeddings = np.empty((len(texts), chunks[0].shape[1]), dtype=np.float32)
+        embeddings[order] = np.vstack(chunks)
+        if normalize_embeddings:
+            norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+            embeddings = embeddings / np.clip(norms, 1e-12, None)
+        return embeddings[0] if single else embeddings
+
+
+@dataclass
+class ParityReport:
+    """Agreement between a reference and a candidate embedding backend."""
+
+    num_texts: int
+    min_cosine: float
+    mean_cosine: float
+    max_abs_diff: float
+    tolerance: float
+
+    @property
+    def passed(self) -> bool:
+        return self.min_cosine >= 1.0 - self.tolerance
+
+
+def verify_embedding_parity(
+    reference: Any,
+    candidate: Any,
+    texts: Optional[Sequence[str]] = None,
+    tolerance: float = 0.02,
+) -> ParityReport:
+    """Compares two encoders on ``texts`` (default: PARITY_SENTENCES).
+
+    Args:
+        reference: Encoder whose embeddings are already stored (e.g. SentenceTransformer).
+        candidate: Encoder to validate.
+        texts: Texts to encode with both.
+        tolerance: Maximum allowed cosine distance for any text.
+
+    Returns:
+        ParityReport; ``passed`` is False if any text's embeddings diverge by more than
+        ``tolerance`` in cosine distance.
+    """
+    texts = list(texts or PARITY_SENTENCES)
+    expected = np.asarray(reference.encode(texts), dtype=np.float32)
+    actual = np.asarray(candidate.encode(texts), dtype=np.float32)
+    if expected.shape != actual.shape:
+        raise ValueError(
+            f"Embedding shapes differ: reference {expected.shape}, candidate {actual.shape}."
+        )
+    expected_unit = expected / np.clip(np.linalg.norm(expected, axis=1, keepdims=True), 1e-12, None)
+    actual_unit = actual / np.clip(np.linalg.norm(actual, axis=1, keepdims=True), 1e-12, None)
+    cosines = (expected_unit * actual_unit).sum(axis=1)
+    return ParityReport(
+        num_texts=len(texts),
+        min_cosine=float(cosines.min()),
+        mean_cosine=float(cosines.mean()),
+        max_abs_diff=float(np.abs(expected_unit - actual_unit).max()),
+        tolerance=tolerance,
+    )
+
+
+def quantize_onnx_model(source_path: str, target_path: str) -> None:
+    """Writes a dynamically int8-quantized copy of an fp32 ONNX model."""
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    quantize_dynamic(source_path, target_path, weight_type=QuantType.QInt8)
+
+
+def load_embedding_model(config: Any) -> Any:
+    """Creates the embedding model selected by ``config`` (an EmbeddingSettings).
+
+    The ONNX backend falls back to the SentenceTransformer model when it cannot be
+    loaded or, with ``verify_parity`` enabled, when it disagrees with the reference
+    model beyond ``parity_tolerance``.
+    """
+    if config.backend not in EMBEDDING_BACKENDS:
+        raise ValueError(
+            f"Unknown embedding backend '{config.backend}'; expected one of {EMBEDDING_BACKENDS}."
+        )
+
+    reference = None
+    if config.backend == "onnx":
+        try:
+            model = OnnxEmbeddingModel(
+                config.onnx_model_dir,
+                model_file=config.onnx_model_file,
+                num_threads=config.onnx_threads,
+            )
+            if not config.verify_parity:
+                return model
+            reference = _load_sentence_transformer(config.model_name)
+            report = verify_embedding_parity(reference, model, tolerance=config.parity_tolerance)
+            if report.passed:
+                logger.info(f"ONNX embedding backend passed parity check: {report}")
+                return model
+            logger.error(f"ONNX embedding backend failed parity check: {report}")
+        except Exception as e:
+            logger.error(f"Could not load ONNX embedding backend: {e}")
+        logger.warning("Falling back to the sentence_transformers embedding backend.")
+
+    return reference if reference is not None else _load_sentence_transformer(config.model_name)
+
+
+def _load_sentence_transformer(model_name: str) -> Any:
+    # Imported lazily: torch is only loaded when this backend is actually used
+    from sentence_transformers import SentenceTransformer
+
+    return SentenceTransformer(model_name)
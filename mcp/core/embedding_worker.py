@@ -0,0 +1,159 @@
+"""
+embedding_worker.py - Micro-batching front end for the sentence embedding model.
+
+Encoding one string per call leaves most of the model's throughput unused. The
+EmbeddingBatcher collects encode requests from any number of threads (or coroutines,
+via ``aencode``) and hands them to the model in batches: a batch is dispatched as soon
+as it reaches ``max_batch_size`` items or its oldest request has waited ``max_wait_ms``.
+Batches run on a small thread pool so the model call never executes on the event loop
+and the dispatcher can keep collecting the next batch while the previous one encodes.
+"""
+
+import asyncio
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# encode_batch(texts) -> one embedding (list of floats) per text, in order
+EncodeBatchFn = Callable[[List[str]], Sequence[Sequence[float]]]
+
+_STOP = object()
+
+
+class EmbeddingBatcher:
+    """Coalesces concurrent embedding requests into batched model calls.
+
+    Attributes:
+        max_batch_size (int): Upper bound on texts per model call.
+        max_wait_ms (float): Longest time a request waits for its batch to fill.
+    """
+
+    def __init__(
+        self,
+        encode_batch: EncodeBatchFn,
+        max_batch_size: int = 32,
+        max_wait_ms: float = 10.0,
+        worker_threads: int = 1,
+    ):
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1")
+        self._encode_batch = encode_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self._worker_threads = max(1, worker_threads)
+        self._queue: "queue.Queue" = queue.Queue()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._dispatcher: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self._dispatcher is not None and self._dispatcher.is_alive()
+
+    def start(self) -> None:
+        """Start the dispatcher thread and the encode pool (idempotent)."""
+        with self._lock:
+            if self.running:
+                return
+            self._executor = ThreadPoolExecutor(
+                max_workers=self._worker_threads, thread_name_prefix="mcp-embed"
+            )
+            self._dispatcher = threading.Thread(
+                target=self._dispatch_loop, name="mcp-embed-dispatcher", daemon=True
+            )
+            self._dispatcher.start()
+            logger.info(
+                f"Embedding batcher started (max_batch_size={self.max_batch_size}, "
+                f"max_wait_ms={self.max_wait_ms}, workers={self._worker_threads})"
+            )
+
+    def stop(self, wait: bool = True) -> None:
+        """Stop accepting work; pending requests are still encoded before shutdown."""
+        with self._lock:
+            dispatcher, executor = self._dispatcher, self._executor
+            if dispatcher is None:
+                return
+            self._queue.put(_STOP)
+            if wait:
+                dispatcher.join()
+            if executor is not None:
+                executor.shutdown(wait=wait)
+            self._dispatcher = None
+            self._executor = None
+
+    def submit(self, text: str) -> "Future[List[float]]":
+        """Queue ``text`` for encoding and return a future for its embedding."""
+        if not self.running:
+            raise RuntimeError("EmbeddingBatcher is not running; call start() first.")
+        future: "Future[List[float]]" = Future()
+        self._queue.put((text, future))
+        return future
+
+    def encode(self, text: str, timeout: Optional[float] = None) -> List[float]:
+        """Blocking helper: encode one text through the batcher."""
+        return self.submit(text).result(timeout=timeout)
+
+    async def aencode(self, text: str) -> List[float]:
+        """Awaitable helper: encode one text without blocking the event loop."""
+        return await asyncio.wrap_future(self.submit(text))
+
+    # ----------------------------------------------------------------- internals
+
+    def _collect_batch(self, first: Tuple[str, Future]) -> Tuple[List[Tuple[str, Future]], bool]:
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait_ms / 1000.0
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is _STOP:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _dispatch_loop(self) -> None:
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is _STOP:
+                break
+            batch, stopping = self._collect_batch(item)
+            self._executor.submit(self._run_batch, batch)  # type: ignore[union-attr]
+        # Drain anything that raced with stop() so no caller waits forever
+        leftovers = []
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not _STOP:
+                leftovers.append(item)
+        for start in range(0, len(leftovers), self.max_batch_size):
+            self._executor.submit(  # type: ignore[union-attr]
+                self._run_batch, leftovers[start:start + self.max_batch_size]
+            )
+
+    def _run_batch(self, batch: List[Tuple[str, Future]]) -> None:
+        live = [(text, fut) for text, fut in batch if fut.set_running_or_notify_cancel()]
+        if not live:
+            return
+        try:
+            embeddings = self._encode_batch([text for text, _ in live])
+            if len(embeddings) != len(live):
+                raise RuntimeError(
+                    f"Embedding model returned {len(embeddings)} vectors for {len(live)} texts."
+                )
+        except Exception as e:
+            logger.error(f"Embedding batch of {len(live)} failed: {e}")
+            for _, fut in live:
+                fut.set_exception(e)
+            return
+        for (_, fut), embedding in zip(live, embeddings):
+            fut.set_result(list(map(float, embedding)))
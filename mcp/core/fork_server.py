@@ -0,0 +1,659 @@
+"""
+fork_server.py - Pre-forked ("zygote") execution of sandboxed Python scripts.
+
+Starting a fresh interpreter for every PythonScriptMCP run costs interpreter startup plus
+the import time of heavy libraries (numpy, pandas, ...), which dominates short scripts.
+A fork server is a long-lived interpreter that imports a configurable set of modules
+once and then forks a child per run:
+
+- The child inherits the already-imported modules (copy-on-write), applies the resource
+  limits of the server's profile, runs the script with ``runpy`` as ``__main__`` and exits,
+  so no state is shared between runs.
+- stdin/stdout/stderr of the child are pipes created by the caller and passed to the
+  server over a Unix socket (SCM_RIGHTS), so output never goes through the server.
+- The server reports the child's pid and exit status; timeouts kill the child's process
+  group directly from the caller.
+- A server is recycled after ``max_runs`` forks or when its RSS exceeds ``max_rss_mb``.
+
+The server side of this module runs in the zygote process and must only import the
+standard library. Fork servers are POSIX-only; ``fork_server_supported`` reports whether
+they can be used on the current platform.
+"""
+
+import json
+import logging
+import os
+import selectors
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import Future
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Control messages are single SOCK_SEQPACKET datagrams
+_MAX_MESSAGE = 1 << 20
+# stdin, stdout, stderr plus the caller's pass_fds
+_MAX_FDS = 16
+# Resource usage reported for each reaped child (see mcp/core/resource_usage.py)
+_RUSAGE_FIELDS = ("ru_utime", "ru_stime", "ru_maxrss", "ru_inblock", "ru_oublock")
+
+
+def fork_server_supported() -> bool:
+    """Whether fork servers can be used on this platform."""
+    return hasattr(os, "fork") and hasattr(socket, "send_fds") and sys.platform != "darwin"
+
+
+class ForkServerError(RuntimeError):
+    """Raised when a run could not be handed to a fork server."""
+
+
+@dataclass(frozen=True)
+class ResourceProfile:
+    """Resource limits applied to every child of a fork server."""
+
+    memory_limit_mb: int = 512
+    cpu_time_limit_sec: int = 60
+
+
+# --- Server side (runs inside the zygote) ---
+
+
+def _vm_size_bytes() -> int:
+    with open("/proc/self/status", "r") as f:
+        for line in f:
+            if line.startswith("VmSize:"):
+                return int(line.split()[1]) * 1024
+    return 0
+
+
+def _exec_as_main(code, script: str) -> None:
+    """Executes a precompiled script as ``__main__`` (what runpy.run_path does, minus compiling)."""
+    import builtins
+    import types
+
+    module = types.ModuleType("__main__")
+    module.__file__ = script
+    module.__builtins__ = builtins
+    sys.modules["__main__"] = module
+    exec(code, module.__dict__)
+
+
+def _run_child(request: dict, fds: List[int], profile: dict, compiled: Dict[str, tuple]) -> int:
+    """Body of a forked child: wires up stdio, applies limits and runs the script."""
+    import resource
+    import runpy
+    import traceback
+
+    import fcntl
+
+    os.setsid()  # own process group, so a timeout kills the script and its children
+    # Received descriptors get arbitrary numbers; move them out of the way first so that
+    # placing them on their target numbers (stdio, then pass_fds) cannot clobber another.
+    targets = [0, 1, 2] + list(request.get("pass_fds", []))
+    moved = [fcntl.fcntl(fd, fcntl.F_DUPFD, 256) for fd in fds]
+    for fd in fds:
+        os.close(fd)
+    for target, fd in zip(targets, moved):
+        os.dup2(fd, target)
+        os.close(fd)
+    os.chdir(request["cwd"])
+    env = request["env"]
+    for key in [key for key in os.environ if key not in env]:
+        del os.environ[key]
+    for key, value in env.items():
+        if os.environ.get(key) != value:
+            os.environ[key] = value
+
+    cpu = profile["cpu_time_limit_sec"]
+    resource.setrlimit(resource.RLIMIT_CPU, (cpu, cpu))
+    # The preloaded modules are already mapped; the memory budget applies on top of them,
+    # otherwise preloading numpy alone could exhaust a small limit.
+    try:
+        baseline = _vm_size_bytes()
+    except OSError:
+        baseline = 0
+    mem_bytes = baseline + profile["memory_limit_mb"] * 1024 * 1024
+    resource.setrlimit(resource.RLIMIT_AS, (mem_bytes, mem_bytes))
+
+    script = request["script"]
+    sys.argv = [script] + list(request["args"])
+    sys.path[0] = os.path.dirname(os.path.abspath(script))
+    code = 0
+    try:
+        cached = compiled.get(script)
+        if cached is not None and os.stat(script).st_mtime_ns == cached[0]:
+            _exec_as_main(cached[1], script)
+        else:
+            runpy.run_path(script, run_name="__main__")
+    except SystemExit as e:
+        if e.code is None:
+            code = 0
+        elif isinstance(e.code, int):
+            code = e.code
+        else:
+            print(e.code, file=sys.stderr)
+            code = 1
+    except BaseException as e:
+        # Report the traceback from the script's first frame, as the interpreter would
+        tb = e.__traceback__
+        while tb is not None and tb.tb_frame.f_code.co_filename != script:
+            tb = tb.tb_next
+        traceback.print_exception(type(e), e, tb or e.__traceback__)
+        code = 1
+    return code
+
+
+def _serve(
+    sock: socket.socket, preload: Sequence[str], profile: dict, precompile: Sequence[str] = ()
+) -> None:
+    """Main loop of the zygote: fork a child per request and report exit statuses."""
+    import gc
+    import importlib
+
+    for module in preload:
+        try:
+            importlib.import_module(module)
+        except Exception as e:  # a missing optional module must not kill the server
+            print(f"fork server: could not preload {module}: {e}", file=sys.stderr)
+    # Scripts that run on every request (e.g. the pipe protocol runner) are compiled once
+    compiled: Dict[str, tuple] = {}
+    for path in precompile:
+        try:
+            with open(path, "rb") as f:
+                compiled[path] = (os.stat(path).st_mtime_ns, compile(f.read(), path, "exec", dont_inherit=True))
+        except (OSError, SyntaxError) as e:
+            print(f"fork server: could not precompile {path}: {e}", file=sys.stderr)
+    # Keep the preloaded heap out of the collector so children don't dirty it (copy-on-write)
+    gc.collect()
+    gc.freeze()
+
+    wake_r, wake_w = os.pipe()
+    os.set_blocking(wake_r, False)
+    os.set_blocking(wake_w, False)
+    signal.set_wakeup_fd(wake_w)
+    signal.signal(signal.SIGCHLD, lambda *_: None)
+
+    children: Dict[int, str] = {}
+    accepting = True
+    selector = selectors.DefaultSelector()
+    selector.register(sock, selectors.EVENT_READ)
+    selector.register(wake_r, selectors.EVENT_READ)
+
+    def send(message: dict) -> None:
+        try:
+            sock.send(json.dumps(message).encode("utf-8"))
+        except OSError:
+            pass  # the client is gone; keep reaping until the children exit
+
+    def reap() -> None:
+        while children:
+            try:
+                pid, status, rusage = os.wait4(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            run_id = children.pop(pid, None)
+            if run_id is not None:
+                send({
+                    "id": run_id,
+                    "returncode": os.waitstatus_to_exitcode(status),
+                    "rusage": {name: getattr(rusage, name) for name in _RUSAGE_FIELDS},
+                })
+
+    while accepting or children:
+        for key, _ in selector.select(timeout=1.0):
+            if key.fileobj == wake_r:
+                try:
+                    while os.read(wake_r, 512):
+                        pass
+                except BlockingIOError:
+                    pass
+                continue
+            message, fds, _, _ = socket.recv_fds(sock, _MAX_MESSAGE, _MAX_FDS)
+            if not message:
+                # Client closed the socket: finish the in-flight children, then exit
+                accepting = False
+                selector.unregister(sock)
+                continue
+            request = json.loads(message)
+            if request.get("op") == "shutdown":
+                accepting = False
+                selector.unregister(sock)
+                continue
+
+            try:
+                pid = os.fork()
+            except OSError as e:
+                for fd in fds:
+                    os.close(fd)
+                print(f"fork server: fork failed: {e}", file=sys.stderr)
+                send({"id": request["id"], "returncode": -1})
+                continue
+            if pid == 0:
+                code = 1
+                try:
+                    selector.close()
+                    sock.close()
+                    signal.set_wakeup_fd(-1)
+                    signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+                    os.close(wake_r)
+                    os.close(wake_w)
+                    gc.unfreeze()
+                    code = _run_child(request, fds, profile, compiled)
+                finally:
+                    try:
+                        sys.stdout.flush()
+                        sys.stderr.flush()
+                    finally:
+                        os._exit(code)
+            for fd in fds:
+                os.close(fd)
+            children[pid] = request["id"]
+            send({"id": request["id"], "pid": pid})
+        reap()
+
+
+def _server_main(argv: List[str]) -> None:
+    fd, config = int(argv[0]), json.loads(argv[1])
+    sock = socket.socket(fileno=fd)
+    _serve(sock, config["preload"], config["profile"], config.get("precompile", ()))
+
+
+# --- Client side ---
+
+
+class ForkServerRun:
+    """A run handed to a fork server (see ``ForkServer.submit``).
+
+    ``pid`` and ``returncode`` are futures resolved by the server's replies; ``rusage``
+    is set with the return code. ``stdin``, ``stdout`` and ``stderr`` are the caller's
+    ends of the child's pipes, to be closed by the caller.
+    """
+
+    __slots__ = ("pid", "returncode", "rusage", "stdin", "stdout", "stderr")
+
+    def __init__(self):
+        self.pid: Future = Future()
+        self.returncode: Future = Future()
+        self.rusage: Optional[dict] = None
+        self.stdin = self.stdout = self.stderr = -1
+
+
+class _Collector:
+    """Keeps a stream's output in full (when the caller passes no capture)."""
+
+    def __init__(self):
+        self.chunks: List[bytes] = []
+
+    def feed(self, data: bytes) -> None:
+        self.chunks.append(data)
+
+    def getvalue(self) -> str:
+        return b"".join(self.chunks).decode("utf-8", errors="replace")
+
+
+def _rss_mb(pid: int) -> float:
+    try:
+        with open(f"/proc/{pid}/status", "r") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return 0.0
+
+
+class ForkServer:
+    """Client handle for one zygote process.
+
+    Args:
+        profile: Resource limits applied to every child.
+        preload_modules: Modules imported once in the zygote.
+        precompile_scripts: Script paths compiled once in the zygote instead of per run.
+        python: Interpreter of the zygote (e.g. a script virtualenv); defaults to this one.
+        env: Environment of the zygote process (children receive their own per run).
+        max_runs: Forks served before the server asks to be recycled.
+        max_rss_mb: Zygote RSS above which the server asks to be recycled.
+        preexec_fn: Called in the zygote before exec (e.g. CPU affinity or niceness,
+            which forked children inherit).
+    """
+
+    def __init__(
+        self,
+        profile: ResourceProfile,
+        preload_modules: Sequence[str] = (),
+        env: Optional[Dict[str, str]] = None,
+        max_runs: int = 1000,
+        max_rss_mb: float = 512.0,
+        precompile_scripts: Sequence[str] = (),
+        python: Optional[str] = None,
+        preexec_fn: Optional[Callable[[], None]] = None,
+    ):
+        self.profile = profile
+        self.python = python or sys.executable
+        self.preload_modules = list(preload_modules)
+        self.precompile_scripts = [os.path.abspath(p) for p in precompile_scripts]
+        self.max_runs = max_runs
+        self.max_rss_mb = max_rss_mb
+        self.runs = 0
+        self._env = dict(env if env is not None else os.environ)
+        self._send_lock = threading.Lock()
+        self._pending: Dict[str, ForkServerRun] = {}
+        self._pending_lock = threading.Lock()
+        self._closed = False
+        self._cwd = tempfile.mkdtemp(prefix="mcp_fork_server_")
+
+        parent_sock, child_sock = socket.socketpair(socket.AF_UNIX, socket.SOCK_SEQPACKET)
+        config = json.dumps(
+            {
+                "preload": self.preload_modules,
+                "precompile": self.precompile_scripts,
+                "profile": {
+                    "memory_limit_mb": profile.memory_limit_mb,
+                    "cpu_time_limit_sec": profile.cpu_time_limit_sec,
+                },
+            }
+        )
+        bootstrap = "import runpy, sys; runpy.run_path(sys.argv[1], run_name='__mcp_fork_server__')"
+        try:
+            self.process = subprocess.Popen(
+                [self.python, "-c", bootstrap, os.path.abspath(__file__),
+                 str(child_sock.fileno()), config],
+                pass_fds=[child_sock.fileno()],
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.DEVNULL,
+                env=self._env,
+                cwd=self._cwd,
+                preexec_fn=preexec_fn,
+            )
+        finally:
+            child_sock.close()
+        self._sock = parent_sock
+        self._reader = threading.Thread(target=self._read_loop, name="fork-server-reader", daemon=True)
+        self._reader.start()
+
+    @property
+    def alive(self) -> bool:
+        return not self._closed and self.process.poll() is None
+
+    def should_recycle(self) -> bool:
+        return self.runs >= self.max_runs or _rss_mb(self.process.pid) > self.max_rss_mb
+
+    def _read_loop(self) -> None:
+        while True:
+            try:
+                message = self._sock.recv(_MAX_MESSAGE)
+            except OSError:
+                message = b""
+            if not message:
+                break
+            reply = json.loads(message)
+            with self._pending_lock:
+                run = self._pending.get(reply["id"])
+                if run is None:
+                    continue
+                if "pid" in reply:
+                    run.pid.set_result(reply["pid"])
+                else:
+                    self._pending.pop(reply["id"], None)
+                    run.rusage = reply.get("rusage")
+                    run.returncode.set_result(reply["returncode"])
+        # The server exited: fail whatever is still waiting
+        self._closed = True
+        with self._pending_lock:
+            pending, self._pending = self._pending, {}
+        for run in pending.values():
+            for future in (run.pid, run.returncode):
+                if not future.done():
+                    future.set_exception(ForkServerError("fork server exited"))
+
+    def run(
+        self,
+        script: str,
+        args: Sequence[str] = (),
+        timeout: float = 600,
+        env: Optional[Dict[str, str]] = None,
+        cwd: Optional[str] = None,
+        input_data: Optional[bytes] = None,
+        pass_fds: Sequence[int] = (),
+        rusage: Optional[dict] = None,
+        stdout_capture: Any = None,
+        stderr_capture: Any = None,
+    ) -> Tuple[int, str, str]:
+        """Runs ``script`` in a forked child; returns (returncode, stdout, stderr).
+
+        Follows run_sandboxed_subprocess: a timeout kills the child and returns -1, and
+        ``pass_fds`` are available in the child under the same descriptor numbers. If
+        ``rusage`` is given, it is filled with the child's ``ru_*`` resource usage fields
+        once the child has been reaped (not on timeouts). Output is passed to the
+        ``feed`` method of ``stdout_capture``/``stderr_capture`` as it is read, and the
+        returned text is their ``getvalue()``; without captures it is kept in full.
+
+        Raises:
+            ForkServerError: If the run could not be handed to the server. The script has
+                not been started in that case, so the caller may fall back safely.
+        """
+        run = self.submit(script, args, env=env, cwd=cwd, pass_fds=pass_fds)
+        deadline = time.monotonic() + timeout
+        stdout, stderr, timed_out = self._communicate(
+            run, run.stdin, run.stdout, run.stderr, input_data, deadline,
+            stdout_capture or _Collector(), stderr_capture or _Collector(),
+        )
+        if timed_out:
+            logger.error(f"Fork server run timed out after {timeout}s: {script}")
+            return -1, stdout, f"TimeoutExpired: script timed out after {timeout} seconds"
+        try:
+            returncode = run.returncode.result(timeout=max(1.0, deadline - time.monotonic()))
+        except Exception as e:
+            return -1, stdout, f"Exception: {e}"
+        if rusage is not None and run.rusage:
+            rusage.update(run.rusage)
+        return returncode, stdout, stderr
+
+    def submit(
+        self,
+        script: str,
+        args: Sequence[str] = (),
+        env: Optional[Dict[str, str]] = None,
+        cwd: Optional[str] = None,
+        pass_fds: Sequence[int] = (),
+    ) -> ForkServerRun:
+        """Hands a run to the server without waiting for it.
+
+        The caller owns the returned run's pipe ends: it must feed or close ``stdin``, read
+        ``stdout`` and ``stderr`` to EOF and close them, and kill the child's process group
+        (``os.killpg(pid)``) if it gives up on the run.
+
+        Raises:
+            ForkServerError: As in ``run``; the script has not been started.
+        """
+        if not self.alive:
+            raise ForkServerError("fork server is not running")
+        if len(pass_fds) > _MAX_FDS - 3:
+            raise ForkServerError(f"at most {_MAX_FDS - 3} pass_fds are supported")
+        run_id = uuid.uuid4().hex
+        run = ForkServerRun()
+        stdin_r, stdin_w = os.pipe()
+        stdout_r, stdout_w = os.pipe()
+        stderr_r, stderr_w = os.pipe()
+        request = {
+            "id": run_id,
+            "script": os.path.abspath(script),
+            "args": [str(a) for a in args],
+            "cwd": cwd or self._cwd,
+            "env": env if env is not None else self._env,
+            "pass_fds": list(pass_fds),
+        }
+        with self._pending_lock:
+            self._pending[run_id] = run
+        try:
+            with self._send_lock:
+                socket.send_fds(
+                    self._sock, [json.dumps(request).encode("utf-8")],
+                    [stdin_r, stdout_w, stderr_w, *pass_fds],
+                )
+                self.runs += 1
+        except OSError as e:
+            with self._pending_lock:
+                self._pending.pop(run_id, None)
+            for fd in (stdin_w, stdout_r, stderr_r):
+                os.close(fd)
+            raise ForkServerError(f"could not submit run: {e}") from e
+        finally:
+            for fd in (stdin_r, stdout_w, stderr_w):
+                os.close(fd)
+        run.stdin, run.stdout, run.stderr = stdin_w, stdout_r, stderr_r
+        return run
+
+    def _communicate(
+        self, run, stdin_w, stdout_r, stderr_r, input_data, deadline, stdout_sink, stderr_sink
+    ):
+        chunks = {stdout_r: stdout_sink, stderr_r: stderr_sink}
+        pending_input = memoryview(input_data or b"")
+        timed_out = False
+        with selectors.DefaultSelector() as selector:
+            for fd in chunks:
+                selector.register(fd, selectors.EVENT_READ)
+            open_fds = set(chunks)
+            if pending_input:
+                # Feed stdin as the child reads it, so large inputs cannot deadlock with output
+                os.set_blocking(stdin_w, False)
+                selector.register(stdin_w, selectors.EVENT_WRITE)
+                open_fds.add(stdin_w)
+            else:
+                os.close(stdin_w)
+            while open_fds:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    timed_out = True
+                    self._kill(run)
+                    break
+                for key, _ in selector.select(timeout=remaining):
+                    if key.fd == stdin_w:
+                        try:
+                            written = os.write(stdin_w, pending_input[:65536])
+                            pending_input = pending_input[written:]
+                        except BlockingIOError:
+                            continue
+                        except OSError:  # the child closed stdin early
+                            pending_input = pending_input[:0]
+                        if not pending_input:
+                            selector.unregister(stdin_w)
+                            open_fds.discard(stdin_w)
+                            os.close(stdin_w)
+                        continue
+                    data = os.read(key.fd, 65536)
+                    if data:
+                        chunks[key.fd].feed(data)
+                    else:
+                        selector.unregister(key.fd)
+                        open_fds.discard(key.fd)
+        if stdin_w in open_fds:
+            os.close(stdin_w)
+        for fd in chunks:
+            os.close(fd)
+        return stdout_sink.getvalue(), stderr_sink.getvalue(), timed_out
+
+    def _kill(self, run: ForkServerRun) -> None:
+        try:
+            pid = run.pid.result(timeout=1.0)
+            os.killpg(pid, signal.SIGKILL)
+        except Exception as e:
+            logger.warning(f"Could not kill timed-out fork server child: {e}")
+
+    def close(self, timeout: float = 10.0) -> None:
+        """Stops accepting runs; the zygote exits once its in-flight children finish."""
+        if self._closed and self.process.poll() is not None:
+            return
+        self._closed = True
+        try:
+            with self._send_lock:
+                self._sock.send(json.dumps({"op": "shutdown"}).encode("utf-8"))
+        except OSError:
+            pass
+        threading.Thread(target=self._reap, args=(timeout,), daemon=True).start()
+
+    def _reap(self, timeout: float) -> None:
+        try:
+            self.process.wait(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+        self._sock.close()
+        try:
+            os.rmdir(self._cwd)
+        except OSError:
+            pass
+
+
+class ForkServerPool:
+    """One fork server per resource profile and interpreter, recycled per its limits."""
+
+    def __init__(
+        self,
+        preload_modules: Sequence[str] = (),
+        env: Optional[Dict[str, str]] = None,
+        max_runs: int = 1000,
+        max_rss_mb: float = 512.0,
+        precompile_scripts: Sequence[str] = (),
+        preexec_fn: Optional[Callable[[], None]] = None,
+    ):
+        self.preload_modules = list(preload_modules)
+        self.precompile_scripts = list(precompile_scripts)
+        self.preexec_fn = preexec_fn
+        self.env = env
+        self.max_runs = max_runs
+        self.max_rss_mb = max_rss_mb
+        self._servers: Dict[Tuple[ResourceProfile, str], ForkServer] = {}
+        self._lock = threading.Lock()
+
+    def get(self, profile: ResourceProfile, python: Optional[str] = None) -> ForkServer:
+        key = (profile, python or sys.executable)
+        with self._lock:
+            server = self._servers.get(key)
+            if server is not None and (not server.alive or server.should_recycle()):
+                logger.info(f"Recycling fork server for {profile} after {server.runs} runs.")
+                server.close()
+                server = None
+            if server is None:
+                server = ForkServer(
+                    profile,
+                    preload_modules=self.preload_modules,
+                    precompile_scripts=self.precompile_scripts,
+                    env=self.env,
+                    max_runs=self.max_runs,
+                    max_rss_mb=self.max_rss_mb,
+                    python=key[1],
+                    preexec_fn=self.preexec_fn,
+                )
+                self._servers[key] = server
+            return server
+
+    def run(
+        self,
+        profile: ResourceProfile,
+        script: str,
+        args: Sequence[str] = (),
+        python: Optional[str] = None,
+        **kwargs,
+    ):
+        return self.get(profile, python).run(script, args, **kwargs)
+
+    def shutdown(self) -> None:
+        with self._lock:
+            servers, self._servers = list(self._servers.values()), {}
+        for server in servers:
+            server.close()
+
+
+if __name__ == "__mcp_fork_server__":
+    _server_main(sys.argv[2:])
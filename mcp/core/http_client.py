@@ -0,0 +1,112 @@
+"""
+http_client.py - Shared, connection-pooled HTTP clients for outbound API calls.
+
+LLM steps call the model API from ``async def execute``. A blocking request there stalls
+the event loop, and with it every other step, for the whole model latency; a new
+connection per call also pays the TCP and TLS handshakes every time. Instead, each event
+loop gets one ``httpx.AsyncClient`` (connections are bound to the loop that opened them)
+that keeps connections alive and multiplexes requests over HTTP/2 when the h2 package is
+installed. Pool limits and timeouts come from the LLM_* settings.
+
+``get_sync_http_client`` is the blocking counterpart for code that is not async (e.g.
+connection checks in constructors). ``close_http_clients`` runs on application shutdown.
+``iter_sse_events`` parses streamed (server-sent events) responses.
+"""
+
+import asyncio
+import logging
+import threading
+import weakref
+from typing import AsyncIterator, List, Optional, Tuple
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = (
+    weakref.WeakKeyDictionary()
+)
+_sync_client: Optional[httpx.Client] = None
+_sync_client_lock = threading.Lock()
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def _client_options() -> dict:
+    from mcp.config.settings import settings
+
+    llm = settings.llm
+    http2 = llm.http2 and _http2_available()
+    if llm.http2 and not http2:
+        logger.info("h2 is not installed; LLM API connections use HTTP/1.1")
+    return {
+        "http2": http2,
+        "limits": httpx.Limits(
+            max_connections=llm.max_connections,
+            max_keepalive_connections=llm.max_keepalive_connections,
+            keepalive_expiry=llm.keepalive_expiry_sec,
+        ),
+        "timeout": httpx.Timeout(
+            connect=llm.connect_timeout_sec,
+            read=llm.read_timeout_sec,
+            write=llm.connect_timeout_sec,
+            pool=llm.pool_timeout_sec,
+        ),
+    }
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Returns the running loop's shared async client, creating it on first use."""
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(**_client_options())
+        _async_clients[loop] = client
+    return client
+
+
+def get_sync_http_client() -> httpx.Client:
+    """Returns the process-wide blocking client, creating it on first use."""
+    global _sync_client
+    with _sync_client_lock:
+        if _sync_client is None or _sync_client.is_closed:
+            _sync_client = httpx.Client(**_client_options())
+        return _sync_client
+
+
+async def close_http_clients() -> None:
+    """Closes the running loop's async client and the blocking client."""
+    global _sync_client
+    client = _async_clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
+    with _sync_client_lock:
+        sync_client, _sync_client = _sync_client, None
+    if sync_client is not None:
+        sync_client.close()
+
+
+async def iter_sse_events(response: httpx.Response) -> AsyncIterator[Tuple[str, str]]:
+    """Yields the (event, data) pairs of a text/event-stream response as they arrive."""
+    event = "message"
+    data: List[str] = []
+    async for line in response.aiter_lines():
+        if not line:
+            if data:
+                yield event, "\n".join(data)
+            event, data = "message", []
+        elif not line.startswith(":"):  # comments keep the connection alive
+            field, _, value = line.partition(":")
+            value = value[1:] if value.startswith(" ") else value
+            if field == "event":
+                event = value
+            elif field == "data":
+                data.append(value)
+    if data:
+        yield event, "\n".join(data)
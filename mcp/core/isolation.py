@@ -0,0 +1,272 @@
+"""
+isolation.py - Keeping sandboxed processes off the API workers' CPU and disk time.
+
+Configured by the ``SANDBOX_*`` settings below and applied to every sandboxed
+subprocess (and to fork server zygotes, whose children inherit it):
+
+- ``SANDBOX_CPU_AFFINITY``: CPU list such as ``"2-3,6"``; children only run on those
+  cores (``os.sched_setaffinity``), leaving the others to uvicorn. Pin the API workers
+  to the remaining cores (e.g. ``taskset``) for full isolation.
+- ``SANDBOX_NICE``: niceness added to children, so the scheduler prefers the API.
+- ``SANDBOX_IONICE_CLASS`` / ``SANDBOX_IONICE_LEVEL``: I/O scheduling class
+  (``idle`` or ``best-effort``) and level of children.
+- ``SANDBOX_MAX_NODE_RUNS``: sandboxed processes running at once on this machine,
+  across all API worker processes (``flock``-ed slot files in ``SANDBOX_NODE_SLOTS_DIR``).
+
+``IsolationProfile.apply`` runs in ``preexec_fn``, between fork and exec of a child of a
+multithreaded server, so it only makes system calls: the I/O priority is set with a raw
+``ioprio_set`` syscall through a libc handle resolved in the parent.
+
+Isolation is best effort: settings that are not supported on the platform are logged
+once and ignored.
+"""
+
+import asyncio
+import ctypes
+import ctypes.util
+import logging
+import os
+import platform
+import sys
+import tempfile
+import time
+from contextlib import asynccontextmanager, contextmanager
+from dataclasses import dataclass
+from typing import AsyncIterator, Callable, FrozenSet, Iterator, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+IONICE_CLASSES = ("idle", "best-effort")
+
+# ioprio_set(2): syscall numbers by machine, and the ioprio encoding
+_IOPRIO_SET_SYSCALLS = {
+    "x86_64": 251, "i386": 289, "i686": 289, "aarch64": 30, "armv7l": 314,
+    "ppc64le": 273, "s390x": 282,
+}
+_IOPRIO_WHO_PROCESS = 1
+_IOPRIO_CLASS_SHIFT = 13
+_IOPRIO_CLASSES = {"best-effort": 2, "idle": 3}
+
+_syscall: Optional[Callable[..., int]] = None
+_ioprio_set_number = _IOPRIO_SET_SYSCALLS.get(platform.machine())
+
+_warned = set()
+
+
+def _warn_once(message: str) -> None:
+    if message not in _warned:
+        _warned.add(message)
+        logger.warning(message)
+
+
+def parse_cpu_list(spec: str) -> FrozenSet[int]:
+    """Parses a CPU list like ``"0-3,6"`` (the taskset/cpuset format).
+
+    Raises:
+        ValueError: If the list is malformed.
+    """
+    cpus = set()
+    for part in spec.replace(" ", "").split(","):
+        if not part:
+            continue
+        first, _, last = part.partition("-")
+        start, end = int(first), int(last or first)
+        if start < 0 or end < start:
+            raise ValueError(f"invalid CPU range {part!r}")
+        cpus.update(range(start, end + 1))
+    return frozenset(cpus)
+
+
+@dataclass(frozen=True)
+class IsolationProfile:
+    """Scheduling settings applied to a sandboxed process."""
+
+    cpus: FrozenSet[int] = frozenset()
+    nice: int = 0
+    ionice_class: Optional[str] = None
+    ionice_level: int = 7
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.cpus or self.nice or self.ionice_class)
+
+    def apply(self) -> None:
+        """Applies the profile to the current process (a child, before exec).
+
+        Runs between fork and exec, so failures are ignored instead of logged; the
+        parent validated the profile in ``isolation_profile()``.
+        """
+        if self.cpus:
+            try:
+                os.sched_setaffinity(0, self.cpus)
+            except OSError:
+                pass
+        if self.nice:
+            try:
+                os.nice(self.nice)
+            except OSError:
+                pass
+        if self.ionice_class and _syscall is not None:
+            level = 0 if self.ionice_class == "idle" else self.ionice_level
+            ioprio = (_IOPRIO_CLASSES[self.ionice_class] << _IOPRIO_CLASS_SHIFT) | level
+            _syscall(_ioprio_set_number, _IOPRIO_WHO_PROCESS, 0, ioprio)  # errors ignored
+
+
+def _load_ioprio_set() -> bool:
+    """Resolves libc's ``syscall`` for ``apply``; False if ioprio_set is not available."""
+    global _syscall
+    if _syscall is None:
+        if not sys.platform.startswith("linux") or _ioprio_set_number is None:
+            return False
+        try:
+            _syscall = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True).syscall
+        except (OSError, AttributeError):
+            return False
+    return True
+
+
+def isolation_profile() -> IsolationProfile:
+    """Builds the isolation profile from the SANDBOX_* settings."""
+    from mcp.config.settings import settings
+
+    sandbox_settings = settings.sandbox
+    cpus: FrozenSet[int] = frozenset()
+    if sandbox_settings.cpu_affinity:
+        if not hasattr(os, "sched_setaffinity"):
+            _warn_once("SANDBOX_CPU_AFFINITY is not supported on this platform; ignored.")
+        else:
+            try:
+                requested = parse_cpu_list(sandbox_settings.cpu_affinity)
+            except ValueError as e:
+                _warn_once(f"Invalid SANDBOX_CPU_AFFINITY {sandbox_settings.cpu_affinity!r}: {e}")
+                requested = frozenset()
+            cpus = requested & frozenset(os.sched_getaffinity(0))
+            if requested and not cpus:
+                _warn_once(
+                    f"SANDBOX_CPU_AFFINITY {sandbox_settings.cpu_affinity!r} names no CPU "
+                    "available to this process; ignored."
+                )
+    ionice_class = sandbox_settings.ionice_class
+    if ionice_class and (ionice_class not in IONICE_CLASSES or not _load_ioprio_set()):
+        _warn_once(f"SANDBOX_IONICE_CLASS {ionice_class!r} is not supported here; ignored.")
+        ionice_class = None
+    return IsolationProfile(
+        cpus=cpus,
+        nice=max(0, sandbox_settings.nice) if hasattr(os, "nice") else 0,
+        ionice_class=ionice_class,
+        ionice_level=min(7, max(0, sandbox_settings.ionice_level)),
+    )
+
+
+class NodeSlots:
+    """A machine-wide limit on concurrent sandboxed processes.
+
+    Each slot is a lock file; a run holds an exclusive ``flock`` on one of them, which
+    the kernel releases if the holding process dies.
+
+    Args:
+        directory: Directory of the slot files, shared by all processes on the machine.
+        slots: Number of slots.
+    """
+
+    def __init__(self, directory: str, slots: int):
+        self.directory = directory
+        self.slots = slots
+        os.makedirs(directory, exist_ok=True)
+
+    def try_acquire(self) -> Optional[int]:
+        """Returns the locked descriptor of a free slot, or None if all are taken."""
+        for index in range(self.slots):
+            fd = os.open(os.path.join(self.directory, f"slot-{index}.lock"), os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                os.close(fd)
+                continue
+            return fd
+        return None
+
+    @staticmethod
+    def release(fd: int) -> None:
+        os.close(fd)  # closing releases the lock
+
+    @contextmanager
+    def acquire(self, timeout: float) -> Iterator[None]:
+        """Holds a slot for the duration of the block.
+
+        Raises:
+            TimeoutError: If no slot became free within ``timeout`` seconds.
+        """
+        deadline = time.monotonic() + timeout
+        delay = 0.01
+        fd = self.try_acquire()
+        while fd is None:
+            if time.monotonic() >= deadline:
+                raise TimeoutError(f"no sandbox slot free within {timeout}s ({self.slots} slots)")
+            time.sleep(delay)
+            delay = min(delay * 2, 0.25)
+            fd = self.try_acquire()
+        try:
+            yield
+        finally:
+            self.release(fd)
+
+    @asynccontextmanager
+    async def acquire_async(self, timeout: float) -> AsyncIterator[None]:
+        """Like ``acquire``, but waits on the event loop."""
+        deadline = time.monotonic() + timeout
+        delay = 0.01
+        fd = self.try_acquire()
+        while fd is None:
+            if time.monotonic() >= deadline:
+                raise TimeoutError(f"no sandbox slot free within {timeout}s ({self.slots} slots)")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 0.25)
+            fd = self.try_acquire()
+        try:
+            yield
+        finally:
+            self.release(fd)
+
+
+def get_node_slots() -> Optional[NodeSlots]:
+    """Returns the machine-wide run slots, or None if SANDBOX_MAX_NODE_RUNS is not set."""
+    from mcp.config.settings import settings
+
+    sandbox_settings = settings.sandbox
+    if sandbox_settings.max_node_runs <= 0:
+        return None
+    if fcntl is None:
+        _warn_once("SANDBOX_MAX_NODE_RUNS is not supported on this platform; ignored.")
+        return None
+    directory = sandbox_settings.node_slots_dir or os.path.join(
+        tempfile.gettempdir(), "mcp_sandbox_slots"
+    )
+    return NodeSlots(directory, sandbox_settings.max_node_runs)
+
+
+@contextmanager
+def node_slot(timeout: float) -> Iterator[None]:
+    """Holds a machine-wide run slot, if SANDBOX_MAX_NODE_RUNS is set."""
+    slots = get_node_slots()
+    if slots is None:
+        yield
+        return
+    with slots.acquire(timeout):
+        yield
+
+
+@asynccontextmanager
+async def node_slot_async(timeout: float) -> AsyncIterator[None]:
+    """Async counterpart of ``node_slot``."""
+    slots = get_node_slots()
+    if slots is None:
+        yield
+        return
+    async with slots.acquire_async(timeout):
+        yield
@@ -1,17 +1,54 @@
+import copy
+import hashlib
+import json
 import os
-import tempfile
+import re
 import sys
 import logging
-from typing import Any, Dict, Optional
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
 
 import nbformat
 import papermill as pm
 
-from mcp.core.types import JupyterNotebookConfig
-from .sandbox import run_sandboxed_subprocess
+from mcp.core.types import JupyterNotebookConfig, PythonScriptConfig
+from .kernel_pool import KernelPoolError, get_kernel_pool, kernel_pool_enabled
+from .notebook_compiler import NotebookCompileError, compile_notebook, notebook_digest
+from .notebook_outputs import ResultExtractor, load_executed_notebook, result_extractor
+from .python_script import PythonScriptMCP
+from .sandbox import run_sandboxed_subprocess_async
+from .scratch import allocate_scratch
+from .table_transport import table_ref_paths
 
 from .base import BaseMCPServer
 
+logger = logging.getLogger(__name__)
+
+# Limits of notebook runs, which may need more than scripts
+NOTEBOOK_MEMORY_LIMIT_MB = 1024
+NOTEBOOK_CPU_TIME_LIMIT_SEC = 120
+
+# Cell metadata marking the cells of a partial run: "setup" or "selected"
+_ROLE = "mcp_role"
+
+# Script MCPs of notebooks compiled for execution_mode="script", by (notebook hash, timeout)
+_COMPILED_CACHE_SIZE = 64
+_compiled_scripts: "OrderedDict[Tuple[str, int], PythonScriptMCP]" = OrderedDict()
+_compiled_scripts_lock = threading.Lock()
+
+
+def _cli_parameter(value: Any) -> Any:
+    """A parameter as papermill's ``-p NAME VALUE`` delivers the JSON-encoded value."""
+    text = json.dumps(value)
+    for convert in (int, float):
+        try:
+            return convert(text)
+        except ValueError:
+            pass
+    return text
+
 
 class JupyterNotebookMCP(BaseMCPServer):
     """MCP for executing Jupyter notebooks.
@@ -32,28 +69,64 @@ class JupyterNotebookMCP(BaseMCPServer):
         self.config: JupyterNotebookConfig = config  # Ensure type for self.config
         if not os.path.exists(self.config.notebook_path):
             raise ValueError(f"Notebook not found: {self.config.notebook_path}")
+        self._parsed: Optional[tuple] = None  # (mtime, notebook)
+
+    @property
+    def accepts_table_refs(self) -> bool:
+        return self.config.table_transport
 
     async def execute(self, inputs: Dict[str, Any]) -> Dict[str, Any]:
         """Execute the Jupyter notebook with given inputs in a sandboxed subprocess.
 
-        This method builds a papermill CLI command and uses run_sandboxed_subprocess
+        This method builds a papermill CLI command and uses run_sandboxed_subprocess_async
         to enforce resource and environment limits. Returns a result dict with output,
         results, execution_time, success, and error.
         """
-        with tempfile.NamedTemporaryFile(suffix=".ipynb", delete=False) as temp:
-            output_path = temp.name
+        # Tables are passed as the paths of their Arrow files (see mcp/core/table_transport.py)
+        try:
+            inputs = table_ref_paths(inputs)
+        except ValueError as e:  # a reference to a file outside the current run
+            return self._failure(str(e))
+        scratch = allocate_scratch("notebook")
+        output_path = scratch.subpath("output.ipynb")
 
         try:
+            if self.config.execution_mode == "script":
+                try:
+                    return await self._execute_as_script(inputs)
+                except ValueError as e:  # cells_to_execute does not fit the notebook
+                    return self._failure(str(e))
+                except NotebookCompileError as e:
+                    logger.warning(f"Running {self.config.notebook_path} on a kernel: {e}")
+            try:
+                result = await self._execute_on_kernel(inputs, scratch.path)
+            except ValueError as e:  # cells_to_execute does not fit the notebook
+                return self._failure(str(e))
+            except KernelPoolError as e:
+                logger.warning(f"No pooled kernel for {self.config.notebook_path}, using papermill: {e}")
+                result = None
+            if result is not None:
+                return result
+
             # --- SANDBOXED EXECUTION ---
             # Build papermill CLI command with parameters
-            import json
             import shlex
             param_str = " ".join([
                 f"-p {shlex.quote(str(k))} {shlex.quote(json.dumps(v))}" for k, v in inputs.items()
             ]) if inputs else ""
+            notebook_path = self.config.notebook_path
+            partial = self._notebook() if not self.config.execute_all else None
+            try:
+                setup = self._mark_partial_run(partial) if partial is not None else None
+            except ValueError as e:
+                return self._failure(str(e))
+            if setup is not None:
+                self._skip_unmarked_cells(partial)
+                notebook_path = scratch.subpath("input.ipynb")
+                nbformat.write(partial, notebook_path)
             command = [
                 sys.executable, "-m", "papermill",
-                self.config.notebook_path,
+                notebook_path,
                 output_path,
             ]
             if param_str:
@@ -61,15 +134,14 @@ class JupyterNotebookMCP(BaseMCPServer):
             if hasattr(self.config, 'timeout'):
                 command += ["--execution-timeout", str(self.config.timeout)]
 
-            logger = logging.getLogger(__name__)
             logger.debug(f"Executing JupyterNotebookMCP with sandboxed papermill: {command}")
 
-            # Use run_sandboxed_subprocess to enforce resource limits and isolation
-            returncode, stdout, stderr = run_sandboxed_subprocess(
+            # Use run_sandboxed_subprocess_async to enforce resource limits and isolation
+            returncode, stdout, stderr = await run_sandboxed_subprocess_async(
                 command,
                 timeout=self.config.timeout if hasattr(self.config, 'timeout') else 600,
-                memory_limit_mb=1024,  # Notebooks may need more memory
-                cpu_time_limit_sec=120,  # Notebooks may run longer
+                memory_limit_mb=NOTEBOOK_MEMORY_LIMIT_MB,
+                cpu_time_limit_sec=NOTEBOOK_CPU_TIME_LIMIT_SEC,
             )
             # --- END SANDBOXED EXECUTION ---
 
@@ -82,25 +154,9 @@ class JupyterNotebookMCP(BaseMCPServer):
                     "error": f"Notebook execution failed (rc={returncode}): {stderr}",
                 }
 
-            # Parse the output notebook for results
-            with open(output_path, "r") as f:
-                nb = nbformat.read(f, as_version=4)
-
-            results = self._extract_results(nb)
-
-            combined_output = []
-            for cell_result in results.values():
-                for output_data in cell_result.get("outputs", []):
-                    if isinstance(output_data, str):
-                        combined_output.append(output_data)
-
-            return {
-                "output": "\n".join(combined_output),
-                "results": results,
-                "execution_time": self._get_execution_time(nb),
-                "success": True,
-                "error": None,
-            }
+            # Parse the output notebook for results, without the rich outputs not asked for
+            nb = load_executed_notebook(output_path, self.config.output_mime_types or ())
+            return self._success(self._extract_results(nb), self._get_execution_time(nb))
 
         except Exception as e:
             import traceback
@@ -115,33 +171,199 @@ class JupyterNotebookMCP(BaseMCPServer):
             }
 
         finally:
-            if os.path.exists(output_path):
-                os.unlink(output_path)
+            scratch.cleanup()
+
+    @staticmethod
+    def _failure(error: str) -> Dict[str, Any]:
+        return {
+            "output": None,
+            "results": None,
+            "execution_time": None,
+            "success": False,
+            "error": error,
+        }
+
+    def _notebook(self) -> nbformat.NotebookNode:
+        """A fresh copy of the notebook, parsed once per modification of the file."""
+        mtime = os.stat(self.config.notebook_path).st_mtime_ns
+        if self._parsed is None or self._parsed[0] != mtime:
+            from papermill.iorw import load_notebook_node
+
+            # papermill's loader, which also adds the cell tags parameterization looks for
+            self._parsed = (mtime, load_notebook_node(self.config.notebook_path))
+        return copy.deepcopy(self._parsed[1])
+
+    def _mark_partial_run(self, nb: nbformat.NotebookNode) -> Optional[List[int]]:
+        """Marks the cells of a partial run; returns the setup cell indices, or None to run all.
+
+        With ``execute_all`` off, ``cells_to_execute`` (indices into the notebook's cells)
+        selects the cells to run. The code cells before the first selected one are setup
+        cells: on warm kernels they run once and their state is reused by later runs
+        with the same setup (see ``_setup_state_key``). Other code cells do not run.
+
+        Raises:
+            ValueError: If an index is not a code cell of the notebook.
+        """
+        if self.config.execute_all or not self.config.cells_to_execute:
+            return None
+        selected = sorted(set(self.config.cells_to_execute))
+        invalid = [i for i in selected if not (0 <= i < len(nb.cells) and nb.cells[i].cell_type == "code")]
+        if invalid:
+            raise ValueError(f"cells_to_execute {invalid} are not code cells of {self.config.notebook_path}")
+        setup = [i for i in range(selected[0]) if nb.cells[i].cell_type == "code"]
+        for i in setup:
+            nb.cells[i].metadata[_ROLE] = "setup"
+        for i in selected:
+            nb.cells[i].metadata[_ROLE] = "selected"
+        return setup
+
+    @staticmethod
+    def _skip_unmarked_cells(nb: nbformat.NotebookNode) -> None:
+        """Turns the code cells outside a partial run into raw cells, which do not run."""
+        for cell in nb.cells:
+            if cell.cell_type == "code" and _ROLE not in cell.metadata:
+                cell.cell_type = "raw"
+                cell.pop("outputs", None)
+                cell.pop("execution_count", None)
+
+    @staticmethod
+    def _setup_state_key(
+        nb: nbformat.NotebookNode, setup: List[int], parameters: Dict[str, Any], kernel_name: str
+    ) -> str:
+        """Identifies the kernel state left by the setup cells.
+
+        Covers the setup cells' sources and the parameters they mention by name (outside
+        the cell of parameter defaults), so parameters used only by the selected cells
+        do not invalidate the state.
+        """
+        sources = [nb.cells[i].source for i in setup]
+        setup_source = "\n".join(
+            nb.cells[i].source for i in setup if "parameters" not in nb.cells[i].metadata.get("tags", [])
+        )
+        setup_parameters = {
+            name: value for name, value in parameters.items()
+            if re.search(rf"\b{re.escape(name)}\b", setup_source)
+        }
+        digest = hashlib.sha256(kernel_name.encode("utf-8"))
+        for source in sources:
+            digest.update(b"\0" + source.encode("utf-8"))
+        digest.update(json.dumps(setup_parameters, sort_keys=True, default=str).encode("utf-8"))
+        return digest.hexdigest()
+
+    async def _execute_on_kernel(self, inputs: Dict[str, Any], cwd: str) -> Optional[Dict[str, Any]]:
+        """Runs the notebook on a warm kernel (see mcp/core/kernel_pool.py).
+
+        Returns None if kernel pooling is disabled; raises KernelPoolError if no kernel
+        could run the notebook, in which case nothing ran.
+        """
+        if not kernel_pool_enabled():
+            return None
+        nb = self._notebook()
+        kernel_name = nb.metadata.get("kernelspec", {}).get("name") or "python3"
+        pool = get_kernel_pool(kernel_name, NOTEBOOK_MEMORY_LIMIT_MB)
+        if pool is None:
+            return None
+        setup = self._mark_partial_run(nb)
+        parameters = {k: _cli_parameter(v) for k, v in inputs.items()}
+        if parameters:
+            from papermill.parameterize import parameterize_notebook
+
+            nb = parameterize_notebook(nb, parameters)
+        cells, setup_cells, state_key = self._partial_run_cells(nb, setup, parameters, kernel_name)
+        started = time.monotonic()
+        nb, error = await pool.run(
+            nb, cwd=cwd, timeout=self.config.timeout, cpu_time_limit_sec=NOTEBOOK_CPU_TIME_LIMIT_SEC,
+            cells=cells, setup_cells=setup_cells, state_key=state_key,
+            owner=os.path.realpath(self.config.notebook_path),
+        )
+        if error is not None:
+            return self._failure(f"Notebook execution failed: {error}")
+        return self._success(self._extract_results(nb), time.monotonic() - started)
+
+    def _compiled_script(self) -> PythonScriptMCP:
+        """The script MCP running the compiled notebook, compiled once per notebook content.
+
+        Raises:
+            NotebookCompileError: If the notebook is not plain Python.
+            ValueError: If ``cells_to_execute`` does not fit the notebook.
+        """
+        nb = self._notebook()
+        if self._mark_partial_run(nb) is not None:
+            self._skip_unmarked_cells(nb)
+        key = (notebook_digest(nb), self.config.timeout)
+        with _compiled_scripts_lock:
+            script = _compiled_scripts.get(key)
+            if script is not None:
+                _compiled_scripts.move_to_end(key)
+                return script
+        source = compile_notebook(nb, origin=os.path.basename(self.config.notebook_path))
+        script = PythonScriptMCP(PythonScriptConfig(
+            name=f"{self.config.name} (compiled)",
+            script_content=source,
+            io_protocol="pipe",
+            timeout=self.config.timeout,
+        ))
+        evicted = []
+        with _compiled_scripts_lock:
+            if key in _compiled_scripts:  # compiled concurrently
+                evicted.append(script)
+                script = _compiled_scripts[key]
+            else:
+                _compiled_scripts[key] = script
+                while len(_compiled_scripts) > _COMPILED_CACHE_SIZE:
+                    evicted.append(_compiled_scripts.popitem(last=False)[1])
+        for stale in evicted:
+            stale.close()
+        return script
+
+    async def _execute_as_script(self, inputs: Dict[str, Any]) -> Dict[str, Any]:
+        """Runs the notebook compiled into a script (see mcp/core/notebook_compiler.py)."""
+        script = self._compiled_script()
+        parameters = {k: _cli_parameter(v) for k, v in inputs.items()}
+        started = time.monotonic()
+        result = await script.execute(parameters)
+        if not result.get("success"):
+            return self._failure(f"Notebook execution failed: {result.get('error')}")
+        results = self._result_extractor().summarize(result["result"]["results"])
+        return self._success(results, time.monotonic() - started)
+
+    @staticmethod
+    def _success(results: Dict[str, Any], execution_time: Optional[float]) -> Dict[str, Any]:
+        return {
+            "output": "\n".join(
+                output for cell in results.values() for output in cell["outputs"] if isinstance(output, str)
+            ),
+            "results": results,
+            "execution_time": execution_time,
+            "success": True,
+            "error": None,
+        }
+
+    def _partial_run_cells(
+        self,
+        nb: nbformat.NotebookNode,
+        setup: Optional[List[int]],
+        parameters: Dict[str, Any],
+        kernel_name: str,
+    ) -> Tuple[Optional[List[int]], List[int], Optional[str]]:
+        """(cells to run, setup cells, state key) of the parameterized notebook."""
+        if setup is None:
+            return None, [], None
+        # Indices moved by the injected parameters cell, which runs on every execution
+        cells = [
+            i for i, cell in enumerate(nb.cells)
+            if _ROLE in cell.metadata or "injected-parameters" in cell.metadata.get("tags", [])
+        ]
+        setup_cells = [i for i in cells if nb.cells[i].metadata.get(_ROLE) == "setup"]
+        return cells, setup_cells, self._setup_state_key(nb, setup_cells, parameters, kernel_name)
+
+    def _result_extractor(self) -> ResultExtractor:
+        label = os.path.splitext(os.path.basename(self.config.notebook_path))[0]
+        return result_extractor(self.config.output_mime_types, label=label)
 
     def _extract_results(self, nb: nbformat.NotebookNode) -> Dict[str, Any]:
-        results = {}
-
-        for i, cell in enumerate(nb.cells):
-            if cell.cell_type == "code" and cell.outputs:
-                cell_outputs = []
-                for output in cell.outputs:
-                    if output.output_type == "execute_result":
-                        if "data" in output and "text/plain" in output.data:
-                            cell_outputs.append(output.data["text/plain"])
-                    elif output.output_type == "stream":
-                        cell_outputs.append(output.text)
-                    elif output.output_type == "error":
-                        cell_outputs.append(
-                            f"ErrorInCell: {output.ename}: {output.evalue}"
-                        )
-                results[
-                    f"cell_{i+1}_{cell.execution_count if cell.execution_count else 'nc'}"
-                ] = {
-                    "outputs": cell_outputs,
-                    "execution_count": cell.execution_count,
-                    "source": cell.source,
-                }
-        return results
+        """Per-cell results, with long and rich outputs moved out (see mcp/core/notebook_outputs.py)."""
+        return self._result_extractor().extract(nb)
 
     def _get_execution_time(self, nb: nbformat.NotebookNode) -> Optional[float]:
         if hasattr(nb.metadata, "papermill") and hasattr(
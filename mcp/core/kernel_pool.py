@@ -0,0 +1,500 @@
+"""
+kernel_pool.py - Warm Jupyter kernels for notebook MCPs.
+
+Running a notebook through ``python -m papermill`` pays for interpreter startup, the
+papermill import, kernel startup and notebook parsing before the first cell runs. With
+SANDBOX_KERNEL_POOL_SIZE set, notebooks are instead executed in-process with nbclient on
+kernels that were started ahead of time:
+
+- Kernels are started with the sandbox environment, a memory limit (RLIMIT_AS), the
+  scratch file size limit and the isolation profile (mcp/core/isolation.py), and
+  import SANDBOX_PRELOAD_MODULES once.
+- Each run gets its own CPU time budget: the kernel's soft RLIMIT_CPU is raised to the
+  CPU time it has used so far plus the run's limit, so exceeding it kills the kernel.
+- Between runs a kernel is reset (SANDBOX_KERNEL_RESET=reset: the user namespace is
+  cleared and the execution count restarts, imported modules stay loaded) or restarted
+  in the background (``restart``: a fresh process, at the cost of the warm imports).
+- A reset leaves imported (or monkeypatched) modules, threads and child processes in
+  place, so a kernel is only reset for runs of the same owner (the notebook file).
+  Runs prefer fresh kernels and their owner's kernels; a kernel last used by another
+  owner is restarted before the run.
+- A run may name setup cells and a state key (e.g. a hash of the setup cells and
+  their parameters): the kernel then keeps its namespace after the run instead of
+  being reset, and later runs with the same key skip the setup cells. Runs prefer
+  kernels holding their key, then kernels without state; otherwise the least
+  recently used state is dropped.
+- Kernels are replaced after SANDBOX_KERNEL_MAX_RUNS runs, when their RSS exceeds
+  SANDBOX_KERNEL_MAX_RSS_MB, and after a timeout, a cancelled run or a crash.
+
+Kernels and their ZMQ channels belong to one event loop, so there is one pool per loop
+and kernel name. If no kernel can be started (e.g. ipykernel is not installed),
+``KernelPoolError`` is raised before anything ran and callers fall back to papermill.
+"""
+
+import asyncio
+import logging
+import math
+import tempfile
+import time
+import weakref
+from typing import Any, Callable, Dict, List, Optional, Sequence, Set, Tuple
+
+import psutil
+
+from .isolation import isolation_profile, node_slot_async
+from .resource_usage import ResourceUsage, classify_exit, record_usage
+from .scratch import get_scratch_manager
+
+logger = logging.getLogger(__name__)
+
+RESET_POLICIES = ("reset", "restart")
+
+# Clears the user namespace and restarts execution counts, so cell keys match a fresh kernel
+_RESET_CODE = "get_ipython().reset(new_session=True)\nimport os\nos.chdir({home!r})\ndel os"
+
+_pools: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, KernelPool]]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+class KernelPoolError(RuntimeError):
+    """Raised when a notebook could not be handed to a pooled kernel; nothing ran."""
+
+
+def _kernel_preexec(memory_limit_mb: int) -> Callable[[], None]:
+    isolation = isolation_profile()
+    file_size_limit = get_scratch_manager().quota_bytes
+
+    def preexec():
+        import resource
+
+        mem_bytes = memory_limit_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (mem_bytes, mem_bytes))
+        if file_size_limit:
+            resource.setrlimit(resource.RLIMIT_FSIZE, (file_size_limit, file_size_limit))
+        if isolation.enabled:
+            isolation.apply()
+
+    return preexec
+
+
+class PooledKernel:
+    """A started kernel with a connected client."""
+
+    def __init__(self, manager: Any, client: Any):
+        self.manager = manager
+        self.client = client
+        self.runs = 0
+        self.state_key: Optional[str] = None  # setup state kept in the namespace
+        self.fresh = True  # no run since the kernel (re)started
+        self.owner: Optional[str] = None  # of the runs since then
+
+    @property
+    def process(self):
+        # The local provisioner keeps the kernel's Popen
+        return getattr(self.manager.provisioner, "process", None)
+
+    @property
+    def alive(self) -> bool:
+        process = self.process
+        return process is not None and process.poll() is None
+
+    def cpu_times(self) -> Tuple[float, float]:
+        try:
+            times = psutil.Process(self.process.pid).cpu_times()
+            return times.user, times.system
+        except (AttributeError, psutil.Error):
+            return 0.0, 0.0
+
+    def rss_mb(self) -> float:
+        try:
+            return psutil.Process(self.process.pid).memory_info().rss / (1024 * 1024)
+        except (AttributeError, psutil.Error):
+            return 0.0
+
+    def limit_cpu(self, cpu_time_limit_sec: float) -> None:
+        """Lets the kernel use ``cpu_time_limit_sec`` more seconds of CPU time."""
+        if not cpu_time_limit_sec or not hasattr(psutil, "RLIMIT_CPU"):
+            return
+        soft = math.ceil(sum(self.cpu_times()) + cpu_time_limit_sec)
+        try:
+            process = psutil.Process(self.process.pid)
+            _, hard = process.rlimit(psutil.RLIMIT_CPU)
+            if hard != psutil.RLIM_INFINITY:
+                soft = min(soft, hard)
+            process.rlimit(psutil.RLIMIT_CPU, (soft, hard))
+        except (AttributeError, OSError, psutil.Error) as e:
+            logger.warning(f"Could not set the CPU limit of kernel {self.process}: {e}")
+
+    async def execute_silent(self, code: str, timeout: float = 30.0) -> bool:
+        """Runs ``code`` without output or history; returns whether it succeeded."""
+        try:
+            reply = await self.client.execute_interactive(
+                code, silent=True, store_history=False, timeout=timeout, output_hook=lambda msg: None
+            )
+        except Exception as e:
+            logger.warning(f"Kernel did not run setup code: {e}")
+            return False
+        return reply.get("content", {}).get("status") == "ok"
+
+    async def shutdown(self) -> None:
+        try:
+            self.client.stop_channels()
+            await self.manager.shutdown_kernel(now=True)
+        except Exception as e:
+            logger.warning(f"Error shutting down pooled kernel: {e}")
+
+
+class KernelPool:
+    """Warm kernels of one kernel name, owned by the running event loop.
+
+    Args:
+        size: Kernels kept started.
+        kernel_name: Kernel spec to start (e.g. ``python3``).
+        memory_limit_mb: Address space limit of each kernel.
+        preload_modules: Modules imported once when a kernel starts.
+        max_runs: Runs after which a kernel is replaced.
+        max_rss_mb: Kernel RSS above which it is replaced.
+        reset_policy: ``reset`` or ``restart`` between runs (see the module docstring).
+        env: Environment of the kernels.
+    """
+
+    def __init__(
+        self,
+        size: int,
+        kernel_name: str = "python3",
+        memory_limit_mb: int = 1024,
+        preload_modules: Sequence[str] = (),
+        max_runs: int = 100,
+        max_rss_mb: float = 1024.0,
+        reset_policy: str = "reset",
+        env: Optional[Dict[str, str]] = None,
+    ):
+        self.size = max(1, size)
+        self.kernel_name = kernel_name
+        self.memory_limit_mb = memory_limit_mb
+        self.preload_modules = list(preload_modules)
+        self.max_runs = max_runs
+        self.max_rss_mb = max_rss_mb
+        self.reset_policy = reset_policy if reset_policy in RESET_POLICIES else "reset"
+        self.env = env
+        self.home = tempfile.mkdtemp(prefix="mcp_kernels_")
+        self._idle: List[PooledKernel] = []
+        self._kernels = 0  # started or starting, idle or busy
+        self._available = asyncio.Condition()
+        self._tasks: Set[asyncio.Future] = set()
+        self._closed = False
+
+    async def _start_kernel(self) -> PooledKernel:
+        from jupyter_client.manager import AsyncKernelManager
+
+        manager = AsyncKernelManager(kernel_name=self.kernel_name)
+        try:
+            await manager.start_kernel(
+                env=self.env, cwd=self.home, preexec_fn=_kernel_preexec(self.memory_limit_mb)
+            )
+        except Exception as e:
+            raise KernelPoolError(f"could not start kernel {self.kernel_name!r}: {e}") from e
+        client = manager.client()
+        client.start_channels()
+        kernel = PooledKernel(manager, client)
+        try:
+            await client.wait_for_ready(timeout=60)
+        except Exception as e:
+            await kernel.shutdown()
+            raise KernelPoolError(f"kernel {self.kernel_name!r} did not become ready: {e}") from e
+        await self._warm(kernel)
+        return kernel
+
+    async def _warm(self, kernel: PooledKernel) -> None:
+        if self.preload_modules:
+            await kernel.execute_silent(
+                f"for _name in {self.preload_modules!r}:\n"
+                "    try:\n        __import__(_name)\n    except ImportError:\n        pass\n"
+                "del _name"
+            )
+
+    def _background(self, coro) -> None:
+        task = asyncio.ensure_future(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def fill(self) -> None:
+        """Starts kernels until the pool has ``size`` of them."""
+        while not self._closed and self._kernels < self.size:
+            self._kernels += 1
+            try:
+                kernel = await self._start_kernel()
+            except KernelPoolError as e:
+                self._kernels -= 1
+                logger.warning(f"Kernel pool not filled: {e}")
+                async with self._available:
+                    self._available.notify_all()  # waiters start (or fail to start) their own
+                return
+            await self._put(kernel)
+
+    async def _put(self, kernel: PooledKernel) -> None:
+        async with self._available:
+            self._idle.append(kernel)
+            self._available.notify()
+
+    def _take_idle(self, state_key: Optional[str], owner: Optional[str]) -> PooledKernel:
+        # Most recently used first; the least recently used kernel is the one taken over
+        def reusable(kernel: PooledKernel) -> bool:
+            return kernel.fresh or kernel.owner == owner
+
+        for kernel in reversed(self._idle):
+            if state_key is not None and kernel.state_key == state_key and reusable(kernel):
+                break
+        else:
+            for kernel in reversed(self._idle):
+                if kernel.state_key is None and reusable(kernel):
+                    break
+            else:
+                for kernel in reversed(self._idle):
+                    if reusable(kernel):
+                        break
+                else:
+                    kernel = self._idle[0]
+        self._idle.remove(kernel)
+        return kernel
+
+    async def acquire(
+        self, timeout: float, state_key: Optional[str] = None, owner: Optional[str] = None
+    ) -> PooledKernel:
+        """Returns an idle kernel, starting one if the pool is not full.
+
+        An idle kernel of ``owner`` holding ``state_key`` is preferred (see ``run``).
+
+        Raises:
+            KernelPoolError: If no kernel could be started or none became idle in time.
+        """
+        if self._closed:
+            raise KernelPoolError("kernel pool is shut down")
+        async with self._available:
+            try:
+                await asyncio.wait_for(
+                    self._available.wait_for(lambda: self._idle or self._kernels < self.size), timeout
+                )
+            except asyncio.TimeoutError:
+                raise KernelPoolError(f"no kernel free within {timeout}s ({self.size} kernels)")
+            if self._idle and (self._kernels >= self.size or any(
+                (kernel.fresh or kernel.owner == owner) and kernel.state_key in (state_key, None)
+                for kernel in self._idle
+            )):
+                return self._take_idle(state_key, owner)
+            self._kernels += 1
+        try:
+            return await self._start_kernel()
+        except BaseException:
+            self._kernels -= 1
+            raise
+
+    def release(self, kernel: PooledKernel, reusable: bool) -> None:
+        """Returns a kernel after a run; it is reset, restarted or replaced in the background."""
+        kernel.runs += 1
+        recycle = kernel.runs >= self.max_runs or kernel.rss_mb() > self.max_rss_mb
+        if not reusable or recycle or not kernel.alive or self._closed:
+            if recycle:
+                logger.info(f"Recycling kernel after {kernel.runs} runs ({kernel.rss_mb():.0f} MB RSS).")
+            self._background(self._replace(kernel))
+        elif kernel.state_key is not None:
+            self._background(self._put(kernel))  # keeps its setup state
+        else:
+            self._background(self._reset(kernel))
+
+    async def _restart(self, kernel: PooledKernel) -> bool:
+        """Restarts the kernel process (and warms it); False if that failed."""
+        kernel.state_key = None
+        try:
+            await kernel.manager.restart_kernel(now=True)
+            await kernel.client.wait_for_ready(timeout=60)
+        except Exception as e:
+            logger.warning(f"Kernel restart failed: {e}")
+            return False
+        await self._warm(kernel)
+        kernel.runs = 0
+        kernel.fresh, kernel.owner = True, None
+        return True
+
+    async def _reset(self, kernel: PooledKernel) -> None:
+        kernel.state_key = None
+        if self.reset_policy == "restart":
+            if not await self._restart(kernel):
+                await self._replace(kernel)
+                return
+        elif not await kernel.execute_silent(_RESET_CODE.format(home=self.home)):
+            await self._replace(kernel)
+            return
+        await self._put(kernel)
+
+    async def _replace(self, kernel: PooledKernel) -> None:
+        await kernel.shutdown()
+        self._kernels -= 1
+        async with self._available:
+            self._available.notify()  # a waiter may start a kernel now
+        await self.fill()
+
+    async def run(
+        self,
+        nb: Any,
+        cwd: str,
+        timeout: float,
+        cpu_time_limit_sec: float,
+        cells: Optional[Sequence[int]] = None,
+        setup_cells: Sequence[int] = (),
+        state_key: Optional[str] = None,
+        owner: Optional[str] = None,
+    ) -> Tuple[Any, Optional[str]]:
+        """Executes code cells of ``nb`` in place; returns (nb, error or None).
+
+        ``cells`` are the indices of the cells to execute (all by default). With a
+        ``state_key``, the ``setup_cells`` among them are skipped on a kernel that ran
+        them for the same key, and the kernel keeps its namespace afterwards. A kernel
+        last used for another ``owner`` (e.g. another notebook) is restarted first.
+
+        ``timeout`` applies per cell and to the whole run, like papermill's execution
+        timeout inside the sandbox's run timeout. The run is reported to the current
+        resource usage collector.
+
+        Raises:
+            KernelPoolError: If no kernel was available; the notebook did not run.
+        """
+        from nbclient import NotebookClient
+        from nbclient.exceptions import CellExecutionError, CellTimeoutError, DeadKernelError
+
+        async with node_slot_async(timeout):
+            kernel = await self.acquire(timeout, state_key, owner)
+            try:
+                ready = True
+                if not kernel.fresh and kernel.owner != owner:
+                    # Another owner's modules, threads and processes would outlive a reset
+                    ready = await self._restart(kernel)
+                elif kernel.state_key is not None and kernel.state_key != state_key:
+                    # Another notebook's setup state; drop it before this run
+                    kernel.state_key = None
+                    ready = await kernel.execute_silent(_RESET_CODE.format(home=self.home))
+                ready = ready and await kernel.execute_silent(f"import os\nos.chdir({cwd!r})\ndel os")
+            except BaseException:
+                self.release(kernel, reusable=False)
+                raise
+            if not ready:
+                self.release(kernel, reusable=False)
+                raise KernelPoolError("kernel did not accept the run")
+            kernel.fresh, kernel.owner = False, owner
+
+            started = time.monotonic()
+            user_before, system_before = kernel.cpu_times()
+            reusable, timed_out, cancelled, error = False, False, False, None
+            try:
+                kernel.limit_cpu(cpu_time_limit_sec)
+                client = NotebookClient(
+                    nb, km=kernel.manager, timeout=timeout, kernel_name=self.kernel_name,
+                    resources={"metadata": {"path": cwd}},
+                )
+                # Cells are executed directly: NotebookClient.execute() would install
+                # signal handlers on the server's event loop and tear the kernel down
+                client.kc = kernel.client
+                client.reset_execution_trackers()
+
+                indices = list(range(len(nb.cells)) if cells is None else cells)
+                setup = set(setup_cells) & set(indices) if state_key is not None else set()
+                if kernel.state_key is not None:  # holds state_key: the setup already ran
+                    indices = [i for i in indices if i not in setup]
+                    setup = set()
+
+                async def execute_cells():
+                    remaining_setup = set(setup)
+                    for index in indices:
+                        await client.async_execute_cell(nb.cells[index], index, store_history=True)
+                        remaining_setup.discard(index)
+                        if setup and not remaining_setup:
+                            kernel.state_key = state_key  # kept after the run
+
+                await asyncio.wait_for(execute_cells(), timeout)
+                reusable = True
+            except CellExecutionError as e:
+                reusable, error = True, str(e)
+            except (CellTimeoutError, asyncio.TimeoutError):
+                timed_out, error = True, f"TimeoutExpired: notebook timed out after {timeout} seconds"
+            except DeadKernelError as e:
+                error = f"Kernel died: {e}"
+            except asyncio.CancelledError:
+                cancelled = True
+                raise
+            finally:
+                self._record(kernel, started, user_before, system_before, error,
+                             timed_out, cancelled, cpu_time_limit_sec)
+                self.release(kernel, reusable)
+        return nb, error
+
+    @staticmethod
+    def _record(kernel, started, user_before, system_before, error, timed_out, cancelled, cpu_limit):
+        user, system = kernel.cpu_times()
+        returncode = 0 if error is None else 1
+        process = kernel.process
+        if process is not None and process.poll() is not None:
+            returncode = process.returncode  # the kernel died, e.g. of SIGXCPU
+        usage = ResourceUsage(
+            wall_time_sec=round(time.monotonic() - started, 6),
+            cpu_user_sec=round(max(0.0, user - user_before), 6),
+            cpu_system_sec=round(max(0.0, system - system_before), 6),
+            max_rss_mb=round(kernel.rss_mb(), 3),
+            returncode=returncode,
+        )
+        usage.exit_reason = classify_exit(
+            returncode, error or "", timed_out=timed_out, cpu_time_sec=usage.cpu_time_sec,
+            cpu_time_limit_sec=cpu_limit, cancelled=cancelled,
+        )
+        record_usage(usage)
+
+    async def shutdown(self) -> None:
+        self._closed = True
+        kernels, self._idle = self._idle, []
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*(kernel.shutdown() for kernel in kernels), return_exceptions=True)
+        self._kernels -= len(kernels)
+
+
+def kernel_pool_enabled() -> bool:
+    from mcp.config.settings import settings
+
+    return settings.sandbox.kernel_pool_size > 0
+
+
+def get_kernel_pool(kernel_name: str = "python3", memory_limit_mb: int = 1024) -> Optional[KernelPool]:
+    """Returns the running loop's pool for ``kernel_name``, or None if pooling is disabled.
+
+    The pool is created (with ``memory_limit_mb`` per kernel) and filled in the
+    background on first use.
+    """
+    from mcp.config.settings import settings
+
+    from .sandbox import _sandbox_env
+
+    sandbox_settings = settings.sandbox
+    if not kernel_pool_enabled():
+        return None
+    pools = _pools.setdefault(asyncio.get_running_loop(), {})
+    pool = pools.get(kernel_name)
+    if pool is None:
+        pool = KernelPool(
+            size=sandbox_settings.kernel_pool_size,
+            kernel_name=kernel_name,
+            memory_limit_mb=memory_limit_mb,
+            preload_modules=sandbox_settings.preload_modules,
+            max_runs=sandbox_settings.kernel_max_runs,
+            max_rss_mb=sandbox_settings.kernel_max_rss_mb,
+            reset_policy=sandbox_settings.kernel_reset,
+            env=_sandbox_env(),
+        )
+        pools[kernel_name] = pool
+        pool._background(pool.fill())
+    return pool
+
+
+async def shutdown_kernel_pools() -> None:
+    """Shuts down the kernel pools of the running loop (e.g. on application shutdown)."""
+    pools = _pools.pop(asyncio.get_running_loop(), {})
+    await asyncio.gather(*(pool.shutdown() for pool in pools.values()), return_exceptions=True)
@@ -0,0 +1,173 @@
+"""
+lexical_index.py - In-memory BM25 inverted index over MCP names, descriptions and tags.
+
+Used by hybrid search for candidate generation: the inverted index narrows the registry
+down to the MCPs that share terms with the query, and only those candidates are scored
+against the query embedding. Name and tag matches weigh more than description matches,
+and an exact (case-insensitive) name lookup is kept alongside the postings so that
+searching for an MCP by its name always finds it.
+"""
+
+import math
+import re
+import threading
+import uuid
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+# Term-frequency weight of each field (a light-weight BM25F).
+FIELD_WEIGHTS = {"name": 3.0, "tags": 2.0, "description": 1.0}
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    """Lowercases ``text`` and splits it into alphanumeric tokens."""
+    if not text:
+        return []
+    return _TOKEN_RE.findall(text.lower())
+
+
+def normalize_name(name: Optional[str]) -> str:
+    """Canonical form used for exact-name lookups."""
+    return " ".join(tokenize(name))
+
+
+class LexicalIndex:
+    """BM25 inverted index keyed by MCP UUID.
+
+    Attributes:
+        k1 (float): BM25 term-frequency saturation.
+        b (float): BM25 document-length normalisation.
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.RLock()
+        self._postings: Dict[str, Dict[uuid.UUID, float]] = defaultdict(dict)
+        self._doc_terms: Dict[uuid.UUID, Dict[str, float]] = {}
+        self._doc_len: Dict[uuid.UUID, float] = {}
+        self._total_len = 0.0
+        self._names: Dict[str, Set[uuid.UUID]] = defaultdict(set)
+        self._name_of: Dict[uuid.UUID, str] = {}
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._doc_len)
+
+    def __contains__(self, mcp_id: object) -> bool:
+        with self._lock:
+            return mcp_id in self._doc_len
+
+    def ids(self) -> List[uuid.UUID]:
+        """Returns the ids of all indexed MCPs."""
+        with self._lock:
+            return list(self._doc_len)
+
+    # ------------------------------------------------------------------ writes
+
+    def _delete(self, mcp_id: uuid.UUID) -> bool:
+        terms = self._doc_terms.pop(mcp_id, None)
+        if terms is None:
+            return False
+        for term in terms:
+            postings = self._postings.get(term)
+            if postings is not None:
+                postings.pop(mcp_id, None)
+                if not postings:
+                    del self._postings[term]
+        self._total_len -= self._doc_len.pop(mcp_id)
+        name = self._name_of.pop(mcp_id)
+        ids = self._names.get(name)
+        if ids is not None:
+            ids.discard(mcp_id)
+            if not ids:
+                del self._names[name]
+        return True
+
+    def add(
+        self,
+        mcp_id: uuid.UUID,
+        name: Optional[str],
+        description: Optional[str] = None,
+        tags: Optional[Sequence[str]] = None,
+    ) -> None:
+        """Indexes an MCP, replacing any previous entry for the same id."""
+        weighted: Counter = Counter()
+        for field, text in (
+            ("name", name),
+            ("description", description),
+            ("tags", " ".join(tags or [])),
+        ):
+            for token in tokenize(text):
+                weighted[token] += FIELD_WEIGHTS[field]
+        with self._lock:
+            self._delete(mcp_id)
+            doc_len = float(sum(weighted.values()))
+            self._doc_terms[mcp_id] = dict(weighted)
+            self._doc_len[mcp_id] = doc_len
+            self._total_len += doc_len
+            for term, tf in weighted.items():
+                self._postings[term][mcp_id] = tf
+            canonical = normalize_name(name)
+            self._name_of[mcp_id] = canonical
+            if canonical:
+                self._names[canonical].add(mcp_id)
+
+    def remove(self, mcp_id: uuid.UUID) -> bool:
+        """Removes an MCP from the index. Returns True if it was present."""
+        with self._lock:
+            return self._delete(mcp_id)
+
+    def rebuild(
+        self, items: Iterable[Tuple[uuid.UUID, Optional[str], Optional[str], Optional[Sequence[str]]]]
+    ) -> int:
+        """Discards the current contents and indexes (id, name, description, tags) rows."""
+        with self._lock:
+            self.clear()
+            for mcp_id, name, description, tags in items:
+                self.add(mcp_id, name, description, tags)
+            return len(self._doc_len)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._postings = defaultdict(dict)
+            self._doc_terms = {}
+            self._doc_len = {}
+            self._total_len = 0.0
+            self._names = defaultdict(set)
+            self._name_of = {}
+
+    # ------------------------------------------------------------------- reads
+
+    def exact_name_matches(self, query: str) -> Set[uuid.UUID]:
+        """Returns the MCPs whose name equals ``query`` (ignoring case and punctuation)."""
+        canonical = normalize_name(query)
+        if not canonical:
+            return set()
+        with self._lock:
+            return set(self._names.get(canonical, ()))
+
+    def search(self, query: str, k: int = 100) -> List[Tuple[uuid.UUID, float]]:
+        """Returns up to ``k`` (mcp_id, bm25_score) pairs, best first."""
+        terms = set(tokenize(query))
+        if not terms or k <= 0:
+            return []
+        scores: Dict[uuid.UUID, float] = defaultdict(float)
+        with self._lock:
+            n_docs = len(self._doc_len)
+            if n_docs == 0:
+                return []
+            avg_len = self._total_len / n_docs or 1.0
+            for term in terms:
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                df = len(postings)
+                idf = math.log(1.0 + (n_docs - df + 0.5) / (df + 0.5))
+                for mcp_id, tf in postings.items():
+                    norm = self.k1 * (1.0 - self.b + self.b * self._doc_len[mcp_id] / avg_len)
+                    scores[mcp_id] += idf * tf * (self.k1 + 1.0) / (tf + norm)
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        return ranked[:k]
@@ -0,0 +1,230 @@
+"""
+llm_cache.py - Response cache for deterministic LLM prompts.
+
+LLM prompt MCPs with ``response_cache`` enabled and temperature 0 look their request up
+before calling the API: the key is a SHA-256 of the canonical JSON of the request body
+(model, system prompt, messages, max_tokens, temperature), so identical requests map to
+the same entry whatever produced them. Backends (LLM_RESPONSE_CACHE_BACKEND):
+
+- ``memory``: an in-process LRU (mcp/utils/cache.py), LLM_RESPONSE_CACHE_SIZE entries;
+- ``disk``: one JSON file per entry under LLM_RESPONSE_CACHE_DIR, shared by the workers
+  of a host;
+- ``redis``: the REDIS_* server, shared by all hosts.
+
+Entries expire after the MCP's ``response_cache_ttl`` or LLM_RESPONSE_CACHE_TTL_SEC. Disk
+and Redis errors count as misses. Lookups are counted per outcome (hit, miss, bypass)
+in ``get_stats`` and the ``mcp_llm_response_cache_lookups_total`` Prometheus counter.
+
+A request carrying the ``X-MCP-Cache: bypass`` header skips lookups (the fresh response
+is still stored); ``cache_bypass()`` does the same for code running outside requests.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, Optional
+
+from prometheus_client import Counter
+
+from mcp.utils.cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+# Request header that makes LLM prompts skip the response cache
+BYPASS_HEADER = "X-MCP-Cache"
+BYPASS_VALUE = "bypass"
+
+_bypass: ContextVar[bool] = ContextVar("llm_cache_bypass", default=False)
+
+_lookups = Counter(
+    "mcp_llm_response_cache_lookups_total", "LLM response cache lookups", ["backend", "result"]
+)
+
+
+@contextmanager
+def cache_bypass(enabled: bool = True) -> Iterator[None]:
+    """Makes LLM calls in this context skip cache lookups."""
+    token = _bypass.set(enabled)
+    try:
+        yield
+    finally:
+        _bypass.reset(token)
+
+
+def cache_bypassed() -> bool:
+    return _bypass.get()
+
+
+class MemoryBackend:
+    name = "memory"
+    blocking = False
+
+    def __init__(self, maxsize: int):
+        self._cache = LRUCache(maxsize=maxsize)
+
+    def get(self, key: str) -> Optional[str]:
+        return self._cache.get(key)
+
+    def set(self, key: str, value: str, ttl: Optional[float]) -> None:
+        self._cache.set(key, value, ttl=ttl)
+
+    def __len__(self) -> int:
+        return len(self._cache)
+
+
+class DiskBackend:
+    name = "disk"
+    blocking = True
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+
+    def get(self, key: str) -> Optional[str]:
+        try:
+            with open(self._path(key), "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except FileNotFoundError:
+            return None
+        if entry["expires_at"] is not None and time.time() >= entry["expires_at"]:
+            try:
+                os.unlink(self._path(key))
+            except OSError:
+                pass
+            return None
+        return entry["value"]
+
+    def set(self, key: str, value: str, ttl: Optional[float]) -> None:
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        entry = {"value": value, "expires_at": time.time() + ttl if ttl is not None else None}
+        # Readers in other workers never see a partly written file
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(entry, f)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+
+class RedisBackend:
+    name = "redis"
+    blocking = True
+
+    def __init__(self, prefix: str = "llm_cache:"):
+        import redis
+
+        from mcp.config.settings import settings
+
+        self.prefix = prefix
+        self.redis = redis.Redis(
+            host=settings.redis.host,
+            port=settings.redis.port,
+            db=settings.redis.db,
+            password=settings.redis.password,
+            decode_responses=True,
+        )
+
+    def get(self, key: str) -> Optional[str]:
+        return self.redis.get(self.prefix + key)
+
+    def set(self, key: str, value: str, ttl: Optional[float]) -> None:
+        if ttl is None:
+            self.redis.set(self.prefix + key, value)
+        else:
+            self.redis.set(self.prefix + key, value, ex=max(1, int(ttl)))
+
+
+class LLMResponseCache:
+    """Response texts by request hash, in one of the backends above.
+
+    Args:
+        backend: A ``MemoryBackend``, ``DiskBackend`` or ``RedisBackend``.
+        ttl: Default time to live in seconds (None keeps entries until evicted).
+    """
+
+    def __init__(self, backend: Any, ttl: Optional[float] = None):
+        self.backend = backend
+        self.ttl = ttl
+        self._counts = {"hit": 0, "miss": 0, "bypass": 0}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(request: Dict[str, Any]) -> str:
+        """Canonical hash of an API request body."""
+        canonical = json.dumps(request, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    def _count(self, result: str) -> None:
+        with self._lock:
+            self._counts[result] += 1
+        _lookups.labels(backend=self.backend.name, result=result).inc()
+
+    async def _run(self, method, *args):
+        if self.backend.blocking:
+            return await asyncio.to_thread(method, *args)
+        return method(*args)
+
+    async def get(self, key: str) -> Optional[str]:
+        """The cached response for ``key``, or None (also when lookups are bypassed)."""
+        if cache_bypassed():
+            self._count("bypass")
+            return None
+        try:
+            value = await self._run(self.backend.get, key)
+        except Exception as e:
+            logger.warning(f"LLM response cache lookup failed ({self.backend.name}): {e}")
+            value = None
+        self._count("hit" if value is not None else "miss")
+        return value
+
+    async def set(self, key: str, value: str, ttl: Optional[float] = None) -> None:
+        try:
+            await self._run(self.backend.set, key, value, self.ttl if ttl is None else ttl)
+        except Exception as e:
+            logger.warning(f"LLM response cache write failed ({self.backend.name}): {e}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counts = dict(self._counts)
+        lookups = counts["hit"] + counts["miss"]
+        return {
+            "backend": self.backend.name,
+            "hits": counts["hit"],
+            "misses": counts["miss"],
+            "bypassed": counts["bypass"],
+            "hit_rate": counts["hit"] / lookups if lookups else 0.0,
+        }
+
+
+_cache: Optional[LLMResponseCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> LLMResponseCache:
+    """The process-wide cache, configured from the LLM_RESPONSE_CACHE_* settings."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            from mcp.config.settings import settings
+
+            llm = settings.llm
+            if llm.response_cache_backend == "redis":
+                backend: Any = RedisBackend()
+            elif llm.response_cache_backend == "disk":
+                backend = DiskBackend(llm.response_cache_dir)
+            else:
+                backend = MemoryBackend(llm.response_cache_size)
+            _cache = LLMResponseCache(backend, ttl=llm.response_cache_ttl_sec)
+        return _cache
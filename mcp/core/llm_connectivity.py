@@ -0,0 +1,148 @@
+"""
+llm_connectivity.py - Cached LLM API connectivity checks with a circuit breaker.
+
+Constructing a ``ClaudeLLM`` used to send a (billable) test message to the API, once per
+workflow step. Connectivity is now tracked once per process for each (API key, model):
+
+- The first call verifies the API with a probe request; concurrent first calls share it.
+- Successful calls keep the state verified. When the last verification is older than
+  LLM_CONNECTIVITY_TTL_SEC, calls go ahead and a probe refreshes it in the background.
+- A failed probe, a rejected API key, or LLM_CIRCUIT_FAILURE_THRESHOLD consecutive
+  failed calls (connection errors, timeouts, 429 and 5xx responses) open the circuit:
+  calls then fail at once with ``LLMUnavailableError`` for LLM_CIRCUIT_COOLDOWN_SEC.
+  After that, the next call probes again (half-open) before going through.
+
+API keys are only kept as hashes.
+"""
+
+import asyncio
+import hashlib
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+Key = Tuple[str, str]  # (API key hash, model)
+
+
+class LLMUnavailableError(RuntimeError):
+    """Raised at call time while the circuit of an API key and model is open."""
+
+
+@dataclass
+class _Connectivity:
+    verified_at: Optional[float] = None
+    failures: int = 0
+    open_until: float = 0.0
+    error: Optional[str] = None
+    probe: Optional["asyncio.Future"] = None
+
+
+class ConnectivityCache:
+    """Connectivity state and circuit breaker per (API key, model).
+
+    Args:
+        ttl: Seconds a verification stays fresh.
+        failure_threshold: Consecutive failed calls that open the circuit.
+        cooldown: Seconds the circuit stays open.
+        clock: Time source, for tests.
+    """
+
+    def __init__(
+        self,
+        ttl: float = 300.0,
+        failure_threshold: int = 3,
+        cooldown: float = 30.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.ttl = ttl
+        self.failure_threshold = max(1, failure_threshold)
+        self.cooldown = cooldown
+        self.clock = clock
+        self._states: Dict[Key, _Connectivity] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(api_key: str, model: str) -> Key:
+        return hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:16], model
+
+    def _state(self, key: Key) -> _Connectivity:
+        with self._lock:
+            return self._states.setdefault(key, _Connectivity())
+
+    async def ensure(self, key: Key, probe: Callable[[], Awaitable[None]]) -> None:
+        """Returns once a call for ``key`` may go ahead.
+
+        Raises:
+            LLMUnavailableError: If the circuit is open or the probe fails.
+        """
+        state = self._state(key)
+        now = self.clock()
+        if state.open_until > now:
+            raise LLMUnavailableError(
+                f"Claude API unavailable for model {key[1]}: {state.error} "
+                f"(retrying in {state.open_until - now:.0f}s)"
+            )
+        if state.verified_at is None or state.open_until:  # unverified or half-open
+            await self._probe(key, state, probe)
+        elif now - state.verified_at > self.ttl and state.probe is None:
+            task = asyncio.ensure_future(self._probe(key, state, probe))
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())
+
+    async def _probe(self, key: Key, state: _Connectivity, probe: Callable[[], Awaitable[None]]) -> None:
+        loop = asyncio.get_running_loop()
+        shared = state.probe
+        if shared is None or shared.get_loop() is not loop or shared.done():
+            shared = state.probe = loop.create_future()
+            try:
+                await probe()
+            except asyncio.CancelledError:
+                shared.cancel()
+                raise
+            except Exception as e:
+                self.record_failure(key, str(e), open_circuit=True)
+                shared.set_exception(LLMUnavailableError(f"Claude API unavailable for model {key[1]}: {e}"))
+            else:
+                self.record_success(key)
+                shared.set_result(None)
+            finally:
+                state.probe = None
+        await asyncio.shield(shared)
+
+    def record_success(self, key: Key) -> None:
+        state = self._state(key)
+        state.verified_at = self.clock()
+        state.failures = 0
+        state.open_until = 0.0
+        state.error = None
+
+    def record_failure(self, key: Key, error: str, open_circuit: bool = False) -> None:
+        """Counts a failed call; opens the circuit at the threshold or if ``open_circuit``."""
+        state = self._state(key)
+        state.failures += 1
+        state.error = error
+        if open_circuit or state.failures >= self.failure_threshold:
+            state.open_until = self.clock() + self.cooldown
+            logger.warning(f"Claude API circuit open for model {key[1]} ({self.cooldown:.0f}s): {error}")
+
+
+_cache: Optional[ConnectivityCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_connectivity_cache() -> ConnectivityCache:
+    """The process-wide cache, configured from the LLM_* settings."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            from mcp.config.settings import settings
+
+            _cache = ConnectivityCache(
+                ttl=settings.llm.connectivity_ttl_sec,
+                failure_threshold=settings.llm.circuit_failure_threshold,
+                cooldown=settings.llm.circuit_cooldown_sec,
+            )
+        return _cache
@@ -1,13 +1,17 @@
 import json
 import os
-from typing import Any, Dict, List, Optional
+from typing import Any, AsyncIterator, Dict, List, Optional
 
-import requests
+import httpx
 from dotenv import load_dotenv
 
+from mcp.config.settings import settings
 from mcp.core.types import LLMPromptConfig
 
 from .base import BaseMCPServer
+from .http_client import get_http_client, get_sync_http_client, iter_sse_events
+from .llm_cache import get_response_cache
+from .llm_connectivity import ConnectivityCache, LLMUnavailableError, get_connectivity_cache
 
 # Load environment variables
 load_dotenv()
@@ -57,13 +61,22 @@ class ClaudeLLM:
                 "1. Create a .env file in the project root with: ANTHROPIC_API_KEY=your_api_key_here\n"
                 "2. Set it as an environment variable: set ANTHROPIC_API_KEY=your_api_key_here (Windows) or export ANTHROPIC_API_KEY=your_api_key_here (Linux/Mac)"
             )
-        # Test API connectivity at initialization
-        self.test_connection()
+        # Connectivity is verified at call time, once per process for this key and
+        # model (see mcp/core/llm_connectivity.py), so construction sends no request
+        self._connectivity_key = ConnectivityCache.key(self.api_key, self.model_name)
+
+    def _test_request(self) -> Dict[str, Any]:
+        return {
+            "model": self.model_name,
+            "max_tokens": 10,
+            "messages": [{"role": "user", "content": "Connection test"}],
+        }
 
     def test_connection(self) -> bool:
         """Test the connection to the Claude API.
 
-        Sends a simple test message to verify API connectivity and key validity.
+        Sends a simple test message to verify API connectivity and key validity, and
+        records the outcome in the process-wide connectivity state.
 
         Returns:
             bool: True if connection is successful.
@@ -72,58 +85,59 @@ class ClaudeLLM:
             ValueError: If API key is invalid or request is malformed.
             Exception: If connection fails for other reasons.
         """
-        headers = {
-            "x-api-key": self.api_key,
-            "anthropic-version": "2023-06-01",
-            "content-type": "application/json",
-        }
-        data = {
-            "model": self.model_name,
-            "max_tokens": 10,
-            "messages": [{"role": "user", "content": "Connection test"}],
-        }
-
         try:
-            response = requests.post(
-                "https://api.anthropic.com/v1/messages", headers=headers, json=data
+            response = get_sync_http_client().post(
+                settings.llm.api_url, headers=self._headers(), json=self._test_request()
             )
-
-            if response.status_code == 401:
-                raise ValueError("Invalid Claude API key.")
-            elif response.status_code == 400:
-                error_detail = (
-                    response.json().get("error", {}).get("message", "Unknown error")
-                )
-                raise ValueError(f"Invalid request: {error_detail}")
-
-            response.raise_for_status()
+            self._record_response(response)
+            self._check_response(response)
             print(
                 f"Successfully connected to Claude API using model: {self.model_name}"
             )
             return True
-        except requests.exceptions.RequestException as e:
+        except httpx.HTTPError as e:
+            if isinstance(e, httpx.TransportError):
+                get_connectivity_cache().record_failure(self._connectivity_key, str(e))
             print(f"Error testing API connection: {str(e)}")
             raise Exception(f"Failed to connect to Claude API: {str(e)}")
 
-    def call(self, messages: List[Dict[str, str]]) -> str:
-        """Send a prompt or messages to the Claude API and get the response.
-
-        Args:
-            messages (List[Dict[str, str]]): A list of messages for conversation history.
-
-        Returns:
-            str: The text response from Claude.
+    async def _probe(self) -> None:
+        """The connectivity check of ``call``; raises if the API cannot be used."""
+        response = await get_http_client().post(
+            settings.llm.api_url, headers=self._headers(), json=self._test_request()
+        )
+        self._check_response(response)
+
+    def _record_response(self, response: httpx.Response) -> None:
+        """Counts rejected keys, rate limits and server errors toward the circuit breaker."""
+        cache = get_connectivity_cache()
+        if response.status_code == 401:
+            cache.record_failure(self._connectivity_key, "Invalid Claude API key.", open_circuit=True)
+        elif response.status_code == 429 or response.status_code >= 500:
+            cache.record_failure(self._connectivity_key, f"HTTP {response.status_code}")
+        else:
+            cache.record_success(self._connectivity_key)
 
-        Raises:
-            ValueError: If API key is invalid or request is malformed.
-            Exception: If API call fails for other reasons.
-        """
-        headers = {
+    def _headers(self) -> Dict[str, str]:
+        return {
             "x-api-key": self.api_key,
             "anthropic-version": "2023-06-01",
             "content-type": "application/json",
         }
 
+    @staticmethod
+    def _check_response(response: httpx.Response) -> None:
+        """Raises ValueError for a rejected key or request, httpx.HTTPStatusError for other errors."""
+        if response.status_code == 401:
+            raise ValueError("Invalid Claude API key.")
+        elif response.status_code == 400:
+            error_detail = (
+                response.json().get("error", {}).get("message", "Unknown error")
+            )
+            raise ValueError(f"Invalid request: {error_detail}")
+        response.raise_for_status()
+
+    def _request_data(self, messages: List[Dict[str, str]]) -> Dict[str, Any]:
         request_data: Dict[str, Any] = {"model": self.model_name, "messages": messages}
 
         if self.system_prompt:
@@ -133,23 +147,57 @@ class ClaudeLLM:
             request_data["temperature"] = self.temperature
         if self.max_tokens is not None:
             request_data["max_tokens"] = self.max_tokens
+        return request_data
+
+    async def call(
+        self,
+        messages: List[Dict[str, str]],
+        use_cache: bool = False,
+        cache_ttl: Optional[float] = None,
+    ) -> str:
+        """Send a prompt or messages to the Claude API and get the response.
+
+        The request goes through the event loop's shared connection pool (see
+        mcp/core/http_client.py), so concurrent calls overlap. The first call for this
+        API key and model verifies connectivity; while the API is failing, calls fail
+        fast (see mcp/core/llm_connectivity.py).
+
+        Args:
+            messages (List[Dict[str, str]]): A list of messages for conversation history.
+            use_cache (bool, optional): At temperature 0, answer identical requests from
+                the response cache (see mcp/core/llm_cache.py). Defaults to False.
+            cache_ttl (Optional[float], optional): Lifetime of the cached response in
+                seconds; None uses LLM_RESPONSE_CACHE_TTL_SEC.
+
+        Returns:
+            str: The text response from Claude.
+
+        Raises:
+            ValueError: If API key is invalid or request is malformed.
+            LLMUnavailableError: If the API is unreachable or rejected the key recently.
+            Exception: If API call fails for other reasons.
+        """
+        request_data = self._request_data(messages)
+
+        # Only deterministic requests are answered from the cache
+        response_cache = get_response_cache() if use_cache and self.temperature == 0 else None
+        if response_cache is not None:
+            cache_key = response_cache.key(request_data)
+            cached = await response_cache.get(cache_key)
+            if cached is not None:
+                return cached
+
+        connectivity = get_connectivity_cache()
+        await connectivity.ensure(self._connectivity_key, self._probe)
 
         try:
-            response = requests.post(
-                "https://api.anthropic.com/v1/messages",
-                headers=headers,
+            response = await get_http_client().post(
+                settings.llm.api_url,
+                headers=self._headers(),
                 json=request_data,
             )
-
-            if response.status_code == 401:
-                raise ValueError("Invalid Claude API key.")
-            elif response.status_code == 400:
-                error_detail = (
-                    response.json().get("error", {}).get("message", "Unknown error")
-                )
-                raise ValueError(f"Invalid request: {error_detail}")
-
-            response.raise_for_status()
+            self._record_response(response)
+            self._check_response(response)
 
             content = response.json().get("content")
             if (
@@ -158,6 +206,8 @@ class ClaudeLLM:
                 and len(content) > 0
                 and "text" in content[0]
             ):
+                if response_cache is not None:
+                    await response_cache.set(cache_key, content[0]["text"], cache_ttl)
                 return content[0]["text"]
             else:
                 print(
@@ -165,9 +215,76 @@ class ClaudeLLM:
                 )
                 return "Error: Could not parse LLM response."
 
-        except requests.exceptions.RequestException as e:
+        except httpx.HTTPError as e:
+            if isinstance(e, httpx.TransportError):
+                connectivity.record_failure(self._connectivity_key, str(e))
             raise Exception(f"Claude API error: {str(e)}")
 
+    async def stream(
+        self,
+        messages: List[Dict[str, str]],
+        use_cache: bool = False,
+        cache_ttl: Optional[float] = None,
+    ) -> AsyncIterator[str]:
+        """Like ``call``, but yields the response text in pieces as the API streams it.
+
+        The request asks for server-sent events and yields the text of each
+        ``content_block_delta`` as it arrives, so the first words reach the caller long
+        before the response is complete. A cached response is yielded in one piece; a
+        complete streamed response is stored like one from ``call``.
+
+        Raises:
+            ValueError: If API key is invalid or request is malformed.
+            LLMUnavailableError: If the API is unreachable or rejected the key recently.
+            Exception: If the API call fails or the stream reports an error.
+        """
+        request_data = self._request_data(messages)
+
+        response_cache = get_response_cache() if use_cache and self.temperature == 0 else None
+        if response_cache is not None:
+            cache_key = response_cache.key(request_data)
+            cached = await response_cache.get(cache_key)
+            if cached is not None:
+                yield cached
+                return
+
+        connectivity = get_connectivity_cache()
+        await connectivity.ensure(self._connectivity_key, self._probe)
+
+        pieces: List[str] = []
+        complete = False
+        try:
+            async with get_http_client().stream(
+                "POST",
+                settings.llm.api_url,
+                headers=self._headers(),
+                json={**request_data, "stream": True},
+            ) as response:
+                self._record_response(response)
+                if response.status_code != 200:
+                    await response.aread()
+                    self._check_response(response)
+                async for event, data in iter_sse_events(response):
+                    if event == "content_block_delta":
+                        delta = json.loads(data).get("delta", {})
+                        if delta.get("type") == "text_delta" and delta.get("text"):
+                            pieces.append(delta["text"])
+                            yield delta["text"]
+                    elif event == "error":
+                        error = json.loads(data).get("error", {})
+                        raise Exception(f"Claude API error: {error.get('message', data)}")
+                    elif event == "message_stop":
+                        complete = True
+                        break
+        except httpx.HTTPError as e:
+            if isinstance(e, httpx.TransportError):
+                connectivity.record_failure(self._connectivity_key, str(e))
+            raise Exception(f"Claude API error: {str(e)}")
+
+        # A body that ends without message_stop was cut off; never cache it as an answer.
+        if response_cache is not None and complete and pieces:
+            await response_cache.set(cache_key, "".join(pieces), cache_ttl)
+
 
 class LLMPromptMCP(BaseMCPServer):
     """MCP for executing LLM prompts with advanced features.
@@ -324,24 +441,61 @@ class LLMPromptMCP(BaseMCPServer):
             messages = self._build_messages(formatted_prompt)
 
             # Call the LLM
-            response_text = self.llm.call(messages=messages)
+            response_text = await self.llm.call(
+                messages=messages,
+                use_cache=self.config.response_cache,
+                cache_ttl=self.config.response_cache_ttl,
+            )
 
             # Parse and validate output
-            result = self._parse_output(response_text)
-
-            return {
-                **result,
-                "model": self.config.model_name,
-                "prompt": formatted_prompt,
-                "system_message": self.config.system_prompt,
-            }
-        except ValueError as ve:
-            return {"success": False, "result": None, "error": str(ve)}
+            return self._result(formatted_prompt, response_text)
         except Exception as e:
-            import traceback
+            return self._failure(e)
 
-            return {
-                "success": False,
-                "result": None,
-                "error": f"LLM execution failed: {str(e)}\n{traceback.format_exc()}",
-            }
+    async def execute_stream(self, inputs: Dict[str, Any]) -> AsyncIterator[Dict[str, Any]]:
+        """Execute the prompt, streaming the response text as the model writes it.
+
+        Args:
+            inputs (Dict[str, Any]): The input variables for the prompt.
+
+        Yields:
+            Dict[str, Any]: ``{"type": "token", "text": ...}`` events, then one
+                ``{"type": "result", "result": ...}`` event with what ``execute`` returns.
+        """
+        try:
+            formatted_prompt = self._format_prompt(inputs)
+            pieces: List[str] = []
+            async for text in self.llm.stream(
+                messages=self._build_messages(formatted_prompt),
+                use_cache=self.config.response_cache,
+                cache_ttl=self.config.response_cache_ttl,
+            ):
+                pieces.append(text)
+                yield {"type": "token", "text": text}
+            result = self._result(formatted_prompt, "".join(pieces))
+        except Exception as e:
+            result = self._failure(e)
+        yield {"type": "result", "result": result}
+
+    def _result(self, formatted_prompt: str, response_text: str) -> Dict[str, Any]:
+        result = self._parse_output(response_text)
+
+        return {
+            **result,
+            "model": self.config.model_name,
+            "prompt": formatted_prompt,
+            "system_message": self.config.system_prompt,
+        }
+
+    @staticmethod
+    def _failure(e: Exception) -> Dict[str, Any]:
+        """The result of a failed execution; call from the ``except`` block."""
+        if isinstance(e, (ValueError, LLMUnavailableError)):
+            return {"success": False, "result": None, "error": str(e)}
+        import traceback
+
+        return {
+            "success": False,
+            "result": None,
+            "error": f"LLM execution failed: {str(e)}\n{traceback.format_exc()}",
+        }
@@ -0,0 +1,161 @@
+"""
+notebook_compiler.py - Compiling linear notebooks into Python script modules.
+
+Notebook MCPs with ``execution_mode="script"`` do not start a kernel: the notebook is
+compiled once per content hash into a module that the Python script execution path runs
+(pipe protocol, fork server and script store included). The module
+
+- turns the ``parameters``-tagged cell into the arguments of ``run_notebook(...)`` when
+  it only assigns literals to names (otherwise the cell runs as is and the parameters
+  are applied after it, like papermill's injected cell);
+- runs the other code cells in order in one namespace, capturing each cell's stdout,
+  stderr and the repr of a trailing expression;
+- defines ``execute_mcp(inputs)``, which returns ``{"results": ...}`` keyed and shaped
+  like ``JupyterNotebookMCP._extract_results`` on a papermill-executed notebook.
+
+Cells must be plain Python: IPython magics and shell escapes cannot be compiled
+(``NotebookCompileError``). Rich outputs (plots, HTML) are not captured.
+"""
+
+import ast
+import hashlib
+from typing import Any, Dict, List, Optional, Tuple
+
+import nbformat
+
+_MODULE_TEMPLATE = '''\
+# Generated from {origin} by mcp/core/notebook_compiler.py; do not edit.
+import ast
+import contextlib
+import io
+
+# (cell_type, source) of every cell, so result keys count cells like the notebook
+CELLS = {cells!r}
+# Index of the parameters cell, whether it became the arguments, and their defaults
+PARAMETERS_CELL = {parameters_cell!r}
+PARAMETERS_AS_ARGUMENTS = {as_arguments!r}
+DEFAULTS = {defaults!r}
+
+
+def _run_cell(source, namespace, filename):
+    tree = ast.parse(source, filename)
+    last = tree.body.pop() if tree.body and isinstance(tree.body[-1], ast.Expr) else None
+    stdout, stderr = io.StringIO(), io.StringIO()
+    value = None
+    with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr):
+        exec(compile(tree, filename, "exec"), namespace)
+        if last is not None:
+            value = eval(compile(ast.Expression(last.value), filename, "eval"), namespace)
+    outputs = [text for text in (stdout.getvalue(), stderr.getvalue()) if text]
+    if value is not None and not source.rstrip().endswith(";"):
+        outputs.append(repr(value))
+    return outputs
+
+
+def _run_cells(parameters, injected):
+    namespace = {{"__name__": "__main__"}}
+    results = {{}}
+    # Papermill inserts an executed cell for the parameters after the parameters cell
+    # (at the top without one), which moves the keys of the cells after it
+    position = count = 0
+    if injected and PARAMETERS_CELL is None:
+        namespace.update(parameters)
+        position = count = 1
+    for index, (cell_type, source) in enumerate(CELLS):
+        position += 1
+        if cell_type != "code" or not source.strip():
+            continue
+        count += 1
+        if index == PARAMETERS_CELL and PARAMETERS_AS_ARGUMENTS:
+            outputs = []
+        else:
+            outputs = _run_cell(source, namespace, "<cell %d>" % position)
+        if index == PARAMETERS_CELL:
+            namespace.update(DEFAULTS)
+            namespace.update(parameters)
+            if injected:
+                position += 1
+                count += 1
+        if outputs:
+            results["cell_%d_%d" % (position, count)] = {{
+                "outputs": outputs,
+                "execution_count": count,
+                "source": source,
+            }}
+    return results
+
+
+def run_notebook({signature}):
+    """Runs the notebook with the given parameters; returns the outputs of its cells."""
+    return _run_cells({arguments}, injected=True)
+
+
+def execute_mcp(inputs):
+    return {{"results": _run_cells(dict(inputs), injected=bool(inputs))}}
+'''
+
+
+class NotebookCompileError(ValueError):
+    """Raised when a notebook cannot be compiled into a script."""
+
+
+def notebook_digest(nb: nbformat.NotebookNode) -> str:
+    """Hash of the notebook's cell types and sources (outputs do not matter)."""
+    digest = hashlib.sha256()
+    for cell in nb.cells:
+        digest.update(f"\0{cell.cell_type}\0{cell.source}".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _literal_parameters(source: str) -> Optional[Dict[str, Any]]:
+    """The parameters of a cell of ``name = <literal>`` lines, or None for other code."""
+    parameters: Dict[str, Any] = {}
+    for statement in ast.parse(source).body:
+        if not (
+            isinstance(statement, ast.Assign)
+            and len(statement.targets) == 1
+            and isinstance(statement.targets[0], ast.Name)
+        ):
+            return None
+        try:
+            parameters[statement.targets[0].id] = ast.literal_eval(statement.value)
+        except ValueError:
+            return None
+    return parameters
+
+
+def compile_notebook(nb: nbformat.NotebookNode, origin: str = "notebook") -> str:
+    """Returns the source of a script module running ``nb`` (see the module docstring).
+
+    Raises:
+        NotebookCompileError: If a code cell is not plain Python.
+    """
+    cells: List[Tuple[str, str]] = []
+    parameters_cell: Optional[int] = None
+    for index, cell in enumerate(nb.cells):
+        cells.append((cell.cell_type, cell.source))
+        if cell.cell_type != "code":
+            continue
+        try:
+            ast.parse(cell.source)
+        except SyntaxError as e:
+            raise NotebookCompileError(f"cell {index} of {origin} is not plain Python: {e}") from e
+        if parameters_cell is None and "parameters" in cell.metadata.get("tags", []):
+            parameters_cell = index
+
+    defaults = None
+    if parameters_cell is not None:
+        defaults = _literal_parameters(nb.cells[parameters_cell].source)
+    as_arguments = defaults is not None
+    defaults = defaults or {}
+    signature = ", ".join([*(f"{name}={value!r}" for name, value in defaults.items()), "**_extra"])
+    arguments = "{" + ", ".join([*(f"{name!r}: {name}" for name in defaults), "**_extra"]) + "}"
+    return _MODULE_TEMPLATE.format(
+        origin=origin,
+        cells=cells,
+        parameters_cell=parameters_cell,
+        as_arguments=as_arguments,
+        defaults=defaults,
+        signature=signature,
+        arguments=arguments,
+    )
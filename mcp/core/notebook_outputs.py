@@ -0,0 +1,265 @@
+"""
+notebook_outputs.py - Extracting compact results from executed notebooks.
+
+Executed notebooks can carry megabytes of base64 images and HTML tables, while notebook
+MCP results only report text. ``load_executed_notebook`` reads papermill's output
+notebook without ``nbformat.read`` (schema validation and a NotebookNode for every
+value): its JSON decoder hook drops the MIME bundle entries that were not requested from
+each output's ``data`` (and ``metadata``) as the output is decoded, so they never reach
+the notebook object. The file itself is decoded in one pass by the standard library's
+(C) decoder; no incremental JSON parser is a dependency.
+
+``ResultExtractor`` then builds the per-cell results, keyed like before:
+
+- stream text, ``text/plain`` results and errors become strings, and cell sources are
+  kept, each cut to SANDBOX_NOTEBOOK_RESULT_CHARS characters; the full text of longer
+  ones is written to the artifact area;
+- outputs of the MIME types in ``output_mime_types`` (e.g. ``image/png``) are kept as
+  ``{"mime_type", "data"}`` when short, and otherwise written to the artifact area and
+  referenced as ``{"mime_type", "artifact", "bytes"}``.
+
+The artifact area (SANDBOX_ARTIFACT_DIR) gets one directory per notebook run that wrote
+something. Run directories older than SANDBOX_ARTIFACT_RETENTION_HOURS are removed, and
+then the oldest ones while the area is above SANDBOX_ARTIFACT_MAX_MB, whenever a run
+directory is created (at most once a minute per process). Without an artifact area,
+long text is only cut.
+"""
+
+import base64
+import json
+import mimetypes
+import os
+import re
+import shutil
+import threading
+import time
+import uuid
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import nbformat
+from nbformat.v4.rwbase import rejoin_lines
+
+# The one MIME type of results reported as text
+_TEXT_MIME = "text/plain"
+
+
+# Outputs whose ``data`` is a MIME bundle (``metadata`` is keyed by MIME type as well)
+_BUNDLE_OUTPUT_TYPES = ("display_data", "execute_result")
+
+
+def _bundle_hook(keep: Iterable[str]):
+    keep = frozenset(keep) | {_TEXT_MIME}
+
+    def hook(pairs: List[Tuple[str, Any]]) -> Dict[str, Any]:
+        obj = dict(pairs)
+        if obj.get("output_type") in _BUNDLE_OUTPUT_TYPES:
+            for field in ("data", "metadata"):
+                if isinstance(obj.get(field), dict):
+                    obj[field] = {k: v for k, v in obj[field].items() if "/" not in k or k in keep}
+        return obj
+
+    return hook
+
+
+def load_executed_notebook(path: str, mime_types: Iterable[str] = ()) -> nbformat.NotebookNode:
+    """Reads an executed notebook, dropping output MIME entries other than text/plain and ``mime_types``."""
+    with open(path, "rb") as f:
+        data = json.load(f, object_pairs_hook=_bundle_hook(mime_types))
+    if data.get("nbformat") != 4:
+        return nbformat.read(path, as_version=4)
+    # Multiline strings are stored as lists of lines, as nbformat.read would join them
+    return rejoin_lines(nbformat.from_dict(data))
+
+
+_PRUNE_INTERVAL_SEC = 60.0
+_last_prune: Dict[str, float] = {}
+_prune_lock = threading.Lock()
+
+
+def _prune_due(artifact_dir: str) -> bool:
+    now = time.monotonic()
+    with _prune_lock:
+        if now - _last_prune.get(artifact_dir, -_PRUNE_INTERVAL_SEC) < _PRUNE_INTERVAL_SEC:
+            return False
+        _last_prune[artifact_dir] = now
+        return True
+
+
+def _tree_bytes(path: str) -> int:
+    total = 0
+    for dirpath, _, filenames in os.walk(path):
+        for name in filenames:
+            try:
+                total += os.lstat(os.path.join(dirpath, name)).st_size
+            except OSError:
+                pass
+    return total
+
+
+def prune_artifacts(
+    artifact_dir: str,
+    retention_sec: Optional[float] = None,
+    max_bytes: Optional[int] = None,
+    keep: Optional[str] = None,
+) -> List[str]:
+    """Removes run directories older than ``retention_sec``, then the oldest while the
+    area is larger than ``max_bytes``; ``keep`` (the current run) is never removed.
+
+    Returns the removed directories.
+    """
+    runs = []
+    for entry in os.scandir(artifact_dir):
+        if entry.is_dir(follow_symlinks=False) and entry.path != keep:
+            try:
+                runs.append((entry.stat().st_mtime, entry.path))
+            except OSError:
+                pass
+    runs.sort()
+    removed = []
+    if retention_sec is not None:
+        cutoff = time.time() - retention_sec
+        while runs and runs[0][0] < cutoff:
+            removed.append(runs.pop(0)[1])
+    if max_bytes is not None:
+        sizes = [(path, _tree_bytes(path)) for _, path in runs]
+        total = sum(size for _, size in sizes) + (_tree_bytes(keep) if keep else 0)
+        for path, size in sizes:
+            if total <= max_bytes:
+                break
+            removed.append(path)
+            total -= size
+    for path in removed:
+        shutil.rmtree(path, ignore_errors=True)
+    return removed
+
+
+def _artifact_bytes(mime_type: str, data: Any) -> bytes:
+    if isinstance(data, (dict, list)):
+        return json.dumps(data).encode("utf-8")
+    if mime_type.startswith("text/") or mime_type.endswith(("json", "xml")):
+        return data.encode("utf-8")
+    return base64.b64decode(data)  # binary bundles are base64 encoded
+
+
+class ResultExtractor:
+    """Builds notebook MCP results, moving long and rich outputs to the artifact area.
+
+    Args:
+        mime_types: Rich output MIME types to keep.
+        result_chars: Longest text kept in results; None keeps everything.
+        artifact_dir: Base directory of the artifact area; None disables it.
+        label: Prefix of this run's artifact directory, e.g. the notebook's name.
+        retention_sec: Age after which run directories are removed; None keeps them.
+        max_bytes: Size of the artifact area above which the oldest runs are removed.
+    """
+
+    def __init__(
+        self,
+        mime_types: Iterable[str] = (),
+        result_chars: Optional[int] = None,
+        artifact_dir: Optional[str] = None,
+        label: str = "notebook",
+        retention_sec: Optional[float] = None,
+        max_bytes: Optional[int] = None,
+    ):
+        self.mime_types = [m for m in mime_types if m != _TEXT_MIME]
+        self.result_chars = result_chars
+        self.artifact_dir = artifact_dir
+        self.label = re.sub(r"[^\w.-]", "_", label) or "notebook"
+        self.retention_sec = retention_sec
+        self.max_bytes = max_bytes
+        self._run_dir: Optional[str] = None
+
+    def _write_artifact(self, name: str, data: bytes) -> Optional[str]:
+        if not self.artifact_dir:
+            return None
+        if self._run_dir is None:
+            run = f"{self.label}-{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+            self._run_dir = os.path.join(self.artifact_dir, run)
+            os.makedirs(self._run_dir, exist_ok=True)
+            if _prune_due(self.artifact_dir):
+                prune_artifacts(self.artifact_dir, self.retention_sec, self.max_bytes, keep=self._run_dir)
+        path = os.path.join(self._run_dir, name)
+        with open(path, "wb") as f:
+            f.write(data)
+        return path
+
+    def text(self, text: str, name: str) -> str:
+        """``text``, cut to ``result_chars`` with a marker naming the artifact holding all of it."""
+        if self.result_chars is None or len(text) <= self.result_chars:
+            return text
+        path = self._write_artifact(f"{name}.txt", text.encode("utf-8"))
+        marker = f"\n... [{len(text) - self.result_chars} characters cut"
+        if path:
+            marker += f"; full text in {path}"
+        return text[: self.result_chars] + marker + "] ..."
+
+    def rich(self, mime_type: str, data: Any, name: str) -> Dict[str, Any]:
+        """A requested rich output, inline if short, else written to the artifact area."""
+        content = _artifact_bytes(mime_type, data)
+        if self.result_chars is None or len(content) <= self.result_chars:
+            return {"mime_type": mime_type, "data": data}
+        extension = ".json" if mime_type.endswith("json") else mimetypes.guess_extension(mime_type) or ".bin"
+        path = self._write_artifact(f"{name}{extension}", content)
+        if path is None:
+            return {"mime_type": mime_type, "data": data}
+        return {"mime_type": mime_type, "artifact": path, "bytes": len(content)}
+
+    def extract(self, nb: nbformat.NotebookNode) -> Dict[str, Any]:
+        """Per-cell results of an executed notebook, keyed ``cell_<number>_<execution count>``."""
+        results = {}
+        for i, cell in enumerate(nb.cells):
+            if cell.cell_type != "code" or not cell.get("outputs"):
+                continue
+            key = f"cell_{i+1}_{cell.execution_count if cell.execution_count else 'nc'}"
+            cell_outputs: List[Any] = []
+            for j, output in enumerate(cell.outputs):
+                name = f"{key}_{j}"
+                if output.output_type in ("execute_result", "display_data"):
+                    data = output.get("data", {})
+                    if output.output_type == "execute_result" and _TEXT_MIME in data:
+                        cell_outputs.append(self.text(data[_TEXT_MIME], name))
+                    cell_outputs.extend(
+                        self.rich(mime_type, data[mime_type], name) for mime_type in self.mime_types if mime_type in data
+                    )
+                elif output.output_type == "stream":
+                    cell_outputs.append(self.text(output.text, name))
+                elif output.output_type == "error":
+                    cell_outputs.append(f"ErrorInCell: {output.ename}: {output.evalue}")
+            results[key] = {
+                "outputs": cell_outputs,
+                "execution_count": cell.execution_count,
+                "source": self.text(cell.source, f"{key}_source"),
+            }
+        return results
+
+    def summarize(self, results: Dict[str, Any]) -> Dict[str, Any]:
+        """Cuts the text of results built elsewhere (e.g. by a compiled notebook)."""
+        return {
+            key: {
+                **cell,
+                "outputs": [
+                    self.text(output, f"{key}_{j}") if isinstance(output, str) else output
+                    for j, output in enumerate(cell["outputs"])
+                ],
+                "source": self.text(cell["source"], f"{key}_source"),
+            }
+            for key, cell in results.items()
+        }
+
+
+def result_extractor(mime_types: Optional[Iterable[str]] = None, label: str = "notebook") -> ResultExtractor:
+    """A ``ResultExtractor`` with the SANDBOX_NOTEBOOK_RESULT_CHARS and SANDBOX_ARTIFACT_* settings."""
+    from mcp.config.settings import settings
+
+    sandbox_settings = settings.sandbox
+    result_chars = sandbox_settings.notebook_result_chars
+    retention_hours = sandbox_settings.artifact_retention_hours
+    return ResultExtractor(
+        mime_types or (),
+        result_chars=result_chars if result_chars > 0 else None,
+        artifact_dir=sandbox_settings.artifact_dir or None,
+        label=label,
+        retention_sec=retention_hours * 3600 if retention_hours > 0 else None,
+        max_bytes=sandbox_settings.artifact_max_mb * 1024 * 1024 if sandbox_settings.artifact_max_mb > 0 else None,
+    )
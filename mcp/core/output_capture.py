@@ -0,0 +1,213 @@
+"""
+output_capture.py - Bounded capture of sandboxed process output.
+
+A ``BoundedOutput`` receives a stream's bytes as they are read from the pipe and keeps
+only the first and the last ``limit_bytes / 2`` of it, so memory stays bounded however
+much a script prints. Optionally:
+
+- the complete stream is written to a spill file once it exceeds the limit (up to
+  ``spill_max_bytes``), and the truncation marker in the captured text points at it;
+- complete lines are forwarded to a logger as they arrive, up to ``limit_bytes`` per
+  stream, instead of logging the whole output after the run.
+
+Only the standard library is used; the fork server feeds these objects by duck typing
+(``feed`` / ``getvalue``).
+"""
+
+import collections
+import logging
+import os
+import tempfile
+import threading
+import time
+from typing import Deque, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Logger that sandboxed output lines are forwarded to
+output_logger = logging.getLogger("mcp.sandbox.output")
+
+# Longest line forwarded to the log; the rest of the line is cut
+_MAX_LOG_LINE = 2000
+
+
+class BoundedOutput:
+    """Head + tail capture of one output stream.
+
+    Args:
+        limit_bytes: Bytes kept in memory (half for the head, half for the tail).
+        spill_dir: Directory for the full output of streams over the limit; None disables.
+        spill_max_bytes: Stop writing the spill file after this many bytes.
+        name: Stream name, used for spill file names and forwarded log lines.
+        log_level: Level of forwarded lines; None disables forwarding.
+    """
+
+    def __init__(
+        self,
+        limit_bytes: int,
+        spill_dir: Optional[str] = None,
+        spill_max_bytes: int = 100 * 1024 * 1024,
+        name: str = "stdout",
+        log_level: Optional[int] = None,
+    ):
+        self.limit_bytes = max(2, limit_bytes)
+        self.spill_dir = spill_dir
+        self.spill_max_bytes = spill_max_bytes
+        self.name = name
+        self.log_level = log_level
+        self.label = ""  # e.g. the pid, set once the process has started
+        self.total_bytes = 0
+        self.spill_path: Optional[str] = None
+        self._head = bytearray()
+        self._head_limit = self.limit_bytes // 2
+        self._tail: Deque[bytes] = collections.deque()
+        self._tail_bytes = 0
+        self._tail_limit = self.limit_bytes - self._head_limit
+        self._spill_file = None
+        self._spilled_bytes = 0
+        self._partial_line = bytearray()
+        self._logged_bytes = 0
+        self._lock = threading.Lock()
+
+    @property
+    def truncated(self) -> bool:
+        return self.total_bytes > len(self._head) + self._tail_bytes
+
+    def feed(self, data: bytes) -> None:
+        """Adds bytes read from the stream."""
+        if not data:
+            return
+        with self._lock:
+            if self.spill_dir and self._spill_file is None and self.spill_path is None:
+                if self.total_bytes + len(data) > self.limit_bytes:
+                    # Nothing was dropped yet, so head + tail is the complete output so far
+                    self._open_spill(bytes(self._head) + b"".join(self._tail))
+            self.total_bytes += len(data)
+            self._spill(data)
+            if self.log_level is not None:
+                self._forward_lines(data)
+            room = self._head_limit - len(self._head)
+            if room > 0:
+                self._head += data[:room]
+                data = data[room:]
+            if data:
+                self._append_tail(data)
+
+    def _append_tail(self, data: bytes) -> None:
+        if len(data) >= self._tail_limit:
+            self._tail.clear()
+            self._tail.append(bytes(data[-self._tail_limit:]))
+            self._tail_bytes = self._tail_limit
+            return
+        self._tail.append(bytes(data))
+        self._tail_bytes += len(data)
+        while self._tail_bytes > self._tail_limit:
+            excess = self._tail_bytes - self._tail_limit
+            first = self._tail[0]
+            if len(first) <= excess:
+                self._tail.popleft()
+                self._tail_bytes -= len(first)
+            else:
+                self._tail[0] = first[excess:]
+                self._tail_bytes -= excess
+
+    def _open_spill(self, written_so_far: bytes) -> None:
+        try:
+            os.makedirs(self.spill_dir, exist_ok=True)
+            fd, path = tempfile.mkstemp(
+                prefix=f"{time.strftime('%Y%m%d-%H%M%S')}-{self.label or 'run'}-",
+                suffix=f".{self.name}.log",
+                dir=self.spill_dir,
+            )
+        except OSError as e:
+            logger.warning(f"Could not create output spill file in {self.spill_dir}: {e}")
+            self.spill_dir = None
+            return
+        self.spill_path = path
+        self._spill_file = os.fdopen(fd, "wb")
+        self._spill(written_so_far)
+
+    def _spill(self, data: bytes) -> None:
+        if self._spill_file is None:
+            return
+        room = self.spill_max_bytes - self._spilled_bytes
+        try:
+            self._spill_file.write(data[:room])
+        except OSError as e:
+            logger.warning(f"Could not write output spill file {self.spill_path}: {e}")
+            room = 0
+        self._spilled_bytes += min(room, len(data))
+        if room <= len(data):
+            self._spill_file.close()
+            self._spill_file = None
+
+    def _forward_lines(self, data: bytes) -> None:
+        if self._logged_bytes >= self.limit_bytes:
+            return
+        self._partial_line += data
+        lines = self._partial_line.split(b"\n")
+        self._partial_line = bytearray(lines.pop())
+        if len(self._partial_line) > _MAX_LOG_LINE:
+            lines.append(bytes(self._partial_line))
+            self._partial_line.clear()
+        for line in lines:
+            self._log_line(line)
+
+    def _log_line(self, line: bytes) -> None:
+        if self._logged_bytes >= self.limit_bytes:
+            return
+        self._logged_bytes += len(line) + 1
+        text = line[:_MAX_LOG_LINE].decode("utf-8", errors="replace")
+        output_logger.log(self.log_level, f"[{self.label}] {self.name}: {text}")
+        if self._logged_bytes >= self.limit_bytes:
+            output_logger.log(
+                self.log_level, f"[{self.label}] {self.name}: output over the log limit, not forwarded"
+            )
+
+    def close(self) -> None:
+        """Forwards a trailing partial line and closes the spill file."""
+        with self._lock:
+            if self.log_level is not None and self._partial_line:
+                self._log_line(bytes(self._partial_line))
+                self._partial_line.clear()
+            if self._spill_file is not None:
+                self._spill_file.close()
+                self._spill_file = None
+
+    def getvalue(self) -> str:
+        """Returns the captured text, with a marker where the middle was dropped."""
+        self.close()
+        with self._lock:
+            tail = b"".join(self._tail)
+            if not self.truncated:
+                return (bytes(self._head) + tail).decode("utf-8", errors="replace")
+            dropped = self.total_bytes - len(self._head) - len(tail)
+            marker = f"\n... [{dropped} bytes of {self.name} truncated"
+            if self.spill_path:
+                marker += f"; full output in {self.spill_path}"
+            marker += "] ...\n"
+            parts: List[str] = [
+                bytes(self._head).decode("utf-8", errors="replace"),
+                marker,
+                tail.decode("utf-8", errors="replace"),
+            ]
+            return "".join(parts)
+
+
+def output_captures(label: str = "") -> Tuple[BoundedOutput, BoundedOutput]:
+    """Returns (stdout, stderr) captures configured from the SANDBOX_OUTPUT_* settings."""
+    from mcp.config.settings import settings
+
+    sandbox_settings = settings.sandbox
+    stdout, stderr = (
+        BoundedOutput(
+            limit_bytes=sandbox_settings.output_limit_kb * 1024,
+            spill_dir=sandbox_settings.output_spill_dir,
+            spill_max_bytes=sandbox_settings.output_spill_max_mb * 1024 * 1024,
+            name=name,
+            log_level=level,
+        )
+        for name, level in (("stdout", logging.DEBUG), ("stderr", logging.INFO))
+    )
+    stdout.label = stderr.label = label
+    return stdout, stderr
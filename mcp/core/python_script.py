@@ -5,46 +5,50 @@ A simple hello world example that demonstrates:
 3. Basic error handling
 """
 
+import ast
 import asyncio
-import atexit
+import functools
 import json
 import logging
 import os
-import subprocess
-import sys
-import tempfile
+import time
 import traceback
-from typing import Any, Dict, Optional, Set
+from typing import Any, Dict, Optional
 
+from mcp.config.settings import settings
 from mcp.core.types import PythonScriptConfig
-from .sandbox import run_sandboxed_subprocess
+from mcp.scripts import script_runner
+from .sandbox import read_fd_until_eof, run_sandboxed_python_async
+from .array_transport import run_array_dir
+from .table_transport import run_table_dir, table_format
+from .scratch import allocate_scratch
+from .script_store import get_script_store
+from .venv_cache import VenvBuildError, get_venv_cache
 
 from .base import BaseMCPServer
 
 logger = logging.getLogger(__name__)
 
-# Store paths of temporary files created for script_content
-_temporary_script_files: Set[str] = set()
+# Shortest wait for the end of the result frame once the script has exited
+_RESULT_PIPE_GRACE_SEC = 1.0
 
 
-def _cleanup_temporary_files():
-    """Remove any temporary script files created during the session."""
-    for temp_file_path in list(_temporary_script_files):
-        try:
-            if os.path.exists(temp_file_path):
-                os.remove(temp_file_path)
-            _temporary_script_files.remove(temp_file_path)
-            logger.info(f"Cleaned up temporary script file: {temp_file_path}")
-        except OSError as e:
-            logger.error(
-                f"Error cleaning up temporary script file {temp_file_path}: {e}"
-            )
-        except KeyError:
-            pass  # Already removed by another thread/process, perhaps
+def _release_when_acquired(lease):
+    def release(acquiring: "asyncio.Future") -> None:
+        if not acquiring.cancelled() and acquiring.exception() is None:
+            lease.__exit__(None, None, None)
+
+    return release
 
 
-# Register cleanup function to be called on Python interpreter exit
-atexit.register(_cleanup_temporary_files)
+@functools.lru_cache(maxsize=1024)
+def _defines_execute_mcp(source: str) -> bool:
+    """Whether a script defines a top-level execute_mcp (cached: instances share content)."""
+    try:
+        tree = ast.parse(source)
+    except (SyntaxError, ValueError):
+        return False
+    return any(isinstance(node, ast.FunctionDef) and node.name == "execute_mcp" for node in tree.body)
 
 
 class PythonScriptMCP(BaseMCPServer):
@@ -62,22 +66,20 @@ class PythonScriptMCP(BaseMCPServer):
         super().__init__(config)
         self.config: PythonScriptConfig = config  # Ensure type for self.config
         self._script_path_to_execute: Optional[str] = None
+        self._stored_script_digest: Optional[str] = None
 
         if self.config.script_content:
-            # If script_content is provided, write it to a temporary file
+            # Instances with identical script_content share one precompiled file
             try:
-                with tempfile.NamedTemporaryFile(
-                    mode="w", suffix=".py", delete=False, encoding="utf-8"
-                ) as tmp_script:
-                    tmp_script.write(self.config.script_content)
-                    self._script_path_to_execute = tmp_script.name
-                _temporary_script_files.add(self._script_path_to_execute)
-                logger.info(
-                    f"Created temporary script file for execution: {self._script_path_to_execute} from script_content of MCP '{self.config.name}'"
+                stored = get_script_store().acquire(self.config.script_content)
+                self._stored_script_digest = stored.digest
+                self._script_path_to_execute = stored.exec_path
+                logger.debug(
+                    f"Using stored script {stored.exec_path} for script_content of MCP '{self.config.name}'"
                 )
             except Exception as e:
                 logger.error(
-                    f"Failed to create temporary script file from script_content for MCP '{self.config.name}': {e}"
+                    f"Failed to store script_content for MCP '{self.config.name}': {e}"
                 )
                 # Potentially raise an error or fall back if script_path is also an option
                 # For now, if temp file creation fails, it might try to use self.config.script_path if set.
@@ -98,11 +100,193 @@ class PythonScriptMCP(BaseMCPServer):
                 f"Script path '{self._script_path_to_execute}' for MCP '{self.config.name}' does not exist."
             )
 
+        self._io_protocol = self._resolve_io_protocol()
+
+    def _resolve_io_protocol(self) -> str:
+        """Resolves io_protocol "auto": the pipe protocol needs a top-level execute_mcp."""
+        protocol = getattr(self.config, "io_protocol", "file")
+        if protocol != "auto":
+            return protocol
+        try:
+            if self.config.script_content:
+                source = self.config.script_content
+            else:
+                with open(self._script_path_to_execute, "r", encoding="utf-8") as f:
+                    source = f.read()
+        except OSError:
+            return "file"
+        return "pipe" if _defines_execute_mcp(source) else "file"
+
+    async def _run_in_environment(self, run) -> Dict[str, Any]:
+        """Awaits ``run(python_executable)`` with the script's cached virtualenv, if any.
+
+        Scripts without requirements (or with virtual_env disabled) run on the server's
+        interpreter. Environments are built in the background when MCP versions are
+        saved; an execution only waits for a build that has not finished yet.
+        """
+        cache = get_venv_cache()
+        if cache is None or not self.config.virtual_env or not self.config.requirements:
+            return await run(None)
+        lease = cache.acquire(self.config.requirements, timeout=settings.sandbox.venv_build_wait_sec)
+        # Waiting for a build or the environment lock blocks, so it happens off the loop
+        acquiring = asyncio.ensure_future(asyncio.to_thread(lease.__enter__))
+        try:
+            python_executable = await asyncio.shield(acquiring)
+        except asyncio.CancelledError:
+            # The thread still takes the lease; give it back once it has
+            acquiring.add_done_callback(_release_when_acquired(lease))
+            raise
+        except (VenvBuildError, TimeoutError) as e:
+            logger.error(f"Python environment unavailable for '{self.config.name}': {e}")
+            return {
+                "success": False,
+                "result": None,
+                "error": f"Python environment for requirements unavailable: {e}",
+            }
+        try:
+            return await run(python_executable)
+        finally:
+            lease.__exit__(None, None, None)
+
+    def _array_transport_args(self):
+        """Script runner options publishing result arrays into the run's array directory."""
+        array_dir = run_array_dir() if self.config.array_transport else None
+        if array_dir is None:
+            return []
+        return [
+            "--array-dir", array_dir,
+            "--array-min-bytes", str(settings.sandbox.array_transport_min_kb * 1024),
+        ]
+
+    def _table_transport_args(self):
+        """Script runner options publishing result tables into the run's table directory."""
+        table_dir = run_table_dir() if self.config.table_transport else None
+        if table_dir is None:
+            return []
+        return ["--table-dir", table_dir, "--table-format", table_format()]
+
+    def _log_output(self, stdout: str, stderr: str) -> None:
+        """Logs the size of the script's output.
+
+        The lines themselves are forwarded to the ``mcp.sandbox.output`` logger while the
+        script runs (see mcp/core/output_capture.py).
+        """
+        if stdout or stderr:
+            logger.info(
+                f"Script '{self.config.name}' wrote {len(stdout)} chars to stdout, "
+                f"{len(stderr)} chars to stderr"
+            )
+
+    @property
+    def accepts_array_refs(self) -> bool:
+        return self.config.array_transport and self._io_protocol == "pipe"
+
+    @property
+    def accepts_table_refs(self) -> bool:
+        return self.config.table_transport and self._io_protocol == "pipe"
+
+    async def _run_script_pipe(
+        self, inputs: Dict[str, Any], python_executable: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Runs the script through the pipe protocol (see mcp/scripts/script_runner.py)."""
+        codec = settings.sandbox.io_codec
+        if codec == "msgpack":
+            try:
+                import msgpack  # noqa: F401
+            except ImportError:
+                logger.warning("SANDBOX_IO_CODEC=msgpack but msgpack is not installed; using json.")
+                codec = "json"
+        elif codec not in script_runner.CODECS:
+            codec = "json"
+        try:
+            input_frame = script_runner.encode_frame(inputs, codec)
+        except (TypeError, ValueError) as e:
+            return {"success": False, "result": None, "error": f"Inputs are not serializable: {e}"}
+
+        timeout = self.config.timeout if hasattr(self.config, 'timeout') else 600
+        started = time.monotonic()
+        result_r, result_w = os.pipe()
+        reader = asyncio.ensure_future(read_fd_until_eof(result_r))
+        try:
+            process_return_code, stdout_str, stderr_str = await run_sandboxed_python_async(
+                script_runner.__file__,
+                [
+                    str(self._script_path_to_execute),
+                    "--result-fd", str(result_w),
+                    "--codec", codec,
+                    *self._array_transport_args(),
+                    *self._table_transport_args(),
+                ],
+                timeout=timeout,
+                memory_limit_mb=settings.sandbox.memory_limit_mb,
+                cpu_time_limit_sec=settings.sandbox.cpu_time_limit_sec,
+                input_data=input_frame,
+                pass_fds=[result_w],
+                python_executable=python_executable,
+            )
+        except BaseException:
+            reader.cancel()
+            raise
+        finally:
+            os.close(result_w)
+        # EOF arrives once the script (and anything it spawned) has closed the result pipe;
+        # a process left running with the pipe open may hold it for the rest of the run's time
+        try:
+            result_frame = await asyncio.wait_for(
+                reader, timeout=max(timeout - (time.monotonic() - started), _RESULT_PIPE_GRACE_SEC)
+            )
+        except asyncio.TimeoutError:
+            logger.error(
+                f"Result pipe of script '{self.config.name}' still open after the run's "
+                f"{timeout}s timeout (code {process_return_code})."
+            )
+            self._log_output(stdout_str, stderr_str)
+            return {
+                "success": False,
+                "result": None,
+                "error": "Timed out reading the script's result: a process it started kept the result pipe open.",
+                "stdout": stdout_str,
+                "stderr": stderr_str,
+            }
+
+        self._log_output(stdout_str, stderr_str)
+
+        if result_frame:
+            try:
+                output = script_runner.decode_frame(result_frame, codec)
+            except Exception as e:
+                return {
+                    "success": False,
+                    "result": None,
+                    "error": f"Failed to decode result frame from script: {e}",
+                    "stdout": stdout_str,
+                    "stderr": stderr_str,
+                }
+            return {
+                "success": output.get("success", False) and process_return_code == 0,
+                "result": output.get("result"),
+                "error": output.get("error"),
+                "stdout": stdout_str,
+                "stderr": stderr_str,
+            }
+        logger.error(
+            f"Script execution for '{self.config.name}' returned no result (code {process_return_code})."
+        )
+        return {
+            "success": False,
+            "result": None,
+            "error": f"Script execution failed with code {process_return_code}. Stderr: {stderr_str}",
+            "stdout": stdout_str,
+            "stderr": stderr_str,
+        }
+
     async def execute(self, inputs: Dict[str, Any]) -> Dict[str, Any]:
         """Executes the Python script with the given inputs in a sandboxed subprocess.
 
-        This method prepares input/output files, constructs the command, and uses
-        run_sandboxed_subprocess to enforce resource and environment limits.
+        With the pipe protocol, inputs and the result are exchanged as frames over stdin and
+        a result pipe; otherwise this method prepares input/output files. Either way
+        run_sandboxed_python_async enforces resource and environment limits (forking from a
+        warm interpreter when enabled) while the event loop keeps serving other requests.
         Returns a result dict with success, result, error, stdout, and stderr.
         """
         if not self._script_path_to_execute or not os.path.exists(
@@ -117,66 +301,44 @@ class PythonScriptMCP(BaseMCPServer):
                 "error": "Script path misconfigured or temporary script creation failed.",
             }
 
-        # This will run in a separate thread via asyncio.to_thread
-        def _run_script_sync():
+        async def _run_script(python_executable: Optional[str] = None):
             """
-            Synchronously runs the script in a sandboxed subprocess.
-            Handles temp file creation, command construction, and result parsing.
+            Runs the script in a sandboxed subprocess.
+            Handles input/output files in the run's scratch space, command construction,
+            and result parsing.
             """
-            python_exe = sys.executable or "python"
             script_to_run_str = str(self._script_path_to_execute)
 
-            tmp_input_file_path = None
-            tmp_output_file_path = None
             stdout_str = ""
             stderr_str = ""
             process_return_code = -1  # Default error code
 
+            scratch = allocate_scratch("script-io")
             try:
-                # Write inputs to a temp file for the script to read
-                with tempfile.NamedTemporaryFile(
-                    mode="w", suffix=".json", delete=False, encoding="utf-8"
-                ) as tmp_input_f_obj:
+                # Write inputs to a file for the script to read; it writes outputs next to it
+                tmp_input_file_path = scratch.subpath("inputs.json")
+                with open(tmp_input_file_path, "w", encoding="utf-8") as tmp_input_f_obj:
                     json.dump(inputs, tmp_input_f_obj)
-                    tmp_input_file_path = tmp_input_f_obj.name
-
-                # Prepare a temp file for the script to write outputs
-                with tempfile.NamedTemporaryFile(
-                    mode="r", suffix=".json", delete=False, encoding="utf-8"
-                ) as tmp_output_f_obj:
-                    tmp_output_file_path = tmp_output_f_obj.name
-                _temporary_script_files.add(
-                    tmp_output_file_path
-                )  # Ensure cleanup even if script fails before writing
-
-                # Build the command to run the script
-                command = [
-                    python_exe,
-                    script_to_run_str,
-                    tmp_input_file_path,
-                    tmp_output_file_path,
-                ]
-                logger.debug(f"Executing PythonScriptMCP sync command (sandboxed): {command}")
+                tmp_output_file_path = scratch.subpath("outputs.json")
+
+                script_args = [tmp_input_file_path, tmp_output_file_path]
+                logger.debug(
+                    f"Executing PythonScriptMCP script (sandboxed): {script_to_run_str} {script_args}"
+                )
 
                 # --- SANDBOXED EXECUTION ---
-                # Use run_sandboxed_subprocess to enforce resource limits and isolation
-                process_return_code, stdout_str, stderr_str = run_sandboxed_subprocess(
-                    command,
+                # Use run_sandboxed_python_async to enforce resource limits and isolation
+                process_return_code, stdout_str, stderr_str = await run_sandboxed_python_async(
+                    script_to_run_str,
+                    script_args,
                     timeout=self.config.timeout if hasattr(self.config, 'timeout') else 600,
-                    memory_limit_mb=512,  # You may want to make this configurable
-                    cpu_time_limit_sec=60,  # You may want to make this configurable
+                    memory_limit_mb=settings.sandbox.memory_limit_mb,
+                    cpu_time_limit_sec=settings.sandbox.cpu_time_limit_sec,
+                    python_executable=python_executable,
                 )
                 # --- END SANDBOXED EXECUTION ---
 
-                # Log output for debugging
-                if stdout_str:
-                    logger.info(
-                        f"Script stdout for '{self.config.name}':\n{stdout_str}"
-                    )
-                if stderr_str:
-                    logger.warning(
-                        f"Script stderr for '{self.config.name}':\n{stderr_str}"
-                    )
+                self._log_output(stdout_str, stderr_str)
 
                 # Parse the output file if execution succeeded
                 if process_return_code == 0:
@@ -224,61 +386,50 @@ class PythonScriptMCP(BaseMCPServer):
                 }
             except Exception as e:
                 logger.error(
-                    f"Exception during Python script sync execution for '{self.config.name}': {e}\n{traceback.format_exc()}"
+                    f"Exception during Python script execution for '{self.config.name}': {e}\n{traceback.format_exc()}"
                 )
                 return {
                     "success": False,
                     "result": None,
-                    "error": f"An unexpected error occurred in sync runner: {str(e)}",
+                    "error": f"An unexpected error occurred in script runner: {str(e)}",
                 }
             finally:
-                if tmp_input_file_path and os.path.exists(tmp_input_file_path):
-                    try:
-                        os.remove(tmp_input_file_path)
-                    except OSError as e_remove:
-                        logger.warning(
-                            f"Could not remove temporary input file {tmp_input_file_path}: {e_remove}"
-                        )
-                # tmp_output_file_path is handled by atexit via _temporary_script_files
+                scratch.cleanup()
 
-        # Run the synchronous script execution function in a separate thread
         try:
-            return await asyncio.to_thread(_run_script_sync)
-        except Exception as e_thread:  # Catch errors from to_thread itself, if any
+            if self._io_protocol == "pipe":
+                return await self._run_in_environment(
+                    lambda python_executable: self._run_script_pipe(inputs, python_executable)
+                )
+            return await self._run_in_environment(_run_script)
+        except Exception as e_run:
             logger.error(
-                f"Error invoking asyncio.to_thread for '{self.config.name}': {e_thread}\n{traceback.format_exc()}"
+                f"Error running script for '{self.config.name}': {e_run}\n{traceback.format_exc()}"
             )
             return {
                 "success": False,
                 "result": None,
-                "error": f"Failed to execute script due to threading error: {str(e_thread)}",
+                "error": f"Failed to execute script: {str(e_run)}",
             }
 
+    def close(self) -> None:
+        """Releases this instance's reference to its stored script_content file.
+
+        The file is removed once no instance uses it any more; safe to call repeatedly.
+        """
+        digest, self._stored_script_digest = getattr(self, "_stored_script_digest", None), None
+        if digest:
+            get_script_store().release(digest)
+
     def __del__(self):
         """
-        Custom destructor to attempt cleanup of the temporary script file created from script_content
-        if this specific MCP instance is deleted and it had created such a file.
-        This is a fallback to the atexit handler, especially useful for long-running apps
-        where instances might be deleted before app exit.
+        Releases the stored script_content file if this instance is deleted without close().
+        The script store's atexit handler removes whatever is left at exit.
         """
-        if (
-            hasattr(self, "_script_path_to_execute")
-            and self._script_path_to_execute
-            and self.config.script_content
-            and self._script_path_to_execute in _temporary_script_files
-        ):
-            try:
-                if os.path.exists(self._script_path_to_execute):
-                    os.remove(self._script_path_to_execute)
-                _temporary_script_files.remove(self._script_path_to_execute)
-                logger.info(
-                    f"Cleaned up temporary script file on MCP instance deletion: {self._script_path_to_execute}"
-                )
-            except Exception as e:
-                logger.error(
-                    f"Error cleaning up temporary script {self._script_path_to_execute} during MCP instance __del__: {e}"
-                )
-            pass  # Ensure no errors from __del__
+        try:
+            self.close()
+        except Exception as e:
+            logger.error(f"Error releasing stored script during MCP instance __del__: {e}")
 
     def _prepare_script(self, inputs: Dict[str, Any]) -> str:
         """Prepare the script content by injecting input parameters at the beginning."""
@@ -1,25 +1,43 @@
+import logging
+import os
+import shutil
+import threading
 import uuid
-from typing import Any, Dict, List, Optional
+from concurrent.futures import Future
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional
 from pathlib import Path
 
-from sentence_transformers import SentenceTransformer
+from sqlalchemy import func
+from sqlalchemy import inspect as sa_inspect
 from sqlalchemy.orm import Session
+from sqlalchemy.orm.base import NO_VALUE
 
-from mcp.db.models import MCP, MCPVersion
-from mcp.schemas.mcp import MCPCreate, MCPUpdate
+from mcp.config.settings import settings
+from mcp.db.models import EMBEDDING_DIM, MCP, MCPVersion
+from mcp.schemas.mcp import MCPCreate, MCPNewVersionRequest, MCPUpdate
+from mcp.utils.cache import LRUCache
 
 from .ai_assistant import AIAssistantMCP
 # Imports needed from mcp.core for MCP instantiation
 from .base import BaseMCPServer
+from .embedding_backends import load_embedding_model
+from .embedding_worker import EmbeddingBatcher
 from .jupyter_notebook import JupyterNotebookMCP
+from .lexical_index import LexicalIndex
 from .llm_prompt import LLMPromptMCP
 from .python_script import PythonScriptMCP
 from .types import MCPType  # Union of all config types
 from .types import (AIAssistantConfig, JupyterNotebookConfig, LLMPromptConfig,
                     PythonScriptConfig)
+from .vector_index import VectorIndex
+from .venv_cache import prewarm_script_environment
 from pydantic import ValidationError
 from fastapi import HTTPException
 
+logger = logging.getLogger(__name__)
+
 # Export MCP_REGISTRY_FILE for test compatibility
 MCP_REGISTRY_FILE = Path(".mcp_data/mcp_storage.json")
 # Export WORKFLOW_STORAGE_FILE for test compatibility
@@ -42,15 +60,220 @@ print(
 
 # Initialize embedding model (ensure this model is downloaded/available)
 # Using a smaller, efficient model for local dev. Consider larger models for production.
+# EMBEDDING_BACKEND=onnx selects the quantized ONNX copy of the same model for CPU nodes.
 try:
-    embedding_model: Optional[SentenceTransformer] = SentenceTransformer("all-MiniLM-L6-v2")
+    embedding_model: Optional[Any] = load_embedding_model(settings.embedding)
 except Exception as e:
     print(
-        f"Error loading SentenceTransformer model: {e}. Semantic search features might not work."
+        f"Error loading embedding model: {e}. Semantic search features might not work."
     )
     embedding_model = None
 
 
+def _open_vector_index() -> VectorIndex:
+    """Opens this process's vector index, removing those of processes that have exited.
+
+    An index directory has a single writer: every process (e.g. each uvicorn worker) keeps
+    its own copy under ``index_dir`` instead of sharing one memory-mapped file.
+    """
+    base_dir = Path(settings.embedding.index_dir)
+    if base_dir.is_dir():
+        for path in base_dir.glob("pid-*"):
+            try:
+                os.kill(int(path.name[len("pid-"):]), 0)
+            except ProcessLookupError:
+                shutil.rmtree(path, ignore_errors=True)
+            except (ValueError, PermissionError):
+                pass
+    return VectorIndex(
+        str(base_dir / f"pid-{os.getpid()}"),
+        dim=EMBEDDING_DIM,
+        quantize=settings.embedding.index_quantize,
+    )
+
+
+# Vector index used for semantic search, one per process (see get_vector_index). It is kept
+# in sync by the save/update/delete functions below; writes made by other processes reach
+# it through the background index sync (see start_index_sync).
+vector_index: Optional[VectorIndex] = None
+_vector_index_pid: Optional[int] = None
+_vector_index_open_lock = threading.Lock()
+_vector_index_synced = False
+
+# BM25 index over name/description/tags used for hybrid search candidate generation. Every
+# process keeps its own copy in memory, built from the database on first use and kept in
+# sync like the vector index.
+lexical_index = LexicalIndex()
+_lexical_index_synced = False
+
+# The index sync re-reads rows updated since the watermark, minus an overlap that covers
+# late commits and clock skew between writers; re-applying a row is idempotent.
+_INDEX_SYNC_OVERLAP = timedelta(seconds=60)
+_index_watermark: Optional[datetime] = None
+# MCP id -> updated_at of the change this process indexed itself (for deletes, their time),
+# so the sync does not re-apply it or resurrect a deleted MCP from an older read.
+_locally_indexed: Dict[uuid.UUID, datetime] = {}
+_index_sync_lock = threading.Lock()
+_index_sync_stop: Optional[threading.Event] = None
+
+
+def get_vector_index() -> VectorIndex:
+    """Returns this process's vector index, opening it on first use.
+
+    The index belongs to the process that opened it: a forked child opens its own on first
+    use instead of writing to its parent's files.
+    """
+    global vector_index, _vector_index_pid, _vector_index_synced
+    with _vector_index_open_lock:
+        pid = os.getpid()
+        if vector_index is None or _vector_index_pid not in (None, pid):
+            vector_index = _open_vector_index()
+            _vector_index_pid = pid
+            _vector_index_synced = False
+        return vector_index
+
+
+# Popular dashboard queries repeat constantly; keep their embeddings instead of
+# re-encoding the same text on every search.
+_query_embedding_cache = LRUCache(
+    maxsize=settings.embedding.query_cache_size,
+    ttl=settings.embedding.query_cache_ttl,
+)
+
+
+@dataclass(frozen=True)
+class LatestVersion:
+    """The fields of an MCP's current version needed to serve and run it."""
+
+    id: uuid.UUID
+    version_str: Optional[str]
+    config_snapshot: Optional[Dict[str, Any]]
+    description: Optional[str] = None
+
+
+# MCP id -> LatestVersion. Invalidated whenever this process creates a version or deletes
+# an MCP; the TTL bounds staleness when another process writes the new version.
+_latest_version_cache = LRUCache(maxsize=4096, ttl=30.0)
+
+
+_LATEST_VERSION_COLUMNS = (
+    MCPVersion.id,
+    MCPVersion.version_str,
+    MCPVersion.config_snapshot,
+    MCPVersion.description,
+)
+
+
+def _latest_version_from_row(row: Any) -> LatestVersion:
+    return LatestVersion(
+        id=row.id,
+        version_str=row.version_str,
+        config_snapshot=row.config_snapshot,
+        description=row.description,
+    )
+
+
+def _query_latest_version(db: Session, mcp_uuid: uuid.UUID) -> Optional[LatestVersion]:
+    columns = _LATEST_VERSION_COLUMNS
+    row = (
+        db.query(*columns)
+        .join(MCP, MCP.current_version_id == MCPVersion.id)
+        .filter(MCP.id == mcp_uuid)
+        .first()
+    )
+    if row is None:
+        # MCPs created before current_version_id was maintained
+        row = (
+            db.query(*columns)
+            .filter(MCPVersion.mcp_id == mcp_uuid)
+            .order_by(MCPVersion.created_at.desc(), MCPVersion.id.desc())
+            .first()
+        )
+    return _latest_version_from_row(row) if row is not None else None
+
+
+def get_latest_mcp_version(db: Session, mcp: MCP | uuid.UUID) -> Optional[LatestVersion]:
+    """Resolves the current version of an MCP without loading its version history.
+
+    Resolution is a single indexed lookup through ``MCP.current_version_id`` (falling back
+    to the newest version by ``created_at``), cached per process. When ``mcp`` is an ORM
+    instance whose ``versions`` collection is already in memory, it is used directly.
+    """
+    mcp_uuid = mcp if isinstance(mcp, uuid.UUID) else mcp.id
+    cached = _latest_version_cache.get(mcp_uuid)
+    if cached is not None:
+        return cached
+
+    if isinstance(mcp, MCP):
+        loaded_versions = sa_inspect(mcp).attrs.versions.loaded_value
+        if loaded_versions is not NO_VALUE and loaded_versions:
+            current = next(
+                (v for v in loaded_versions if v.id == mcp.current_version_id), None
+            ) or max(loaded_versions, key=lambda v: v.created_at or datetime.min)
+            return _latest_version_from_row(current)
+
+    latest = _query_latest_version(db, mcp_uuid)
+    if latest is not None:
+        _latest_version_cache.set(mcp_uuid, latest)
+    return latest
+
+
+def get_latest_mcp_versions(db: Session, mcps: List[Any]) -> Dict[uuid.UUID, LatestVersion]:
+    """Batch form of get_latest_mcp_version for list views: one query for all cache misses.
+
+    ``mcps`` may be MCP instances or rows with ``id`` and ``current_version_id``. MCPs
+    created before current_version_id was maintained are resolved by one more query.
+    """
+    result: Dict[uuid.UUID, LatestVersion] = {}
+    pending = []
+    for mcp in mcps:
+        cached = _latest_version_cache.get(mcp.id)
+        if cached is not None:
+            result[mcp.id] = cached
+        else:
+            pending.append(mcp)
+
+    mcp_id_by_version_id = {
+        mcp.current_version_id: mcp.id for mcp in pending if mcp.current_version_id is not None
+    }
+    if mcp_id_by_version_id:
+        rows = (
+            db.query(*_LATEST_VERSION_COLUMNS)
+            .filter(MCPVersion.id.in_(list(mcp_id_by_version_id)))
+            .all()
+        )
+        for row in rows:
+            latest = _latest_version_from_row(row)
+            result[mcp_id_by_version_id[row.id]] = latest
+            _latest_version_cache.set(mcp_id_by_version_id[row.id], latest)
+
+    unresolved = [mcp.id for mcp in pending if mcp.id not in result]
+    if unresolved:
+        ranked = (
+            db.query(
+                *_LATEST_VERSION_COLUMNS,
+                MCPVersion.mcp_id,
+                func.row_number()
+                .over(
+                    partition_by=MCPVersion.mcp_id,
+                    order_by=(MCPVersion.created_at.desc(), MCPVersion.id.desc()),
+                )
+                .label("rank"),
+            )
+            .filter(MCPVersion.mcp_id.in_(unresolved))
+            .subquery()
+        )
+        for row in db.query(ranked).filter(ranked.c.rank == 1).all():
+            latest = _latest_version_from_row(row)
+            result[row.mcp_id] = latest
+            _latest_version_cache.set(row.mcp_id, latest)
+    return result
+
+
+def invalidate_latest_version_cache(mcp_uuid: uuid.UUID) -> None:
+    _latest_version_cache.delete(mcp_uuid)
+
+
 def load_mcp_definition_from_db(db: Session, mcp_id_str: str) -> Optional[MCP]:
     """Loads a single MCP definition from the database by its ID."""
     try:
@@ -66,12 +289,123 @@ def load_all_mcp_definitions_from_db(db: Session) -> List[MCP]:
     return db.query(MCP).all()
 
 
-def _generate_mcp_embedding(
-    mcp_data: MCPCreate | MCPUpdate | MCP, existing_mcp: Optional[MCP] = None
-):
+def encode_texts(texts: List[str]) -> List[List[float]]:
+    """Encodes a batch of texts with a single model call."""
     if not embedding_model:
-        return None
+        raise RuntimeError("Embedding model is not available.")
+    embeddings = embedding_model.encode(texts, batch_size=max(len(texts), 1))
+    return [list(map(float, embedding)) for embedding in embeddings]
+
+
+# Coalesces concurrent encode requests into batched model calls. Started on application
+# startup (see start_embedding_worker); while it is stopped, encoding happens inline.
+embedding_worker = EmbeddingBatcher(
+    encode_texts,
+    max_batch_size=settings.embedding.batch_size,
+    max_wait_ms=settings.embedding.batch_max_wait_ms,
+    worker_threads=settings.embedding.worker_threads,
+)
+_embedding_session_factory: Optional[Callable[[], Session]] = None
+# Latest scheduled write-back per MCP, so a slow stale embedding never overwrites a newer one.
+_embedding_generations: Dict[uuid.UUID, int] = {}
+# Serializes the row write of one MCP; the global lock only guards the tables and the index.
+_embedding_row_locks: Dict[uuid.UUID, threading.Lock] = {}
+_embedding_writeback_lock = threading.Lock()
+
+
+def start_embedding_worker(session_factory: Optional[Callable[[], Session]] = None) -> bool:
+    """Starts the batching embedding worker.
 
+    Args:
+        session_factory: Callable returning a new Session. Required for asynchronous
+            write-back of embeddings; without it the worker only batches inline encodes.
+
+    Returns:
+        True if the worker is running.
+    """
+    global _embedding_session_factory
+    if not embedding_model:
+        logger.info("Embedding model unavailable; embedding worker not started.")
+        return False
+    _embedding_session_factory = session_factory
+    embedding_worker.start()
+    return True
+
+
+def stop_embedding_worker() -> None:
+    """Stops the embedding worker after draining queued requests."""
+    embedding_worker.stop()
+
+
+def _encode_text(text: str) -> List[float]:
+    if embedding_worker.running:
+        return embedding_worker.encode(text)
+    embedding = embedding_model.encode(text)  # type: ignore[union-attr]
+    return embedding.tolist()  # pgvector expects a list or numpy array
+
+
+def _should_defer_embedding(defer_embedding: Optional[bool]) -> bool:
+    defer = settings.embedding.async_writeback if defer_embedding is None else defer_embedding
+    return bool(defer) and embedding_worker.running and _embedding_session_factory is not None
+
+
+def _schedule_embedding_writeback(mcp_id: uuid.UUID, text: str) -> None:
+    """Queues ``text`` on the embedding worker and stores the result once it is ready."""
+    with _embedding_writeback_lock:
+        generation = _embedding_generations.get(mcp_id, 0) + 1
+        _embedding_generations[mcp_id] = generation
+        _embedding_row_locks.setdefault(mcp_id, threading.Lock())
+    future = embedding_worker.submit(text)
+    future.add_done_callback(
+        lambda f: _write_back_embedding(mcp_id, generation, f)
+    )
+
+
+def _write_back_embedding(mcp_id: uuid.UUID, generation: int, future: Future) -> None:
+    with _embedding_writeback_lock:
+        if _embedding_generations.get(mcp_id) != generation:
+            return  # superseded by a newer update
+        row_lock = _embedding_row_locks[mcp_id]
+    try:
+        error = future.exception()
+        if error is not None:
+            logger.warning(f"Embedding generation failed for MCP {mcp_id}: {error}")
+            return
+        embedding = future.result()
+        with row_lock:
+            with _embedding_writeback_lock:
+                if _embedding_generations.get(mcp_id) != generation:
+                    return  # a newer write-back owns the row
+            db = _embedding_session_factory()  # type: ignore[misc]
+            try:
+                updated = (
+                    db.query(MCP)
+                    .filter(MCP.id == mcp_id)
+                    .update({MCP.embedding: embedding}, synchronize_session=False)
+                )
+                db.commit()
+            except Exception as e:
+                db.rollback()
+                logger.warning(f"Failed to store embedding for MCP {mcp_id}: {e}")
+                return
+            finally:
+                db.close()
+            with _embedding_writeback_lock:
+                if updated and _embedding_generations.get(mcp_id) == generation:
+                    get_vector_index().upsert(mcp_id, embedding)
+    except Exception as e:
+        logger.warning(f"Embedding write-back failed for MCP {mcp_id}: {e}")
+    finally:
+        with _embedding_writeback_lock:
+            if _embedding_generations.get(mcp_id) == generation:
+                del _embedding_generations[mcp_id]
+                del _embedding_row_locks[mcp_id]
+
+
+def build_embedding_text(
+    mcp_data: MCPCreate | MCPUpdate | MCP, existing_mcp: Optional[MCP] = None
+) -> Optional[str]:
+    """Builds the text that is embedded for an MCP (name, description and tags)."""
     text_parts = []
     # For MCPCreate or MCPUpdate, mcp_data has the fields directly
     if isinstance(mcp_data, (MCPCreate, MCPUpdate)):
@@ -121,14 +455,231 @@ def _generate_mcp_embedding(
     full_text = " ".join(filter(None, [str(part) if part is not None else None for part in text_parts]))
     if not full_text.strip():
         return None
+    return full_text
 
-    embedding = embedding_model.encode(full_text)
-    return embedding.tolist()  # pgvector expects a list or numpy array
+
+def _generate_mcp_embedding(
+    mcp_data: MCPCreate | MCPUpdate | MCP, existing_mcp: Optional[MCP] = None
+):
+    if not embedding_model:
+        return None
+
+    full_text = build_embedding_text(mcp_data, existing_mcp)
+    if full_text is None:
+        return None
+    return _encode_text(full_text)
+
+
+def _index_mcp_embedding(db_mcp: MCP) -> None:
+    """Mirrors an MCP's stored embedding into the vector index.
+
+    Index failures are logged rather than raised: the database row is the source of
+    truth and the index can always be rebuilt from it.
+    """
+    try:
+        get_vector_index().upsert(db_mcp.id, db_mcp.embedding)
+    except Exception as e:
+        logger.warning(f"Failed to update vector index for MCP {db_mcp.id}: {e}")
+    _note_indexed(db_mcp.id, db_mcp.updated_at)
+
+
+def rebuild_vector_index(db: Session, batch_size: int = 1000) -> int:
+    """Rebuilds the vector index from the embeddings stored in the database.
+
+    Returns:
+        The number of MCPs indexed.
+    """
+    global _vector_index_synced
+    index = get_vector_index()
+    _init_index_watermark(db)
+    rows = db.query(MCP.id, MCP.embedding).yield_per(batch_size)
+    indexed = index.rebuild(
+        (mcp_id, embedding) for mcp_id, embedding in rows if embedding is not None
+    )
+    _vector_index_synced = True
+    logger.info(f"Rebuilt MCP vector index with {indexed} embeddings.")
+    return indexed
+
+
+def _index_mcp_text(db_mcp: MCP) -> None:
+    """Mirrors an MCP's name, description and tags into the lexical index."""
+    try:
+        lexical_index.add(db_mcp.id, db_mcp.name, db_mcp.description, db_mcp.tags)
+    except Exception as e:
+        logger.warning(f"Failed to update lexical index for MCP {db_mcp.id}: {e}")
+    _note_indexed(db_mcp.id, db_mcp.updated_at)
 
 
-def save_mcp_definition_to_db(db: Session, mcp_data: MCPCreate) -> MCP:
+def _prewarm_environment(mcp_type: str, config: Dict[str, Any]) -> None:
+    """Starts building the virtualenv of a Python script version in the background."""
+    if mcp_type != MCPType.PYTHON_SCRIPT.value:
+        return
+    try:
+        prewarm_script_environment(config)
+    except Exception as e:
+        logger.warning(f"Failed to schedule virtualenv build: {e}")
+
+
+def rebuild_lexical_index(db: Session, batch_size: int = 1000) -> int:
+    """Rebuilds the lexical index from the MCPs stored in the database.
+
+    Returns:
+        The number of MCPs indexed.
+    """
+    global _lexical_index_synced
+    _init_index_watermark(db)
+    rows = db.query(MCP.id, MCP.name, MCP.description, MCP.tags).yield_per(batch_size)
+    indexed = lexical_index.rebuild(
+        (mcp_id, name, description, tags) for mcp_id, name, description, tags in rows
+    )
+    _lexical_index_synced = True
+    logger.info(f"Rebuilt MCP lexical index with {indexed} MCPs.")
+    return indexed
+
+
+def _ensure_lexical_index(db: Session) -> None:
+    """Builds the in-memory lexical index from the database if this process has not yet."""
+    if not _lexical_index_synced:
+        rebuild_lexical_index(db)
+
+
+def _encode_query(query_text: str):
+    """Encodes a search query, reusing cached embeddings of recent queries."""
+    # Keyed by model identity as well, so swapping the model never serves stale vectors
+    key = (id(embedding_model), " ".join(query_text.split()))
+    query_embedding = _query_embedding_cache.get(key)
+    if query_embedding is None:
+        query_embedding = embedding_model.encode(query_text)  # type: ignore[union-attr]
+        _query_embedding_cache.set(key, query_embedding)
+    return query_embedding
+
+
+def _ensure_vector_index(db: Session) -> None:
+    """Builds the vector index from the database if this process has not yet."""
+    if not _vector_index_synced:
+        rebuild_vector_index(db)
+
+
+def _note_indexed(mcp_id: uuid.UUID, changed_at: Optional[datetime]) -> None:
+    if changed_at is None:
+        return
+    with _index_sync_lock:
+        if changed_at > _locally_indexed.get(mcp_id, datetime.min):
+            _locally_indexed[mcp_id] = changed_at
+
+
+def _init_index_watermark(db: Session) -> None:
+    """Starts the index sync from the table's state when the first index is built."""
+    global _index_watermark
+    if _index_watermark is not None:
+        return
+    latest = db.query(func.max(MCP.updated_at)).scalar()
+    with _index_sync_lock:
+        if _index_watermark is None:
+            _index_watermark = latest or datetime(1970, 1, 1)
+
+
+def sync_search_indexes(db: Session, batch_size: int = 1000) -> int:
+    """Applies MCP changes made by other processes to this process's search indexes.
+
+    Indexes that have not been built yet are built first. After that only rows updated
+    since the last sync are read and upserted, skipping changes this process indexed
+    itself; deleted MCPs are found by an id comparison, which runs only when the table's
+    row count no longer matches the lexical index.
+
+    Returns:
+        The number of changed MCPs applied.
+    """
+    global _index_watermark
+    index = get_vector_index()
+    if not _lexical_index_synced:
+        rebuild_lexical_index(db, batch_size)
+    if not _vector_index_synced:
+        rebuild_vector_index(db, batch_size)
+    with _index_sync_lock:
+        since = _index_watermark - _INDEX_SYNC_OVERLAP  # type: ignore[operator]
+
+    rows = (
+        db.query(MCP.id, MCP.name, MCP.description, MCP.tags, MCP.embedding, MCP.updated_at)
+        .filter(MCP.updated_at > since)
+        .order_by(MCP.updated_at)
+        .yield_per(batch_size)
+    )
+    applied, latest, embeddings = 0, None, []
+    for row in rows:
+        latest = row.updated_at
+        with _index_sync_lock:
+            local = _locally_indexed.get(row.id)
+        if local is not None and local >= row.updated_at:
+            continue
+        lexical_index.add(row.id, row.name, row.description, row.tags)
+        embeddings.append((row.id, row.embedding))
+        if len(embeddings) >= batch_size:
+            index.upsert_many(embeddings)
+            embeddings = []
+        applied += 1
+    if embeddings:
+        index.upsert_many(embeddings)
+
+    if db.query(func.count(MCP.id)).scalar() != len(lexical_index):
+        live = {mcp_id for (mcp_id,) in db.query(MCP.id).yield_per(batch_size)}
+        for mcp_id in set(lexical_index.ids()) - live:
+            lexical_index.remove(mcp_id)
+            index.remove(mcp_id)
+            applied += 1
+
+    with _index_sync_lock:
+        if latest is not None and latest > _index_watermark:  # type: ignore[operator]
+            _index_watermark = latest
+        horizon = _index_watermark - _INDEX_SYNC_OVERLAP  # type: ignore[operator]
+        for mcp_id in [i for i, changed_at in _locally_indexed.items() if changed_at < horizon]:
+            del _locally_indexed[mcp_id]
+    return applied
+
+
+def start_index_sync(session_factory: Callable[[], Session]) -> None:
+    """Starts the background thread that keeps the search indexes in sync with the database.
+
+    The first pass builds the indexes, so that searches do not; later passes run every
+    ``settings.embedding.index_resync_sec`` seconds (see sync_search_indexes).
+    """
+    global _index_sync_stop
+    if _index_sync_stop is not None:
+        return
+    stop = _index_sync_stop = threading.Event()
+
+    def sync_loop() -> None:
+        while True:
+            db = session_factory()
+            try:
+                sync_search_indexes(db)
+            except Exception:
+                logger.exception("Failed to sync the MCP search indexes")
+            finally:
+                db.close()
+            if stop.wait(settings.embedding.index_resync_sec):
+                return
+
+    threading.Thread(target=sync_loop, name="mcp-index-sync", daemon=True).start()
+
+
+def stop_index_sync() -> None:
+    """Stops the background index sync after its current pass."""
+    global _index_sync_stop
+    if _index_sync_stop is not None:
+        _index_sync_stop.set()
+        _index_sync_stop = None
+
+
+def save_mcp_definition_to_db(
+    db: Session, mcp_data: MCPCreate, defer_embedding: Optional[bool] = None
+) -> MCP:
     """Saves a new MCP definition and its initial version to the database.
     Performs type-specific validation on the initial_config.
+
+    When ``defer_embedding`` is true (default: ``settings.embedding.async_writeback``, on
+    unless disabled) and the embedding worker is running, the MCP is committed without an embedding and the
+    worker stores it once its batch has been encoded.
     """
 
     # Type-specific config validation
@@ -153,9 +704,13 @@ def save_mcp_definition_to_db(db: Session, mcp_data: MCPCreate) -> MCP:
     )
 
     # Generate and set embedding
-    embedding = _generate_mcp_embedding(mcp_data)
-    if embedding:
-        db_mcp.embedding = embedding
+    deferred_text = None
+    if _should_defer_embedding(defer_embedding):
+        deferred_text = build_embedding_text(mcp_data)
+    else:
+        embedding = _generate_mcp_embedding(mcp_data)
+        if embedding:
+            db_mcp.embedding = embedding
 
     # The MCP ID is generated upon instantiation if default=uuid.uuid4 is set in model
 
@@ -167,6 +722,7 @@ def save_mcp_definition_to_db(db: Session, mcp_data: MCPCreate) -> MCP:
         config_snapshot=validated_initial_config.model_dump(),  # Store the validated and structured config
         definition=validated_initial_config.model_dump(),
     )
+    db_mcp.current_version = db_initial_version
 
     # Add MCP first, so it gets an ID if not already set by default factory (though it should)
     db.add(db_mcp)
@@ -182,13 +738,23 @@ def save_mcp_definition_to_db(db: Session, mcp_data: MCPCreate) -> MCP:
         # Consider logging the error e
         # Consider raising a custom exception or re-raising
         raise e  # Re-raise for now, API layer can handle it
+    _index_mcp_text(db_mcp)
+    if deferred_text:
+        _schedule_embedding_writeback(db_mcp.id, deferred_text)
+    else:
+        _index_mcp_embedding(db_mcp)
+    _prewarm_environment(db_mcp.type, db_initial_version.config_snapshot)
     return db_mcp
 
 
 def update_mcp_definition_in_db(
-    db: Session, mcp_id_str: str, mcp_data: MCPUpdate
+    db: Session, mcp_id_str: str, mcp_data: MCPUpdate, defer_embedding: Optional[bool] = None
 ) -> Optional[MCP]:
-    """Updates an existing MCP definition in the database."""
+    """Updates an existing MCP definition in the database.
+
+    ``defer_embedding`` behaves as in save_mcp_definition_to_db; the previous embedding
+    is kept until the new one has been written back.
+    """
     try:
         mcp_uuid = uuid.UUID(mcp_id_str)
     except ValueError:
@@ -205,7 +771,10 @@ def update_mcp_definition_in_db(
             needs_embedding_update = True
         setattr(db_mcp, key, value)
 
-    if needs_embedding_update:
+    deferred_text = None
+    if needs_embedding_update and _should_defer_embedding(defer_embedding):
+        deferred_text = build_embedding_text(mcp_data, existing_mcp=db_mcp)
+    elif needs_embedding_update:
         # Pass the db_mcp instance itself which now has updated fields (prior to commit)
         # Or pass mcp_data with existing_mcp=db_mcp to _generate_mcp_embedding
         embedding = _generate_mcp_embedding(
@@ -220,9 +789,112 @@ def update_mcp_definition_in_db(
     except Exception as e:
         db.rollback()
         raise e
+    if needs_embedding_update:
+        _index_mcp_text(db_mcp)
+    if deferred_text:
+        _schedule_embedding_writeback(db_mcp.id, deferred_text)
+    elif needs_embedding_update:
+        _index_mcp_embedding(db_mcp)
     return db_mcp
 
 
+def add_mcp_version_to_db(
+    db: Session, mcp_id_str: str, version_data: MCPNewVersionRequest
+) -> Optional[MCPVersion]:
+    """Adds a new version to an existing MCP and makes it the current version.
+    Performs type-specific validation on the config_snapshot.
+    """
+    try:
+        mcp_uuid = uuid.UUID(mcp_id_str)
+    except ValueError:
+        return None
+
+    db_mcp = db.query(MCP).filter(MCP.id == mcp_uuid).first()
+    if not db_mcp:
+        return None
+
+    _, config_class = _MCP_TYPE_TO_CLASS_AND_CONFIG[MCPType(db_mcp.type)]
+    try:
+        validated_config = config_class(**version_data.config_snapshot)
+    except (ValidationError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid config_snapshot: {e}")
+
+    db_version = MCPVersion(
+        mcp_id=db_mcp.id,
+        version=version_data.version_str,
+        version_str=version_data.version_str,
+        description=version_data.description,
+        config_snapshot=validated_config.model_dump(),
+        definition=validated_config.model_dump(),
+    )
+    db.add(db_version)
+    db_mcp.current_version = db_version
+
+    try:
+        db.commit()
+        db.refresh(db_version)
+    except Exception as e:
+        db.rollback()
+        raise e
+    invalidate_latest_version_cache(mcp_uuid)
+    _prewarm_environment(db_mcp.type, db_version.config_snapshot)
+    return db_version
+
+
+def reembed_all_mcps(db: Session, batch_size: int = 256, only_missing: bool = False) -> int:
+    """Recomputes stored embeddings in batches, e.g. after switching embedding models.
+
+    MCPs are walked in primary-key order, one page of ``batch_size`` rows at a time, so
+    each page is encoded with a single model call and committed on its own.
+
+    Args:
+        db: Database session.
+        batch_size: Number of MCPs encoded and committed per batch.
+        only_missing: Only backfill MCPs that have no embedding yet.
+
+    Returns:
+        The number of MCPs whose embedding was written.
+    """
+    if not embedding_model:
+        raise RuntimeError("Embedding model is not available; cannot re-embed MCPs.")
+
+    written = 0
+    last_id: Optional[uuid.UUID] = None
+    while True:
+        query = db.query(MCP.id, MCP.name, MCP.description, MCP.tags, MCP.embedding)
+        if last_id is not None:
+            query = query.filter(MCP.id > last_id)
+        rows = query.order_by(MCP.id).limit(batch_size).all()
+        if not rows:
+            break
+        last_id = rows[-1].id
+
+        pending = []
+        for row in rows:
+            if only_missing and row.embedding is not None:
+                continue
+            text = build_embedding_text(
+                MCP(name=row.name, description=row.description, tags=row.tags)
+            )
+            if text:
+                pending.append((row.id, text))
+        if not pending:
+            continue
+
+        embeddings = encode_texts([text for _, text in pending])
+        for (mcp_id, _), embedding in zip(pending, embeddings):
+            db.query(MCP).filter(MCP.id == mcp_id).update(
+                {MCP.embedding: embedding}, synchronize_session=False
+            )
+        db.commit()
+        get_vector_index().upsert_many(
+            (mcp_id, embedding) for (mcp_id, _), embedding in zip(pending, embeddings)
+        )
+        written += len(pending)
+        logger.info(f"Re-embedded {written} MCPs so far.")
+    return written
+
+
 def delete_mcp_definition_from_db(db: Session, mcp_id_str: str) -> bool:
     """Deletes an MCP definition from the database.
     Note: MCPVersions associated with this MCP will also be deleted due to cascade settings.
@@ -236,6 +908,11 @@ def delete_mcp_definition_from_db(db: Session, mcp_id_str: str) -> bool:
     if not db_mcp:
         return False  # MCP not found
 
+    # Clear the current-version pointer so the versions can be deleted before the MCP row
+    if db_mcp.current_version_id is not None:
+        db_mcp.current_version = None
+        db.flush()
+
     # Delete all related MCPVersion rows first to avoid NOT NULL constraint errors
     db.query(MCPVersion).filter(MCPVersion.mcp_id == db_mcp.id).delete()
 
@@ -246,6 +923,13 @@ def delete_mcp_definition_from_db(db: Session, mcp_id_str: str) -> bool:
         db.rollback()
         # Log error e
         raise e  # Or return False, depending on desired error handling
+    invalidate_latest_version_cache(mcp_uuid)
+    _note_indexed(mcp_uuid, datetime.utcnow())
+    try:
+        get_vector_index().remove(mcp_uuid)
+    except Exception as e:
+        logger.warning(f"Failed to remove MCP {mcp_uuid} from vector index: {e}")
+    lexical_index.remove(mcp_uuid)
     return True
 
 
@@ -258,6 +942,15 @@ _MCP_TYPE_TO_CLASS_AND_CONFIG = {
 }
 
 
+def config_class_for(mcp_type: MCPType) -> type:
+    """The configuration model of an MCP type.
+
+    Raises:
+        KeyError: If the type has no MCP implementation.
+    """
+    return _MCP_TYPE_TO_CLASS_AND_CONFIG[mcp_type][1]
+
+
 def get_mcp_instance_from_db(
     db: Session, mcp_id_str: str, mcp_version_str: Optional[str] = None
 ) -> Optional[BaseMCPServer]:
@@ -280,46 +973,30 @@ def get_mcp_instance_from_db(
         # Log error: Invalid mcp_id_str format
         return None
 
-    # Fetch the MCP definition to get its type
-    mcp_definition = db.query(MCP).filter(MCP.id == mcp_uuid).first()
-    if not mcp_definition:
+    # Fetch only the MCP's type; the definition row itself is not needed here
+    mcp_type_row = db.query(MCP.type).filter(MCP.id == mcp_uuid).first()
+    if not mcp_type_row:
         # Log error: MCP definition not found
         return None
 
     # Determine which version to fetch
-    query = db.query(MCPVersion).filter(MCPVersion.mcp_id == mcp_uuid)
     if mcp_version_str and mcp_version_str.lower() != "latest":
-        query = query.filter(MCPVersion.version_str == mcp_version_str)
+        mcp_version = (
+            db.query(MCPVersion.config_snapshot)
+            .filter(MCPVersion.mcp_id == mcp_uuid, MCPVersion.version_str == mcp_version_str)
+            .order_by(MCPVersion.created_at.desc())
+            .first()
+        )
     else:
-        # Order by created_at or a semantic version sort key if available
-        # For simplicity, assuming version_str can be lexicographically sorted for "latest",
-        # or a dedicated "is_latest" flag or a proper version sorting mechanism exists.
-        # If version_str is like "1.0.0", "1.1.0", direct string sort might not be ideal.
-        # Using a 'created_at' timestamp for ordering versions is safer for "latest".
-        # Assuming MCPVersion has a 'created_at' field (it should for good version tracking)
-        # If MCPVersion has 'created_at' field uncomment below:
-        # query = query.order_by(MCPVersion.created_at.desc())
-        # For now, if no explicit version, and no created_at, we might get an arbitrary one or error.
-        # Let's assume for now we need a specific version or a clear latest marker in a real scenario.
-        # If we need to strictly get the latest version, we'd need to enhance this query.
-        # For this example, if no version_str, it tries to get any version.
-        # A robust solution would order by a version sequence or timestamp.
-        # Let's assume for now, if mcp_version_str is None, we attempt to get the one with the highest ID or a specific 'latest' tag.
-        # This part needs to be robust based on how versions are managed (e.g., semantic versioning, 'latest' tag, creation timestamp).
-        # For now, we will fetch the first one if no version is specified, or the one matching the version string.
-        # A better way for "latest" would be to sort by a version index or creation date.
-        query = query.order_by(
-            MCPVersion.id.desc()
-        )  # Placeholder for a proper "latest" logic
-
-    mcp_version = query.first()
+        # Single indexed lookup via MCP.current_version_id, cached per process
+        mcp_version = get_latest_mcp_version(db, mcp_uuid)
 
     if not mcp_version:
         # Log error: MCP version not found
         return None
 
     config_snapshot = mcp_version.config_snapshot
-    mcp_type_str = mcp_definition.type  # This is stored as string from enum value
+    mcp_type_str = mcp_type_row.type  # This is stored as string from enum value
 
     try:
         mcp_type_enum = MCPType(
@@ -381,17 +1058,64 @@ def search_mcp_definitions_by_text(
     if not query_text or not query_text.strip():
         return []
 
-    query_embedding = embedding_model.encode(query_text)
-
-    # Assuming MCP model has an 'embedding' field of type Vector
-    # and pgvector extension is enabled with appropriate distance function.
-    # Using cosine distance: 0 is most similar, 1 is least similar.
-    # For other distances like L2, smaller is better.
-    # results = db.query(MCP).order_by(MCP.embedding.l2_distance(query_embedding)).limit(limit).all()
-    results = (
-        db.query(MCP)
-        .order_by(MCP.embedding.cosine_distance(query_embedding))
-        .limit(limit)
-        .all()
+    query_embedding = _encode_query(query_text)
+
+    # Nearest neighbours come from the registry-owned vector index, which works the same
+    # on every database backend; the database is only used to load the matching rows.
+    _ensure_vector_index(db)
+    hits = get_vector_index().search(query_embedding, k=limit)
+    if not hits:
+        return []
+    hit_ids = [mcp_id for mcp_id, _ in hits]
+    mcps_by_id = {mcp.id: mcp for mcp in db.query(MCP).filter(MCP.id.in_(hit_ids)).all()}
+    return [mcps_by_id[mcp_id] for mcp_id in hit_ids if mcp_id in mcps_by_id]
+
+
+def hybrid_search_mcp_definitions(
+    db: Session, query_text: str, limit: int = 10
+) -> List[MCP]:
+    """Searches MCP definitions with BM25 candidate generation and vector re-ranking.
+
+    The lexical index proposes the MCPs sharing terms with the query; only those are
+    scored against the (cached) query embedding, and the final ranking blends the
+    normalised BM25 score with cosine similarity (``EMBEDDING_HYBRID_VECTOR_WEIGHT``).
+    MCPs whose name equals the query always rank first. When the query has too few
+    lexical matches (e.g. a paraphrase), the candidates are topped up with a full
+    vector search; without an embedding model the ranking is purely lexical.
+    """
+    if not query_text or not query_text.strip():
+        return []
+
+    _ensure_lexical_index(db)
+    lexical_scores = dict(
+        lexical_index.search(query_text, k=max(limit, settings.embedding.hybrid_candidates))
     )
-    return results
+    exact_matches = lexical_index.exact_name_matches(query_text)
+    for mcp_id in exact_matches:
+        lexical_scores.setdefault(mcp_id, 0.0)
+
+    vector_scores: Dict[uuid.UUID, float] = {}
+    if embedding_model:
+        query_embedding = _encode_query(query_text)
+        _ensure_vector_index(db)
+        vector_scores = get_vector_index().scores_for(query_embedding, lexical_scores)
+        if len(lexical_scores) < limit:
+            for mcp_id, score in get_vector_index().search(query_embedding, k=limit):
+                vector_scores.setdefault(mcp_id, score)
+
+    vector_weight = settings.embedding.hybrid_vector_weight if vector_scores else 0.0
+    top_lexical = max(lexical_scores.values(), default=0.0)
+
+    def combined_score(mcp_id: uuid.UUID) -> float:
+        lexical = lexical_scores.get(mcp_id, 0.0) / top_lexical if top_lexical > 0 else 0.0
+        return vector_weight * vector_scores.get(mcp_id, 0.0) + (1.0 - vector_weight) * lexical
+
+    ranked = sorted(
+        set(lexical_scores) | set(vector_scores),
+        key=lambda mcp_id: (mcp_id in exact_matches, combined_score(mcp_id)),
+        reverse=True,
+    )[:limit]
+    if not ranked:
+        return []
+    mcps_by_id = {mcp.id: mcp for mcp in db.query(MCP).filter(MCP.id.in_(ranked)).all()}
+    return [mcps_by_id[mcp_id] for mcp_id in ranked if mcp_id in mcps_by_id]
@@ -0,0 +1,212 @@
+"""
+resource_usage.py - Resource accounting for sandboxed executions.
+
+Every sandboxed script or notebook run produces a ``ResourceUsage`` (CPU user/system
+time, peak RSS, wall time, block I/O and the exit reason) from the child's ``rusage``.
+Runs are reported to the collector of the current context, so callers account for
+everything an MCP execution started without threading results through ``execute()``::
+
+    with collect_resource_usage(mcp_id=..., mcp_type=...) as usages:
+        result = await mcp_instance.execute(inputs)
+    step_usage = aggregate_usage(usages)
+
+Leaving a collector with an ``mcp_id`` also records the runs in Prometheus histograms
+labelled by MCP, for right-sizing limits and finding the most expensive steps.
+"""
+
+import signal
+import sys
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Union
+
+from prometheus_client import Counter, Histogram
+
+EXIT_COMPLETED = "completed"
+EXIT_ERROR = "error"
+EXIT_TIMEOUT = "timeout"
+EXIT_CPU_LIMIT = "cpu_limit"
+EXIT_MEMORY_LIMIT = "memory_limit"
+EXIT_SIGNAL = "signal"
+EXIT_SANDBOX_ERROR = "sandbox_error"
+EXIT_CANCELLED = "cancelled"
+
+_CPU_LIMIT_SLACK_SEC = 0.1
+
+_collector: ContextVar[Optional[List["ResourceUsage"]]] = ContextVar(
+    "resource_usage_collector", default=None
+)
+
+SANDBOX_CPU_SECONDS = Histogram(
+    "mcp_sandbox_cpu_seconds",
+    "CPU time (user + system) of sandboxed runs",
+    ["mcp_id", "mcp_type"],
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300),
+)
+SANDBOX_MAX_RSS_MB = Histogram(
+    "mcp_sandbox_max_rss_megabytes",
+    "Peak resident set size of sandboxed runs",
+    ["mcp_id", "mcp_type"],
+    buckets=(16, 32, 64, 128, 256, 384, 512, 768, 1024, 2048, 4096),
+)
+SANDBOX_WALL_SECONDS = Histogram(
+    "mcp_sandbox_wall_seconds",
+    "Wall time of sandboxed runs",
+    ["mcp_id", "mcp_type"],
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600),
+)
+SANDBOX_EXITS = Counter(
+    "mcp_sandbox_exits_total",
+    "Sandboxed runs by exit reason",
+    ["mcp_id", "mcp_type", "reason"],
+)
+
+
+@dataclass
+class ResourceUsage:
+    """Resources used by one sandboxed run."""
+
+    wall_time_sec: float
+    cpu_user_sec: float = 0.0
+    cpu_system_sec: float = 0.0
+    max_rss_mb: float = 0.0
+    io_read_blocks: int = 0
+    io_write_blocks: int = 0
+    returncode: Optional[int] = None
+    exit_reason: str = EXIT_COMPLETED
+
+    @property
+    def cpu_time_sec(self) -> float:
+        return self.cpu_user_sec + self.cpu_system_sec
+
+    @classmethod
+    def from_rusage(
+        cls,
+        rusage: Union[Any, Dict[str, float], None],
+        wall_time_sec: float,
+        returncode: Optional[int],
+        exit_reason: str,
+    ) -> "ResourceUsage":
+        """Builds a ResourceUsage from a ``resource.struct_rusage`` or a dict of its fields."""
+        usage = cls(
+            wall_time_sec=round(wall_time_sec, 6), returncode=returncode, exit_reason=exit_reason
+        )
+        if rusage is None:
+            return usage
+        get = rusage.get if isinstance(rusage, dict) else lambda name: getattr(rusage, name, 0)
+        # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+        rss_divisor = 1024 * 1024 if sys.platform == "darwin" else 1024
+        usage.cpu_user_sec = round(float(get("ru_utime") or 0.0), 6)
+        usage.cpu_system_sec = round(float(get("ru_stime") or 0.0), 6)
+        usage.max_rss_mb = round((get("ru_maxrss") or 0) / rss_divisor, 3)
+        usage.io_read_blocks = int(get("ru_inblock") or 0)
+        usage.io_write_blocks = int(get("ru_oublock") or 0)
+        return usage
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+def classify_exit(
+    returncode: Optional[int],
+    stderr: str = "",
+    timed_out: bool = False,
+    cpu_time_sec: float = 0.0,
+    cpu_time_limit_sec: Optional[float] = None,
+    cancelled: bool = False,
+) -> str:
+    """Maps how a sandboxed run ended to one of the ``EXIT_*`` reasons."""
+    if cancelled:
+        return EXIT_CANCELLED
+    if timed_out:
+        return EXIT_TIMEOUT
+    if returncode is None:
+        return EXIT_SANDBOX_ERROR
+    if returncode == 0:
+        return EXIT_COMPLETED
+    if returncode < 0:
+        signum = -returncode
+        if signum == getattr(signal, "SIGXCPU", None):
+            return EXIT_CPU_LIMIT
+        # The kernel follows SIGXCPU with SIGKILL at the hard limit. It enforces the limit
+        # on scheduler ticks, so rusage can report slightly less than the limit.
+        if cpu_time_limit_sec and cpu_time_sec >= cpu_time_limit_sec - _CPU_LIMIT_SLACK_SEC:
+            return EXIT_CPU_LIMIT
+        return EXIT_SIGNAL
+    # RLIMIT_AS surfaces as MemoryError in Python
+    if "MemoryError" in stderr[-4096:]:
+        return EXIT_MEMORY_LIMIT
+    return EXIT_ERROR
+
+
+def record_usage(usage: ResourceUsage) -> None:
+    """Reports a run to the collector of the current context, if any."""
+    usages = _collector.get()
+    if usages is not None:
+        usages.append(usage)
+
+
+def observe_usage(usage: ResourceUsage, mcp_id: str, mcp_type: str) -> None:
+    """Records a run in the per-MCP Prometheus metrics."""
+    labels = {"mcp_id": mcp_id, "mcp_type": mcp_type}
+    SANDBOX_CPU_SECONDS.labels(**labels).observe(usage.cpu_time_sec)
+    SANDBOX_MAX_RSS_MB.labels(**labels).observe(usage.max_rss_mb)
+    SANDBOX_WALL_SECONDS.labels(**labels).observe(usage.wall_time_sec)
+    SANDBOX_EXITS.labels(reason=usage.exit_reason, **labels).inc()
+
+
+@contextmanager
+def collect_resource_usage(
+    mcp_id: Optional[str] = None, mcp_type: str = "unknown"
+) -> Iterator[List[ResourceUsage]]:
+    """Collects the sandboxed runs started in this context (including ``asyncio.to_thread``).
+
+    With ``mcp_id``, the collected runs are also recorded in the per-MCP metrics on exit.
+    """
+    usages: List[ResourceUsage] = []
+    token = _collector.set(usages)
+    try:
+        yield usages
+    finally:
+        _collector.reset(token)
+        if mcp_id:
+            for usage in usages:
+                observe_usage(usage, mcp_id, mcp_type)
+
+
+def aggregate_usage(usages: Iterable[Union[ResourceUsage, Dict[str, Any]]]) -> Dict[str, Any]:
+    """Sums times and block I/O, takes the peak RSS and counts exit reasons.
+
+    Accepts ResourceUsage objects or their dicts, as well as earlier aggregates, so step
+    usage rolls up into run usage the same way runs roll up into step usage.
+    """
+    total: Dict[str, Any] = {
+        "runs": 0,
+        "wall_time_sec": 0.0,
+        "cpu_user_sec": 0.0,
+        "cpu_system_sec": 0.0,
+        "max_rss_mb": 0.0,
+        "io_read_blocks": 0,
+        "io_write_blocks": 0,
+        "exit_reasons": {},
+    }
+    for usage in usages:
+        if isinstance(usage, ResourceUsage):
+            usage = usage.to_dict()
+        if not usage:
+            continue
+        for key in ("wall_time_sec", "cpu_user_sec", "cpu_system_sec", "io_read_blocks", "io_write_blocks"):
+            total[key] += usage.get(key) or 0
+        total["max_rss_mb"] = max(total["max_rss_mb"], usage.get("max_rss_mb") or 0.0)
+        if "runs" in usage:  # an aggregate
+            total["runs"] += usage["runs"]
+            reasons = usage.get("exit_reasons") or {}
+        else:
+            total["runs"] += 1
+            reasons = {usage.get("exit_reason", EXIT_COMPLETED): 1}
+        for reason, count in reasons.items():
+            total["exit_reasons"][reason] = total["exit_reasons"].get(reason, 0) + count
+    for key in ("wall_time_sec", "cpu_user_sec", "cpu_system_sec"):
+        total[key] = round(total[key], 6)
+    return total
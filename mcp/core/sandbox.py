@@ -5,17 +5,142 @@ This module provides helpers to execute untrusted or user-supplied code in a san
 limiting CPU, memory, and file/network access as much as possible from Python.
 """
 
+import asyncio
 import os
+import selectors
+import signal
 import sys
-import tempfile
 import subprocess
 import platform
 import shutil
 import logging
-from typing import List, Optional, Dict, Tuple
+import threading
+import time
+import weakref
+from typing import Any, Callable, List, Optional, Dict, Sequence, Tuple
+
+from mcp.scripts import script_runner
+
+from .isolation import isolation_profile, node_slot, node_slot_async
+from .output_capture import BoundedOutput, output_captures
+from .scratch import ScratchQuotaExceeded, ScratchSpace, get_scratch_manager, scratch_scope, scratch_scope_async
+from .fork_server import (
+    ForkServerError, ForkServerPool, ForkServerRun, ResourceProfile, fork_server_supported,
+)
+from .resource_usage import ResourceUsage, classify_exit, record_usage
 
 logger = logging.getLogger(__name__)
 
+_fork_server_pool: Optional[ForkServerPool] = None
+_fork_server_pool_lock = threading.Lock()
+
+# One concurrency limiter per event loop (asyncio primitives are bound to their loop)
+_async_limiters: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def _sandbox_env(extra_env: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+    """Environment for sandboxed processes: the current env without proxies."""
+    # Prepare environment: start with a copy of the current env
+    env = os.environ.copy()
+    # Remove network proxy env vars to reduce risk of network access
+    for k in list(env.keys()):
+        if k.lower().startswith("http_proxy") or k.lower().startswith("https_proxy") or k.lower().startswith("ftp_proxy"):
+            env.pop(k)
+    # Optionally, restrict PATH and other envs (could be further locked down)
+    env["PYTHONUNBUFFERED"] = "1"
+    if extra_env:
+        env.update(extra_env)
+    return env
+
+
+def _rlimit_preexec(memory_limit_mb: int, cpu_time_limit_sec: int) -> Callable[[], None]:
+    isolation = isolation_profile()
+    file_size_limit = get_scratch_manager().quota_bytes
+
+    def preexec_fn_unix():
+        import resource
+        # Set CPU time limit (seconds)
+        resource.setrlimit(resource.RLIMIT_CPU, (cpu_time_limit_sec, cpu_time_limit_sec))
+        # Set memory limit (address space, bytes)
+        mem_bytes = memory_limit_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (mem_bytes, mem_bytes))
+        # No single file may exceed the scratch quota (see mcp/core/scratch.py)
+        if file_size_limit:
+            resource.setrlimit(resource.RLIMIT_FSIZE, (file_size_limit, file_size_limit))
+        # CPU affinity, niceness and I/O priority (see mcp/core/isolation.py)
+        if isolation.enabled:
+            isolation.apply()
+        # Optionally, set file descriptor limits, etc.
+
+    return preexec_fn_unix
+
+
+def _check_scratch_quota(
+    scratch: ScratchSpace, result: Tuple[int, str, str]
+) -> Tuple[int, str, str]:
+    """Fails a run whose files took the scratch tree over its quota."""
+    try:
+        scratch.check_quota()
+    except ScratchQuotaExceeded as e:
+        logger.error(f"Sandboxed run exceeded its scratch quota: {e}")
+        return -1, result[1], f"Exception: {e}"
+    return result
+
+
+def _no_slot_result(
+    command: Sequence[str], error: TimeoutError, cpu_time_limit_sec: int
+) -> Tuple[int, str, str]:
+    logger.error(f"Sandboxed subprocess not started: {command}: {error}")
+    _record_run(time.monotonic(), None, "", None, cpu_time_limit_sec)
+    return -1, "", f"Exception: {error}"
+
+
+class _RusagePopen(subprocess.Popen):
+    """Popen that keeps the child's resource usage (Unix).
+
+    The child is reaped with ``os.wait4`` (``reap`` here, ``_wait_for_exit`` on the event
+    loop), which returns the exit status plus the rusage, before Popen would reap it;
+    Popen then only reads the ``returncode`` set here.
+    """
+
+    rusage = None
+
+    def reap(self) -> int:
+        """Waits for the child to exit and reaps it; returns its exit code."""
+        if self.returncode is None:
+            try:
+                _, status, self.rusage = os.wait4(self.pid, 0)
+            except ChildProcessError:  # reaped elsewhere; the status is lost
+                self.returncode = -1
+            else:
+                self.returncode = os.waitstatus_to_exitcode(status)
+        return self.returncode
+
+
+def _record_run(
+    started: float,
+    returncode: Optional[int],
+    stderr: str,
+    rusage: Any,
+    cpu_time_limit_sec: Optional[float],
+    timed_out: bool = False,
+    cancelled: bool = False,
+) -> None:
+    """Reports a finished sandboxed run to the current resource usage collector."""
+    usage = ResourceUsage.from_rusage(rusage, time.monotonic() - started, returncode, "")
+    usage.exit_reason = classify_exit(
+        returncode,
+        stderr,
+        timed_out=timed_out,
+        cpu_time_sec=usage.cpu_time_sec,
+        cpu_time_limit_sec=cpu_time_limit_sec,
+        cancelled=cancelled,
+    )
+    record_usage(usage)
+
+
 def run_sandboxed_subprocess(
     command: List[str],
     timeout: int = 600,
@@ -23,6 +148,7 @@ def run_sandboxed_subprocess(
     cpu_time_limit_sec: int = 60,
     extra_env: Optional[Dict[str, str]] = None,
     input_data: Optional[bytes] = None,
+    pass_fds: Sequence[int] = (),
 ) -> Tuple[int, str, str]:
     """
     Run a command in a subprocess with resource limits and a sandboxed environment.
@@ -31,6 +157,14 @@ def run_sandboxed_subprocess(
     - Restricts environment variables (removes proxies, disables networking if possible).
     - Enforces CPU and memory limits (best effort on Windows; strict on Unix).
     - Enforces a timeout (process is killed if it exceeds this).
+    - Reports CPU time, peak RSS, wall time, block I/O and the exit reason of the process
+      to the current resource usage collector (see mcp/core/resource_usage.py).
+    - Captures stdout/stderr as they are produced into bounded head + tail buffers
+      (SANDBOX_OUTPUT_LIMIT_KB per stream; see mcp/core/output_capture.py), forwarding
+      lines to the ``mcp.sandbox.output`` logger.
+    - Applies the CPU affinity, niceness and I/O priority settings, and waits up to
+      ``timeout`` for a machine-wide run slot if SANDBOX_MAX_NODE_RUNS is set
+      (see mcp/core/isolation.py).
     - Returns (returncode, stdout, stderr).
 
     Args:
@@ -40,32 +174,28 @@ def run_sandboxed_subprocess(
         cpu_time_limit_sec: Maximum CPU time in seconds (Unix only).
         extra_env: Additional environment variables to set.
         input_data: Bytes to send to stdin of the process (rarely used).
+        pass_fds: File descriptors kept open in the process (Unix only).
 
     Returns:
         Tuple of (returncode, stdout, stderr).
     """
-    # Prepare environment: start with a copy of the current env
-    env = os.environ.copy()
-    # Remove network proxy env vars to reduce risk of network access
-    for k in list(env.keys()):
-        if k.lower().startswith("http_proxy") or k.lower().startswith("https_proxy") or k.lower().startswith("ftp_proxy"):
-            env.pop(k)
-    # Optionally, restrict PATH and other envs (could be further locked down)
-    env["PYTHONUNBUFFERED"] = "1"
-    if extra_env:
-        env.update(extra_env)
+    try:
+        with node_slot(timeout):
+            return _run_subprocess(
+                command, timeout, memory_limit_mb, cpu_time_limit_sec, extra_env, input_data, pass_fds
+            )
+    except TimeoutError as e:
+        return _no_slot_result(command, e, cpu_time_limit_sec)
+
 
-    # Create a temp working directory for the subprocess
-    with tempfile.TemporaryDirectory() as temp_cwd:
-        def preexec_fn_unix():
-            import resource
-            # Set CPU time limit (seconds)
-            resource.setrlimit(resource.RLIMIT_CPU, (cpu_time_limit_sec, cpu_time_limit_sec))
-            # Set memory limit (address space, bytes)
-            mem_bytes = memory_limit_mb * 1024 * 1024
-            resource.setrlimit(resource.RLIMIT_AS, (mem_bytes, mem_bytes))
-            # Optionally, set file descriptor limits, etc.
+def _run_subprocess(
+    command, timeout, memory_limit_mb, cpu_time_limit_sec, extra_env, input_data, pass_fds
+) -> Tuple[int, str, str]:
+    env = _sandbox_env(extra_env)
 
+    # Create a scratch working directory for the subprocess
+    with scratch_scope("exec") as scratch:
+        temp_cwd = scratch.path
         preexec_fn = None
         creationflags = 0
         if platform.system() == "Windows":
@@ -73,26 +203,599 @@ def run_sandboxed_subprocess(
             # Optionally, use CREATE_NO_WINDOW to hide the window
             creationflags = subprocess.CREATE_NO_WINDOW
         else:
-            preexec_fn = preexec_fn_unix
+            preexec_fn = _rlimit_preexec(memory_limit_mb, cpu_time_limit_sec)
 
+        started = time.monotonic()
+        proc = None
+        stdout_capture, stderr_capture = output_captures()
         try:
-            proc = subprocess.run(
+            # Same as subprocess.run(), but with a Popen that keeps the child's rusage
+            with _RusagePopen(
                 command,
-                input=input_data,
-                capture_output=True,
-                text=True,
+                stdin=subprocess.PIPE if input_data is not None else None,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
                 cwd=temp_cwd,  # Isolate file access to temp dir
                 env=env,
-                timeout=timeout,
                 preexec_fn=preexec_fn,  # Only works on Unix
                 creationflags=creationflags,  # Only used on Windows
-            )
-            return proc.returncode, proc.stdout, proc.stderr
+                pass_fds=pass_fds,
+            ) as proc:
+                stdout_capture.label = stderr_capture.label = f"pid {proc.pid}"
+                if platform.system() == "Windows":
+                    # No select() on pipes there; output is bounded after the fact
+                    try:
+                        stdout_bytes, stderr_bytes = proc.communicate(input_data, timeout=timeout)
+                    except subprocess.TimeoutExpired:
+                        proc.kill()
+                        stdout_bytes, stderr_bytes = proc.communicate()
+                        stdout_capture.feed(stdout_bytes)
+                        raise subprocess.TimeoutExpired(command, timeout)
+                    stdout_capture.feed(stdout_bytes)
+                    stderr_capture.feed(stderr_bytes)
+                elif _pump_pipes(proc, input_data, stdout_capture, stderr_capture, timeout):
+                    proc.kill()
+                    proc.reap()
+                    raise subprocess.TimeoutExpired(command, timeout)
+            stdout = stdout_capture.getvalue()
+            stderr = stderr_capture.getvalue()
+            _record_run(started, proc.returncode, stderr, proc.rusage, cpu_time_limit_sec)
+            return _check_scratch_quota(scratch, (proc.returncode, stdout, stderr))
         except subprocess.TimeoutExpired as e:
             logger.error(f"Sandboxed subprocess timed out: {command}")
-            # e.stdout and e.stderr may be bytes if text=False, but we set text=True, so should be str or None
-            stdout = e.stdout if isinstance(e.stdout, str) or e.stdout is None else e.stdout.decode(errors="replace")
-            return -1, stdout or "", f"TimeoutExpired: {str(e)}"
+            if proc is not None and proc.returncode is None:
+                proc.wait()
+            _record_run(started, -1, "", proc.rusage, cpu_time_limit_sec, timed_out=True)
+            return -1, stdout_capture.getvalue(), f"TimeoutExpired: {str(e)}"
         except Exception as e:
             logger.error(f"Sandboxed subprocess error: {command}: {e}")
-            return -1, "", f"Exception: {str(e)}" 
\ No newline at end of file
+            stdout_capture.close()
+            stderr_capture.close()
+            _record_run(started, None, "", getattr(proc, "rusage", None), cpu_time_limit_sec)
+            return -1, "", f"Exception: {str(e)}"
+
+
+def _pump_pipes(
+    proc: _RusagePopen,
+    input_data: Optional[bytes],
+    stdout: BoundedOutput,
+    stderr: BoundedOutput,
+    timeout: float,
+) -> bool:
+    """Feeds stdin and streams stdout/stderr into the captures until EOF (Unix).
+
+    Returns True if ``timeout`` expired first; the pipes are closed either way.
+    """
+    deadline = time.monotonic() + timeout
+    sinks = {proc.stdout.fileno(): stdout, proc.stderr.fileno(): stderr}
+    pending_input = memoryview(input_data or b"")
+    stdin_fd = proc.stdin.fileno() if proc.stdin is not None else None
+    timed_out = False
+    with selectors.DefaultSelector() as selector:
+        for fd in sinks:
+            selector.register(fd, selectors.EVENT_READ)
+        if stdin_fd is not None:
+            if pending_input:
+                # Feed stdin as the child reads it, so large inputs cannot deadlock with output
+                os.set_blocking(stdin_fd, False)
+                selector.register(stdin_fd, selectors.EVENT_WRITE)
+            else:
+                proc.stdin.close()
+        open_fds = len(selector.get_map())
+        while open_fds:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                timed_out = True
+                break
+            for key, _ in selector.select(timeout=remaining):
+                if key.fd == stdin_fd:
+                    try:
+                        pending_input = pending_input[os.write(stdin_fd, pending_input[:65536]):]
+                    except BlockingIOError:
+                        continue
+                    except OSError:  # the child closed stdin early
+                        pending_input = pending_input[:0]
+                    if not pending_input:
+                        selector.unregister(stdin_fd)
+                        proc.stdin.close()
+                        open_fds -= 1
+                    continue
+                data = os.read(key.fd, 65536)
+                if data:
+                    sinks[key.fd].feed(data)
+                else:
+                    selector.unregister(key.fd)
+                    open_fds -= 1
+    for pipe in (proc.stdin, proc.stdout, proc.stderr):
+        if pipe is not None:
+            pipe.close()
+    if not timed_out:
+        proc.reap()
+    return timed_out
+
+
+def _concurrency_limiter() -> asyncio.Semaphore:
+    from mcp.config.settings import settings
+
+    loop = asyncio.get_running_loop()
+    limiter = _async_limiters.get(loop)
+    if limiter is None:
+        limiter = asyncio.Semaphore(max(1, settings.sandbox.max_concurrent_runs))
+        _async_limiters[loop] = limiter
+    return limiter
+
+
+async def read_fd_until_eof(fd: int) -> bytes:
+    """Reads a pipe to EOF on the event loop (no thread) and closes ``fd``."""
+    chunks: List[bytes] = []
+    await _read_fd(fd, chunks.append)
+    return b"".join(chunks)
+
+
+async def _read_fd(fd: int, feed: Callable[[bytes], None]) -> None:
+    """Passes everything read from a pipe to ``feed`` until EOF, then closes ``fd``."""
+    loop = asyncio.get_running_loop()
+    os.set_blocking(fd, False)
+    eof = loop.create_future()
+
+    def on_readable():
+        try:
+            chunk = os.read(fd, 65536)
+        except BlockingIOError:
+            return
+        except OSError as e:
+            chunk = b""
+            logger.debug(f"Error reading sandbox pipe: {e}")
+        if chunk:
+            feed(chunk)
+        elif not eof.done():
+            eof.set_result(None)
+
+    loop.add_reader(fd, on_readable)
+    try:
+        await eof
+    finally:
+        loop.remove_reader(fd)
+        os.close(fd)
+
+
+async def _write_fd(fd: int, data: bytes) -> None:
+    loop = asyncio.get_running_loop()
+    os.set_blocking(fd, False)
+    pending = memoryview(data)
+    written = loop.create_future()
+
+    def on_writable():
+        nonlocal pending
+        try:
+            pending = pending[os.write(fd, pending[:65536]):]
+        except BlockingIOError:
+            return
+        except OSError:  # the process exited or closed stdin
+            pending = pending[:0]
+        if not pending and not written.done():
+            written.set_result(None)
+
+    if not pending:
+        os.close(fd)
+        return
+    loop.add_writer(fd, on_writable)
+    try:
+        await written
+    finally:
+        loop.remove_writer(fd)
+        os.close(fd)
+
+
+async def _wait_for_exit(proc: _RusagePopen) -> None:
+    """Waits for the process on the event loop, then reaps it with wait4 to keep its rusage."""
+    loop = asyncio.get_running_loop()
+    pidfd = None
+    if hasattr(os, "pidfd_open"):
+        try:
+            pidfd = os.pidfd_open(proc.pid)
+        except OSError:
+            pidfd = None
+    delay = 0.001
+    try:
+        while proc.returncode is None:
+            try:
+                pid, status, rusage = os.wait4(proc.pid, os.WNOHANG)
+            except ChildProcessError:  # reaped elsewhere; the status is lost
+                proc.returncode = -1
+                return
+            if pid == proc.pid:
+                proc.returncode = os.waitstatus_to_exitcode(status)
+                proc.rusage = rusage
+                return
+            if pidfd is not None:
+                # A pidfd becomes readable when the process exits
+                exited = loop.create_future()
+                loop.add_reader(pidfd, lambda: exited.done() or exited.set_result(None))
+                try:
+                    await exited
+                finally:
+                    loop.remove_reader(pidfd)
+            else:
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 0.05)
+    finally:
+        if pidfd is not None:
+            os.close(pidfd)
+
+
+def _kill_process_group(proc: subprocess.Popen) -> None:
+    try:
+        os.killpg(proc.pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        pass
+
+
+async def run_sandboxed_subprocess_async(
+    command: List[str],
+    timeout: float = 600,
+    memory_limit_mb: int = 512,
+    cpu_time_limit_sec: int = 60,
+    extra_env: Optional[Dict[str, str]] = None,
+    input_data: Optional[bytes] = None,
+    pass_fds: Sequence[int] = (),
+) -> Tuple[int, str, str]:
+    """
+    Async counterpart of run_sandboxed_subprocess, for use on the event loop.
+
+    Applies the same rlimits, environment scrubbing, temporary working directory and
+    timeout result, and reports resource usage the same way. Pipes and process exit are
+    watched by the event loop (a pidfd where available), so no thread is held per run.
+
+    - At most SANDBOX_MAX_CONCURRENT_RUNS runs execute at once per event loop; further
+      calls wait for a slot.
+    - The process runs in its own session: a timeout or cancellation of the awaiting
+      task kills the whole process group (including e.g. notebook kernels).
+    - stdin is /dev/null unless ``input_data`` is given.
+    - Output is captured into bounded buffers as in run_sandboxed_subprocess.
+
+    Returns:
+        Tuple of (returncode, stdout, stderr).
+    """
+    if platform.system() == "Windows":
+        # No rlimits, process groups or pidfds there; keep the blocking runner off the loop
+        return await asyncio.to_thread(
+            run_sandboxed_subprocess, command, timeout, memory_limit_mb, cpu_time_limit_sec,
+            extra_env, input_data, pass_fds,
+        )
+    env = _sandbox_env(extra_env)
+    async with _concurrency_limiter():
+        try:
+            async with node_slot_async(timeout):
+                # Walking and removing the scratch tree is file system work: keep it off the loop
+                async with scratch_scope_async("exec") as scratch:
+                    result = await _run_subprocess_async(
+                        command, env, scratch.path, timeout, memory_limit_mb, cpu_time_limit_sec,
+                        input_data, pass_fds,
+                    )
+                    return await asyncio.to_thread(_check_scratch_quota, scratch, result)
+        except TimeoutError as e:
+            return _no_slot_result(command, e, cpu_time_limit_sec)
+
+
+async def _run_subprocess_async(
+    command, env, cwd, timeout, memory_limit_mb, cpu_time_limit_sec, input_data, pass_fds
+) -> Tuple[int, str, str]:
+    started = time.monotonic()
+    stdin_r, stdin_w = os.pipe() if input_data is not None else (subprocess.DEVNULL, None)
+    stdout_r, stdout_w = os.pipe()
+    stderr_r, stderr_w = os.pipe()
+    try:
+        proc = _RusagePopen(
+            command,
+            stdin=stdin_r,
+            stdout=stdout_w,
+            stderr=stderr_w,
+            cwd=cwd,
+            env=env,
+            preexec_fn=_rlimit_preexec(memory_limit_mb, cpu_time_limit_sec),
+            start_new_session=True,  # own process group, killed as a whole
+            pass_fds=pass_fds,
+        )
+    except Exception as e:
+        for fd in (stdin_w, stdout_r, stderr_r):
+            if fd is not None:
+                os.close(fd)
+        logger.error(f"Sandboxed subprocess error: {command}: {e}")
+        _record_run(started, None, "", None, cpu_time_limit_sec)
+        return -1, "", f"Exception: {str(e)}"
+    finally:
+        for fd in (stdin_r, stdout_w, stderr_w):
+            if fd != subprocess.DEVNULL:
+                os.close(fd)
+
+    stdout_capture, stderr_capture = output_captures(label=f"pid {proc.pid}")
+    tasks = [
+        asyncio.ensure_future(_read_fd(stdout_r, stdout_capture.feed)),
+        asyncio.ensure_future(_read_fd(stderr_r, stderr_capture.feed)),
+        asyncio.ensure_future(_wait_for_exit(proc)),
+    ]
+    if stdin_w is not None:
+        tasks.append(asyncio.ensure_future(_write_fd(stdin_w, input_data)))
+    try:
+        _, pending = await asyncio.wait(tasks, timeout=timeout)
+    except asyncio.CancelledError:
+        _kill_process_group(proc)
+        await _finish_killed(tasks)
+        stdout_capture.close()
+        stderr_capture.close()
+        _record_run(started, -1, "", proc.rusage, cpu_time_limit_sec, cancelled=True)
+        raise
+
+    if pending:
+        logger.error(f"Sandboxed subprocess timed out: {command}")
+        _kill_process_group(proc)
+        await _finish_killed(tasks)
+        _record_run(started, -1, "", proc.rusage, cpu_time_limit_sec, timed_out=True)
+        return (
+            -1,
+            stdout_capture.getvalue(),
+            f"TimeoutExpired: {subprocess.TimeoutExpired(command, timeout)}",
+        )
+
+    stdout = stdout_capture.getvalue()
+    stderr = stderr_capture.getvalue()
+    _record_run(started, proc.returncode, stderr, proc.rusage, cpu_time_limit_sec)
+    return proc.returncode, stdout, stderr
+
+
+async def _finish_killed(tasks: List[asyncio.Future], grace: float = 5.0) -> None:
+    """After a kill, lets the pipes drain and the process be reaped; gives up after ``grace``."""
+    _, pending = await asyncio.wait(tasks, timeout=grace)
+    for task in pending:  # e.g. a daemonized grandchild still holding a pipe
+        task.cancel()
+    if pending:
+        await asyncio.wait(pending)
+
+
+def get_fork_server_pool() -> Optional[ForkServerPool]:
+    """Returns the shared fork server pool, or None if fork servers are disabled."""
+    global _fork_server_pool
+    from mcp.config.settings import settings
+
+    if not settings.sandbox.fork_server_enabled or not fork_server_supported():
+        return None
+    with _fork_server_pool_lock:
+        if _fork_server_pool is None:
+            isolation = isolation_profile()
+            _fork_server_pool = ForkServerPool(
+                preload_modules=settings.sandbox.preload_modules,
+                env=_sandbox_env(),
+                max_runs=settings.sandbox.fork_server_max_runs,
+                max_rss_mb=settings.sandbox.fork_server_max_rss_mb,
+                precompile_scripts=[script_runner.__file__],
+                # Forked children inherit the zygote's affinity, niceness and I/O priority
+                preexec_fn=isolation.apply if isolation.enabled else None,
+            )
+        return _fork_server_pool
+
+
+def shutdown_fork_servers() -> None:
+    """Stops all fork servers (e.g. on application shutdown)."""
+    global _fork_server_pool
+    with _fork_server_pool_lock:
+        pool, _fork_server_pool = _fork_server_pool, None
+    if pool is not None:
+        pool.shutdown()
+
+
+def _run_in_fork_server(
+    pool: ForkServerPool,
+    script_path: str,
+    args: Sequence[str],
+    timeout: float,
+    memory_limit_mb: int,
+    cpu_time_limit_sec: int,
+    extra_env: Optional[Dict[str, str]],
+    input_data: Optional[bytes],
+    pass_fds: Sequence[int],
+    python_executable: Optional[str],
+) -> Optional[Tuple[int, str, str]]:
+    """Runs a script in the fork server pool; returns None if a subprocess must be used instead."""
+    profile = ResourceProfile(memory_limit_mb=memory_limit_mb, cpu_time_limit_sec=cpu_time_limit_sec)
+    try:
+        with node_slot(timeout), scratch_scope("exec") as scratch:
+            started, rusage = time.monotonic(), {}
+            stdout_capture, stderr_capture = output_captures(label="fork server")
+            returncode, stdout, stderr = pool.run(
+                profile,
+                script_path,
+                args,
+                python=python_executable,
+                timeout=timeout,
+                env=_sandbox_env(extra_env),
+                cwd=scratch.path,
+                input_data=input_data,
+                pass_fds=pass_fds,
+                rusage=rusage,
+                stdout_capture=stdout_capture,
+                stderr_capture=stderr_capture,
+            )
+            failed_to_run = returncode == -1 and stderr.startswith("Exception:")
+            _record_run(
+                started,
+                None if failed_to_run else returncode,
+                stderr,
+                rusage,
+                cpu_time_limit_sec,
+                timed_out=returncode == -1 and stderr.startswith("TimeoutExpired"),
+            )
+            return _check_scratch_quota(scratch, (returncode, stdout, stderr))
+    except TimeoutError as e:  # no machine-wide run slot
+        return _no_slot_result([script_path, *args], e, cpu_time_limit_sec)
+    except ForkServerError as e:
+        logger.warning(f"Fork server unavailable, starting a new interpreter: {e}")
+    except OSError as e:
+        logger.warning(f"Could not start fork server, starting a new interpreter: {e}")
+    return None
+
+
+async def _run_in_fork_server_async(
+    pool: ForkServerPool,
+    script_path: str,
+    args: Sequence[str],
+    timeout: float,
+    memory_limit_mb: int,
+    cpu_time_limit_sec: int,
+    extra_env: Optional[Dict[str, str]],
+    input_data: Optional[bytes],
+    pass_fds: Sequence[int],
+    python_executable: Optional[str],
+) -> Optional[Tuple[int, str, str]]:
+    """Async counterpart of _run_in_fork_server: the child's pipes and exit are watched by the loop."""
+    profile = ResourceProfile(memory_limit_mb=memory_limit_mb, cpu_time_limit_sec=cpu_time_limit_sec)
+    try:
+        async with node_slot_async(timeout):
+            async with scratch_scope_async("exec") as scratch:
+                # Starting or recycling a server spawns a process; keep that off the loop
+                server = await asyncio.to_thread(pool.get, profile, python_executable)
+                run = server.submit(
+                    script_path, args, env=_sandbox_env(extra_env), cwd=scratch.path, pass_fds=pass_fds,
+                )
+                result = await _communicate_forked(
+                    run, script_path, timeout, input_data, cpu_time_limit_sec
+                )
+                return await asyncio.to_thread(_check_scratch_quota, scratch, result)
+    except TimeoutError as e:  # no machine-wide run slot
+        return _no_slot_result([script_path, *args], e, cpu_time_limit_sec)
+    except ForkServerError as e:
+        logger.warning(f"Fork server unavailable, starting a new interpreter: {e}")
+    except OSError as e:
+        logger.warning(f"Could not start fork server, starting a new interpreter: {e}")
+    return None
+
+
+async def _kill_forked(run: ForkServerRun) -> None:
+    try:
+        # Shielded: cancelling the wrapper would cancel the future the reader thread resolves
+        pid = await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(run.pid)), 1.0)
+        os.killpg(pid, signal.SIGKILL)
+    except (asyncio.TimeoutError, ForkServerError, ProcessLookupError, PermissionError) as e:
+        logger.warning(f"Could not kill fork server child: {e!r}")
+
+
+async def _communicate_forked(
+    run: ForkServerRun, script_path: str, timeout: float, input_data: Optional[bytes],
+    cpu_time_limit_sec: int,
+) -> Tuple[int, str, str]:
+    started = time.monotonic()
+    stdout_capture, stderr_capture = output_captures(label="fork server")
+    exited = asyncio.shield(asyncio.wrap_future(run.returncode))  # see _kill_forked
+    tasks = [
+        asyncio.ensure_future(_read_fd(run.stdout, stdout_capture.feed)),
+        asyncio.ensure_future(_read_fd(run.stderr, stderr_capture.feed)),
+        asyncio.ensure_future(_write_fd(run.stdin, input_data or b"")),
+        exited,
+    ]
+    try:
+        _, pending = await asyncio.wait(tasks, timeout=timeout)
+    except asyncio.CancelledError:
+        await _kill_forked(run)
+        await _finish_killed(tasks)
+        stdout_capture.close()
+        stderr_capture.close()
+        _record_run(started, -1, "", run.rusage, cpu_time_limit_sec, cancelled=True)
+        raise
+
+    if pending:
+        logger.error(f"Fork server run timed out after {timeout}s: {script_path}")
+        await _kill_forked(run)
+        await _finish_killed(tasks)
+        _record_run(started, -1, "", run.rusage, cpu_time_limit_sec, timed_out=True)
+        return (
+            -1,
+            stdout_capture.getvalue(),
+            f"TimeoutExpired: script timed out after {timeout} seconds",
+        )
+
+    stdout = stdout_capture.getvalue()
+    if exited.exception() is not None:  # the server died; the script's fate is unknown
+        _record_run(started, None, "", None, cpu_time_limit_sec)
+        return -1, stdout, f"Exception: {exited.exception()}"
+    stderr = stderr_capture.getvalue()
+    _record_run(started, exited.result(), stderr, run.rusage, cpu_time_limit_sec)
+    return exited.result(), stdout, stderr
+
+
+def run_sandboxed_python(
+    script_path: str,
+    args: Sequence[str] = (),
+    timeout: int = 600,
+    memory_limit_mb: int = 512,
+    cpu_time_limit_sec: int = 60,
+    extra_env: Optional[Dict[str, str]] = None,
+    input_data: Optional[bytes] = None,
+    pass_fds: Sequence[int] = (),
+    python_executable: Optional[str] = None,
+) -> Tuple[int, str, str]:
+    """
+    Run a Python script with the same limits and return value as run_sandboxed_subprocess.
+
+    ``python_executable`` selects the interpreter (e.g. a cached script virtualenv); by
+    default the server's own interpreter is used.
+
+    When fork servers are enabled (SANDBOX_FORK_SERVER_ENABLED), the script is forked from
+    a warm interpreter with the preloaded modules instead of starting a new one. If the
+    fork server cannot accept the run, it falls back to a fresh subprocess.
+    """
+    pool = get_fork_server_pool()
+    if pool is not None:
+        result = _run_in_fork_server(
+            pool, script_path, args, timeout, memory_limit_mb, cpu_time_limit_sec,
+            extra_env, input_data, pass_fds, python_executable,
+        )
+        if result is not None:
+            return result
+    return run_sandboxed_subprocess(
+        [python_executable or sys.executable or "python", script_path, *args],
+        timeout=timeout,
+        memory_limit_mb=memory_limit_mb,
+        cpu_time_limit_sec=cpu_time_limit_sec,
+        extra_env=extra_env,
+        input_data=input_data,
+        pass_fds=pass_fds,
+    )
+
+
+async def run_sandboxed_python_async(
+    script_path: str,
+    args: Sequence[str] = (),
+    timeout: float = 600,
+    memory_limit_mb: int = 512,
+    cpu_time_limit_sec: int = 60,
+    extra_env: Optional[Dict[str, str]] = None,
+    input_data: Optional[bytes] = None,
+    pass_fds: Sequence[int] = (),
+    python_executable: Optional[str] = None,
+) -> Tuple[int, str, str]:
+    """
+    Async counterpart of run_sandboxed_python.
+
+    Fresh interpreters run through run_sandboxed_subprocess_async. Fork server runs are
+    driven the same way: the child's pipes and exit status are watched by the event loop
+    within the same concurrency limit, and a timeout or cancellation of the awaiting task
+    kills the child's process group.
+    """
+    pool = get_fork_server_pool()
+    if pool is not None:
+        async with _concurrency_limiter():
+            result = await _run_in_fork_server_async(
+                pool, script_path, args, timeout, memory_limit_mb, cpu_time_limit_sec,
+                extra_env, input_data, pass_fds, python_executable,
+            )
+        if result is not None:
+            return result
+    return await run_sandboxed_subprocess_async(
+        [python_executable or sys.executable or "python", script_path, *args],
+        timeout=timeout,
+        memory_limit_mb=memory_limit_mb,
+        cpu_time_limit_sec=cpu_time_limit_sec,
+        extra_env=extra_env,
+        input_data=input_data,
+        pass_fds=pass_fds,
+    )
@@ -0,0 +1,216 @@
+"""
+scratch.py - Per-run scratch space for sandboxed executions.
+
+Intermediate files of an execution (working directory, input/output files, executed
+notebooks) live in a scratch tree instead of scattered temporary files::
+
+    with scratch_scope("run-<id>"):                  # a workflow run
+        with scratch_scope("step-<id>"):             # one of its steps
+            with scratch_scope("exec") as space:     # one sandboxed process
+                path = space.subpath("outputs.json")
+
+The outermost scope allocates a directory under the scratch base and removes the whole
+tree when it exits; nested scopes are subdirectories of the enclosing one (removed on
+exit as well). ``scratch_scope_async`` is the same for code on the event loop; it removes
+the directory in a worker thread. All scopes of a tree share one quota (SANDBOX_SCRATCH_QUOTA_MB), checked
+after each sandboxed run; sandboxed processes also get it as their file size limit.
+
+The base is ``/dev/shm`` when it is available and has room for the quota, so the I/O of
+intermediate data is memory-backed, and the system temp directory otherwise
+(SANDBOX_SCRATCH_DIR overrides both). Each process uses its own ``<base>/mcp_scratch/<pid>``
+directory; directories of processes that died are removed by the next process to start.
+"""
+
+import asyncio
+import atexit
+import itertools
+import logging
+import os
+import re
+import shutil
+import tempfile
+import threading
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from typing import AsyncIterator, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+SHM_DIR = "/dev/shm"
+
+_UNSAFE_NAME_CHARS = re.compile(r"[^A-Za-z0-9_.-]")
+
+_current: ContextVar[Optional["ScratchSpace"]] = ContextVar("scratch_space", default=None)
+_manager: Optional["ScratchManager"] = None
+_manager_lock = threading.Lock()
+
+
+class ScratchQuotaExceeded(Exception):
+    """Raised when a scratch tree uses more than its quota."""
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _tree_bytes(path: str) -> int:
+    total = 0
+    for dirpath, _, filenames in os.walk(path):
+        for name in filenames:
+            try:
+                total += os.lstat(os.path.join(dirpath, name)).st_blocks * 512
+            except OSError:
+                pass
+    return total
+
+
+class ScratchSpace:
+    """A scratch directory; nested spaces share the quota of their tree's root.
+
+    Args:
+        path: The directory (created by the manager or the parent space).
+        quota_bytes: Quota of the whole tree; 0 disables the check.
+        root: Outermost space of the tree (None for the root itself).
+    """
+
+    def __init__(self, path: str, quota_bytes: int = 0, root: Optional["ScratchSpace"] = None):
+        self.path = path
+        self.quota_bytes = quota_bytes
+        self.root = root or self
+        self._names = itertools.count()
+
+    def subpath(self, name: str) -> str:
+        """Returns a path inside this space for a file or directory named ``name``."""
+        path = os.path.normpath(os.path.join(self.path, name))
+        if os.path.commonpath([path, self.path]) != self.path:
+            raise ValueError(f"{name!r} is outside the scratch space")
+        return path
+
+    def child(self, name: str) -> "ScratchSpace":
+        """Creates a uniquely named subdirectory as a nested space."""
+        path = tempfile.mkdtemp(prefix=f"{name}-{next(self._names)}-", dir=self.path)
+        return ScratchSpace(path, self.quota_bytes, root=self.root)
+
+    def usage_bytes(self) -> int:
+        """Disk (or memory, on tmpfs) used by the files of this space."""
+        return _tree_bytes(self.path)
+
+    def check_quota(self) -> None:
+        """Raises ScratchQuotaExceeded if the tree uses more than its quota."""
+        if not self.quota_bytes:
+            return
+        used = self.root.usage_bytes()
+        if used > self.quota_bytes:
+            raise ScratchQuotaExceeded(
+                f"scratch space uses {used // (1024 * 1024)} MB of its "
+                f"{self.quota_bytes // (1024 * 1024)} MB quota"
+            )
+
+    def cleanup(self) -> None:
+        shutil.rmtree(self.path, ignore_errors=True)
+
+
+class ScratchManager:
+    """Allocates the root scratch spaces of the current process.
+
+    Args:
+        base: Directory to allocate under; None picks /dev/shm or the temp directory.
+        quota_bytes: Quota of each root space; 0 disables it.
+    """
+
+    def __init__(self, base: Optional[str] = None, quota_bytes: int = 0):
+        self.quota_bytes = quota_bytes
+        self.base = base or self._default_base(quota_bytes)
+        self.pid = os.getpid()
+        self.directory = os.path.join(self.base, "mcp_scratch", str(self.pid))
+        os.makedirs(self.directory, exist_ok=True)
+        self._remove_stale_directories()
+
+    @staticmethod
+    def _default_base(quota_bytes: int) -> str:
+        try:
+            stats = os.statvfs(SHM_DIR)
+            if os.access(SHM_DIR, os.W_OK) and stats.f_bavail * stats.f_frsize >= quota_bytes:
+                return SHM_DIR
+        except (AttributeError, OSError):  # no statvfs (Windows) or no /dev/shm
+            pass
+        return tempfile.gettempdir()
+
+    def _remove_stale_directories(self) -> None:
+        parent = os.path.dirname(self.directory)
+        for name in os.listdir(parent):
+            if name.isdigit() and int(name) != self.pid and not _pid_alive(int(name)):
+                shutil.rmtree(os.path.join(parent, name), ignore_errors=True)
+
+    def allocate(self, name: str) -> ScratchSpace:
+        """Creates a new root space; the caller removes it with ``cleanup()``."""
+        path = tempfile.mkdtemp(prefix=f"{name}-", dir=self.directory)
+        return ScratchSpace(path, self.quota_bytes)
+
+    def clear(self) -> None:
+        """Removes all scratch spaces of this process."""
+        if os.getpid() == self.pid:  # inherited through fork; the files belong to the parent
+            shutil.rmtree(self.directory, ignore_errors=True)
+
+
+def get_scratch_manager() -> ScratchManager:
+    """Returns the scratch manager of the current process."""
+    global _manager
+    with _manager_lock:
+        if _manager is None or _manager.pid != os.getpid():
+            from mcp.config.settings import settings
+
+            _manager = ScratchManager(
+                base=settings.sandbox.scratch_dir,
+                quota_bytes=settings.sandbox.scratch_quota_mb * 1024 * 1024,
+            )
+            atexit.register(_manager.clear)
+        return _manager
+
+
+def current_scratch() -> Optional[ScratchSpace]:
+    """Returns the innermost scratch space of the current context, if any."""
+    return _current.get()
+
+
+def allocate_scratch(name: str) -> ScratchSpace:
+    """Creates a space nested in the current one, or a new root space.
+
+    The caller removes it with ``cleanup()``; it does not become the current space.
+    """
+    name = _UNSAFE_NAME_CHARS.sub("_", name)[:64]
+    parent = _current.get()
+    return parent.child(name) if parent is not None else get_scratch_manager().allocate(name)
+
+
+@contextmanager
+def scratch_scope(name: str) -> Iterator[ScratchSpace]:
+    """Enters a scratch space: nested in the current one, or a new root space.
+
+    The space (and everything under it) is removed when the block exits.
+    """
+    space = allocate_scratch(name)
+    token = _current.set(space)
+    try:
+        yield space
+    finally:
+        _current.reset(token)
+        space.cleanup()
+
+
+@asynccontextmanager
+async def scratch_scope_async(name: str) -> AsyncIterator[ScratchSpace]:
+    """``scratch_scope`` for the event loop: the space is removed in a worker thread."""
+    space = allocate_scratch(name)
+    token = _current.set(space)
+    try:
+        yield space
+    finally:
+        _current.reset(token)
+        await asyncio.to_thread(space.cleanup)
@@ -0,0 +1,169 @@
+"""
+script_store.py - Deduplicated, precompiled storage for inline Python script MCPs.
+
+``PythonScriptMCP`` instances built from ``script_content`` share one file per distinct
+content: ``<sha256>.py`` plus ``<sha256>.<cache_tag>.pyc`` compiled once with
+``py_compile``, so executions load bytecode instead of recompiling the source on every
+run. Tracebacks still point at the ``.py`` file.
+
+Files are reference counted per process. A script whose last reference is released
+stays on disk, since workflow steps build a new MCP instance for every execution; the
+least recently released scripts beyond ``keep_released`` are removed. Each process keeps
+its scripts in its own subdirectory, which is removed at exit (or by the next process to
+start, if it crashed).
+"""
+
+import atexit
+import hashlib
+import logging
+import os
+import py_compile
+import shutil
+import sys
+import tempfile
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+_store: Optional["ScriptStore"] = None
+_store_lock = threading.Lock()
+
+
+@dataclass(frozen=True)
+class StoredScript:
+    """A script in the store; ``exec_path`` is the ``.pyc`` unless compilation failed."""
+
+    digest: str
+    source_path: str
+    exec_path: str
+
+
+def content_digest(content: str) -> str:
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class ScriptStore:
+    """Reference-counted, content-addressed script files of the current process.
+
+    Args:
+        root: Shared scratch directory; this process uses ``<root>/<pid>/``.
+        keep_released: Unreferenced scripts kept on disk, least recently released first out.
+    """
+
+    def __init__(self, root: str, keep_released: int = 256):
+        self.root = os.path.abspath(root)
+        self.pid = os.getpid()
+        self.directory = os.path.join(self.root, str(self.pid))
+        self.keep_released = keep_released
+        self._scripts: Dict[str, StoredScript] = {}
+        self._refcounts: Dict[str, int] = {}
+        self._released: "OrderedDict[str, None]" = OrderedDict()
+        self._lock = threading.Lock()
+        os.makedirs(self.directory, exist_ok=True)
+        self._remove_stale_directories()
+
+    def _remove_stale_directories(self) -> None:
+        # Directories of processes that exited without running their atexit hooks
+        for name in os.listdir(self.root):
+            if name.isdigit() and int(name) != self.pid and not _pid_alive(int(name)):
+                shutil.rmtree(os.path.join(self.root, name), ignore_errors=True)
+
+    def acquire(self, content: str) -> StoredScript:
+        """Returns the stored script for ``content``, writing and compiling it on first use."""
+        digest = content_digest(content)
+        with self._lock:
+            script = self._scripts.get(digest)
+            if script is None:
+                script = self._write(digest, content)
+                self._scripts[digest] = script
+            self._released.pop(digest, None)
+            self._refcounts[digest] = self._refcounts.get(digest, 0) + 1
+            return script
+
+    def _write(self, digest: str, content: str) -> StoredScript:
+        source_path = os.path.join(self.directory, f"{digest}.py")
+        with open(source_path + ".tmp", "w", encoding="utf-8") as f:
+            f.write(content)
+        os.replace(source_path + ".tmp", source_path)
+
+        exec_path = os.path.join(self.directory, f"{digest}.{sys.implementation.cache_tag}.pyc")
+        try:
+            # Unchecked hash: the source never changes under its content address
+            py_compile.compile(
+                source_path,
+                cfile=exec_path,
+                dfile=source_path,
+                doraise=True,
+                invalidation_mode=py_compile.PycInvalidationMode.UNCHECKED_HASH,
+            )
+        except py_compile.PyCompileError as e:
+            # Run the source instead, so the syntax error is reported by the execution
+            logger.debug(f"Script {digest} does not compile: {e.msg}")
+            exec_path = source_path
+        return StoredScript(digest=digest, source_path=source_path, exec_path=exec_path)
+
+    def release(self, digest: str) -> None:
+        """Drops one reference; unreferenced scripts are evicted least recently released first."""
+        with self._lock:
+            count = self._refcounts.get(digest, 0) - 1
+            if count > 0:
+                self._refcounts[digest] = count
+                return
+            self._refcounts.pop(digest, None)
+            if digest not in self._scripts:
+                return
+            self._released[digest] = None
+            self._released.move_to_end(digest)
+            while len(self._released) > self.keep_released:
+                evicted, _ = self._released.popitem(last=False)
+                self._remove(self._scripts.pop(evicted))
+
+    def _remove(self, script: StoredScript) -> None:
+        # Under the lock, so a concurrent acquire cannot lose freshly written files
+        for path in {script.source_path, script.exec_path}:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def refcount(self, digest: str) -> int:
+        with self._lock:
+            return self._refcounts.get(digest, 0)
+
+    def clear(self) -> None:
+        """Removes all scripts of this process."""
+        if os.getpid() != self.pid:  # inherited through fork; the files belong to the parent
+            return
+        with self._lock:
+            self._scripts.clear()
+            self._refcounts.clear()
+            self._released.clear()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+def get_script_store() -> ScriptStore:
+    """Returns the script store of the current process."""
+    global _store
+    with _store_lock:
+        if _store is None or _store.pid != os.getpid():
+            from mcp.config.settings import settings
+
+            root = settings.sandbox.script_store_dir or os.path.join(
+                tempfile.gettempdir(), "mcp_scripts"
+            )
+            _store = ScriptStore(root, keep_released=settings.sandbox.script_store_keep_released)
+            atexit.register(_store.clear)
+        return _store
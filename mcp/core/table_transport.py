@@ -0,0 +1,94 @@
+"""
+table_transport.py - Passing tabular data between workflow steps as Arrow files.
+
+Python script MCPs with ``table_transport`` enabled run with the script runner's
+``--table-dir`` option (see mcp/scripts/script_runner.py): pyarrow Tables and pandas
+DataFrames in their results are written once, as an Arrow IPC file (or Parquet, with
+SANDBOX_TABLE_FORMAT=parquet), to the ``tables`` directory of the run's scratch tree
+(mcp/core/scratch.py), and travel through the workflow context as small references.
+
+- Script steps with ``table_transport`` receive memory-mapped pyarrow Tables.
+- Notebook steps with ``table_transport`` receive the file's path as the parameter
+  (``table_ref_paths``) and read it with ``pyarrow.ipc.open_file(pyarrow.memory_map(path))``.
+- Other steps receive the rows as a list of dicts (``materialize_table_refs``).
+
+Only references to files in the current run's table directory are followed; any other
+path (e.g. from a run's initial inputs) is rejected with ``ValueError``.
+
+The files are removed with the run, so step results and final outputs keep only the
+tables' schema and row count (``summarize_table_refs``).
+
+pyarrow is only needed when tables are actually exchanged.
+"""
+
+import os
+from typing import Any, Optional
+
+from mcp.scripts.script_runner import TABLE_FORMATS, TABLE_REF_KEY, is_table_ref, map_values, read_table
+
+from .array_transport import run_file_path
+from .scratch import current_scratch
+
+
+def run_table_dir() -> Optional[str]:
+    """Returns the table directory of the current run, or None outside a scratch scope."""
+    scratch = current_scratch()
+    if scratch is None:
+        return None
+    path = scratch.root.subpath("tables")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def table_format() -> str:
+    """File format of published tables (SANDBOX_TABLE_FORMAT), ``arrow`` if unsupported."""
+    from mcp.config.settings import settings
+
+    fmt = settings.sandbox.table_format
+    return fmt if fmt in TABLE_FORMATS else "arrow"
+
+
+def contains_table_refs(obj: Any) -> bool:
+    if is_table_ref(obj):
+        return True
+    if isinstance(obj, dict):
+        return any(contains_table_refs(value) for value in obj.values())
+    if isinstance(obj, (list, tuple)):
+        return any(contains_table_refs(value) for value in obj)
+    return False
+
+
+def _table_path(ref: Any) -> str:
+    path = ref.get("path") if isinstance(ref, dict) else None
+    return run_file_path(path, run_table_dir(), "table")
+
+
+def check_table_refs(obj: Any) -> None:
+    """Raises ValueError if a table reference in ``obj`` is not a file of the current run."""
+    _replace_table_refs(obj, _table_path)
+
+
+def _replace_table_refs(obj: Any, replace) -> Any:
+    if not contains_table_refs(obj):
+        return obj
+    return map_values(obj, lambda value: replace(value[TABLE_REF_KEY]) if is_table_ref(value) else value)
+
+
+def materialize_table_refs(obj: Any) -> Any:
+    """Replaces table references with the tables' rows as lists of dicts."""
+    return _replace_table_refs(
+        obj, lambda ref: read_table(_table_path(ref), ref.get("format", "arrow")).to_pylist()
+    )
+
+
+def table_ref_paths(obj: Any) -> Any:
+    """Replaces table references with the paths of their files."""
+    return _replace_table_refs(obj, _table_path)
+
+
+def summarize_table_refs(obj: Any) -> Any:
+    """Drops the file paths from table references, keeping schema and row count."""
+    return _replace_table_refs(
+        obj,
+        lambda ref: {TABLE_REF_KEY: {"num_rows": ref.get("num_rows"), "schema": ref.get("schema")}},
+    )
@@ -1,6 +1,6 @@
 import uuid
 from enum import Enum
-from typing import Any, Dict, List, Optional, Union
+from typing import Any, Dict, List, Literal, Optional, Union
 
 from pydantic import (BaseModel, ConfigDict, Field, field_validator,
                       model_validator)
@@ -35,6 +35,15 @@ class LLMPromptConfig(BaseMCPConfig):
     temperature: float = Field(ge=0.0, le=1.0, default=0.7)
     max_tokens: int = Field(ge=1, default=1000)
     system_prompt: Optional[str] = None
+    response_cache: bool = Field(
+        default=False,
+        description="At temperature 0, answer repeated identical requests from the LLM response cache (LLM_RESPONSE_CACHE_BACKEND) instead of calling the API.",
+    )
+    response_cache_ttl: Optional[float] = Field(
+        default=None,
+        gt=0,
+        description="Seconds a cached response stays valid; defaults to LLM_RESPONSE_CACHE_TTL_SEC.",
+    )
 
 
 class JupyterNotebookConfig(BaseMCPConfig):
@@ -43,8 +52,23 @@ class JupyterNotebookConfig(BaseMCPConfig):
     type: MCPType = MCPType.JUPYTER_NOTEBOOK
     notebook_path: str
     execute_all: bool = True
-    cells_to_execute: Optional[List[int]] = None
+    cells_to_execute: Optional[List[int]] = Field(
+        default=None,
+        description="With execute_all off, indices of the notebook cells (0-based) run by each execution. Code cells before the first of them are setup cells; warm kernels run them once per setup and parameter values and reuse their state.",
+    )
     timeout: int = Field(ge=60, default=600)
+    execution_mode: Literal["kernel", "script"] = Field(
+        default="kernel",
+        description="'kernel' executes the notebook on a Jupyter kernel (papermill or a warm kernel). 'script' compiles a linear, plain-Python notebook once into a script module, with the parameters cell as function arguments, and runs it through the Python script execution path; cell outputs are captured as text.",
+    )
+    output_mime_types: Optional[List[str]] = Field(
+        default=None,
+        description="Rich output MIME types (e.g. image/png, text/html) to keep in results; other rich outputs are dropped while the executed notebook is read. Large ones are written to the artifact area (SANDBOX_ARTIFACT_DIR) and referenced by path.",
+    )
+    table_transport: bool = Field(
+        default=False,
+        description="Within workflow runs, pass tabular inputs produced by table_transport scripts as paths of Arrow IPC (or Parquet) files in the run's scratch space instead of lists of rows.",
+    )
 
 
 class PythonScriptConfig(BaseMCPConfig):
@@ -66,6 +90,18 @@ class PythonScriptConfig(BaseMCPConfig):
     requirements: List[str] = Field(default_factory=list)
     virtual_env: bool = True
     timeout: int = Field(ge=60, default=600)
+    io_protocol: Literal["auto", "pipe", "file"] = Field(
+        default="auto",
+        description="How inputs and outputs are exchanged with the script. 'pipe' calls the script's execute_mcp(inputs) with framed stdin/result pipes; 'file' passes input/output JSON file paths as arguments; 'auto' uses 'pipe' when the script defines execute_mcp.",
+    )
+    array_transport: bool = Field(
+        default=False,
+        description="Within workflow runs, pass NumPy arrays to and from the script as read-only memory-mapped .npy files in the run's scratch space instead of JSON lists. Requires the 'pipe' I/O protocol.",
+    )
+    table_transport: bool = Field(
+        default=False,
+        description="Within workflow runs, write pyarrow Tables and pandas DataFrames returned by the script once as Arrow IPC (or Parquet) files in the run's scratch space, and pass tabular inputs to it as memory-mapped pyarrow Tables instead of lists of rows. Requires the 'pipe' I/O protocol and pyarrow.",
+    )
 
     @model_validator(mode="after")
     def check_script_path_or_content_exists(self) -> "PythonScriptConfig":
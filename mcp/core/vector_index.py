@@ -0,0 +1,329 @@
+"""
+vector_index.py - Registry-owned vector index for MCP semantic search.
+
+Embeddings are L2-normalised and stored row-wise in a memory-mapped matrix, so cosine
+similarity reduces to a dot product that NumPy evaluates in large vectorised chunks.
+The index lives next to the other registry data on local disk and does not depend on
+the database backend, which keeps semantic search working on SQLite and PostgreSQL alike.
+
+Layout of an index directory:
+    meta.json        - dimension, row count, capacity and storage dtype
+    vectors.f32.bin  - (capacity, dim) float32 matrix (vectors.i8.bin when quantized)
+    ids.bin          - (capacity, 16) uint8 matrix holding the raw MCP UUID bytes
+
+Only the first ``count`` rows are live. Deleting an entry moves the last row into the
+freed slot, so the live rows always form a dense prefix that can be scanned directly.
+
+An index directory must have a single writer process: row assignments are tracked in
+memory, so two processes writing to the same files would overwrite each other's rows.
+"""
+
+import json
+import logging
+import os
+import threading
+import uuid
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Normalised components lie in [-1, 1]; int8 quantization maps them onto [-127, 127].
+_INT8_SCALE = 127.0
+# Rows scored per NumPy call; bounds temporary memory for quantized indexes.
+_SEARCH_CHUNK_ROWS = 65536
+_MIN_CAPACITY = 1024
+
+
+class VectorIndex:
+    """Memory-mapped matrix of normalised embeddings keyed by MCP UUID.
+
+    The index is opened lazily on first use and is safe to share between threads, but not
+    between processes (see the module docstring).
+
+    Attributes:
+        index_dir (Path): Directory holding the index files.
+        dim (int): Embedding dimension.
+        quantize (bool): Whether vectors are stored as int8 instead of float32.
+    """
+
+    def __init__(self, index_dir: str, dim: int, quantize: bool = False):
+        self.index_dir = Path(index_dir)
+        self.dim = dim
+        self.quantize = quantize
+        self._dtype = np.int8 if quantize else np.float32
+        self._lock = threading.RLock()
+        self._loaded = False
+        self._count = 0
+        self._capacity = 0
+        self._vectors: Optional[np.memmap] = None
+        self._ids: Optional[np.memmap] = None
+        self._row_of: Dict[uuid.UUID, int] = {}
+
+    # ------------------------------------------------------------------ files
+
+    @property
+    def _vectors_path(self) -> Path:
+        suffix = "i8" if self.quantize else "f32"
+        return self.index_dir / f"vectors.{suffix}.bin"
+
+    @property
+    def _ids_path(self) -> Path:
+        return self.index_dir / "ids.bin"
+
+    @property
+    def _meta_path(self) -> Path:
+        return self.index_dir / "meta.json"
+
+    def _read_meta(self) -> Optional[Dict[str, Any]]:
+        if not self._meta_path.exists():
+            return None
+        try:
+            with open(self._meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            logger.warning(f"Ignoring unreadable vector index metadata {self._meta_path}: {e}")
+            return None
+        if meta.get("dim") != self.dim or meta.get("quantize") != self.quantize:
+            logger.warning(
+                f"Vector index at {self.index_dir} was built with dim={meta.get('dim')}, "
+                f"quantize={meta.get('quantize')}; resetting it for dim={self.dim}, quantize={self.quantize}."
+            )
+            return None
+        return meta
+
+    def _write_meta(self) -> None:
+        meta = {
+            "dim": self.dim,
+            "quantize": self.quantize,
+            "count": self._count,
+            "capacity": self._capacity,
+        }
+        tmp_path = self._meta_path.with_suffix(".json.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, self._meta_path)
+
+    def _map_files(self) -> None:
+        self._vectors = np.memmap(
+            self._vectors_path, dtype=self._dtype, mode="r+", shape=(self._capacity, self.dim)
+        )
+        self._ids = np.memmap(self._ids_path, dtype=np.uint8, mode="r+", shape=(self._capacity, 16))
+
+    def _resize_files(self, capacity: int) -> None:
+        if self._vectors is not None:
+            self._vectors.flush()
+            self._ids.flush()  # type: ignore[union-attr]
+        self._vectors = None
+        self._ids = None
+        itemsize = np.dtype(self._dtype).itemsize
+        for path, row_bytes in ((self._vectors_path, self.dim * itemsize), (self._ids_path, 16)):
+            with open(path, "ab") as f:
+                f.truncate(capacity * row_bytes)
+        self._capacity = capacity
+        self._map_files()
+
+    def _ensure_loaded(self) -> None:
+        if self._loaded:
+            return
+        self.index_dir.mkdir(parents=True, exist_ok=True)
+        meta = self._read_meta()
+        if meta is None:
+            self._count = 0
+            for path in (self._vectors_path, self._ids_path):
+                if path.exists():
+                    path.unlink()
+            self._resize_files(_MIN_CAPACITY)
+            self._write_meta()
+        else:
+            self._count = int(meta["count"])
+            self._capacity = int(meta["capacity"])
+            self._map_files()
+        self._row_of = {
+            uuid.UUID(bytes=bytes(self._ids[row])): row  # type: ignore[index]
+            for row in range(self._count)
+        }
+        self._loaded = True
+
+    # --------------------------------------------------------------- encoding
+
+    def _normalise(self, embedding: Any) -> Optional[np.ndarray]:
+        vector = np.asarray(embedding, dtype=np.float32).reshape(-1)
+        if vector.shape[0] != self.dim:
+            raise ValueError(
+                f"Embedding has dimension {vector.shape[0]}, vector index expects {self.dim}."
+            )
+        norm = float(np.linalg.norm(vector))
+        if not np.isfinite(norm) or norm == 0.0:
+            return None
+        return vector / norm
+
+    def _to_storage(self, vector: np.ndarray) -> np.ndarray:
+        if self.quantize:
+            return np.clip(np.rint(vector * _INT8_SCALE), -127, 127).astype(np.int8)
+        return vector
+
+    # ------------------------------------------------------------------ writes
+
+    def _put(self, mcp_id: uuid.UUID, vector: np.ndarray) -> None:
+        row = self._row_of.get(mcp_id)
+        if row is None:
+            if self._count >= self._capacity:
+                self._resize_files(max(self._capacity * 2, _MIN_CAPACITY))
+            row = self._count
+            self._count += 1
+            self._ids[row] = np.frombuffer(mcp_id.bytes, dtype=np.uint8)  # type: ignore[index]
+            self._row_of[mcp_id] = row
+        self._vectors[row] = self._to_storage(vector)  # type: ignore[index]
+
+    def _delete(self, mcp_id: uuid.UUID) -> bool:
+        row = self._row_of.pop(mcp_id, None)
+        if row is None:
+            return False
+        last = self._count - 1
+        if row != last:
+            self._vectors[row] = self._vectors[last]  # type: ignore[index]
+            self._ids[row] = self._ids[last]  # type: ignore[index]
+            moved_id = uuid.UUID(bytes=bytes(self._ids[row]))  # type: ignore[index]
+            self._row_of[moved_id] = row
+        self._count = last
+        return True
+
+    def upsert(self, mcp_id: uuid.UUID, embedding: Any) -> None:
+        """Insert or replace the embedding for an MCP.
+
+        A missing or zero embedding removes the MCP from the index instead.
+        """
+        self.upsert_many([(mcp_id, embedding)])
+
+    def upsert_many(self, items: Iterable[Tuple[uuid.UUID, Any]]) -> int:
+        """Insert or replace several embeddings, persisting metadata once.
+
+        Returns:
+            int: Number of MCPs that are indexed after the call among ``items``.
+        """
+        indexed = 0
+        with self._lock:
+            self._ensure_loaded()
+            for mcp_id, embedding in items:
+                vector = self._normalise(embedding) if embedding is not None else None
+                if vector is None:
+                    self._delete(mcp_id)
+                    continue
+                self._put(mcp_id, vector)
+                indexed += 1
+            self._write_meta()
+        return indexed
+
+    def remove(self, mcp_id: uuid.UUID) -> bool:
+        """Remove an MCP from the index. Returns True if it was present."""
+        with self._lock:
+            self._ensure_loaded()
+            removed = self._delete(mcp_id)
+            if removed:
+                self._write_meta()
+            return removed
+
+    def rebuild(self, items: Iterable[Tuple[uuid.UUID, Any]]) -> int:
+        """Discard the current contents and index ``items`` from scratch."""
+        with self._lock:
+            self.clear()
+            return self.upsert_many(items)
+
+    def clear(self) -> None:
+        """Remove every entry while keeping the allocated files."""
+        with self._lock:
+            self._ensure_loaded()
+            self._count = 0
+            self._row_of = {}
+            self._write_meta()
+
+    def flush(self) -> None:
+        """Flush dirty pages of the memory-mapped files to disk."""
+        with self._lock:
+            if self._vectors is not None:
+                self._vectors.flush()
+                self._ids.flush()  # type: ignore[union-attr]
+
+    # ------------------------------------------------------------------- reads
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._ensure_loaded()
+            return self._count
+
+    def __contains__(self, mcp_id: object) -> bool:
+        with self._lock:
+            self._ensure_loaded()
+            return mcp_id in self._row_of
+
+    def scores_for(self, query_embedding: Any, mcp_ids: Iterable[uuid.UUID]) -> Dict[uuid.UUID, float]:
+        """Return the cosine similarity of ``query_embedding`` to each indexed id in ``mcp_ids``.
+
+        Ids that are not in the index are omitted. Only the requested rows are read, which
+        makes re-ranking a candidate set much cheaper than a full ``search``.
+        """
+        query = self._normalise(query_embedding)
+        if query is None:
+            return {}
+        if self.quantize:
+            query = query / _INT8_SCALE
+        with self._lock:
+            self._ensure_loaded()
+            found = [(mcp_id, self._row_of[mcp_id]) for mcp_id in mcp_ids if mcp_id in self._row_of]
+            if not found:
+                return {}
+            rows = np.fromiter((row for _, row in found), dtype=np.int64, count=len(found))
+            vectors = self._vectors[rows]  # type: ignore[index]
+            if self.quantize:
+                vectors = vectors.astype(np.float32)
+            scores = vectors @ query
+        return {mcp_id: float(score) for (mcp_id, _), score in zip(found, scores)}
+
+    def search(self, query_embedding: Any, k: int = 10) -> List[Tuple[uuid.UUID, float]]:
+        """Return the ``k`` MCPs most similar to ``query_embedding``.
+
+        Args:
+            query_embedding: Query vector (any array-like of length ``dim``).
+            k: Maximum number of results.
+
+        Returns:
+            List of (mcp_id, cosine_similarity) tuples, most similar first.
+        """
+        if k <= 0:
+            return []
+        query = self._normalise(query_embedding)
+        if query is None:
+            return []
+        if self.quantize:
+            query = query / _INT8_SCALE
+
+        with self._lock:
+            self._ensure_loaded()
+            count = self._count
+            if count == 0:
+                return []
+            best_rows = np.empty(0, dtype=np.int64)
+            best_scores = np.empty(0, dtype=np.float32)
+            for start in range(0, count, _SEARCH_CHUNK_ROWS):
+                stop = min(start + _SEARCH_CHUNK_ROWS, count)
+                chunk = self._vectors[start:stop]  # type: ignore[index]
+                if self.quantize:
+                    chunk = chunk.astype(np.float32)
+                scores = chunk @ query
+                if scores.shape[0] > k:
+                    top = np.argpartition(scores, -k)[-k:]
+                else:
+                    top = np.arange(scores.shape[0])
+                best_rows = np.concatenate([best_rows, top + start])
+                best_scores = np.concatenate([best_scores, scores[top]])
+                if best_scores.shape[0] > k:
+                    keep = np.argpartition(best_scores, -k)[-k:]
+                    best_rows, best_scores = best_rows[keep], best_scores[keep]
+            order = np.argsort(-best_scores, kind="stable")
+            return [
+                (uuid.UUID(bytes=bytes(self._ids[best_rows[i]])), float(best_scores[i]))  # type: ignore[index]
+                for i in order
+            ]
@@ -0,0 +1,342 @@
+"""
+venv_cache.py - Content-addressed virtualenv cache for Python script MCPs.
+
+A Python script MCP with ``virtual_env`` and ``requirements`` runs in a virtualenv built
+for exactly those requirements. Environments are keyed by a hash of the normalized
+requirements and the interpreter (implementation, version, machine), so every MCP version
+resolves to the same environment for as long as its requirements do not change, and
+identical requirements share one environment across MCPs, executions and worker
+processes.
+
+- Builds run on a background thread (deduplicated per key) and are serialized across
+  processes with an exclusive ``fcntl`` lock; executions only look environments up.
+- Packages are installed from a local wheelhouse when one is configured
+  (``--no-index --find-links``), so builds are reproducible and need no network.
+- Executions hold a shared lock on their environment while running; eviction removes
+  the least recently used environments beyond the disk budget and skips any in use.
+
+On disk, ``<root>/<key>/`` is the virtualenv and ``<root>/<key>/.mcp_venv.json`` marks it
+as complete (its mtime is the last use). ``<root>/<key>.lock`` is the lock file.
+"""
+
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import threading
+import time
+import venv
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+_META_FILE = ".mcp_venv.json"
+
+_venv_cache: Optional["VenvCache"] = None
+_venv_cache_lock = threading.Lock()
+
+
+class VenvBuildError(RuntimeError):
+    """Raised when a virtualenv could not be built."""
+
+
+def normalize_requirements(requirements: Sequence[str]) -> List[str]:
+    """Strips comments and blanks, removes duplicates and sorts requirement lines."""
+    normalized = set()
+    for line in requirements:
+        line = line.split("#", 1)[0].strip()
+        if line:
+            normalized.add(" ".join(line.split()))
+    return sorted(normalized, key=str.lower)
+
+
+def python_tag(python: Optional[str] = None) -> str:
+    """Identifies the interpreter environments are built for, e.g. ``cpython-3.11-x86_64``."""
+    if python is None or os.path.realpath(python) == os.path.realpath(sys.executable):
+        return f"{sys.implementation.name}-{sys.version_info[0]}.{sys.version_info[1]}-{platform.machine()}"
+    out = subprocess.run(
+        [python, "-c", "import platform, sys; print(f'{sys.implementation.name}-"
+         "{sys.version_info[0]}.{sys.version_info[1]}-{platform.machine()}')"],
+        capture_output=True, text=True, check=True,
+    )
+    return out.stdout.strip()
+
+
+def environment_key(requirements: Sequence[str], tag: Optional[str] = None) -> str:
+    """Content address of the environment for ``requirements``."""
+    payload = json.dumps(
+        {"python": tag or python_tag(), "requirements": normalize_requirements(requirements)},
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:32]
+
+
+def _dir_size(path: str) -> int:
+    total = 0
+    for dirpath, _, filenames in os.walk(path):
+        for name in filenames:
+            try:
+                total += os.lstat(os.path.join(dirpath, name)).st_size
+            except OSError:
+                pass
+    return total
+
+
+class VenvCache:
+    """Builds, looks up and evicts cached virtualenvs.
+
+    Args:
+        root: Directory holding the environments.
+        wheelhouse: Local directory of wheels; when set, builds never use a package index.
+        max_disk_bytes: Disk budget enforced by ``evict`` (after every build).
+        build_timeout: Maximum seconds for installing the requirements of one environment.
+        base_python: Interpreter the environments are created from.
+    """
+
+    def __init__(
+        self,
+        root: str,
+        wheelhouse: Optional[str] = None,
+        max_disk_bytes: int = 10 * 1024 ** 3,
+        build_timeout: float = 900,
+        base_python: Optional[str] = None,
+    ):
+        self.root = os.path.abspath(root)
+        self.wheelhouse = os.path.abspath(wheelhouse) if wheelhouse else None
+        self.max_disk_bytes = max_disk_bytes
+        self.build_timeout = build_timeout
+        self.base_python = base_python or sys.executable
+        self._tag = python_tag(self.base_python)
+        self._builds: Dict[str, Future] = {}
+        self._builds_lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="venv-build")
+        os.makedirs(self.root, exist_ok=True)
+
+    def key_for(self, requirements: Sequence[str]) -> str:
+        return environment_key(requirements, self._tag)
+
+    def env_path(self, key: str) -> str:
+        return os.path.join(self.root, key)
+
+    def python_path(self, key: str) -> str:
+        if os.name == "nt":
+            return os.path.join(self.env_path(key), "Scripts", "python.exe")
+        return os.path.join(self.env_path(key), "bin", "python")
+
+    def _meta_path(self, key: str) -> str:
+        return os.path.join(self.env_path(key), _META_FILE)
+
+    def is_ready(self, key: str) -> bool:
+        return os.path.exists(self._meta_path(key))
+
+    def lookup(self, requirements: Sequence[str]) -> Optional[str]:
+        """Returns the interpreter of a ready environment (marking it used), or None."""
+        key = self.key_for(requirements)
+        try:
+            os.utime(self._meta_path(key))
+        except OSError:
+            return None
+        return self.python_path(key)
+
+    @contextmanager
+    def _lock(self, key: str, exclusive: bool, blocking: bool = True) -> Iterator[bool]:
+        fd = os.open(os.path.join(self.root, f"{key}.lock"), os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            flags = fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH
+            try:
+                fcntl.flock(fd, flags if blocking else flags | fcntl.LOCK_NB)
+            except BlockingIOError:
+                yield False
+                return
+            yield True
+        finally:
+            os.close(fd)  # closing releases the lock
+
+    def prewarm(self, requirements: Sequence[str]) -> Future:
+        """Schedules a background build of the environment; returns its Future (the python path)."""
+        key = self.key_for(requirements)
+        with self._builds_lock:
+            future = self._builds.get(key)
+            if future is not None and not future.done():
+                return future
+            if self.is_ready(key):
+                future = Future()
+                future.set_result(self.python_path(key))
+                return future
+            future = self._executor.submit(self._build_and_evict, key, list(requirements))
+            self._builds[key] = future
+            future.add_done_callback(lambda _: self._forget_build(key, future))
+            return future
+
+    def _forget_build(self, key: str, future: Future) -> None:
+        with self._builds_lock:
+            if self._builds.get(key) is future:
+                del self._builds[key]
+
+    @contextmanager
+    def acquire(self, requirements: Sequence[str], timeout: Optional[float] = None) -> Iterator[str]:
+        """Yields the environment's interpreter, holding it against eviction.
+
+        If the environment is not built yet, waits up to ``timeout`` seconds for the
+        background build (started if necessary).
+
+        Raises:
+            VenvBuildError: If the build failed.
+            TimeoutError: If the build did not finish in time.
+        """
+        key = self.key_for(requirements)
+        python = self.lookup(requirements)
+        if python is None:
+            future = self.prewarm(requirements)
+            try:
+                python = future.result(timeout=timeout)
+            except TimeoutError:
+                raise TimeoutError(f"virtualenv {key} is still being built") from None
+        with self._lock(key, exclusive=False):
+            if not self.is_ready(key):  # evicted between lookup and lock
+                raise VenvBuildError(f"virtualenv {key} was evicted; retry the execution")
+            yield python
+
+    def ensure(self, requirements: Sequence[str]) -> str:
+        """Builds the environment synchronously if needed; returns its interpreter."""
+        return self.prewarm(requirements).result()
+
+    def _build_and_evict(self, key: str, requirements: List[str]) -> str:
+        python = self._build(key, requirements)
+        try:
+            self.evict()
+        except Exception as e:
+            logger.warning(f"Virtualenv eviction failed: {e}")
+        return python
+
+    def _build(self, key: str, requirements: List[str]) -> str:
+        with self._lock(key, exclusive=True):
+            if self.is_ready(key):  # built by another process while we waited
+                return self.python_path(key)
+            path = self.env_path(key)
+            shutil.rmtree(path, ignore_errors=True)  # leftovers of an interrupted build
+            started = time.monotonic()
+            logger.info(f"Building virtualenv {key} for {normalize_requirements(requirements)}")
+            try:
+                # pip runs from the base interpreter (--python), so the env needs no pip of its own
+                venv.EnvBuilder(with_pip=False, symlinks=os.name != "nt", clear=True).create(path)
+                normalized = normalize_requirements(requirements)
+                if normalized:
+                    command = [
+                        self.base_python, "-m", "pip", "--python", self.python_path(key),
+                        "install", "--disable-pip-version-check", "--no-input", "--quiet",
+                    ]
+                    if self.wheelhouse:
+                        command += ["--no-index", "--find-links", self.wheelhouse]
+                    subprocess.run(
+                        command + normalized,
+                        check=True, capture_output=True, text=True, timeout=self.build_timeout,
+                    )
+                freeze = subprocess.run(
+                    [self.base_python, "-m", "pip", "--python", self.python_path(key),
+                     "freeze", "--disable-pip-version-check"],
+                    capture_output=True, text=True, timeout=self.build_timeout,
+                )
+            except subprocess.CalledProcessError as e:
+                shutil.rmtree(path, ignore_errors=True)
+                raise VenvBuildError(f"pip install failed for {key}: {e.stderr.strip()}") from e
+            except (OSError, subprocess.SubprocessError) as e:
+                shutil.rmtree(path, ignore_errors=True)
+                raise VenvBuildError(f"could not build virtualenv {key}: {e}") from e
+
+            meta = {
+                "key": key,
+                "python": self._tag,
+                "requirements": normalize_requirements(requirements),
+                "installed": freeze.stdout.split(),
+                "size_bytes": _dir_size(path),
+                "build_seconds": round(time.monotonic() - started, 2),
+                "created_at": time.time(),
+            }
+            # Written last: its presence marks the environment as complete
+            with open(self._meta_path(key) + ".tmp", "w", encoding="utf-8") as f:
+                json.dump(meta, f, indent=2)
+            os.replace(self._meta_path(key) + ".tmp", self._meta_path(key))
+            logger.info(
+                f"Built virtualenv {key} in {meta['build_seconds']}s ({meta['size_bytes'] / 1e6:.1f} MB)"
+            )
+            return self.python_path(key)
+
+    def list_environments(self) -> List[dict]:
+        """Metadata of all complete environments, least recently used first."""
+        environments = []
+        for key in os.listdir(self.root):
+            meta_path = self._meta_path(key)
+            try:
+                with open(meta_path, "r", encoding="utf-8") as f:
+                    meta = json.load(f)
+                meta["last_used"] = os.stat(meta_path).st_mtime
+            except (OSError, ValueError):
+                continue
+            environments.append(meta)
+        return sorted(environments, key=lambda meta: meta["last_used"])
+
+    def evict(self, max_disk_bytes: Optional[int] = None) -> List[str]:
+        """Removes least recently used environments until the cache fits the disk budget.
+
+        Environments that are being built or used by an execution are skipped.
+        Returns the evicted keys.
+        """
+        budget = self.max_disk_bytes if max_disk_bytes is None else max_disk_bytes
+        environments = self.list_environments()
+        total = sum(meta.get("size_bytes", 0) for meta in environments)
+        evicted = []
+        for meta in environments:
+            if total <= budget:
+                break
+            key = meta["key"]
+            with self._lock(key, exclusive=True, blocking=False) as locked:
+                if not locked:
+                    continue
+                os.remove(self._meta_path(key))
+                shutil.rmtree(self.env_path(key), ignore_errors=True)
+            total -= meta.get("size_bytes", 0)
+            evicted.append(key)
+            logger.info(f"Evicted virtualenv {key} ({meta.get('size_bytes', 0) / 1e6:.1f} MB)")
+        return evicted
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+def get_venv_cache() -> Optional[VenvCache]:
+    """Returns the shared virtualenv cache, or None if script virtualenvs are disabled."""
+    global _venv_cache
+    from mcp.config.settings import settings
+
+    if not settings.sandbox.venv_enabled:
+        return None
+    with _venv_cache_lock:
+        if _venv_cache is None:
+            _venv_cache = VenvCache(
+                settings.sandbox.venv_dir,
+                wheelhouse=settings.sandbox.venv_wheelhouse,
+                max_disk_bytes=settings.sandbox.venv_max_disk_mb * 1024 * 1024,
+                build_timeout=settings.sandbox.venv_build_timeout_sec,
+            )
+        return _venv_cache
+
+
+def prewarm_script_environment(config: dict) -> Optional[Future]:
+    """Starts building the environment of a Python script config in the background.
+
+    Called when MCP versions are saved, so that executions find their environment ready.
+    """
+    if not config.get("virtual_env", True) or not config.get("requirements"):
+        return None
+    cache = get_venv_cache()
+    if cache is None:
+        return None
+    return cache.prewarm(config["requirements"])
@@ -47,6 +47,10 @@ from sqlalchemy.orm import Session
 from mcp.core import \
     registry  # Assuming registry.py is in the same directory or mcp.core is a package
 from mcp.core.dag import DAGOptimizer
+from mcp.core.array_transport import check_array_refs, materialize_array_refs, summarize_array_refs
+from mcp.core.table_transport import check_table_refs, materialize_table_refs, summarize_table_refs
+from mcp.core.resource_usage import aggregate_usage, collect_resource_usage
+from mcp.core.scratch import scratch_scope_async
 # ADD: Import MCP model for type hinting
 from mcp.db.models import MCP as MCPModel
 # ADD: Import ArchitecturalConstraints
@@ -229,14 +233,28 @@ class WorkflowEngine:
                     final_outputs=None,
                 )
 
-            if workflow.execution_mode == "sequential":
-                return await self._execute_sequential_workflow(
-                    workflow, initial_inputs, execution_id, start_time
-                )
-            elif workflow.execution_mode == "parallel":
-                return await self._execute_parallel_workflow(
-                    workflow, initial_inputs, execution_id, start_time
+            if workflow.execution_mode in ("sequential", "parallel"):
+                # One scratch tree per run; steps get subdirectories, all removed at the end
+                async with scratch_scope_async(f"run-{execution_id}"):
+                    if workflow.execution_mode == "sequential":
+                        result = await self._execute_sequential_workflow(
+                            workflow, initial_inputs, execution_id, start_time
+                        )
+                    else:
+                        result = await self._execute_parallel_workflow(
+                            workflow, initial_inputs, execution_id, start_time
+                        )
+                    # Shared array and table files are removed with the run's scratch space;
+                    # stored results keep only the arrays' dtype and shape and the tables'
+                    # schema and row count
+                    result.final_outputs = summarize_table_refs(
+                        materialize_array_refs(result.final_outputs)
+                    )
+                    result.step_results = summarize_table_refs(summarize_array_refs(result.step_results))
+                result.resource_usage = aggregate_usage(
+                    step.get("resource_usage") for step in result.step_results
                 )
+                return result
             else:
                 error_msg = f"Execution mode '{workflow.execution_mode}' not supported."
                 logger.error(error_msg)
@@ -450,6 +468,7 @@ class WorkflowEngine:
                 - inputs_used: Inputs used for execution
                 - outputs_generated: Outputs generated by the step
                 - error: Error message if the step failed
+                - resource_usage: Aggregated usage of the step's sandboxed runs
 
         Example:
             ```python
@@ -469,6 +488,7 @@ class WorkflowEngine:
             f"Executing step '{step.name}' (ID: {step.step_id}, MCP: {step.mcp_id})"
         )
 
+        usages = []
         try:
             resolved_inputs = self._resolve_step_inputs(step, workflow_context)
             logger.debug(f"Resolved inputs for step '{step.name}': {resolved_inputs}")
@@ -485,7 +505,21 @@ class WorkflowEngine:
                     f"(Version: {step.mcp_version_id or 'latest'}) not found or failed to instantiate."
                 )
 
-            mcp_result = await mcp_instance.execute(resolved_inputs)
+            # Inputs may carry references from anywhere (e.g. initial inputs); only this
+            # run's files are passed on
+            check_array_refs(resolved_inputs)
+            check_table_refs(resolved_inputs)
+            if not getattr(mcp_instance, "accepts_array_refs", False):
+                resolved_inputs = materialize_array_refs(resolved_inputs)
+            step_inputs = resolved_inputs
+            if not getattr(mcp_instance, "accepts_table_refs", False):
+                # The step record keeps the references rather than the rows
+                step_inputs = materialize_table_refs(resolved_inputs)
+
+            mcp_type = getattr(mcp_instance.config.type, "value", mcp_instance.config.type)
+            with collect_resource_usage(mcp_id=step.mcp_id, mcp_type=str(mcp_type)) as usages:
+                async with scratch_scope_async(f"step-{step.step_id}"):
+                    mcp_result = await mcp_instance.execute(step_inputs)
 
             if mcp_result.get("success"):
                 workflow_context[step.step_id] = {"outputs": mcp_result.get("result")}
@@ -499,6 +533,7 @@ class WorkflowEngine:
                     "inputs_used": resolved_inputs,
                     "outputs_generated": mcp_result.get("result"),
                     "error": None,
+                    "resource_usage": aggregate_usage(usages),
                 }
             else:
                 error_msg = mcp_result.get(
@@ -515,6 +550,7 @@ class WorkflowEngine:
                     "inputs_used": resolved_inputs,
                     "outputs_generated": None,
                     "error": error_msg,
+                    "resource_usage": aggregate_usage(usages),
                 }
 
         except Exception as e:
@@ -532,6 +568,7 @@ class WorkflowEngine:
                 ),
                 "outputs_generated": None,
                 "error": error_msg,
+                "resource_usage": aggregate_usage(usages),
             }
 
     def _validate_workflow_against_constraints(self, workflow: Workflow) -> None:
@@ -18,7 +18,7 @@ import uuid
 from datetime import datetime
 from typing import Optional
 
-from sqlalchemy import JSON, Enum, ForeignKey, String, Table, DateTime, Column
+from sqlalchemy import JSON, Enum, ForeignKey, String, Table, DateTime, Column, Index
 from sqlalchemy.dialects.postgresql import UUID as SA_UUID
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
@@ -73,7 +73,11 @@ class MCP(Base):  # type: ignore[misc, valid-type]
     versions: Mapped[list["MCPVersion"]] = relationship(
         "MCPVersion", back_populates="mcp", foreign_keys="MCPVersion.mcp_id"
     )
-    current_version: Mapped[Optional["MCPVersion"]] = relationship("MCPVersion", foreign_keys=[current_version_id])
+    # post_update: the MCP row and its first version reference each other, so the pointer
+    # is written with a separate UPDATE after both rows exist.
+    current_version: Mapped[Optional["MCPVersion"]] = relationship(
+        "MCPVersion", foreign_keys=[current_version_id], post_update=True
+    )
 
 
 class MCPVersion(Base):  # type: ignore[misc, valid-type]
@@ -106,6 +110,10 @@ class MCPVersion(Base):  # type: ignore[misc, valid-type]
     """
 
     __tablename__ = "mcp_versions"
+    __table_args__ = (
+        # Latest-version lookups: WHERE mcp_id = ? ORDER BY created_at DESC LIMIT 1
+        Index("ix_mcp_versions_mcp_id_created_at", "mcp_id", "created_at"),
+    )
 
     id: Mapped[PyUUID] = mapped_column(SA_UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     mcp_id: Mapped[PyUUID] = mapped_column(SA_UUID(as_uuid=True), ForeignKey("mcps.id"), nullable=False)
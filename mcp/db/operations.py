@@ -21,6 +21,7 @@ from uuid import UUID
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.orm import Session
 
+from ..core.resource_usage import aggregate_usage
 from ..schemas.mcp import MCPStatus, MCPType
 from ..schemas.workflow import WorkflowStatus, WorkflowStepStatus
 from .models.mcp import MCP, MCPVersion
@@ -108,8 +109,8 @@ def create_mcp_version(
         )
         db.add(version_obj)
 
-        # Update MCP's current version
-        mcp.current_version_id = version_obj.id
+        # Update MCP's current version (the relationship sets the id once it is flushed)
+        mcp.current_version = version_obj
         mcp.updated_at = datetime.utcnow()
 
         db.commit()
@@ -238,6 +239,7 @@ def update_workflow_step_run(
     status: WorkflowStepStatus,
     outputs: Optional[Dict[str, Any]] = None,
     error: Optional[str] = None,
+    resource_usage: Optional[Dict[str, Any]] = None,
 ) -> WorkflowStepRun:
     """
     Update a workflow step run.
@@ -254,6 +256,7 @@ def update_workflow_step_run(
         status: New status
         outputs: Optional step outputs
         error: Optional error message
+        resource_usage: Optional aggregated usage of the step's sandboxed runs
 
     Returns:
         WorkflowStepRun: The updated step run instance
@@ -274,6 +277,8 @@ def update_workflow_step_run(
             step_run.outputs = outputs
         if error is not None:
             step_run.error = error
+        if resource_usage is not None:
+            step_run.resource_usage = resource_usage
 
         if status in [WorkflowStepStatus.COMPLETED, WorkflowStepStatus.FAILED]:
             step_run.finished_at = datetime.utcnow()
@@ -336,3 +341,92 @@ def update_workflow_run(
     except SQLAlchemyError as e:
         db.rollback()
         raise SQLAlchemyError(f"Failed to update workflow run: {str(e)}")
+
+
+def record_workflow_step_results(
+    db: Session, run_id: UUID, step_results: List[Dict[str, Any]]
+) -> List[WorkflowStepRun]:
+    """
+    Persist the step results of a finished workflow run as step runs.
+
+    This function:
+    1. Creates one step run per executed step
+    2. Stores each step's resource usage
+    3. Skips results without a valid MCP ID
+    4. Manages transactions
+
+    Args:
+        db: Database session
+        run_id: Workflow run ID
+        step_results: Step result dicts as produced by the workflow engine
+
+    Returns:
+        List[WorkflowStepRun]: The created step runs
+
+    Raises:
+        SQLAlchemyError: If database operation fails
+    """
+    now = datetime.utcnow()
+    step_runs = []
+    for result in step_results:
+        try:
+            mcp_id = UUID(str(result.get("mcp_id")))
+        except ValueError:
+            continue
+        outputs = result.get("outputs_generated")
+        if outputs is not None and not isinstance(outputs, dict):
+            outputs = {"result": outputs}
+        step_runs.append(
+            WorkflowStepRun(
+                workflow_run_id=run_id,
+                step_id=result.get("step_id"),
+                mcp_id=mcp_id,
+                status=result.get("status"),
+                inputs=result.get("inputs_used") or {},
+                outputs=outputs,
+                error=result.get("error"),
+                started_at=_parse_timestamp(result.get("started_at")),
+                finished_at=_parse_timestamp(result.get("finished_at")),
+                retry_count=0,
+                created_at=now,
+                updated_at=now,
+                resource_usage=result.get("resource_usage") or {},
+            )
+        )
+    try:
+        db.add_all(step_runs)
+        db.commit()
+        return step_runs
+    except SQLAlchemyError as e:
+        db.rollback()
+        raise SQLAlchemyError(f"Failed to record step runs: {str(e)}")
+
+
+def get_workflow_run_resource_usage(db: Session, run_id: UUID) -> Dict[str, Any]:
+    """
+    Get the resource usage of a workflow run.
+
+    Args:
+        db: Database session
+        run_id: Workflow run ID
+
+    Returns:
+        Dict[str, Any]: ``steps`` maps step IDs to their stored usage, ``total`` is the
+        aggregate over all steps of the run
+    """
+    rows = (
+        db.query(WorkflowStepRun.step_id, WorkflowStepRun.resource_usage)
+        .filter(WorkflowStepRun.workflow_run_id == run_id)
+        .all()
+    )
+    steps = {step_id: usage or {} for step_id, usage in rows}
+    return {"steps": steps, "total": aggregate_usage(steps.values())}
+
+
+def _parse_timestamp(value: Any) -> Optional[datetime]:
+    if isinstance(value, datetime) or value is None:
+        return value
+    try:
+        return datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
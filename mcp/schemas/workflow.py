@@ -286,6 +286,10 @@ class WorkflowExecutionResult(BaseModel):
     error_message: Optional[str] = Field(
         default=None, description="Error message if the workflow execution failed."
     )
+    resource_usage: Optional[Dict[str, Any]] = Field(
+        default=None,
+        description="Resources used by the sandboxed runs of all steps (CPU and wall time, peak RSS, block I/O, exit reasons).",
+    )
 
 
 # It would be good to also define a StepExecutionResult model:
@@ -0,0 +1,358 @@
+"""
+Runner for Python script MCPs using the pipe I/O protocol.
+
+Instead of passing an input and an output file path to the script, the runner reads the
+inputs as one length-prefixed frame from stdin, calls the script's
+``execute_mcp(inputs)`` function and writes the result as one frame to the file
+descriptor given by ``--result-fd``. stdout and stderr remain free for the script's logs.
+
+A frame is a 4-byte big-endian payload length followed by the payload, encoded with the
+codec named by ``--codec`` (``json`` or ``msgpack``).
+
+With ``--array-dir DIR`` (array transport), NumPy arrays of at least
+``--array-min-bytes`` in the result are saved as ``.npy`` files in DIR and replaced by
+references (``{"__mcp_array__": {"path": ..., "dtype": ..., "shape": [...]}}``), and
+references in the inputs are opened as read-only memory maps, so arrays move between
+steps without being serialized. Smaller arrays are sent as lists.
+
+With ``--table-dir DIR`` (table transport), pyarrow Tables and pandas DataFrames in the
+result are written once to DIR as an Arrow IPC file (``--table-format arrow``, the
+default) or as Parquet (``--table-format parquet``) and replaced by references
+(``{"__mcp_table__": {"path": ..., "format": ..., "num_rows": N, "schema": {...}}}``);
+references in the inputs are opened as memory-mapped pyarrow Tables.
+
+This file is executed in the sandbox and must only depend on the standard library
+(msgpack, numpy and pyarrow are imported only when needed); it keeps its imports minimal because they
+are paid on every run.
+
+Usage:
+    python script_runner.py <script.py> --result-fd N [--codec json|msgpack]
+        [--array-dir DIR [--array-min-bytes N]] [--table-dir DIR [--table-format arrow|parquet]]
+"""
+
+import json
+import os
+import struct
+import sys
+
+_HEADER = struct.Struct(">I")
+CODECS = ("json", "msgpack")
+ARRAY_REF_KEY = "__mcp_array__"
+TABLE_REF_KEY = "__mcp_table__"
+TABLE_FORMATS = ("arrow", "parquet")
+
+# Tables opened from input references, by id: (table, reference); returning one of them
+# unchanged publishes the existing file again instead of a copy
+_opened_tables = {}
+
+
+def encode_payload(obj, codec: str = "json") -> bytes:
+    if codec == "msgpack":
+        import msgpack
+
+        return msgpack.packb(obj, use_bin_type=True)
+    return json.dumps(obj, default=_json_default).encode("utf-8")
+
+
+def _json_default(value):
+    # NumPy arrays and scalars become lists and Python numbers; anything else its str()
+    tolist = getattr(value, "tolist", None)
+    if callable(tolist):
+        return tolist()
+    return str(value)
+
+
+def decode_payload(payload: bytes, codec: str = "json"):
+    if codec == "msgpack":
+        import msgpack
+
+        return msgpack.unpackb(payload, raw=False)
+    return json.loads(payload)
+
+
+def encode_frame(obj, codec: str = "json") -> bytes:
+    """Encodes ``obj`` as a length-prefixed frame."""
+    payload = encode_payload(obj, codec)
+    return _HEADER.pack(len(payload)) + payload
+
+
+def decode_frame(data: bytes, codec: str = "json"):
+    """Decodes a complete frame; raises ValueError if it is truncated."""
+    if len(data) < _HEADER.size:
+        raise ValueError("truncated frame header")
+    (length,) = _HEADER.unpack_from(data)
+    payload = data[_HEADER.size:_HEADER.size + length]
+    if len(payload) != length:
+        raise ValueError(f"truncated frame: expected {length} bytes, got {len(payload)}")
+    return decode_payload(payload, codec)
+
+
+def _read_exact(stream, size: int) -> bytes:
+    chunks, remaining = [], size
+    while remaining:
+        chunk = stream.read(remaining)
+        if not chunk:
+            raise ValueError(f"unexpected end of stream ({size - remaining}/{size} bytes)")
+        chunks.append(chunk)
+        remaining -= len(chunk)
+    return b"".join(chunks)
+
+
+def read_frame(stream, codec: str = "json"):
+    """Reads one frame from a binary stream."""
+    (length,) = _HEADER.unpack(_read_exact(stream, _HEADER.size))
+    return decode_payload(_read_exact(stream, length), codec)
+
+
+def is_array_ref(value) -> bool:
+    return isinstance(value, dict) and len(value) == 1 and ARRAY_REF_KEY in value
+
+
+def map_values(obj, convert):
+    """Applies ``convert`` to every value nested in dicts and lists (bottom-up copy)."""
+    converted = convert(obj)
+    if converted is not obj:
+        return converted
+    if isinstance(obj, dict):
+        return {key: map_values(value, convert) for key, value in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [map_values(value, convert) for value in obj]
+    return obj
+
+
+def open_array_refs(obj):
+    """Replaces array references with read-only memory maps of their ``.npy`` files."""
+
+    def convert(value):
+        if is_array_ref(value):
+            import numpy
+
+            return numpy.load(value[ARRAY_REF_KEY]["path"], mmap_mode="r")
+        return value
+
+    return map_values(obj, convert)
+
+
+def publish_arrays(obj, array_dir: str, min_bytes: int):
+    """Replaces NumPy arrays with references to ``.npy`` files in ``array_dir``."""
+    numpy = sys.modules.get("numpy")
+    if numpy is None:  # the script never imported numpy, so there are no arrays
+        return obj
+    array_dir = os.path.abspath(array_dir)
+
+    def convert(value):
+        if not isinstance(value, numpy.ndarray):
+            return value
+        if value.dtype.hasobject or value.nbytes < min_bytes:
+            return value.tolist()
+        path = getattr(value, "filename", None)
+        if not (path and os.path.dirname(path) == array_dir and _is_whole_file(value)):
+            import uuid
+
+            path = os.path.join(array_dir, f"{uuid.uuid4().hex}.npy")
+            numpy.save(path, value, allow_pickle=False)
+        # else: an input array passed through unchanged, already published
+        return {ARRAY_REF_KEY: {"path": path, "dtype": value.dtype.str, "shape": list(value.shape)}}
+
+    return map_values(obj, convert)
+
+
+def _is_whole_file(array) -> bool:
+    # A memory map of a complete .npy file, not a view into part of it
+    base = array
+    while getattr(base, "base", None) is not None and hasattr(base.base, "shape"):
+        base = base.base
+    return array.shape == base.shape and array.dtype == base.dtype and array.flags.c_contiguous
+
+
+def is_table_ref(value) -> bool:
+    return isinstance(value, dict) and len(value) == 1 and TABLE_REF_KEY in value
+
+
+def read_table(path: str, table_format: str = "arrow"):
+    """Reads a published table through a memory map of its file."""
+    import pyarrow
+
+    if table_format == "parquet":
+        import pyarrow.parquet
+
+        return pyarrow.parquet.read_table(path, memory_map=True)
+    import pyarrow.ipc
+
+    return pyarrow.ipc.open_file(pyarrow.memory_map(path, "r")).read_all()
+
+
+def write_table(table, path: str, table_format: str = "arrow") -> None:
+    import pyarrow
+
+    if table_format == "parquet":
+        import pyarrow.parquet
+
+        pyarrow.parquet.write_table(table, path)
+        return
+    import pyarrow.ipc
+
+    # Uncompressed IPC file: readers map the buffers instead of decoding them
+    with pyarrow.OSFile(path, "wb") as sink, pyarrow.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+
+
+def open_table_refs(obj):
+    """Replaces table references with pyarrow Tables backed by memory maps of their files."""
+
+    def convert(value):
+        if is_table_ref(value):
+            ref = value[TABLE_REF_KEY]
+            table = read_table(ref["path"], ref.get("format", "arrow"))
+            _opened_tables[id(table)] = (table, value)
+            return table
+        return value
+
+    return map_values(obj, convert)
+
+
+def table_schema(table) -> dict:
+    """Column names and Arrow type names of a pyarrow Table."""
+    return {field.name: str(field.type) for field in table.schema}
+
+
+def publish_tables(obj, table_dir: str, table_format: str = "arrow"):
+    """Replaces pyarrow Tables and pandas DataFrames with references to files in ``table_dir``."""
+    pyarrow = sys.modules.get("pyarrow")
+    pandas = sys.modules.get("pandas")
+    if pyarrow is None and pandas is None:  # the script created no tables
+        return obj
+    table_dir = os.path.abspath(table_dir)
+
+    def convert(value):
+        if pandas is not None and isinstance(value, pandas.DataFrame):
+            value = _table_from_pandas(value)
+        elif pyarrow is None or not isinstance(value, pyarrow.Table):
+            return value
+        opened = _opened_tables.get(id(value))
+        if opened is not None and opened[0] is value:
+            return opened[1]
+        import uuid
+
+        path = os.path.join(table_dir, f"{uuid.uuid4().hex}.{table_format}")
+        write_table(value, path, table_format)
+        return {
+            TABLE_REF_KEY: {
+                "path": path,
+                "format": table_format,
+                "num_rows": value.num_rows,
+                "schema": table_schema(value),
+            }
+        }
+
+    return map_values(obj, convert)
+
+
+def _table_from_pandas(frame):
+    import pyarrow
+
+    return pyarrow.Table.from_pandas(frame, preserve_index=False)
+
+
+def _normalize_result(value) -> dict:
+    # Scripts may return the full result envelope or just the result value
+    if isinstance(value, dict) and "success" in value:
+        return {
+            "success": bool(value.get("success")),
+            "result": value.get("result"),
+            "error": value.get("error"),
+        }
+    return {"success": True, "result": value, "error": None}
+
+
+def _parse_args(argv):
+    # argparse is not used: its import alone costs more than a warm fork-server run
+    usage = (
+        "usage: script_runner.py <script.py> --result-fd N [--codec json|msgpack]"
+        " [--array-dir DIR [--array-min-bytes N]] [--table-dir DIR [--table-format arrow|parquet]]"
+    )
+    options = {
+        "--result-fd": None,
+        "--codec": "json",
+        "--array-dir": None,
+        "--array-min-bytes": "0",
+        "--table-dir": None,
+        "--table-format": "arrow",
+    }
+    positional = []
+    args = iter(argv)
+    for arg in args:
+        if arg in options:
+            options[arg] = next(args, None)
+        else:
+            positional.append(arg)
+    if (
+        len(positional) != 1
+        or options["--result-fd"] is None
+        or options["--codec"] not in CODECS
+        or options["--table-format"] not in TABLE_FORMATS
+    ):
+        print(usage, file=sys.stderr)
+        sys.exit(2)
+    return (
+        positional[0],
+        int(options["--result-fd"]),
+        options["--codec"],
+        options["--array-dir"],
+        int(options["--array-min-bytes"]),
+        options["--table-dir"],
+        options["--table-format"],
+    )
+
+
+def main() -> int:
+    script, result_fd, codec, array_dir, array_min_bytes, table_dir, table_format = _parse_args(
+        sys.argv[1:]
+    )
+    script = os.path.abspath(script)
+    # Imports in the script resolve relative to the script, as with "python script.py"
+    sys.path[0] = os.path.dirname(script)
+    sys.argv = [script]
+
+    exit_code = 0
+    try:
+        inputs = read_frame(sys.stdin.buffer, codec)
+        if array_dir:
+            inputs = open_array_refs(inputs)
+        if table_dir:
+            inputs = open_table_refs(inputs)
+        import runpy
+
+        namespace = runpy.run_path(script, run_name="__mcp_script__")
+        execute = namespace.get("execute_mcp")
+        if not callable(execute):
+            raise AttributeError(f"{script} does not define execute_mcp(inputs)")
+        result = _normalize_result(execute(inputs))
+        if array_dir:
+            result["result"] = publish_arrays(result["result"], array_dir, array_min_bytes)
+        if table_dir:
+            result["result"] = publish_tables(result["result"], table_dir, table_format)
+    except SystemExit:
+        raise
+    except BaseException as e:
+        import traceback
+
+        traceback.print_exc()
+        result = {"success": False, "result": None, "error": f"{type(e).__name__}: {e}"}
+        exit_code = 1
+
+    try:
+        frame = encode_frame(result, codec)
+    except Exception as e:
+        frame = encode_frame(
+            {"success": False, "result": None, "error": f"Result is not serializable: {e}"},
+            codec,
+        )
+        exit_code = 1
+    with os.fdopen(result_fd, "wb") as out:
+        out.write(frame)
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
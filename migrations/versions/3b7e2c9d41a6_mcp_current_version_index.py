@@ -0,0 +1,56 @@
+"""Index latest-version lookups and backfill mcps.current_version_id
+
+Revision ID: 3b7e2c9d41a6
+Revises: 999999999998
+Create Date: 2026-10-18
+
+This migration:
+1. Adds a composite index on mcp_versions (mcp_id, created_at) so the latest version
+   of an MCP is a single index lookup
+2. Backfills mcps.current_version_id with each MCP's most recently created version
+3. Adds the foreign key from mcps.current_version_id to mcp_versions.id
+"""
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "3b7e2c9d41a6"
+down_revision = "999999999998"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index(
+        "ix_mcp_versions_mcp_id_created_at",
+        "mcp_versions",
+        ["mcp_id", "created_at"],
+        unique=False,
+    )
+    op.execute(
+        """
+        UPDATE mcps
+        SET current_version_id = (
+            SELECT v.id
+            FROM mcp_versions v
+            WHERE v.mcp_id = mcps.id
+            ORDER BY v.created_at DESC, v.id DESC
+            LIMIT 1
+        )
+        WHERE current_version_id IS NULL
+        """
+    )
+    # Batch mode, because SQLite cannot add a constraint with ALTER TABLE
+    with op.batch_alter_table("mcps") as batch_op:
+        batch_op.create_foreign_key(
+            "fk_mcps_current_version_id",
+            "mcp_versions",
+            ["current_version_id"],
+            ["id"],
+        )
+
+
+def downgrade():
+    with op.batch_alter_table("mcps") as batch_op:
+        batch_op.drop_constraint("fk_mcps_current_version_id", type_="foreignkey")
+    op.drop_index("ix_mcp_versions_mcp_id_created_at", table_name="mcp_versions")
@@ -0,0 +1,136 @@
+"""
+Embedding Backend Benchmark Script
+
+Compares the embedding backends (PyTorch SentenceTransformer vs. quantized ONNX) on:
+1. Model load time and resident memory (RSS) after loading
+2. Single-text encode latency (p50 / p95), as seen by MCP creation and search
+3. Batch encode throughput, as seen by bulk imports and re-embedding
+4. Peak RSS of the whole run
+
+Each backend runs in its own Python process so their memory usage does not overlap.
+
+Usage:
+    python scripts/benchmark_embeddings.py [--backends sentence_transformers onnx] [--runs 200]
+"""
+
+import argparse
+import json
+import logging
+import resource
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+# Add the project root to the Python path
+project_root = str(Path(__file__).parent.parent)
+sys.path.append(project_root)
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+SAMPLE_TEXTS = [
+    "CSV to JSON converter converts tabular files into JSON documents csv json data",
+    "Summarise a support ticket and suggest a reply llm support",
+    "Jupyter notebook computing monthly revenue by region finance reporting",
+    "Weather lookup returns the forecast for a city api weather",
+]
+
+
+def _rss_mb() -> float:
+    import psutil
+
+    return psutil.Process().memory_info().rss / (1024 * 1024)
+
+
+def run_backend(backend: str, runs: int, batch_size: int) -> dict:
+    """Benchmarks one backend in the current process."""
+    from mcp.config.settings import settings
+    from mcp.core.embedding_backends import OnnxEmbeddingModel, _load_sentence_transformer
+
+    rss_before = _rss_mb()
+    started = time.perf_counter()
+    if backend == "onnx":
+        model = OnnxEmbeddingModel(
+            settings.embedding.onnx_model_dir,
+            model_file=settings.embedding.onnx_model_file,
+            num_threads=settings.embedding.onnx_threads,
+        )
+    else:
+        model = _load_sentence_transformer(settings.embedding.model_name)
+    load_seconds = time.perf_counter() - started
+    rss_loaded = _rss_mb()
+
+    for text in SAMPLE_TEXTS:  # warm-up
+        model.encode(text)
+
+    latencies = []
+    for i in range(runs):
+        text = SAMPLE_TEXTS[i % len(SAMPLE_TEXTS)]
+        started = time.perf_counter()
+        model.encode(text)
+        latencies.append((time.perf_counter() - started) * 1000)
+    latencies.sort()
+
+    batch = [SAMPLE_TEXTS[i % len(SAMPLE_TEXTS)] for i in range(batch_size * 4)]
+    started = time.perf_counter()
+    model.encode(batch, batch_size=batch_size)
+    batch_seconds = time.perf_counter() - started
+
+    # ru_maxrss is reported in kilobytes on Linux
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return {
+        "backend": backend,
+        "load_seconds": round(load_seconds, 3),
+        "rss_model_mb": round(rss_loaded - rss_before, 1),
+        "latency_p50_ms": round(statistics.median(latencies), 3),
+        "latency_p95_ms": round(latencies[int(len(latencies) * 0.95) - 1], 3),
+        "batch_texts_per_second": round(len(batch) / batch_seconds, 1),
+        "peak_rss_mb": round(peak_rss, 1),
+    }
+
+
+def main():
+    """Main function to benchmark embedding backends."""
+    parser = argparse.ArgumentParser(description="Benchmark MCP embedding backends.")
+    parser.add_argument(
+        "--backends", nargs="+", default=["sentence_transformers", "onnx"],
+        choices=["sentence_transformers", "onnx"],
+    )
+    parser.add_argument("--runs", type=int, default=200, help="Single-text encodes per backend")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_backend(args.worker, args.runs, args.batch_size)))
+        return
+
+    results = []
+    for backend in args.backends:
+        logger.info(f"Benchmarking {backend}...")
+        proc = subprocess.run(
+            [
+                sys.executable, __file__, "--worker", backend,
+                "--runs", str(args.runs), "--batch-size", str(args.batch_size),
+            ],
+            capture_output=True,
+            text=True,
+        )
+        if proc.returncode != 0:
+            logger.error(f"{backend} benchmark failed:\n{proc.stderr.strip()}")
+            continue
+        results.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+
+    if not results:
+        sys.exit(1)
+    columns = list(results[0].keys())
+    widths = {c: max(len(c), *(len(str(r[c])) for r in results)) for c in columns}
+    print("  ".join(c.ljust(widths[c]) for c in columns))
+    for result in results:
+        print("  ".join(str(result[c]).ljust(widths[c]) for c in columns))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""
+LLM Client Concurrency Benchmark Script
+
+Runs batches of concurrent ClaudeLLM calls against a local mock of the messages API
+that answers after a fixed delay (the model latency), and compares:
+1. blocking: the previous client, a blocking requests.post per call inside the coroutine
+2. pooled: the shared httpx.AsyncClient with keep-alive (mcp/core/http_client.py)
+
+For each concurrency level it reports the wall time of the batch, calls per second and
+the new TCP connections the mock server accepted. With the blocking client the calls
+run one after another; with the pooled client the batch takes about one model latency.
+
+Usage:
+    python scripts/benchmark_llm_client.py [--concurrency 1 4 16 64] [--latency-ms 200]
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+# Add the project root to the Python path
+project_root = str(Path(__file__).parent.parent)
+sys.path.append(project_root)
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class MockMessagesServer(ThreadingHTTPServer):
+    """Answers every POST with a fixed messages API response after ``latency`` seconds."""
+
+    daemon_threads = True
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.connections = 0
+        self._lock = threading.Lock()
+        super().__init__(("127.0.0.1", 0), _MockHandler)
+
+    def get_request(self):
+        with self._lock:
+            self.connections += 1
+        return super().get_request()
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}/v1/messages"
+
+
+class _MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("content-length", 0)))
+        time.sleep(self.server.latency)
+        body = json.dumps({"content": [{"type": "text", "text": "ok"}]}).encode("utf-8")
+        self.send_response(200)
+        self.send_header("content-type", "application/json")
+        self.send_header("content-length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+async def _blocking_call(url: str, messages) -> str:
+    import requests
+
+    # The previous implementation: a blocking request without a session
+    response = requests.post(url, json={"messages": messages})
+    return response.json()["content"][0]["text"]
+
+
+async def run_batch(client: str, llm, server: MockMessagesServer, concurrency: int) -> dict:
+    messages = [{"role": "user", "content": "benchmark"}]
+    connections = server.connections
+    started = time.perf_counter()
+    if client == "blocking":
+        await asyncio.gather(*(_blocking_call(server.url, messages) for _ in range(concurrency)))
+    else:
+        await asyncio.gather(*(llm.call(messages) for _ in range(concurrency)))
+    seconds = time.perf_counter() - started
+    return {
+        "client": client,
+        "concurrency": concurrency,
+        "seconds": round(seconds, 3),
+        "calls_per_second": round(concurrency / seconds, 1),
+        "new_connections": server.connections - connections,
+    }
+
+
+async def run(levels, latency: float) -> list:
+    from mcp.config.settings import settings
+    from mcp.core.http_client import close_http_clients
+    from mcp.core.llm_prompt import ClaudeLLM
+
+    server = MockMessagesServer(latency)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    settings.llm.api_url = server.url
+    os.environ.setdefault("ANTHROPIC_API_KEY", "benchmark")
+    try:
+        llm = ClaudeLLM(model_name="claude-3-haiku-20240229", max_tokens=10)
+        results = []
+        for client in ("blocking", "pooled"):
+            await run_batch(client, llm, server, 1)  # warm-up
+            for concurrency in levels:
+                logger.info(f"{client}: {concurrency} concurrent calls...")
+                results.append(await run_batch(client, llm, server, concurrency))
+        return results
+    finally:
+        await close_http_clients()
+        server.shutdown()
+
+
+def main():
+    """Main function to benchmark the LLM HTTP clients."""
+    parser = argparse.ArgumentParser(description="Benchmark concurrent LLM calls against a mock API.")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--latency-ms", type=float, default=200.0, help="Mock model latency per call")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args.concurrency, args.latency_ms / 1000))
+    columns = list(results[0].keys())
+    widths = {c: max(len(c), *(len(str(r[c])) for r in results)) for c in columns}
+    print("  ".join(c.ljust(widths[c]) for c in columns))
+    for result in results:
+        print("  ".join(str(result[c]).ljust(widths[c]) for c in columns))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+ONNX Embedding Model Export Script
+
+Exports the SentenceTransformer model used for MCP embeddings to ONNX, writes a
+dynamically int8-quantized copy for CPU inference and checks that the quantized model
+reproduces the original embeddings within tolerance.
+
+The resulting directory is what EMBEDDING_ONNX_MODEL_DIR should point to:
+    model.onnx             - fp32 transformer graph
+    model_quantized.onnx   - int8-quantized graph (EMBEDDING_ONNX_MODEL_FILE)
+    tokenizer.json         - fast tokenizer
+    export_manifest.json   - model name, dimension and max sequence length
+
+Usage:
+    python scripts/export_onnx_embedding_model.py [--model all-MiniLM-L6-v2] [--output-dir DIR]
+"""
+
+import argparse
+import json
+import logging
+import sys
+from pathlib import Path
+
+# Add the project root to the Python path
+project_root = str(Path(__file__).parent.parent)
+sys.path.append(project_root)
+
+from mcp.config.settings import settings
+from mcp.core.embedding_backends import (OnnxEmbeddingModel, quantize_onnx_model,
+                                         verify_embedding_parity)
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def export_transformer(model, output_dir: Path) -> Path:
+    """Exports the transformer module of a SentenceTransformer to ONNX."""
+    import torch
+
+    transformer = model[0].auto_model.eval()
+    tokenizer = model.tokenizer
+
+    class _LastHiddenState(torch.nn.Module):
+        def __init__(self, module):
+            super().__init__()
+            self.module = module
+
+        def forward(self, input_ids, attention_mask, token_type_ids):
+            return self.module(
+                input_ids=input_ids,
+                attention_mask=attention_mask,
+                token_type_ids=token_type_ids,
+            ).last_hidden_state
+
+    sample = tokenizer(["export sample text"], return_tensors="pt")
+    token_type_ids = sample.get("token_type_ids", torch.zeros_like(sample["input_ids"]))
+    onnx_path = output_dir / "model.onnx"
+    dynamic_axes = {
+        "input_ids": {0: "batch", 1: "sequence"},
+        "attention_mask": {0: "batch", 1: "sequence"},
+        "token_type_ids": {0: "batch", 1: "sequence"},
+        "last_hidden_state": {0: "batch", 1: "sequence"},
+    }
+    with torch.no_grad():
+        torch.onnx.export(
+            _LastHiddenState(transformer),
+            (sample["input_ids"], sample["attention_mask"], token_type_ids),
+            str(onnx_path),
+            input_names=["input_ids", "attention_mask", "token_type_ids"],
+            output_names=["last_hidden_state"],
+            dynamic_axes=dynamic_axes,
+            opset_version=14,
+            dynamo=False,
+        )
+    tokenizer.save_pretrained(str(output_dir))
+    return onnx_path
+
+
+def main():
+    """Main function to export, quantize and verify the ONNX embedding model."""
+    parser = argparse.ArgumentParser(description="Export the MCP embedding model to ONNX.")
+    parser.add_argument("--model", default=settings.embedding.model_name)
+    parser.add_argument("--output-dir", default=settings.embedding.onnx_model_dir)
+    parser.add_argument("--tolerance", type=float, default=settings.embedding.parity_tolerance)
+    args = parser.parse_args()
+
+    from sentence_transformers import SentenceTransformer
+
+    output_dir = Path(args.output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    logger.info(f"Loading {args.model}...")
+    reference = SentenceTransformer(args.model)
+
+    logger.info("Exporting transformer to ONNX...")
+    onnx_path = export_transformer(reference, output_dir)
+
+    logger.info("Quantizing weights to int8...")
+    quantized_path = output_dir / "model_quantized.onnx"
+    quantize_onnx_model(str(onnx_path), str(quantized_path))
+
+    manifest = {
+        "model_name": args.model,
+        "dimension": reference.get_sentence_embedding_dimension(),
+        "max_seq_length": reference.max_seq_length,
+        "pad_token": reference.tokenizer.pad_token,
+    }
+    with open(output_dir / "export_manifest.json", "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+
+    failed = False
+    for model_file in ("model.onnx", "model_quantized.onnx"):
+        candidate = OnnxEmbeddingModel(str(output_dir), model_file=model_file)
+        report = verify_embedding_parity(reference, candidate, tolerance=args.tolerance)
+        logger.info(
+            f"{model_file}: min cosine {report.min_cosine:.5f}, mean cosine "
+            f"{report.mean_cosine:.5f}, max abs diff {report.max_abs_diff:.5f} -> "
+            f"{'OK' if report.passed else 'FAILED'}"
+        )
+        failed = failed or not report.passed
+
+    if failed:
+        logger.error("ONNX model does not match the reference embeddings within tolerance.")
+        sys.exit(1)
+    logger.info(f"ONNX embedding model written to {output_dir}")
+
+
+if __name__ == "__main__":
+    main()
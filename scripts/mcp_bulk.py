@@ -0,0 +1,89 @@
+"""
+MCP Bulk Import/Export Script
+
+Moves the MCP catalog between environments as NDJSON (one MCP with its current version
+per line). MCP ids are preserved, and MCPs that already exist in the target database
+are skipped, so an interrupted import can be re-run with the same file.
+
+Usage:
+    python scripts/mcp_bulk.py export [--output mcps.ndjson] [--batch-size 1000]
+    python scripts/mcp_bulk.py import mcps.ndjson [--batch-size 500] [--no-embed]
+"""
+
+import argparse
+import logging
+import sys
+import time
+from pathlib import Path
+
+# Add the project root to the Python path
+project_root = str(Path(__file__).parent.parent)
+sys.path.append(project_root)
+
+from mcp.core.bulk_io import DEFAULT_BATCH_SIZE, export_mcps_ndjson, import_mcps_ndjson
+from mcp.db.session import SessionLocal
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def export_command(args) -> None:
+    out = open(args.output, "w", encoding="utf-8") if args.output != "-" else sys.stdout
+    count = 0
+    db = SessionLocal()
+    try:
+        for line in export_mcps_ndjson(db, batch_size=args.batch_size):
+            out.write(line)
+            count += 1
+    finally:
+        db.close()
+        if out is not sys.stdout:
+            out.close()
+    logger.info(f"Exported {count} MCPs.")
+
+
+def import_command(args) -> None:
+    started = time.perf_counter()
+    db = SessionLocal()
+    try:
+        with open(args.input, "r", encoding="utf-8") as f:
+            result = import_mcps_ndjson(
+                db, f, batch_size=args.batch_size, embed=not args.no_embed
+            )
+    finally:
+        db.close()
+    logger.info(
+        f"Imported {result.imported}, skipped {result.skipped}, failed {result.failed} "
+        f"in {time.perf_counter() - started:.1f}s."
+    )
+    for error in result.errors:
+        logger.error(f"Line {error['line']}: {error['error']}")
+    if result.failed:
+        sys.exit(1)
+
+
+def main():
+    """Main function to import or export MCP definitions."""
+    parser = argparse.ArgumentParser(description="Bulk import/export of MCP definitions (NDJSON).")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = subparsers.add_parser("export", help="Write all MCPs as NDJSON")
+    export_parser.add_argument("--output", default="-", help="Output file (default: stdout)")
+    export_parser.add_argument("--batch-size", type=int, default=1000)
+    export_parser.set_defaults(func=export_command)
+
+    import_parser = subparsers.add_parser("import", help="Load MCPs from an NDJSON file")
+    import_parser.add_argument("input", help="NDJSON file produced by 'export'")
+    import_parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    import_parser.add_argument(
+        "--no-embed", action="store_true",
+        help="Skip embeddings (run scripts/reembed_mcps.py --only-missing afterwards)",
+    )
+    import_parser.set_defaults(func=import_command)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
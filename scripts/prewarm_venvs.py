@@ -0,0 +1,98 @@
+"""
+Script Virtualenv Prewarm Script
+
+Builds the cached virtualenvs of all Python script MCPs (current versions) ahead of their
+first execution, e.g. after a deployment or after the cache directory was cleared. Builds
+are deduplicated by requirements, so MCPs with identical requirements share one build.
+
+Requires SANDBOX_VENV_ENABLED=true; SANDBOX_VENV_WHEELHOUSE selects an offline wheelhouse.
+
+Usage:
+    python scripts/prewarm_venvs.py [--requirements numpy==1.26.4 ...]
+    python scripts/prewarm_venvs.py --list
+    python scripts/prewarm_venvs.py --evict-only
+"""
+
+import argparse
+import logging
+import sys
+import time
+from pathlib import Path
+
+# Add the project root to the Python path
+project_root = str(Path(__file__).parent.parent)
+sys.path.append(project_root)
+
+from mcp.core.registry import get_latest_mcp_versions
+from mcp.core.types import MCPType
+from mcp.core.venv_cache import VenvBuildError, get_venv_cache
+from mcp.db.models import MCP
+from mcp.db.session import SessionLocal
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def collect_requirements() -> list:
+    """Distinct requirement sets of the current versions of all Python script MCPs."""
+    db = SessionLocal()
+    try:
+        mcps = db.query(MCP).filter(MCP.type == MCPType.PYTHON_SCRIPT.value).all()
+        versions = get_latest_mcp_versions(db, mcps)
+    finally:
+        db.close()
+    requirement_sets = {}
+    for version in versions.values():
+        config = version.config_snapshot or {}
+        if config.get("virtual_env", True) and config.get("requirements"):
+            requirement_sets[tuple(sorted(config["requirements"]))] = config["requirements"]
+    return list(requirement_sets.values())
+
+
+def main():
+    """Main function to build, list or evict script virtualenvs."""
+    parser = argparse.ArgumentParser(description="Prewarm the virtualenvs of Python script MCPs.")
+    parser.add_argument(
+        "--requirements", nargs="+", help="Build only this requirement set instead of all MCPs'"
+    )
+    parser.add_argument("--list", action="store_true", help="List cached environments and exit")
+    parser.add_argument(
+        "--evict-only", action="store_true", help="Only enforce the disk budget"
+    )
+    args = parser.parse_args()
+
+    cache = get_venv_cache()
+    if cache is None:
+        logger.error("Script virtualenvs are disabled (set SANDBOX_VENV_ENABLED=true).")
+        sys.exit(1)
+
+    if args.list:
+        for meta in cache.list_environments():
+            print(
+                f"{meta['key']}  {meta.get('size_bytes', 0) / 1e6:8.1f} MB  "
+                f"{' '.join(meta.get('requirements', []))}"
+            )
+        return
+    if args.evict_only:
+        evicted = cache.evict()
+        logger.info(f"Evicted {len(evicted)} environments.")
+        return
+
+    requirement_sets = [args.requirements] if args.requirements else collect_requirements()
+    logger.info(f"Prewarming {len(requirement_sets)} environments...")
+    started = time.perf_counter()
+    failures = 0
+    for requirements, future in [(r, cache.prewarm(r)) for r in requirement_sets]:
+        try:
+            logger.info(f"Ready: {future.result()} ({' '.join(requirements)})")
+        except VenvBuildError as e:
+            failures += 1
+            logger.error(f"Failed: {' '.join(requirements)}: {e}")
+    cache.shutdown()
+    logger.info(f"Done in {time.perf_counter() - started:.1f}s ({failures} failed).")
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
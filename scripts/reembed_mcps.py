@@ -0,0 +1,57 @@
+"""
+MCP Re-embedding Script
+
+Recomputes the stored embeddings of all MCPs in batches. Use it to backfill embeddings
+for MCPs created while the embedding model was unavailable, or after switching to a
+different embedding model. Running API workers pick up the new embeddings when their
+vector indexes resync with the database.
+
+Usage:
+    python scripts/reembed_mcps.py [--batch-size 256] [--only-missing]
+"""
+
+import argparse
+import logging
+import sys
+import time
+from pathlib import Path
+
+# Add the project root to the Python path
+project_root = str(Path(__file__).parent.parent)
+sys.path.append(project_root)
+
+from mcp.core import registry
+from mcp.db.session import SessionLocal
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def main():
+    """Main function to re-embed MCP definitions."""
+    parser = argparse.ArgumentParser(description="Recompute MCP embeddings in batches.")
+    parser.add_argument(
+        "--batch-size", type=int, default=256, help="MCPs encoded and committed per batch"
+    )
+    parser.add_argument(
+        "--only-missing", action="store_true", help="Only backfill MCPs without an embedding"
+    )
+    args = parser.parse_args()
+
+    session = SessionLocal()
+    try:
+        started = time.perf_counter()
+        written = registry.reembed_all_mcps(
+            session, batch_size=args.batch_size, only_missing=args.only_missing
+        )
+        elapsed = time.perf_counter() - started
+        logger.info(f"Re-embedded {written} MCPs in {elapsed:.1f}s.")
+    except Exception as e:
+        logger.error(f"Error re-embedding MCPs: {str(e)}")
+        sys.exit(1)
+    finally:
+        session.close()
+
+
+if __name__ == "__main__":
+    main()
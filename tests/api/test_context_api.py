@@ -1,3 +1,4 @@
+import json
 import os
 import sys
 from unittest.mock import patch
@@ -23,7 +24,7 @@ def mock_search_func():
         return MOCK_SEARCH_RETURN
     return _search
 
-from mcp.api.main import app, get_search_func  # app from your FastAPI application
+from mcp.api.main import app, get_search_func, get_session_factory  # app from your FastAPI application
 # from mcp.core.registry import mcp_server_registry, MCP_REGISTRY_FILE, WORKFLOW_STORAGE_FILE # REMOVE: Old file-based
 from mcp.core.types import MCPType
 from mcp.db.models import EMBEDDING_DIM
@@ -571,6 +572,101 @@ def test_delete_mcp_invalid_jwt(client: TestClient, created_db_mcp: MCPModel):
     assert response.status_code == 401
 
 
+# === POST /context/{mcp_id}/versions Tests ===
+def test_create_mcp_version_becomes_latest(
+    client: TestClient,
+    created_db_mcp: MCPModel,
+    jwt_headers: Dict[str, str],
+    test_db_session: Session,
+):
+    mcp_id = created_db_mcp.id
+    # Resolve once so the latest version is cached before the new version is added
+    assert client.get(f"/context/{mcp_id}", headers=jwt_headers).json()["latest_version_str"] == "0.1.0"
+
+    payload = {
+        "version_str": "0.2.0",
+        "description": "Second version",
+        "config_snapshot": {
+            "name": "Test Python Script MCP for DB Context API",
+            "script_content": "print('v2')",
+        },
+    }
+    response = client.post(f"/context/{mcp_id}/versions", json=payload, headers=jwt_headers)
+
+    assert response.status_code == 201, response.text
+    data = response.json()
+    assert data["latest_version_str"] == "0.2.0"
+    assert data["latest_version_config"]["script_content"] == "print('v2')"
+    assert client.get(f"/context/{mcp_id}", headers=jwt_headers).json()["latest_version_str"] == "0.2.0"
+    listed = client.get("/context", headers=jwt_headers).json()
+    assert [item["latest_version_str"] for item in listed] == ["0.2.0"]
+
+    test_db_session.expire_all()
+    db_mcp = test_db_session.query(MCPModel).filter(MCPModel.id == mcp_id).one()
+    assert db_mcp.current_version.version_str == "0.2.0"
+
+
+def test_create_mcp_version_invalid_config(
+    client: TestClient, created_db_mcp: MCPModel, jwt_headers: Dict[str, str]
+):
+    payload = {"version_str": "0.2.0", "config_snapshot": {"wrong_key": True}}
+    response = client.post(
+        f"/context/{created_db_mcp.id}/versions", json=payload, headers=jwt_headers
+    )
+    assert response.status_code == 400
+    assert "invalid config_snapshot" in response.json()["detail"].lower()
+
+
+def test_create_mcp_version_not_found(client: TestClient, jwt_headers: Dict[str, str]):
+    payload = {"version_str": "1.0.0", "config_snapshot": {"name": "x"}}
+    response = client.post(f"/context/{uuid.uuid4()}/versions", json=payload, headers=jwt_headers)
+    assert response.status_code == 404
+
+
+# === NDJSON import/export Tests ===
+def test_import_then_export_ndjson(
+    client: TestClient, jwt_headers: Dict[str, str], test_db_session: Session
+):
+    lines = [
+        json.dumps(
+            {
+                "name": f"Imported {i}",
+                "type": "python_script",
+                "tags": ["bulk"],
+                "initial_version_str": "1.0.0",
+                "initial_config": {"name": f"Imported {i}", "script_content": "pass"},
+            }
+        )
+        for i in range(3)
+    ]
+    body = "\n".join(lines[:2] + ["{broken"] + lines[2:]) + "\n"
+
+    response = client.post(
+        "/context/import?batch_size=2",
+        content=body,
+        headers={**jwt_headers, "Content-Type": "application/x-ndjson"},
+    )
+
+    assert response.status_code == 200, response.text
+    data = response.json()
+    assert (data["imported"], data["skipped"], data["failed"]) == (3, 0, 1)
+    assert data["errors"][0]["line"] == 3
+    assert test_db_session.query(MCPModel).count() == 3
+
+    app.dependency_overrides[get_session_factory] = lambda: lambda: Session(bind=test_db_session.get_bind())
+    response = client.get("/context/export", headers=jwt_headers)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    exported = [json.loads(line) for line in response.text.splitlines()]
+    assert sorted(record["name"] for record in exported) == ["Imported 0", "Imported 1", "Imported 2"]
+    assert all(record["initial_version_str"] == "1.0.0" for record in exported)
+
+
+def test_import_ndjson_no_jwt(client: TestClient):
+    response = client.post("/context/import", content="")
+    assert response.status_code == 401
+
+
 # === GET /context/search Tests ===
 @pytest.fixture
 def search_client(test_app_client):
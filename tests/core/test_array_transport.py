@@ -0,0 +1,125 @@
+import asyncio
+import os
+import sys
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+
+from mcp.core.array_transport import (ARRAY_REF_KEY, check_array_refs, is_array_ref,
+                                       materialize_array_refs, run_array_dir, summarize_array_refs)
+from mcp.core.python_script import PythonScriptMCP
+from mcp.core.scratch import ScratchManager, scratch_scope
+from mcp.core.types import PythonScriptConfig
+
+pytestmark = pytest.mark.skipif(sys.platform == "win32", reason="sandbox pipes need Unix")
+
+PRODUCER = """
+import numpy as np
+
+def execute_mcp(inputs):
+    return {"big": np.arange(inputs["n"], dtype=np.float64), "small": np.arange(3), "label": "x"}
+"""
+
+CONSUMER = """
+def execute_mcp(inputs):
+    a = inputs["a"]
+    return {"kind": type(a).__name__, "writeable": a.flags.writeable, "sum": float(a.sum()), "same": a}
+"""
+
+
+def _mcp(name: str, source: str, array_transport: bool = True) -> PythonScriptMCP:
+    return PythonScriptMCP(
+        PythonScriptConfig(name=name, script_content=source, array_transport=array_transport)
+    )
+
+
+@pytest.fixture(autouse=True)
+def manager(tmp_path):
+    manager = ScratchManager(base=str(tmp_path), quota_bytes=1024 * 1024 * 1024)
+    with patch("mcp.core.scratch._manager", manager):
+        yield manager
+
+
+def test_arrays_travel_as_memory_mapped_files_within_a_run():
+    producer, consumer = _mcp("producer", PRODUCER), _mcp("consumer", CONSUMER)
+    n = 2_000_000
+
+    async def run():
+        with scratch_scope("run-test"):
+            produced = await producer.execute({"n": n})
+            ref = produced["result"]["big"]
+            consumed = await consumer.execute({"a": ref})
+            return produced, consumed, os.path.exists(ref[ARRAY_REF_KEY]["path"])
+
+    try:
+        produced, consumed, existed = asyncio.run(run())
+    finally:
+        producer.close()
+        consumer.close()
+
+    assert produced["success"] is True, produced
+    result = produced["result"]
+    assert is_array_ref(result["big"]) and existed
+    assert result["big"][ARRAY_REF_KEY]["shape"] == [n]
+    assert result["small"] == [0, 1, 2] and result["label"] == "x"
+
+    assert consumed["success"] is True, consumed
+    assert consumed["result"]["kind"] == "memmap"
+    assert consumed["result"]["writeable"] is False
+    assert consumed["result"]["sum"] == n * (n - 1) / 2
+    # Returning an input array unchanged references the same file
+    assert consumed["result"]["same"] == result["big"]
+    assert not os.path.exists(result["big"][ARRAY_REF_KEY]["path"])
+
+
+def test_outside_a_run_arrays_are_sent_as_lists():
+    producer = _mcp("producer", PRODUCER)
+    try:
+        result = asyncio.run(producer.execute({"n": 4}))
+    finally:
+        producer.close()
+    assert result["result"]["big"] == [0.0, 1.0, 2.0, 3.0]
+
+
+def test_materialize_replaces_refs_with_lists():
+    with scratch_scope("run-test"):
+        path = os.path.join(run_array_dir(), "a.npy")
+        np.save(path, np.arange(6).reshape(2, 3))
+        ref = {ARRAY_REF_KEY: {"path": path, "dtype": "<i8", "shape": [2, 3]}}
+
+        outputs = {"rows": ref, "nested": [ref, 1], "plain": "kept"}
+        assert materialize_array_refs(outputs) == {
+            "rows": [[0, 1, 2], [3, 4, 5]],
+            "nested": [[[0, 1, 2], [3, 4, 5]], 1],
+            "plain": "kept",
+        }
+    plain = {"a": [1, 2]}
+    assert materialize_array_refs(plain) is plain
+
+
+def test_refs_to_files_outside_the_run_are_rejected(tmp_path):
+    outside = str(tmp_path / "secret.npy")
+    np.save(outside, np.arange(3))
+
+    with scratch_scope("run-test"):
+        escape = os.path.join(run_array_dir(), "..", "..", os.path.basename(os.path.dirname(outside)), "secret.npy")
+        for path in (outside, escape, "/etc/passwd", None):
+            ref = {ARRAY_REF_KEY: {"path": path}}
+            with pytest.raises(ValueError, match="not a file of the current run"):
+                materialize_array_refs({"a": ref})
+            with pytest.raises(ValueError, match="not a file of the current run"):
+                check_array_refs([ref])
+    with pytest.raises(ValueError):  # no current run
+        materialize_array_refs({ARRAY_REF_KEY: {"path": outside}})
+
+
+def test_stored_results_keep_dtype_shape_and_size_only():
+    ref = {ARRAY_REF_KEY: {"path": "/scratch/a.npy", "dtype": "<f8", "shape": [2, 3]}}
+    assert summarize_array_refs({"a": ref, "nested": [ref], "plain": 1}) == {
+        "a": {ARRAY_REF_KEY: {"dtype": "<f8", "shape": [2, 3], "nbytes": 48}},
+        "nested": [{ARRAY_REF_KEY: {"dtype": "<f8", "shape": [2, 3], "nbytes": 48}}],
+        "plain": 1,
+    }
+    plain = {"a": [1, 2]}
+    assert summarize_array_refs(plain) is plain
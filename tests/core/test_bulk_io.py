@@ -0,0 +1,118 @@
+import json
+import uuid
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+from sqlalchemy.orm import Session
+
+from mcp.core.bulk_io import export_mcps_ndjson, import_mcps_ndjson
+from mcp.core.lexical_index import LexicalIndex
+from mcp.core.types import MCPType
+from mcp.core.vector_index import VectorIndex
+from mcp.db.models import EMBEDDING_DIM
+from mcp.db.models import MCP as MCPModel
+from mcp.db.models import MCPVersion as MCPVersionModel
+
+
+def _fake_encode(texts, **kwargs):
+    return np.array(
+        [[float(len(t))] + [1.0] * (EMBEDDING_DIM - 1) for t in texts], dtype=np.float32
+    )
+
+
+def _line(name: str, **overrides) -> str:
+    record = {
+        "name": name,
+        "type": MCPType.PYTHON_SCRIPT.value,
+        "description": f"{name} description",
+        "tags": ["bulk"],
+        "initial_version_str": "1.0.0",
+        "initial_config": {"name": name, "script_content": "print('hi')"},
+    }
+    record.update(overrides)
+    return json.dumps(record) + "\n"
+
+
+@pytest.fixture
+def indexes(tmp_path):
+    vector = VectorIndex(str(tmp_path / "index"), dim=EMBEDDING_DIM)
+    lexical = LexicalIndex()
+    with patch("mcp.core.registry.vector_index", vector), patch(
+        "mcp.core.registry.lexical_index", lexical
+    ):
+        yield vector, lexical
+
+
+@patch("mcp.core.registry.embedding_model")
+def test_import_batches_embeddings_and_reports_bad_lines(
+    mock_embedding_model_global, test_db_session: Session, indexes
+):
+    mock_embedding_model_global.encode.side_effect = _fake_encode
+    fixed_id = uuid.uuid4()
+    lines = [_line(f"Bulk {i}") for i in range(5)]
+    lines.insert(2, "not json\n")
+    lines.append(_line("Broken", type="not_a_type"))
+    lines.append(_line("Pinned", id=str(fixed_id)))
+
+    result = import_mcps_ndjson(test_db_session, lines, batch_size=2)
+
+    assert result.imported == 6
+    assert result.failed == 2
+    assert [error["line"] for error in result.errors] == [3, 7]
+    # One model call per batch, never per MCP
+    batch_calls = mock_embedding_model_global.encode.call_args_list
+    assert len(batch_calls) == 3
+    assert all(isinstance(call.args[0], list) for call in batch_calls)
+
+    pinned = test_db_session.get(MCPModel, fixed_id)
+    assert pinned is not None
+    assert pinned.embedding is not None
+    assert pinned.current_version.version_str == "1.0.0"
+    assert pinned.current_version.config_snapshot["script_content"] == "print('hi')"
+    vector, lexical = indexes
+    assert len(vector) == 6
+    assert lexical.exact_name_matches("Pinned") == {fixed_id}
+
+
+def test_import_skips_existing_ids(test_db_session: Session, indexes):
+    fixed_id = uuid.uuid4()
+    line = _line("Once", id=str(fixed_id))
+
+    first = import_mcps_ndjson(test_db_session, [line], embed=False)
+    second = import_mcps_ndjson(test_db_session, [line, line], embed=False)
+
+    assert (first.imported, first.skipped) == (1, 0)
+    assert (second.imported, second.skipped) == (0, 2)
+    assert test_db_session.query(MCPModel).filter(MCPModel.id == fixed_id).count() == 1
+
+
+def test_export_roundtrips_through_import(test_db_session: Session, indexes):
+    import_mcps_ndjson(test_db_session, [_line("Alpha"), _line("Beta")], embed=False)
+    # An MCP created without a current_version pointer still exports its newest version
+    legacy = MCPModel(name="Legacy", type=MCPType.PYTHON_SCRIPT.value, tags=[])
+    test_db_session.add(legacy)
+    test_db_session.flush()
+    test_db_session.add(
+        MCPVersionModel(
+            mcp_id=legacy.id,
+            version="2.0.0",
+            version_str="2.0.0",
+            description="Legacy release",
+            definition={},
+            config_snapshot={"name": "Legacy", "script_content": "pass"},
+        )
+    )
+    test_db_session.commit()
+
+    exported = list(export_mcps_ndjson(test_db_session, batch_size=2))
+    records = {json.loads(line)["name"]: json.loads(line) for line in exported}
+
+    assert set(records) == {"Alpha", "Beta", "Legacy"}
+    assert records["Legacy"]["initial_version_str"] == "2.0.0"
+    assert records["Legacy"]["initial_version_description"] == "Legacy release"
+    assert records["Alpha"]["type"] == MCPType.PYTHON_SCRIPT.value
+
+    # Re-importing the export into the same database is a no-op
+    result = import_mcps_ndjson(test_db_session, exported, embed=False)
+    assert (result.imported, result.skipped, result.failed) == (0, 3, 0)
@@ -0,0 +1,148 @@
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+
+onnx = pytest.importorskip("onnx")
+pytest.importorskip("onnxruntime")
+from onnx import TensorProto, helper, numpy_helper
+from tokenizers import Tokenizer
+from tokenizers.models import WordLevel
+from tokenizers.pre_tokenizers import Whitespace
+
+from mcp.core.embedding_backends import (OnnxEmbeddingModel, load_embedding_model,
+                                         quantize_onnx_model, verify_embedding_parity)
+
+VOCAB = ["[PAD]", "[UNK]"] + "csv to json converter weather lookup report builder".split()
+DIM = 8
+
+
+@pytest.fixture(scope="module")
+def weights():
+    rng = np.random.default_rng(0)
+    return (
+        rng.normal(size=(len(VOCAB), DIM)).astype(np.float32),
+        rng.normal(size=(DIM, DIM)).astype(np.float32),
+    )
+
+
+@pytest.fixture(scope="module")
+def model_dir(tmp_path_factory, weights):
+    """A toy "transformer": last_hidden_state = embeddings[input_ids] @ projection."""
+    directory = tmp_path_factory.mktemp("onnx_model")
+    embeddings, projection = weights
+    graph = helper.make_graph(
+        [
+            helper.make_node("Gather", ["embeddings", "input_ids"], ["token_vectors"]),
+            helper.make_node("MatMul", ["token_vectors", "projection"], ["last_hidden_state"]),
+        ],
+        "toy_encoder",
+        [
+            helper.make_tensor_value_info("input_ids", TensorProto.INT64, ["batch", "seq"]),
+            helper.make_tensor_value_info("attention_mask", TensorProto.INT64, ["batch", "seq"]),
+        ],
+        [helper.make_tensor_value_info("last_hidden_state", TensorProto.FLOAT, ["batch", "seq", DIM])],
+        initializer=[
+            numpy_helper.from_array(embeddings, "embeddings"),
+            numpy_helper.from_array(projection, "projection"),
+        ],
+    )
+    model = helper.make_model(graph, opset_imports=[helper.make_opsetid("", 14)], ir_version=8)
+    onnx.save(model, str(directory / "model.onnx"))
+    quantize_onnx_model(str(directory / "model.onnx"), str(directory / "model_quantized.onnx"))
+
+    tokenizer = Tokenizer(WordLevel({w: i for i, w in enumerate(VOCAB)}, unk_token="[UNK]"))
+    tokenizer.pre_tokenizer = Whitespace()
+    tokenizer.save(str(directory / "tokenizer.json"))
+    return directory
+
+
+def _expected(text: str, weights) -> np.ndarray:
+    embeddings, projection = weights
+    ids = [VOCAB.index(w) if w in VOCAB else 1 for w in text.split()]
+    vector = (embeddings[ids] @ projection).mean(axis=0)
+    return vector / np.linalg.norm(vector)
+
+
+def test_encode_matches_mean_pooled_reference(model_dir, weights):
+    model = OnnxEmbeddingModel(str(model_dir), model_file="model.onnx")
+    texts = ["csv to json converter", "weather", "report builder lookup"]
+
+    batch = model.encode(texts, batch_size=2)
+    single = model.encode("weather")
+
+    assert batch.shape == (3, DIM)
+    assert single.shape == (DIM,)
+    for text, vector in zip(texts, batch):
+        # Padding tokens must not leak into the mean, whatever the batch composition
+        np.testing.assert_allclose(vector, _expected(text, weights), atol=1e-5)
+    np.testing.assert_allclose(single, batch[1], atol=1e-5)
+    assert model.get_sentence_embedding_dimension() == DIM
+
+
+def test_quantized_model_passes_parity(model_dir):
+    reference = OnnxEmbeddingModel(str(model_dir), model_file="model.onnx")
+    quantized = OnnxEmbeddingModel(str(model_dir), model_file="model_quantized.onnx")
+
+    report = verify_embedding_parity(reference, quantized, texts=["csv to json", "weather lookup"])
+
+    assert report.passed
+    assert report.min_cosine > 0.98
+
+
+def test_parity_detects_divergent_backend(model_dir):
+    reference = OnnxEmbeddingModel(str(model_dir), model_file="model.onnx")
+
+    class Shuffled:
+        def encode(self, texts):
+            return reference.encode(texts)[:, ::-1]
+
+    report = verify_embedding_parity(reference, Shuffled(), texts=["csv to json", "weather lookup"])
+    assert not report.passed
+
+
+def _config(**overrides):
+    values = dict(
+        backend="onnx",
+        model_name="reference-model",
+        onnx_model_dir="",
+        onnx_model_file="model_quantized.onnx",
+        onnx_threads=1,
+        verify_parity=False,
+        parity_tolerance=0.02,
+    )
+    values.update(overrides)
+    return SimpleNamespace(**values)
+
+
+def test_load_embedding_model_selects_onnx(model_dir):
+    model = load_embedding_model(_config(onnx_model_dir=str(model_dir)))
+    assert isinstance(model, OnnxEmbeddingModel)
+
+
+def test_load_embedding_model_falls_back_when_parity_fails(model_dir):
+    class Unrelated:
+        def encode(self, texts):
+            return np.ones((len(texts), DIM), dtype=np.float32)
+
+    reference = Unrelated()
+    with patch(
+        "mcp.core.embedding_backends._load_sentence_transformer", return_value=reference
+    ) as load_reference:
+        model = load_embedding_model(_config(onnx_model_dir=str(model_dir), verify_parity=True))
+
+    assert model is reference
+    load_reference.assert_called_once_with("reference-model")
+
+
+def test_load_embedding_model_falls_back_when_onnx_missing(tmp_path):
+    with patch(
+        "mcp.core.embedding_backends._load_sentence_transformer", return_value="fallback"
+    ):
+        assert load_embedding_model(_config(onnx_model_dir=str(tmp_path))) == "fallback"
+
+
+def test_load_embedding_model_rejects_unknown_backend():
+    with pytest.raises(ValueError, match="Unknown embedding backend"):
+        load_embedding_model(_config(backend="tensorflow"))
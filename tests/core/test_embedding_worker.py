@@ -0,0 +1,92 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from mcp.core.embedding_worker import EmbeddingBatcher
+
+
+class RecordingEncoder:
+    """Fake model: embeds a text as [len(text), 1.0] and records batch sizes."""
+
+    def __init__(self, fail: bool = False):
+        self.batches = []
+        self.fail = fail
+        self._lock = threading.Lock()
+
+    def __call__(self, texts):
+        with self._lock:
+            self.batches.append(list(texts))
+        if self.fail:
+            raise RuntimeError("model exploded")
+        return [[float(len(t)), 1.0] for t in texts]
+
+
+@pytest.fixture
+def encoder():
+    return RecordingEncoder()
+
+
+def test_concurrent_requests_are_coalesced(encoder):
+    batcher = EmbeddingBatcher(encoder, max_batch_size=64, max_wait_ms=200)
+    batcher.start()
+    try:
+        texts = ["x" * i for i in range(1, 21)]
+        with ThreadPoolExecutor(max_workers=20) as pool:
+            results = list(pool.map(batcher.encode, texts))
+    finally:
+        batcher.stop()
+
+    assert results == [[float(len(t)), 1.0] for t in texts]
+    assert sum(len(b) for b in encoder.batches) == 20
+    assert len(encoder.batches) < 20
+
+
+def test_batches_respect_max_batch_size(encoder):
+    batcher = EmbeddingBatcher(encoder, max_batch_size=4, max_wait_ms=200)
+    batcher.start()
+    try:
+        futures = [batcher.submit(f"text {i}") for i in range(10)]
+        results = [f.result(timeout=5) for f in futures]
+    finally:
+        batcher.stop()
+
+    assert len(results) == 10
+    assert all(len(b) <= 4 for b in encoder.batches)
+
+
+def test_model_errors_are_propagated_to_callers():
+    batcher = EmbeddingBatcher(RecordingEncoder(fail=True), max_wait_ms=1)
+    batcher.start()
+    try:
+        with pytest.raises(RuntimeError, match="model exploded"):
+            batcher.encode("hello", timeout=5)
+    finally:
+        batcher.stop()
+
+
+def test_submit_requires_running_worker(encoder):
+    batcher = EmbeddingBatcher(encoder)
+    with pytest.raises(RuntimeError, match="not running"):
+        batcher.submit("hello")
+
+
+def test_aencode(encoder):
+    batcher = EmbeddingBatcher(encoder, max_wait_ms=1)
+    batcher.start()
+    try:
+        result = asyncio.run(batcher.aencode("abc"))
+    finally:
+        batcher.stop()
+    assert result == [3.0, 1.0]
+
+
+def test_stop_drains_pending_requests(encoder):
+    batcher = EmbeddingBatcher(encoder, max_batch_size=2, max_wait_ms=50)
+    batcher.start()
+    futures = [batcher.submit(str(i)) for i in range(5)]
+    batcher.stop()
+
+    assert [f.result(timeout=0) for f in futures] == [[1.0, 1.0]] * 5
+    assert not batcher.running
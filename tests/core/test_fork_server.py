@@ -0,0 +1,170 @@
+import asyncio
+import os
+import textwrap
+import time
+from unittest.mock import patch
+
+import pytest
+
+from mcp.core import sandbox
+from mcp.core.fork_server import (ForkServer, ForkServerPool, ResourceProfile,
+                                  fork_server_supported)
+
+pytestmark = pytest.mark.skipif(not fork_server_supported(), reason="fork servers need Linux")
+
+
+def _script(tmp_path, name: str, source: str) -> str:
+    path = tmp_path / name
+    path.write_text(textwrap.dedent(source))
+    return str(path)
+
+
+@pytest.fixture
+def server():
+    server = ForkServer(ResourceProfile(memory_limit_mb=256, cpu_time_limit_sec=5), ["decimal"])
+    yield server
+    server.close()
+
+
+def test_run_returns_output_exit_code_and_preloaded_modules(server, tmp_path):
+    script = _script(
+        tmp_path,
+        "echo.py",
+        """
+        import sys
+        print("args", sys.argv[1:], "decimal" in sys.modules)
+        print(sys.stdin.read().upper(), file=sys.stderr)
+        if __name__ == "__main__":
+            sys.exit(3)
+        """,
+    )
+
+    returncode, stdout, stderr = server.run(script, ["a", "b"], input_data=b"payload")
+
+    assert returncode == 3
+    assert stdout == "args ['a', 'b'] True\n"
+    assert stderr.strip() == "PAYLOAD"
+
+
+def test_runs_do_not_share_state(server, tmp_path):
+    script = _script(
+        tmp_path,
+        "state.py",
+        """
+        import decimal
+        print(getattr(decimal, "touched", False))
+        decimal.touched = True
+        """,
+    )
+    assert server.run(script)[1] == "False\n"
+    assert server.run(script)[1] == "False\n"
+
+
+def test_timeout_kills_child(server, tmp_path):
+    script = _script(tmp_path, "spin.py", "while True:\n    pass\n")
+    returncode, _, stderr = server.run(script, timeout=0.5)
+    assert returncode == -1
+    assert "TimeoutExpired" in stderr
+
+
+def test_memory_limit_applies_to_child(server, tmp_path):
+    script = _script(tmp_path, "hog.py", "data = bytearray(1024 * 1024 * 1024)\n")
+    returncode, _, stderr = server.run(script)
+    assert returncode == 1
+    assert "MemoryError" in stderr
+    assert "fork_server.py" not in stderr  # traceback starts at the script
+
+
+def test_pool_recycles_server_after_max_runs(tmp_path):
+    script = _script(tmp_path, "noop.py", "pass\n")
+    pool = ForkServerPool(max_runs=2)
+    profile = ResourceProfile()
+    try:
+        first = pool.get(profile)
+        pool.run(profile, script)
+        pool.run(profile, script)
+        second = pool.get(profile)
+        assert second is not first
+        assert pool.get(ResourceProfile(memory_limit_mb=128)) is not second
+        assert pool.run(profile, script)[0] == 0
+    finally:
+        pool.shutdown()
+
+
+def test_run_sandboxed_python_uses_fork_server_when_enabled(tmp_path):
+    script = _script(tmp_path, "hello.py", "print('hello')\n")
+    with patch("mcp.config.settings.settings.sandbox.fork_server_enabled", True):
+        try:
+            with patch.object(
+                sandbox, "run_sandboxed_subprocess", side_effect=AssertionError("not forked")
+            ):
+                assert sandbox.run_sandboxed_python(script) == (0, "hello\n", "")
+            assert sandbox.get_fork_server_pool() is not None
+        finally:
+            sandbox.shutdown_fork_servers()
+    assert sandbox.get_fork_server_pool() is None
+
+
+def test_async_fork_server_runs_are_driven_by_the_loop(tmp_path):
+    echo = _script(tmp_path, "echo.py", "import sys\nprint(sys.stdin.read().upper())\n")
+    pid_file = tmp_path / "pid"
+    sleeper = _script(
+        tmp_path,
+        "sleep.py",
+        f"""
+        import os, time
+        open({str(pid_file)!r}, "w").write(str(os.getpid()))
+        time.sleep(30)
+        """,
+    )
+
+    async def run():
+        assert await sandbox.run_sandboxed_python_async(echo, input_data=b"hi") == (0, "HI\n", "")
+        returncode, _, stderr = await sandbox.run_sandboxed_python_async(sleeper, timeout=0.5)
+        assert returncode == -1 and stderr.startswith("TimeoutExpired")
+
+        pid_file.unlink()
+        task = asyncio.ensure_future(sandbox.run_sandboxed_python_async(sleeper))
+        while not pid_file.exists() or not pid_file.read_text():
+            await asyncio.sleep(0.05)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        return int(pid_file.read_text())
+
+    with patch("mcp.config.settings.settings.sandbox.fork_server_enabled", True), patch.object(
+        sandbox, "run_sandboxed_subprocess_async", side_effect=AssertionError("not forked")
+    ), patch.object(sandbox, "_run_in_fork_server", side_effect=AssertionError("thread")):
+        try:
+            cancelled_pid = asyncio.run(run())
+        finally:
+            sandbox.shutdown_fork_servers()
+    # The cancelled run's child was killed, not left running
+    deadline = time.monotonic() + 5
+    while time.monotonic() < deadline:
+        try:
+            os.kill(cancelled_pid, 0)
+        except ProcessLookupError:
+            break
+        time.sleep(0.05)
+    else:
+        pytest.fail("cancelled fork server child is still running")
+
+
+def test_pass_fds_keep_their_numbers_in_child(server, tmp_path):
+    script = _script(
+        tmp_path,
+        "result.py",
+        """
+        import os, sys
+        os.write(int(sys.argv[1]), b"via pipe")
+        """,
+    )
+    read_end, write_end = os.pipe()
+    try:
+        returncode, _, stderr = server.run(script, [str(write_end)], pass_fds=[write_end])
+    finally:
+        os.close(write_end)
+    with os.fdopen(read_end, "rb") as f:
+        assert f.read() == b"via pipe"
+    assert returncode == 0, stderr
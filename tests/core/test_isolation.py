@@ -0,0 +1,66 @@
+import asyncio
+import os
+import sys
+from unittest.mock import patch
+
+import pytest
+
+from mcp.core import sandbox
+from mcp.core.isolation import NodeSlots, isolation_profile, parse_cpu_list
+
+pytestmark = pytest.mark.skipif(not sys.platform.startswith("linux"), reason="Linux scheduling APIs")
+
+REPORT = (
+    "import os, psutil; "
+    "print(sorted(os.sched_getaffinity(0)), os.nice(0), int(psutil.Process().ionice().ioclass))"
+)
+
+
+def test_parse_cpu_list():
+    assert parse_cpu_list("0-3, 6,8-8") == {0, 1, 2, 3, 6, 8}
+    for bad in ("3-1", "a", "-2"):
+        with pytest.raises(ValueError):
+            parse_cpu_list(bad)
+
+
+def test_unavailable_cpus_are_ignored():
+    with patch("mcp.config.settings.settings.sandbox.cpu_affinity", "100000"):
+        assert isolation_profile().cpus == frozenset()
+
+
+def test_children_get_affinity_niceness_and_io_class():
+    import psutil
+
+    with patch.multiple(
+        "mcp.config.settings.settings.sandbox", cpu_affinity="0", nice=7, ionice_class="idle"
+    ):
+        code, stdout, stderr = sandbox.run_sandboxed_subprocess([sys.executable, "-c", REPORT])
+        async_code, async_stdout, _ = asyncio.run(
+            sandbox.run_sandboxed_subprocess_async([sys.executable, "-c", REPORT])
+        )
+
+    expected = f"[0] {7 + os.nice(0)} {int(psutil.IOPRIO_CLASS_IDLE)}\n"
+    assert (code, stdout) == (0, expected), stderr
+    assert (async_code, async_stdout) == (0, expected)
+
+
+def test_node_slots_cap_concurrent_runs(tmp_path):
+    slots = NodeSlots(str(tmp_path), slots=1)
+    with slots.acquire(timeout=1):
+        with pytest.raises(TimeoutError):
+            with slots.acquire(timeout=0.1):
+                pass
+
+        with patch.multiple(
+            "mcp.config.settings.settings.sandbox", max_node_runs=1, node_slots_dir=str(tmp_path)
+        ):
+            code, _, stderr = sandbox.run_sandboxed_subprocess([sys.executable, "-c", "pass"], timeout=0.2)
+            assert code == -1 and "no sandbox slot free" in stderr
+
+    with patch.multiple(
+        "mcp.config.settings.settings.sandbox", max_node_runs=1, node_slots_dir=str(tmp_path)
+    ):
+        assert sandbox.run_sandboxed_subprocess([sys.executable, "-c", "pass"], timeout=5)[0] == 0
+        assert asyncio.run(
+            sandbox.run_sandboxed_subprocess_async([sys.executable, "-c", "pass"], timeout=5)
+        )[0] == 0
@@ -0,0 +1,85 @@
+import asyncio
+
+import nbformat
+import pytest
+from papermill.parameterize import parameterize_notebook
+
+from mcp.core.jupyter_notebook import JupyterNotebookMCP
+from mcp.core.types import JupyterNotebookConfig
+
+
+@pytest.fixture
+def notebook_path(tmp_path):
+    nb = nbformat.v4.new_notebook()
+    nb.metadata["kernelspec"] = {"name": "python3", "language": "python", "display_name": "Python 3"}
+    parameters = nbformat.v4.new_code_cell("size = 10\nscale = 1")
+    parameters.metadata["tags"] = ["parameters"]
+    nb.cells = [
+        nbformat.v4.new_markdown_cell("# Model"),
+        parameters,
+        nbformat.v4.new_code_cell("model = list(range(size))"),
+        nbformat.v4.new_code_cell("[x * scale for x in model]"),
+        nbformat.v4.new_code_cell("print('not selected')"),
+    ]
+    path = tmp_path / "model.ipynb"
+    nbformat.write(nb, str(path))
+    return str(path)
+
+
+def _mcp(notebook_path, **config):
+    return JupyterNotebookMCP(JupyterNotebookConfig(name="nb", notebook_path=notebook_path, **config))
+
+
+def test_setup_cells_precede_the_selected_cells(notebook_path):
+    mcp = _mcp(notebook_path, execute_all=False, cells_to_execute=[3])
+    nb = mcp._notebook()
+    assert mcp._mark_partial_run(nb) == [1, 2]
+    assert _mcp(notebook_path)._mark_partial_run(nb) is None
+
+    with pytest.raises(ValueError):
+        _mcp(notebook_path, execute_all=False, cells_to_execute=[0])._mark_partial_run(mcp._notebook())
+
+
+def test_state_key_depends_on_setup_parameters_only(notebook_path):
+    mcp = _mcp(notebook_path, execute_all=False, cells_to_execute=[3])
+
+    def plan(parameters):
+        nb = mcp._notebook()
+        setup = mcp._mark_partial_run(nb)
+        nb = parameterize_notebook(nb, parameters)
+        return mcp._partial_run_cells(nb, setup, parameters, "python3")
+
+    cells, setup_cells, key = plan({"size": 10, "scale": 2})
+    # The injected parameters cell (index 2) runs every time; cell 5 never runs
+    assert cells == [1, 2, 3, 4] and setup_cells == [1, 3]
+    assert plan({"size": 10, "scale": 3})[2] == key
+    assert plan({"size": 11, "scale": 2})[2] != key
+
+
+def test_script_mode_compiles_the_notebook_once(notebook_path):
+    from mcp.core import jupyter_notebook
+
+    mcp = _mcp(notebook_path, execution_mode="script")
+    first = asyncio.run(mcp.execute({"size": 3, "scale": 2}))
+    assert first["success"] is True, first
+    # Keys and outputs as papermill reports them, after the injected parameters cell
+    assert first["results"] == {
+        "cell_5_4": {"outputs": ["[0, 2, 4]"], "execution_count": 4, "source": "[x * scale for x in model]"},
+        "cell_6_5": {"outputs": ["not selected\n"], "execution_count": 5, "source": "print('not selected')"},
+    }
+    script = mcp._compiled_script()
+    assert asyncio.run(mcp.execute({}))["results"]["cell_4_3"]["outputs"] == [repr(list(range(10)))]
+    assert mcp._compiled_script() is script
+    assert any(cached is script for cached in jupyter_notebook._compiled_scripts.values())
+
+    partial = _mcp(notebook_path, execution_mode="script", execute_all=False, cells_to_execute=[3])
+    assert list(asyncio.run(partial.execute({"scale": 3}))["results"]) == ["cell_5_4"]
+
+
+def test_magics_cannot_be_compiled(tmp_path):
+    from mcp.core.notebook_compiler import NotebookCompileError, compile_notebook
+
+    nb = nbformat.v4.new_notebook()
+    nb.cells = [nbformat.v4.new_code_cell("%matplotlib inline")]
+    with pytest.raises(NotebookCompileError):
+        compile_notebook(nb)
@@ -0,0 +1,123 @@
+import asyncio
+import sys
+import time
+
+import nbformat
+import pytest
+from papermill.cli import _resolve_type
+
+from mcp.core.jupyter_notebook import _cli_parameter
+from mcp.core.kernel_pool import KernelPool, KernelPoolError
+
+pytestmark = pytest.mark.skipif(sys.platform == "win32", reason="kernel pool needs Unix")
+
+
+def _notebook(*sources):
+    nb = nbformat.v4.new_notebook()
+    nb.metadata["kernelspec"] = {"name": "python3", "language": "python", "display_name": "Python 3"}
+    nb.cells = [nbformat.v4.new_code_cell(source) for source in sources]
+    return nb
+
+
+@pytest.mark.parametrize("value", ["text", 3, 2.5, True, None, [1, 2], {"a": 1}])
+def test_parameters_match_papermill_cli(value):
+    import json
+
+    assert _cli_parameter(value) == _resolve_type(json.dumps(value))
+
+
+def test_unknown_kernel_raises_before_running(tmp_path):
+    async def run():
+        pool = KernelPool(size=1, kernel_name="no-such-kernel")
+        try:
+            await pool.run(_notebook("1"), cwd=str(tmp_path), timeout=10, cpu_time_limit_sec=10)
+        finally:
+            await pool.shutdown()
+        return pool
+
+    with pytest.raises(KernelPoolError):
+        asyncio.run(run())
+
+
+def test_warm_kernel_runs_are_reset_between_notebooks(tmp_path):
+    pytest.importorskip("ipykernel")
+
+    async def run():
+        pool = KernelPool(size=1, max_runs=10)
+        try:
+            await pool.fill()
+            first, error = await pool.run(
+                _notebook("x = 41", "x + 1"), cwd=str(tmp_path), timeout=30, cpu_time_limit_sec=10
+            )
+            assert error is None
+            await asyncio.sleep(0.5)  # the reset happens in the background
+            started = time.monotonic()
+            second, error = await pool.run(
+                _notebook("'x' in dir()"), cwd=str(tmp_path), timeout=30, cpu_time_limit_sec=10
+            )
+            elapsed = time.monotonic() - started
+            assert error is None
+            failed, error = await pool.run(
+                _notebook("raise ValueError('boom')"), cwd=str(tmp_path), timeout=30, cpu_time_limit_sec=10
+            )
+            return first, second, elapsed, error
+        finally:
+            await pool.shutdown()
+
+    first, second, elapsed, error = asyncio.run(run())
+    assert first.cells[1].outputs[0]["data"]["text/plain"] == "42"
+    assert second.cells[0].outputs[0]["data"]["text/plain"] == "False"
+    assert second.cells[0].execution_count == 1
+    assert elapsed < 1.0
+    assert "ValueError: boom" in error
+
+
+def test_setup_state_is_reused_for_the_same_key(tmp_path):
+    pytest.importorskip("ipykernel")
+
+    def notebook(scale):
+        # builtins survive namespace resets, so they count every run of the setup
+        return _notebook("import builtins", "builtins.setups = getattr(builtins, 'setups', 0) + 1",
+                         f"scale = {scale}", "(builtins.setups, scale)")
+
+    async def run():
+        pool = KernelPool(size=1, max_runs=10)
+        outputs = []
+        try:
+            for scale, key in ((1, "a"), (2, "a"), (3, "b")):
+                nb, error = await pool.run(
+                    notebook(scale), cwd=str(tmp_path), timeout=30, cpu_time_limit_sec=10,
+                    setup_cells=[0, 1], state_key=key,
+                )
+                assert error is None
+                outputs.append(nb.cells[3].outputs[0]["data"]["text/plain"])
+                await asyncio.sleep(0.2)
+        finally:
+            await pool.shutdown()
+        return outputs
+
+    # The second run skips the setup cells; a new key runs them again
+    assert asyncio.run(run()) == ["(1, 1)", "(1, 2)", "(2, 3)"]
+
+
+def test_kernels_are_restarted_for_another_owner(tmp_path):
+    pytest.importorskip("ipykernel")
+
+    async def run():
+        pool = KernelPool(size=1, max_runs=10)
+        outputs = []
+        try:
+            # builtins survive namespace resets, but not restarts
+            for owner in ("a.ipynb", "a.ipynb", "b.ipynb"):
+                nb, error = await pool.run(
+                    _notebook("import builtins", "builtins.runs = getattr(builtins, 'runs', 0) + 1", "builtins.runs"),
+                    cwd=str(tmp_path), timeout=30, cpu_time_limit_sec=10, owner=owner,
+                )
+                assert error is None
+                outputs.append(nb.cells[2].outputs[0]["data"]["text/plain"])
+                await asyncio.sleep(0.2)
+        finally:
+            await pool.shutdown()
+        return outputs
+
+    assert asyncio.run(run()) == ["1", "2", "1"]
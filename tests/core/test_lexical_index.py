@@ -0,0 +1,71 @@
+import uuid
+
+import pytest
+
+from mcp.core.lexical_index import LexicalIndex, normalize_name, tokenize
+
+
+@pytest.fixture
+def index() -> LexicalIndex:
+    return LexicalIndex()
+
+
+def test_tokenize_and_normalize_name():
+    assert tokenize("CSV-to-JSON Converter!") == ["csv", "to", "json", "converter"]
+    assert normalize_name("  CSV  to JSON ") == "csv to json"
+    assert tokenize(None) == []
+
+
+def test_search_ranks_name_matches_above_description_matches(index: LexicalIndex):
+    in_name, in_description, unrelated = uuid.uuid4(), uuid.uuid4(), uuid.uuid4()
+    index.add(in_name, "Invoice parser", "Reads PDF files")
+    index.add(in_description, "Document tool", "Extracts totals from an invoice")
+    index.add(unrelated, "Weather lookup", "Forecast by city", ["weather"])
+
+    hits = index.search("invoice")
+
+    assert [mcp_id for mcp_id, _ in hits] == [in_name, in_description]
+
+
+def test_tags_are_indexed(index: LexicalIndex):
+    mcp_id = uuid.uuid4()
+    index.add(mcp_id, "Tool", None, ["finance", "reporting"])
+    assert index.search("reporting")[0][0] == mcp_id
+
+
+def test_add_replaces_previous_entry(index: LexicalIndex):
+    mcp_id = uuid.uuid4()
+    index.add(mcp_id, "Old name")
+    index.add(mcp_id, "New name")
+
+    assert len(index) == 1
+    assert index.search("old") == []
+    assert index.exact_name_matches("old name") == set()
+    assert index.exact_name_matches("NEW name") == {mcp_id}
+
+
+def test_remove(index: LexicalIndex):
+    keep, drop = uuid.uuid4(), uuid.uuid4()
+    index.add(keep, "Shared term")
+    index.add(drop, "Shared term")
+
+    assert index.remove(drop)
+    assert not index.remove(drop)
+    assert [mcp_id for mcp_id, _ in index.search("shared")] == [keep]
+    assert drop not in index
+
+
+def test_rebuild(index: LexicalIndex):
+    index.add(uuid.uuid4(), "Stale")
+    fresh = uuid.uuid4()
+
+    assert index.rebuild([(fresh, "Fresh", "description", ["tag"])]) == 1
+    assert index.search("stale") == []
+    assert index.search("fresh")[0][0] == fresh
+
+
+def test_search_limits_results(index: LexicalIndex):
+    for i in range(5):
+        index.add(uuid.uuid4(), f"report {i}")
+    assert len(index.search("report", k=3)) == 3
+    assert index.search("report", k=0) == []
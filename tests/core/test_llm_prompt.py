@@ -0,0 +1,238 @@
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from mcp.config.settings import settings
+from mcp.core import llm_cache, llm_connectivity
+from mcp.core.http_client import close_http_clients
+from mcp.core.llm_cache import DiskBackend, LLMResponseCache, MemoryBackend, cache_bypass
+from mcp.core.llm_connectivity import ConnectivityCache, LLMUnavailableError
+from mcp.core.llm_prompt import ClaudeLLM, LLMPromptMCP
+from mcp.core.types import LLMPromptConfig
+
+LATENCY = 0.3
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        self.server.requests += 1
+        request = json.loads(self.rfile.read(int(self.headers["content-length"])))
+        if request.get("stream"):
+            return self._stream(request["messages"][-1]["content"].split(" "))
+        time.sleep(LATENCY)
+        body = json.dumps({"content": [{"type": "text", "text": request["messages"][0]["content"]}]}).encode()
+        self.send_response(200)
+        self.send_header("content-type", "application/json")
+        self.send_header("content-length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _stream(self, words):
+        self.send_response(200)
+        self.send_header("content-type", "text/event-stream")
+        self.send_header("connection", "close")
+        self.end_headers()
+
+        def send(event, data):
+            self.wfile.write(f"event: {event}\ndata: {json.dumps(data)}\n\n".encode())
+            self.wfile.flush()
+
+        send("message_start", {"type": "message_start"})
+        self.wfile.write(b": ping\n\n")
+        for i, word in enumerate(words):
+            text = word if i == 0 else " " + word
+            send("content_block_delta", {"type": "content_block_delta", "delta": {"type": "text_delta", "text": text}})
+            time.sleep(LATENCY)
+        if words[-1] != "[cut]":
+            send("message_stop", {"type": "message_stop"})
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def api_server(monkeypatch):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    server.daemon_threads = True
+    server.requests = 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/v1/messages"
+    monkeypatch.setattr(settings.llm, "api_url", url)
+    monkeypatch.setenv("ANTHROPIC_API_KEY", "test-key")
+    monkeypatch.setattr(llm_connectivity, "_cache", ConnectivityCache())
+    monkeypatch.setattr(llm_cache, "_cache", LLMResponseCache(MemoryBackend(100)))
+    yield server
+    server.shutdown()
+
+
+def test_concurrent_calls_overlap(api_server):
+    llm = ClaudeLLM(model_name="claude-3-haiku-20240229", max_tokens=10)
+    assert api_server.requests == 0  # construction is free
+
+    async def run():
+        try:
+            await llm.call([{"role": "user", "content": "warm-up"}])
+            # A single connectivity check, for the first call
+            assert api_server.requests == 1 + 1
+            started = time.monotonic()
+            replies = await asyncio.gather(
+                *(llm.call([{"role": "user", "content": f"prompt {i}"}]) for i in range(8))
+            )
+            return replies, time.monotonic() - started
+        finally:
+            await close_http_clients()
+
+    replies, elapsed = asyncio.run(run())
+    assert replies == [f"prompt {i}" for i in range(8)]
+    # One after another they would take 8 * LATENCY
+    assert elapsed < 4 * LATENCY
+    assert api_server.requests == 2 + 8
+
+
+def test_circuit_opens_on_failed_check_and_half_opens_after_cooldown():
+    now = [0.0]
+    cache = ConnectivityCache(ttl=60, failure_threshold=2, cooldown=30, clock=lambda: now[0])
+    key = cache.key("key", "model")
+    probes = []
+
+    async def probe():
+        probes.append(now[0])
+        if len(probes) == 1:
+            raise ConnectionError("refused")
+
+    async def run():
+        with pytest.raises(LLMUnavailableError, match="refused"):
+            await cache.ensure(key, probe)
+        now[0] = 10
+        with pytest.raises(LLMUnavailableError, match="retrying in 20s"):
+            await cache.ensure(key, probe)
+        now[0] = 31
+        await cache.ensure(key, probe)  # half-open: probes again
+        await cache.ensure(key, probe)
+        now[0] = 100
+        await cache.ensure(key, probe)  # stale: goes ahead, refreshes in the background
+        await asyncio.sleep(0)
+        # Failed calls open the circuit at the threshold
+        cache.record_failure(key, "HTTP 529")
+        await cache.ensure(key, probe)
+        cache.record_failure(key, "HTTP 529")
+        with pytest.raises(LLMUnavailableError, match="HTTP 529"):
+            await cache.ensure(key, probe)
+
+    asyncio.run(run())
+    assert probes == [0.0, 31, 100]
+
+
+def test_deterministic_responses_are_cached(api_server):
+    deterministic = ClaudeLLM(model_name="claude-3-haiku-20240229", temperature=0, max_tokens=10)
+    sampled = ClaudeLLM(model_name="claude-3-haiku-20240229", temperature=0.7, max_tokens=10)
+    messages = [{"role": "user", "content": "classify this"}]
+
+    async def run():
+        try:
+            replies = [await deterministic.call(messages, use_cache=True)]
+            requests = api_server.requests  # connectivity check and the call
+            started = time.monotonic()
+            replies.append(await deterministic.call(messages, use_cache=True))
+            hit_seconds = time.monotonic() - started
+            assert api_server.requests == requests
+            with cache_bypass():
+                replies.append(await deterministic.call(messages, use_cache=True))
+            replies.append(await sampled.call(messages, use_cache=True))
+            replies.append(await deterministic.call(messages))
+            return replies, hit_seconds
+        finally:
+            await close_http_clients()
+
+    replies, hit_seconds = asyncio.run(run())
+    assert replies == ["classify this"] * 5
+    assert hit_seconds < LATENCY / 10
+    assert api_server.requests == 2 + 3
+    assert llm_cache.get_response_cache().get_stats() == {
+        "backend": "memory", "hits": 1, "misses": 1, "bypassed": 1, "hit_rate": 0.5,
+    }
+
+
+def test_disk_backend_expires_entries(tmp_path):
+    cache = LLMResponseCache(DiskBackend(str(tmp_path)), ttl=60)
+    key = cache.key({"model": "m", "messages": [{"role": "user", "content": "hi"}], "temperature": 0})
+    assert key == cache.key({"temperature": 0, "messages": [{"content": "hi", "role": "user"}], "model": "m"})
+
+    async def run():
+        await cache.set(key, "hello")
+        await cache.set("expired" + key[7:], "old", ttl=-1)
+        return await cache.get(key), await cache.get("expired" + key[7:])
+
+    assert asyncio.run(run()) == ("hello", None)
+
+
+def test_tokens_stream_as_the_model_writes_them(api_server):
+    mcp = LLMPromptMCP(LLMPromptConfig(
+        name="classifier", template="{text}", model_name="claude-3-haiku-20240229", temperature=0,
+    ))
+
+    async def run():
+        try:
+            await mcp.llm.call([{"role": "user", "content": "warm-up"}])  # connectivity check
+            started = time.monotonic()
+            events = []
+            async for event in mcp.execute_stream({"text": '{"label": "spam"}'}):
+                events.append((time.monotonic() - started, event))
+            return events
+        finally:
+            await close_http_clients()
+
+    events = asyncio.run(run())
+    tokens = [event["text"] for _, event in events if event["type"] == "token"]
+    assert tokens == ['{"label":', ' "spam"}']
+    # The first token arrives long before the response is complete
+    assert events[0][0] < LATENCY and events[-1][0] >= 2 * LATENCY
+    result = events[-1][1]
+    assert result["type"] == "result"
+    assert result["result"]["label"] == "spam" and result["result"]["model"] == "claude-3-haiku-20240229"
+
+
+def test_cut_off_stream_is_not_cached(api_server):
+    llm = ClaudeLLM(model_name="claude-3-haiku-20240229", temperature=0, max_tokens=10)
+    messages = [{"role": "user", "content": "partial [cut]"}]
+
+    async def run():
+        try:
+            pieces = [piece async for piece in llm.stream(messages, use_cache=True)]
+            key = llm_cache.get_response_cache().key(llm._request_data(messages))
+            return pieces, await llm_cache.get_response_cache().get(key)
+        finally:
+            await close_http_clients()
+
+    pieces, cached = asyncio.run(run())
+    assert pieces == ["partial", " [cut]"]
+    assert cached is None
+
+
+def test_stream_endpoint_relays_server_sent_events(api_server, monkeypatch):
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+
+    from mcp.api.dependencies import get_current_subject
+    from mcp.api.routers import execution
+
+    config = LLMPromptConfig(name="echo", template="{text}", model_name="claude-3-haiku-20240229")
+    monkeypatch.setattr(execution, "load_mcp_config_from_file", lambda mcp_config_id: config)
+    app = FastAPI()
+    app.include_router(execution.router)
+    app.dependency_overrides[get_current_subject] = lambda: "tester"
+
+    with TestClient(app) as client:
+        with client.stream("POST", "/execute/mcp/echo/stream", json={"text": "one two"}) as response:
+            assert response.headers["content-type"].startswith("text/event-stream")
+            body = "".join(response.iter_text())
+
+    events = [block.split("\n") for block in body.strip().split("\n\n")]
+    assert [lines[0] for lines in events] == ["event: token", "event: token", "event: result"]
+    assert [json.loads(lines[1][len("data: "):]).get("text") for lines in events[:2]] == ["one", " two"]
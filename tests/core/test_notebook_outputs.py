@@ -0,0 +1,71 @@
+import base64
+import os
+import time
+
+import nbformat
+
+from mcp.core.notebook_outputs import ResultExtractor, load_executed_notebook, prune_artifacts
+
+PNG = base64.b64encode(b"\x89PNG\r\n" + bytes(4000)).decode("ascii")
+
+
+def _executed_notebook(path):
+    nb = nbformat.v4.new_notebook()
+    cell = nbformat.v4.new_code_cell("plot(); 'done'", execution_count=1)
+    cell.outputs = [
+        nbformat.v4.new_output("stream", name="stdout", text="x" * 50 + "\n"),
+        nbformat.v4.new_output(
+            "display_data", data={"image/png": PNG, "text/html": "<img>", "text/plain": "<Figure>"},
+            metadata={"image/png": {"width": 400}},
+        ),
+        nbformat.v4.new_output("execute_result", data={"text/plain": "'done'"}, execution_count=1),
+    ]
+    nb.cells = [nbformat.v4.new_markdown_cell("# Plot"), cell]
+    nb.metadata["papermill"] = {"parameters": {"path": "data/input.csv"}, "input/output": "kept"}
+    nbformat.write(nb, str(path))
+    return str(path)
+
+
+def test_unrequested_rich_outputs_are_dropped_while_reading(tmp_path):
+    path = _executed_notebook(tmp_path / "out.ipynb")
+    nb = load_executed_notebook(path)
+    display = nb.cells[1].outputs[1]
+    assert display.data == {"text/plain": "<Figure>"} and display.metadata == {}
+    assert nb.cells[1].outputs[0].text == "x" * 50 + "\n"
+    # Only the MIME bundles of outputs are filtered
+    assert nb.metadata.papermill["input/output"] == "kept"
+
+    results = ResultExtractor().extract(nb)
+    assert results == {
+        "cell_2_1": {"outputs": ["x" * 50 + "\n", "'done'"], "execution_count": 1, "source": "plot(); 'done'"}
+    }
+
+
+def test_long_and_requested_outputs_go_to_the_artifact_area(tmp_path):
+    path = _executed_notebook(tmp_path / "out.ipynb")
+    nb = load_executed_notebook(path, ["image/png"])
+    extractor = ResultExtractor(["image/png"], result_chars=20, artifact_dir=str(tmp_path / "artifacts"), label="plot")
+    outputs = extractor.extract(nb)["cell_2_1"]["outputs"]
+
+    assert outputs[0].startswith("x" * 20 + "\n... [31 characters cut; full text in ")
+    with open(outputs[0].split("full text in ")[1].split("]")[0]) as f:
+        assert f.read() == "x" * 50 + "\n"
+    image = outputs[1]
+    assert image["mime_type"] == "image/png" and image["bytes"] == 4006
+    assert image["artifact"].endswith(".png") and os.path.getsize(image["artifact"]) == 4006
+    assert outputs[2] == "'done'"
+    assert os.path.basename(os.path.dirname(image["artifact"])).startswith("plot-")
+
+
+def test_old_and_oversized_artifact_runs_are_removed(tmp_path):
+    now = time.time()
+    for i, (age_hours, size) in enumerate([(48, 10), (3, 600), (2, 600), (1, 600)]):
+        run = tmp_path / f"run{i}"
+        run.mkdir()
+        (run / "out.txt").write_bytes(b"x" * size)
+        os.utime(run, (now - age_hours * 3600,) * 2)
+
+    removed = prune_artifacts(str(tmp_path), retention_sec=24 * 3600, max_bytes=1500, keep=str(tmp_path / "run3"))
+
+    assert sorted(os.path.basename(path) for path in removed) == ["run0", "run1"]
+    assert sorted(os.listdir(tmp_path)) == ["run2", "run3"]
@@ -0,0 +1,83 @@
+import asyncio
+import logging
+import sys
+import textwrap
+from unittest.mock import patch
+
+import pytest
+
+from mcp.core import sandbox
+from mcp.core.output_capture import BoundedOutput
+
+CHATTY = """
+import sys
+for i in range(200_000):
+    print(f"line {i:06d} " + "x" * 40)
+sys.stderr.write("done\\n")
+"""
+
+
+def test_keeps_head_and_tail_and_marks_the_gap():
+    capture = BoundedOutput(limit_bytes=20)
+    for i in range(100):
+        capture.feed(f"{i:03d}\n".encode())
+
+    text = capture.getvalue()
+    assert capture.truncated
+    assert capture.total_bytes == 400
+    assert text.startswith("000\n001\n00")
+    assert text.endswith("7\n098\n099\n")
+    assert "[380 bytes of stdout truncated]" in text
+
+
+def test_output_within_limit_is_unchanged():
+    capture = BoundedOutput(limit_bytes=1024)
+    capture.feed(b"hello ")
+    capture.feed("wörld".encode())
+    assert not capture.truncated
+    assert capture.getvalue() == "hello wörld"
+
+
+def test_spills_full_output_to_file(tmp_path):
+    capture = BoundedOutput(limit_bytes=16, spill_dir=str(tmp_path), name="stderr")
+    payload = b"".join(f"{i}\n".encode() for i in range(1000))
+    for start in range(0, len(payload), 7):
+        capture.feed(payload[start:start + 7])
+
+    text = capture.getvalue()
+    assert capture.spill_path and capture.spill_path.endswith(".stderr.log")
+    assert f"full output in {capture.spill_path}" in text
+    with open(capture.spill_path, "rb") as f:
+        assert f.read() == payload
+
+
+def test_forwards_lines_up_to_the_limit(caplog):
+    capture = BoundedOutput(limit_bytes=30, log_level=logging.INFO)
+    capture.label = "pid 1"
+    with caplog.at_level(logging.INFO, logger="mcp.sandbox.output"):
+        capture.feed(b"first line\nsec")
+        capture.feed(b"ond line\n" + b"z" * 50 + b"\nnever logged\n")
+        capture.close()
+
+    messages = [record.getMessage() for record in caplog.records]
+    assert messages[:2] == ["[pid 1] stdout: first line", "[pid 1] stdout: second line"]
+    assert "never logged" not in "".join(messages)
+    assert messages[-1].endswith("output over the log limit, not forwarded")
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="streaming capture needs Unix")
+def test_sandboxed_runs_capture_bounded_output(tmp_path):
+    script = tmp_path / "chatty.py"
+    script.write_text(textwrap.dedent(CHATTY))
+
+    with patch("mcp.config.settings.settings.sandbox.output_limit_kb", 64):
+        code, stdout, stderr = sandbox.run_sandboxed_python(str(script))
+        async_code, async_stdout, _ = asyncio.run(sandbox.run_sandboxed_python_async(str(script)))
+
+    for result_code, result_stdout in ((code, stdout), (async_code, async_stdout)):
+        assert result_code == 0
+        assert len(result_stdout) < 70 * 1024
+        assert result_stdout.startswith("line 000000 ")
+        assert result_stdout.rstrip().endswith("line 199999 " + "x" * 40)
+        assert "bytes of stdout truncated" in result_stdout
+    assert stderr == "done\n"
@@ -0,0 +1,94 @@
+import asyncio
+import io
+import tempfile
+from pathlib import Path
+
+import pytest
+
+from mcp.core.python_script import PythonScriptMCP
+from mcp.core.types import PythonScriptConfig
+from mcp.scripts.script_runner import decode_frame, encode_frame, read_frame
+
+PIPE_SCRIPT = """
+import sys
+
+def execute_mcp(inputs):
+    print("adding", file=sys.stderr)
+    return {"sum": inputs["a"] + inputs["b"]}
+"""
+
+FILE_SCRIPT = """
+import json
+import sys
+
+with open(sys.argv[1], encoding="utf-8") as f:
+    inputs = json.load(f)
+with open(sys.argv[2], "w", encoding="utf-8") as f:
+    json.dump({"success": True, "result": {"sum": inputs["a"] + inputs["b"]}, "error": None}, f)
+"""
+
+
+def _mcp(script_content: str, **config) -> PythonScriptMCP:
+    return PythonScriptMCP(PythonScriptConfig(name="adder", script_content=script_content, **config))
+
+
+def test_frames_roundtrip_and_reject_truncation():
+    frame = encode_frame({"text": "héllo", "values": [1, 2.5, None]})
+
+    assert decode_frame(frame) == {"text": "héllo", "values": [1, 2.5, None]}
+    assert read_frame(io.BytesIO(frame + b"trailing")) == {"text": "héllo", "values": [1, 2.5, None]}
+    with pytest.raises(ValueError, match="truncated"):
+        decode_frame(frame[:-1])
+
+
+def test_auto_protocol_detects_execute_mcp():
+    assert _mcp(PIPE_SCRIPT)._io_protocol == "pipe"
+    assert _mcp(FILE_SCRIPT)._io_protocol == "file"
+    assert _mcp(PIPE_SCRIPT, io_protocol="file")._io_protocol == "file"
+
+
+def test_pipe_protocol_returns_result_and_keeps_logs():
+    result = asyncio.run(_mcp(PIPE_SCRIPT).execute({"a": 2, "b": 3}))
+
+    assert result["success"] is True
+    assert result["result"] == {"sum": 5}
+    assert result["stdout"] == ""
+    assert "adding" in result["stderr"]
+
+
+def test_pipe_protocol_reports_script_exceptions():
+    result = asyncio.run(_mcp(PIPE_SCRIPT).execute({"a": 2}))
+
+    assert result["success"] is False
+    assert result["error"] == "KeyError: 'b'"
+
+
+def test_file_protocol_removes_temporary_files():
+    tmp = Path(tempfile.gettempdir())
+    before = set(tmp.glob("*.json"))
+
+    result = asyncio.run(_mcp(FILE_SCRIPT).execute({"a": 2, "b": 3}))
+
+    assert result["result"] == {"sum": 5}
+    assert set(tmp.glob("*.json")) - before == set()
+
+
+def test_pipe_protocol_reports_a_result_pipe_held_open():
+    script = """
+import os, time
+
+def execute_mcp(inputs):
+    if os.fork() == 0:  # keeps the result pipe, but not the output pipes, open
+        devnull = os.open(os.devnull, os.O_WRONLY)
+        os.dup2(devnull, 1)
+        os.dup2(devnull, 2)
+        time.sleep(5)
+        os._exit(0)
+    return {"ok": True}
+"""
+    mcp = _mcp(script)
+    mcp.config.timeout = 2  # below the configurable minimum, to keep the test short
+    result = asyncio.run(mcp.execute({}))
+
+    assert result["success"] is False
+    assert "result pipe open" in result["error"]
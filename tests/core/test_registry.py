@@ -1,3 +1,5 @@
+import os
+import threading
 import uuid
 from unittest.mock import MagicMock, patch
 
@@ -6,6 +8,7 @@ from sqlalchemy.orm import Session
 
 from mcp.core import registry as mcp_registry_service
 from mcp.core.types import MCPType
+from mcp.core.vector_index import VectorIndex
 from mcp.db.models import EMBEDDING_DIM
 from mcp.db.models import MCP as MCPModel
 from mcp.db.models import MCPVersion as MCPVersionModel
@@ -314,44 +317,106 @@ def test_generate_mcp_embedding_empty_input():
 # === Tests for search_mcp_definitions_by_text ===
 @patch("mcp.core.registry.embedding_model")
 def test_search_mcp_definitions_by_text_success(
-    mock_embedding_model_global, test_db_session: Session
+    mock_embedding_model_global, test_db_session: Session, tmp_path
 ):
-    mock_encoder = MagicMock()
-    mock_query_embedding = [0.3] * EMBEDDING_DIM
-    mock_encoder.encode.return_value = mock_query_embedding
-    mock_embedding_model_global.encode = mock_encoder
-
-    # Mock the database query result
-    # We can't easily test the .cosine_distance part with SQLite, so we mock the final DB call result
-    mock_db_mcps = [
-        MCPModel(
-            id=uuid.uuid4(), name="Search Result 1", embedding=[0.31] * EMBEDDING_DIM
-        ),
-        MCPModel(
-            id=uuid.uuid4(), name="Search Result 2", embedding=[0.32] * EMBEDDING_DIM
-        ),
-    ]
+    query_embedding = [1.0] + [0.0] * (EMBEDDING_DIM - 1)
+    mock_embedding_model_global.encode.return_value = query_embedding
 
-    with patch.object(test_db_session, "query") as mock_db_query:
-        mock_query_chain = MagicMock()
-        mock_db_query.return_value = mock_query_chain  # query(MCP)
-        mock_query_chain.order_by.return_value = mock_query_chain  # .order_by(...)
-        mock_query_chain.limit.return_value = mock_query_chain  # .limit(...)
-        mock_query_chain.all.return_value = mock_db_mcps  # .all()
+    close_match = MCPModel(
+        id=uuid.uuid4(),
+        name="Search Result 1",
+        type=MCPType.PYTHON_SCRIPT.value,
+        embedding=[0.9, 0.1] + [0.0] * (EMBEDDING_DIM - 2),
+    )
+    far_match = MCPModel(
+        id=uuid.uuid4(),
+        name="Search Result 2",
+        type=MCPType.PYTHON_SCRIPT.value,
+        embedding=[0.1, 0.9] + [0.0] * (EMBEDDING_DIM - 2),
+    )
+    test_db_session.add_all([close_match, far_match])
+    test_db_session.commit()
 
+    index = VectorIndex(str(tmp_path / "index"), dim=EMBEDDING_DIM)
+    with patch("mcp.core.registry.vector_index", index), patch(
+        "mcp.core.registry._vector_index_synced", False
+    ):
+        # The empty index is populated from the stored embeddings on first search
         results = mcp_registry_service.search_mcp_definitions_by_text(
             test_db_session, "test query", limit=5
         )
 
-        assert len(results) == 2
-        assert results[0].name == "Search Result 1"
-        mock_embedding_model_global.encode.assert_called_once_with("test query")
-        mock_db_query.assert_called_once_with(MCPModel)
-        # We can't easily assert the content of order_by due to complex object,
-        # but we check it was called, and limit and all were called.
-        mock_query_chain.order_by.assert_called_once()
-        mock_query_chain.limit.assert_called_once_with(5)
-        mock_query_chain.all.assert_called_once()
+    assert [r.name for r in results] == ["Search Result 1", "Search Result 2"]
+    mock_embedding_model_global.encode.assert_called_once_with("test query")
+    assert len(index) == 2
+
+
+def test_index_sync_applies_only_changes_made_elsewhere(test_db_session: Session, tmp_path):
+    from mcp.core.lexical_index import LexicalIndex
+
+    def add_mcp(name):
+        mcp = MCPModel(
+            name=name,
+            type=MCPType.PYTHON_SCRIPT.value,
+            embedding=[1.0] + [0.0] * (EMBEDDING_DIM - 1),
+        )
+        test_db_session.add(mcp)
+        test_db_session.commit()
+        return mcp
+
+    first = add_mcp("Indexed here")
+    index = VectorIndex(str(tmp_path / "index"), dim=EMBEDDING_DIM)
+    lexical = LexicalIndex()
+    with patch("mcp.core.registry.vector_index", index), patch(
+        "mcp.core.registry._vector_index_synced", False
+    ), patch("mcp.core.registry.lexical_index", lexical), patch(
+        "mcp.core.registry._lexical_index_synced", False
+    ), patch("mcp.core.registry._index_watermark", None), patch(
+        "mcp.core.registry._locally_indexed", {}
+    ):
+        mcp_registry_service.sync_search_indexes(test_db_session)  # first pass builds both
+        assert len(index) == 1 and len(lexical) == 1
+
+        # Written by another worker: this process's indexes never saw it
+        second = add_mcp("Indexed elsewhere")
+        # Indexed by this process already: not applied again
+        mcp_registry_service._index_mcp_text(first)
+        with patch.object(index, "rebuild", side_effect=AssertionError("rebuilt")), patch.object(
+            lexical, "rebuild", side_effect=AssertionError("rebuilt")
+        ):
+            assert mcp_registry_service.sync_search_indexes(test_db_session) == 1
+            assert second.id in index and lexical.exact_name_matches("Indexed elsewhere") == {second.id}
+
+            test_db_session.delete(second)
+            test_db_session.commit()
+            assert mcp_registry_service.sync_search_indexes(test_db_session) == 1
+        assert second.id not in index and second.id not in lexical
+        assert first.id in index and first.id in lexical
+
+
+def test_vector_index_directory_is_per_process(tmp_path):
+    from mcp.config.settings import settings
+
+    (tmp_path / "pid-999999999").mkdir()
+    with patch.object(settings.embedding, "index_dir", str(tmp_path)):
+        index = mcp_registry_service._open_vector_index()
+
+    assert index.index_dir == tmp_path / f"pid-{os.getpid()}"
+    # Directories of processes that have exited are removed
+    assert not (tmp_path / "pid-999999999").exists()
+
+
+def test_vector_index_is_reopened_in_a_forked_process(tmp_path):
+    from mcp.config.settings import settings
+
+    inherited = VectorIndex(str(tmp_path / "parent"), dim=EMBEDDING_DIM)
+    with patch.object(settings.embedding, "index_dir", str(tmp_path)), patch(
+        "mcp.core.registry.vector_index", inherited
+    ), patch("mcp.core.registry._vector_index_pid", os.getpid() + 1):
+        reopened = mcp_registry_service.get_vector_index()
+        assert reopened is not inherited
+        assert reopened.index_dir == tmp_path / f"pid-{os.getpid()}"
+        assert mcp_registry_service.get_vector_index() is reopened
 
 
 @patch("mcp.core.registry.embedding_model", None)
@@ -373,3 +438,270 @@ def test_search_mcp_definitions_by_text_empty_query(test_db_session: Session):
 # As noted, it's fairly well covered by engine and API integration tests.
 
 # More tests to be added for get_mcp_instance_from_db
+
+
+# === Tests for batched embedding generation ===
+def _fake_encode(texts, **kwargs):
+    import numpy as np
+
+    if isinstance(texts, str):
+        return np.full(EMBEDDING_DIM, float(len(texts)), dtype=np.float32)
+    return np.array(
+        [[float(len(t))] + [1.0] * (EMBEDDING_DIM - 1) for t in texts], dtype=np.float32
+    )
+
+
+@patch("mcp.core.registry.embedding_model")
+def test_reembed_all_mcps_batches_and_indexes(
+    mock_embedding_model_global, test_db_session: Session, tmp_path
+):
+    mock_embedding_model_global.encode.side_effect = _fake_encode
+    for i in range(5):
+        test_db_session.add(
+            MCPModel(
+                name=f"Backfill {i}",
+                type=MCPType.PYTHON_SCRIPT.value,
+                embedding=[0.5] * EMBEDDING_DIM if i == 0 else None,
+            )
+        )
+    test_db_session.commit()
+
+    index = VectorIndex(str(tmp_path / "index"), dim=EMBEDDING_DIM)
+    with patch("mcp.core.registry.vector_index", index):
+        written = mcp_registry_service.reembed_all_mcps(
+            test_db_session, batch_size=2, only_missing=True
+        )
+
+    assert written == 4
+    # Every model call encodes a whole batch, never a single string
+    batch_calls = mock_embedding_model_global.encode.call_args_list
+    assert sum(len(call.args[0]) for call in batch_calls) == 4
+    assert all(isinstance(call.args[0], list) for call in batch_calls)
+    assert len(index) == 4
+    test_db_session.expire_all()
+    assert all(m.embedding is not None for m in test_db_session.query(MCPModel).all())
+
+
+@patch("mcp.core.registry.embedding_model")
+def test_save_mcp_definition_defers_embedding_to_worker(
+    mock_embedding_model_global,
+    test_db_session: Session,
+    basic_mcp_create_payload: MCPCreateSchema,
+    tmp_path,
+):
+    from sqlalchemy.orm import sessionmaker
+
+    mock_embedding_model_global.encode.side_effect = _fake_encode
+    payload = basic_mcp_create_payload.model_copy(
+        update={
+            "initial_config": {
+                "name": "Deferred MCP",
+                "script_content": "print('deferred')",
+            }
+        }
+    )
+    session_factory = sessionmaker(bind=test_db_session.get_bind())
+    index = VectorIndex(str(tmp_path / "index"), dim=EMBEDDING_DIM)
+    written = threading.Event()
+    original_write_back = mcp_registry_service._write_back_embedding
+
+    def write_back_and_signal(*args):
+        original_write_back(*args)
+        written.set()
+
+    with patch("mcp.core.registry.vector_index", index), patch(
+        "mcp.core.registry._write_back_embedding", write_back_and_signal
+    ):
+        assert mcp_registry_service.start_embedding_worker(session_factory)
+        try:
+            created_mcp = mcp_registry_service.save_mcp_definition_to_db(
+                db=test_db_session, mcp_data=payload, defer_embedding=True
+            )
+            assert created_mcp.embedding is None
+            assert written.wait(timeout=5)
+        finally:
+            mcp_registry_service.stop_embedding_worker()
+
+    test_db_session.expire_all()
+    stored = test_db_session.query(MCPModel).filter(MCPModel.id == created_mcp.id).one()
+    assert stored.embedding is not None
+    assert len(stored.embedding) == EMBEDDING_DIM
+    assert created_mcp.id in index
+
+
+def test_stale_embedding_write_back_is_dropped(test_db_session: Session, tmp_path):
+    from concurrent.futures import Future
+
+    from sqlalchemy.orm import sessionmaker
+
+    mcp = MCPModel(name="Raced", type=MCPType.PYTHON_SCRIPT.value, description="d")
+    test_db_session.add(mcp)
+    test_db_session.commit()
+    index = VectorIndex(str(tmp_path / "index"), dim=EMBEDDING_DIM)
+    stale, fresh = Future(), Future()
+    stale.set_result([1.0] + [0.0] * (EMBEDDING_DIM - 1))
+    fresh.set_result([0.0, 1.0] + [0.0] * (EMBEDDING_DIM - 2))
+
+    with patch("mcp.core.registry.vector_index", index), patch(
+        "mcp.core.registry._embedding_session_factory",
+        sessionmaker(bind=test_db_session.get_bind()),
+    ):
+        # Two updates were scheduled; the first one finishes last.
+        with mcp_registry_service._embedding_writeback_lock:
+            mcp_registry_service._embedding_generations[mcp.id] = 2
+            mcp_registry_service._embedding_row_locks[mcp.id] = threading.Lock()
+        mcp_registry_service._write_back_embedding(mcp.id, 2, fresh)
+        mcp_registry_service._write_back_embedding(mcp.id, 1, stale)
+
+    test_db_session.expire_all()
+    stored = test_db_session.query(MCPModel).filter(MCPModel.id == mcp.id).one()
+    assert list(stored.embedding)[:2] == [0.0, 1.0]
+    assert mcp.id in index
+    assert mcp.id not in mcp_registry_service._embedding_generations
+    assert mcp.id not in mcp_registry_service._embedding_row_locks
+
+
+# === Tests for hybrid_search_mcp_definitions ===
+def _add_search_fixtures(db: Session):
+    mcps = {
+        "exact": MCPModel(
+            name="Report Builder",
+            type=MCPType.PYTHON_SCRIPT.value,
+            description="Assembles documents",
+            embedding=[0.0, 1.0] + [0.0] * (EMBEDDING_DIM - 2),
+        ),
+        "semantic": MCPModel(
+            name="Summary generator",
+            type=MCPType.LLM_PROMPT.value,
+            description="Builds a report from notes",
+            tags=["report"],
+            embedding=[1.0] + [0.0] * (EMBEDDING_DIM - 1),
+        ),
+        "unrelated": MCPModel(
+            name="Weather lookup",
+            type=MCPType.PYTHON_SCRIPT.value,
+            embedding=[0.9, 0.1] + [0.0] * (EMBEDDING_DIM - 2),
+        ),
+    }
+    db.add_all(mcps.values())
+    db.commit()
+    return mcps
+
+
+@patch("mcp.core.registry.embedding_model")
+def test_hybrid_search_reranks_lexical_candidates(
+    mock_embedding_model_global, test_db_session: Session, tmp_path
+):
+    from mcp.core.lexical_index import LexicalIndex
+    from mcp.utils.cache import LRUCache
+
+    mock_embedding_model_global.encode.return_value = [1.0] + [0.0] * (EMBEDDING_DIM - 1)
+    mcps = _add_search_fixtures(test_db_session)
+
+    index = VectorIndex(str(tmp_path / "index"), dim=EMBEDDING_DIM)
+    with patch("mcp.core.registry.vector_index", index), patch(
+        "mcp.core.registry._vector_index_synced", False
+    ), patch("mcp.core.registry.lexical_index", LexicalIndex()), patch(
+        "mcp.core.registry._lexical_index_synced", False
+    ), patch(
+        "mcp.core.registry._query_embedding_cache", LRUCache(maxsize=8)
+    ):
+        by_name = mcp_registry_service.hybrid_search_mcp_definitions(
+            test_db_session, "report builder", limit=2
+        )
+        by_topic = mcp_registry_service.hybrid_search_mcp_definitions(
+            test_db_session, "report", limit=2
+        )
+        topped_up = mcp_registry_service.hybrid_search_mcp_definitions(
+            test_db_session, "  report ", limit=5
+        )
+
+    # The exact name match wins even though its embedding is further from the query
+    assert by_name[0].id == mcps["exact"].id
+    # Only lexical candidates are returned; the vector score decides their order
+    assert [m.id for m in by_topic] == [mcps["semantic"].id, mcps["exact"].id]
+    # With fewer lexical candidates than requested, a vector search tops up the results
+    assert {m.id for m in topped_up} == {m.id for m in mcps.values()}
+    # "report" and "  report " share one cached query embedding
+    assert mock_embedding_model_global.encode.call_count == 2
+
+
+@patch("mcp.core.registry.embedding_model", None)
+def test_hybrid_search_without_embedding_model_is_lexical(test_db_session: Session):
+    from mcp.core.lexical_index import LexicalIndex
+
+    mcps = _add_search_fixtures(test_db_session)
+    with patch("mcp.core.registry.lexical_index", LexicalIndex()), patch(
+        "mcp.core.registry._lexical_index_synced", False
+    ):
+        results = mcp_registry_service.hybrid_search_mcp_definitions(
+            test_db_session, "weather", limit=5
+        )
+        assert mcp_registry_service.hybrid_search_mcp_definitions(test_db_session, "   ") == []
+
+    assert [m.id for m in results] == [mcps["unrelated"].id]
+
+
+# === Tests for current-version resolution ===
+def _versioned_payload(basic_mcp_create_payload: MCPCreateSchema) -> MCPCreateSchema:
+    return basic_mcp_create_payload.model_copy(
+        update={"initial_config": {"name": "Versioned", "script_content": "print('v1')"}}
+    )
+
+
+@patch("mcp.core.registry.embedding_model", None)
+def test_add_mcp_version_updates_current_version_and_cache(
+    test_db_session: Session, basic_mcp_create_payload: MCPCreateSchema
+):
+    from mcp.schemas.mcp import MCPNewVersionRequest
+
+    created = mcp_registry_service.save_mcp_definition_to_db(
+        test_db_session, _versioned_payload(basic_mcp_create_payload)
+    )
+    assert created.current_version_id == created.versions[0].id
+    first = mcp_registry_service.get_latest_mcp_version(test_db_session, created.id)
+    assert first.version_str == "1.0.0"
+
+    new_version = mcp_registry_service.add_mcp_version_to_db(
+        test_db_session,
+        str(created.id),
+        MCPNewVersionRequest(
+            version_str="2.0.0", config_snapshot={"name": "Versioned", "script_content": "print('v2')"}
+        ),
+    )
+
+    test_db_session.expire_all()
+    assert test_db_session.get(MCPModel, created.id).current_version_id == new_version.id
+    latest = mcp_registry_service.get_latest_mcp_version(test_db_session, created.id)
+    assert latest.version_str == "2.0.0"
+    instance = mcp_registry_service.get_mcp_instance_from_db(test_db_session, str(created.id))
+    assert instance.config.script_content == "print('v2')"
+    pinned = mcp_registry_service.get_mcp_instance_from_db(
+        test_db_session, str(created.id), "1.0.0"
+    )
+    assert pinned.config.script_content == "print('v1')"
+
+
+def test_get_latest_mcp_version_falls_back_to_newest_created(test_db_session: Session):
+    from datetime import datetime, timedelta
+
+    mcp = MCPModel(name="Legacy", type=MCPType.PYTHON_SCRIPT.value)
+    test_db_session.add(mcp)
+    test_db_session.flush()
+    now = datetime.utcnow()
+    for version_str, age in (("1.0.0", 2), ("1.2.0", 0), ("1.1.0", 1)):
+        test_db_session.add(
+            MCPVersionModel(
+                mcp_id=mcp.id,
+                version=version_str,
+                version_str=version_str,
+                definition={},
+                config_snapshot={},
+                created_at=now - timedelta(days=age),
+            )
+        )
+    test_db_session.commit()
+    test_db_session.expire_all()
+
+    latest = mcp_registry_service.get_latest_mcp_version(test_db_session, mcp.id)
+    assert latest.version_str == "1.2.0"
@@ -0,0 +1,123 @@
+import asyncio
+import sys
+import textwrap
+from unittest.mock import MagicMock, patch
+
+import pytest
+from prometheus_client import REGISTRY
+
+from mcp.core import sandbox
+from mcp.core.fork_server import fork_server_supported
+from mcp.core.resource_usage import (EXIT_COMPLETED, EXIT_CPU_LIMIT, EXIT_ERROR,
+                                     EXIT_MEMORY_LIMIT, EXIT_TIMEOUT, aggregate_usage,
+                                     collect_resource_usage)
+from mcp.core.workflow_engine import WorkflowEngine
+from mcp.schemas.workflow import WorkflowStep
+
+pytestmark = pytest.mark.skipif(sys.platform == "win32", reason="rusage needs Unix")
+
+BURN = """
+import sys
+data = bytearray(64 * 1024 * 1024)
+total = sum(range(2_000_000))
+sys.exit(int(sys.argv[1]) if len(sys.argv) > 1 else 0)
+"""
+
+
+def _script(tmp_path, source: str) -> str:
+    path = tmp_path / "script.py"
+    path.write_text(textwrap.dedent(source))
+    return str(path)
+
+
+def test_subprocess_runs_report_rusage_and_exit_reason(tmp_path):
+    script = _script(tmp_path, BURN)
+
+    with collect_resource_usage() as usages:
+        assert sandbox.run_sandboxed_python(script)[0] == 0
+        assert sandbox.run_sandboxed_python(script, ["3"])[0] == 3
+
+    ok, failed = usages
+    assert ok.exit_reason == EXIT_COMPLETED and ok.returncode == 0
+    assert failed.exit_reason == EXIT_ERROR and failed.returncode == 3
+    assert ok.cpu_user_sec > 0
+    assert ok.max_rss_mb >= 64
+    assert ok.wall_time_sec >= ok.cpu_user_sec * 0.5
+
+
+def test_limit_violations_are_classified(tmp_path):
+    hog = _script(tmp_path, "data = bytearray(1024 * 1024 * 1024)\n")
+    with collect_resource_usage() as usages:
+        sandbox.run_sandboxed_python(hog, memory_limit_mb=256)
+        spin = _script(tmp_path, "while True:\n    pass\n")
+        sandbox.run_sandboxed_python(spin, cpu_time_limit_sec=1, timeout=30)
+        sandbox.run_sandboxed_python(spin, timeout=0.5)
+
+    assert [usage.exit_reason for usage in usages] == [
+        EXIT_MEMORY_LIMIT,
+        EXIT_CPU_LIMIT,
+        EXIT_TIMEOUT,
+    ]
+    assert usages[1].cpu_time_sec >= 0.9
+
+
+@pytest.mark.skipif(not fork_server_supported(), reason="fork servers need Linux")
+def test_fork_server_runs_report_rusage(tmp_path):
+    script = _script(tmp_path, BURN)
+    with patch("mcp.config.settings.settings.sandbox.fork_server_enabled", True):
+        try:
+            with collect_resource_usage() as usages:
+                assert sandbox.run_sandboxed_python(script, ["2"])[0] == 2
+        finally:
+            sandbox.shutdown_fork_servers()
+
+    [usage] = usages
+    assert usage.exit_reason == EXIT_ERROR
+    assert usage.cpu_user_sec > 0
+    assert usage.max_rss_mb >= 64
+
+
+def test_aggregate_rolls_runs_up_into_steps_and_steps_into_runs():
+    runs = [
+        {"wall_time_sec": 1.0, "cpu_user_sec": 0.5, "cpu_system_sec": 0.1, "max_rss_mb": 100.0,
+         "io_read_blocks": 2, "io_write_blocks": 1, "exit_reason": "completed"},
+        {"wall_time_sec": 2.0, "cpu_user_sec": 1.5, "cpu_system_sec": 0.2, "max_rss_mb": 300.0,
+         "io_read_blocks": 0, "io_write_blocks": 4, "exit_reason": "timeout"},
+    ]
+    step = aggregate_usage(runs)
+    assert step["runs"] == 2
+    assert step["cpu_user_sec"] == 2.0
+    assert step["max_rss_mb"] == 300.0
+    assert step["exit_reasons"] == {"completed": 1, "timeout": 1}
+
+    total = aggregate_usage([step, step, {}])
+    assert total["runs"] == 4
+    assert total["io_write_blocks"] == 10
+    assert total["exit_reasons"] == {"completed": 2, "timeout": 2}
+
+
+def test_workflow_step_records_usage_and_per_mcp_metrics(tmp_path):
+    script = _script(tmp_path, BURN)
+    mcp_id = "11111111-2222-3333-4444-555555555555"
+
+    class ScriptMCP:
+        config = MagicMock(type="python_script")
+
+        async def execute(self, inputs):
+            code, _, _ = await asyncio.to_thread(sandbox.run_sandboxed_python, script)
+            return {"success": code == 0, "result": {"code": code}}
+
+    step = WorkflowStep(step_id="s1", name="Burn", mcp_id=mcp_id, inputs={})
+    with patch("mcp.core.workflow_engine.registry.get_mcp_instance_from_db", return_value=ScriptMCP()):
+        result = asyncio.run(
+            WorkflowEngine(db_session=MagicMock())._execute_workflow_step(step, {}, "stop_on_error")
+        )
+
+    assert result["status"] == "SUCCESS"
+    assert result["resource_usage"]["runs"] == 1
+    assert result["resource_usage"]["max_rss_mb"] >= 64
+    labels = {"mcp_id": mcp_id, "mcp_type": "python_script"}
+    assert REGISTRY.get_sample_value("mcp_sandbox_cpu_seconds_count", labels) == 1
+    assert REGISTRY.get_sample_value(
+        "mcp_sandbox_exits_total", {**labels, "reason": "completed"}
+    ) == 1
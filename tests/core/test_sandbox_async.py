@@ -0,0 +1,125 @@
+import asyncio
+import os
+import sys
+import textwrap
+import time
+from unittest.mock import patch
+
+import pytest
+
+from mcp.core import sandbox
+from mcp.core.resource_usage import EXIT_CANCELLED, EXIT_COMPLETED, collect_resource_usage
+
+pytestmark = pytest.mark.skipif(sys.platform == "win32", reason="process groups need Unix")
+
+# Starts a grandchild in the same process group and reports its pid
+SPAWN_AND_SLEEP = """
+import subprocess, sys, time
+child = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(60)"])
+print(child.pid, flush=True)
+time.sleep(60)
+"""
+
+
+def _script(tmp_path, source: str, name: str = "script.py") -> str:
+    path = tmp_path / name
+    path.write_text(textwrap.dedent(source))
+    return str(path)
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    # A killed grandchild is reparented to init and may briefly linger as a zombie
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            return f.read().split(") ")[1][0] != "Z"
+    except OSError:
+        return True
+
+
+def _wait_dead(pid: int, timeout: float = 5.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if not _pid_alive(pid):
+            return True
+        time.sleep(0.05)
+    return False
+
+
+def test_runs_with_input_and_reports_usage(tmp_path):
+    script = _script(tmp_path, "import sys\ndata = sys.stdin.read()\nprint(data.upper())\nsys.stderr.write('warn')\n")
+
+    async def main():
+        with collect_resource_usage() as usages:
+            result = await sandbox.run_sandboxed_python_async(script, input_data=b"hello")
+        return result, usages
+
+    (code, stdout, stderr), [usage] = asyncio.run(main())
+    assert (code, stdout, stderr) == (0, "HELLO\n", "warn")
+    assert usage.exit_reason == EXIT_COMPLETED
+    assert usage.cpu_user_sec + usage.cpu_system_sec > 0
+
+
+def test_timeout_kills_the_process_group(tmp_path):
+    script = _script(tmp_path, SPAWN_AND_SLEEP)
+
+    code, stdout, stderr = asyncio.run(sandbox.run_sandboxed_python_async(script, timeout=2))
+
+    assert code == -1
+    assert stderr.startswith("TimeoutExpired")
+    assert _wait_dead(int(stdout.split()[0]))
+
+
+def test_cancellation_kills_the_process_group(tmp_path):
+    script = _script(tmp_path, SPAWN_AND_SLEEP)
+    pid_file = tmp_path / "pid"
+
+    async def main():
+        with collect_resource_usage() as usages:
+            task = asyncio.ensure_future(
+                sandbox.run_sandboxed_subprocess_async(
+                    ["/bin/sh", "-c", f"{sys.executable} {script} > {pid_file}"]
+                )
+            )
+            while not pid_file.exists() or not pid_file.read_text().strip():
+                await asyncio.sleep(0.05)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+        return usages
+
+    [usage] = asyncio.run(main())
+    assert usage.exit_reason == EXIT_CANCELLED
+    assert _wait_dead(int(pid_file.read_text().split()[0]))
+
+
+def test_concurrent_runs_are_limited_and_loop_stays_responsive(tmp_path):
+    script = _script(tmp_path, "import time\ntime.sleep(0.5)\n")
+
+    async def main():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        tick_task = asyncio.ensure_future(ticker())
+        started = time.monotonic()
+        results = await asyncio.gather(
+            *(sandbox.run_sandboxed_python_async(script) for _ in range(4))
+        )
+        elapsed = time.monotonic() - started
+        tick_task.cancel()
+        return results, elapsed, ticks
+
+    with patch("mcp.config.settings.settings.sandbox.max_concurrent_runs", 2):
+        results, elapsed, ticks = asyncio.run(main())
+
+    assert [code for code, _, _ in results] == [0, 0, 0, 0]
+    assert elapsed >= 1.0  # two waves of two
+    assert ticks >= elapsed / 0.01 * 0.5
@@ -0,0 +1,78 @@
+import asyncio
+import os
+import sys
+from unittest.mock import patch
+
+import pytest
+
+from mcp.core import sandbox
+from mcp.core.python_script import PythonScriptMCP
+from mcp.core.scratch import SHM_DIR, ScratchManager, current_scratch, scratch_scope
+from mcp.core.types import PythonScriptConfig
+
+pytestmark = pytest.mark.skipif(sys.platform == "win32", reason="scratch quota needs Unix")
+
+WRITE_FILES = """
+import sys
+for i in range(int(sys.argv[1])):
+    with open(f"part{i}.bin", "wb") as f:
+        f.write(b"x" * 600 * 1024)
+"""
+
+FILE_PROTOCOL_SCRIPT = """
+import json, sys
+json.dump({"success": True, "result": 1}, open(sys.argv[2], "w"))
+"""
+
+
+@pytest.fixture
+def manager(tmp_path):
+    manager = ScratchManager(base=str(tmp_path), quota_bytes=1024 * 1024)
+    with patch("mcp.core.scratch._manager", manager):
+        yield manager
+
+
+def test_nested_scopes_share_one_tree_removed_at_the_end(manager):
+    with scratch_scope("run-1") as run:
+        with scratch_scope("step/a") as step:
+            assert current_scratch() is step
+            assert step.root is run
+            assert os.path.dirname(step.path) == run.path
+            with open(step.subpath("data.txt"), "w") as f:
+                f.write("intermediate")
+            with pytest.raises(ValueError):
+                step.subpath("../escape")
+        assert not os.path.exists(step.path)
+        assert current_scratch() is run
+    assert not os.path.exists(run.path)
+    assert os.listdir(manager.directory) == []
+
+
+def test_prefers_shm_when_the_quota_fits():
+    if not os.access(SHM_DIR, os.W_OK):
+        pytest.skip("no writable /dev/shm")
+    assert ScratchManager._default_base(1024) == SHM_DIR
+    assert ScratchManager._default_base(1 << 60) != SHM_DIR
+
+
+def test_runs_over_the_quota_fail(manager, tmp_path):
+    script = tmp_path / "write.py"
+    script.write_text(WRITE_FILES)
+
+    assert sandbox.run_sandboxed_python(str(script), ["1"])[0] == 0
+    code, _, stderr = sandbox.run_sandboxed_python(str(script), ["2"])
+    assert code == -1 and "quota" in stderr
+    code, _, stderr = asyncio.run(sandbox.run_sandboxed_python_async(str(script), ["2"]))
+    assert code == -1 and "quota" in stderr
+    assert os.listdir(manager.directory) == []
+
+
+def test_script_files_do_not_outlive_the_execution(manager):
+    mcp = PythonScriptMCP(PythonScriptConfig(name="plain", script_content=FILE_PROTOCOL_SCRIPT))
+    try:
+        assert mcp._io_protocol == "file"
+        result = asyncio.run(mcp.execute({"x": 1}))
+    finally:
+        mcp.close()
+    assert result["success"] is True and result["result"] == 1
+    assert os.listdir(manager.directory) == []
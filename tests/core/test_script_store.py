@@ -0,0 +1,92 @@
+import asyncio
+import os
+import subprocess
+import sys
+from unittest.mock import patch
+
+from mcp.core.python_script import PythonScriptMCP
+from mcp.core.script_store import ScriptStore
+from mcp.core.types import PythonScriptConfig
+
+SCRIPT = """
+def execute_mcp(inputs):
+    return inputs["x"] * 2
+"""
+
+
+def test_identical_content_is_stored_once_and_kept_after_last_reference(tmp_path):
+    store = ScriptStore(str(tmp_path), keep_released=1)
+
+    first = store.acquire(SCRIPT)
+    second = store.acquire(SCRIPT)
+    other = store.acquire(SCRIPT + "\n# changed\n")
+
+    assert first == second
+    assert other.digest != first.digest
+    assert first.exec_path.endswith(".pyc")
+    assert store.refcount(first.digest) == 2
+
+    store.release(first.digest)
+    store.release(first.digest)
+    # Kept for the next instance with the same content, without recompiling
+    assert os.path.exists(first.exec_path)
+    with patch.object(store, "_write", side_effect=AssertionError("recompiled")):
+        assert store.acquire(SCRIPT) == first
+    store.release(first.digest)
+
+    # Releasing another script evicts the least recently released one
+    store.release(other.digest)
+    assert not os.path.exists(first.exec_path)
+    assert not os.path.exists(first.source_path)
+    assert os.path.exists(other.exec_path)
+
+
+def test_bytecode_runs_and_tracebacks_point_at_source(tmp_path):
+    store = ScriptStore(str(tmp_path))
+    script = store.acquire("import sys\nprint(__name__)\nraise ValueError(sys.argv[1])\n")
+
+    out = subprocess.run([sys.executable, script.exec_path, "boom"], capture_output=True, text=True)
+
+    assert out.stdout == "__main__\n"
+    assert f'File "{script.source_path}", line 3' in out.stderr
+    assert "ValueError: boom" in out.stderr
+
+
+def test_syntax_errors_fall_back_to_source(tmp_path):
+    script = ScriptStore(str(tmp_path)).acquire("def broken(:\n")
+    assert script.exec_path == script.source_path
+
+
+def test_stale_process_directories_are_removed(tmp_path):
+    stale = tmp_path / "999999999"
+    stale.mkdir()
+    (stale / "old.py").write_text("pass\n")
+
+    ScriptStore(str(tmp_path))
+
+    assert not stale.exists()
+
+
+def test_python_script_instances_share_stored_script(tmp_path):
+    store = ScriptStore(str(tmp_path))
+    with patch("mcp.core.python_script.get_script_store", return_value=store):
+        mcps = [
+            PythonScriptMCP(PythonScriptConfig(name=f"double {i}", script_content=SCRIPT))
+            for i in range(3)
+        ]
+        path = mcps[0]._script_path_to_execute
+        assert {mcp._script_path_to_execute for mcp in mcps} == {path}
+
+        result = asyncio.run(mcps[1].execute({"x": 21}))
+        assert result["success"] is True
+        assert result["result"] == 42
+
+        digest = mcps[0]._stored_script_digest
+        for mcp in mcps:
+            mcp.close()
+        mcps[0].close()  # idempotent
+        assert store.refcount(digest) == 0
+        # Released scripts stay compiled for the next instance, e.g. the next workflow step
+        assert os.path.exists(path)
+        store.clear()
+        assert not os.path.exists(path)
@@ -0,0 +1,108 @@
+import asyncio
+import os
+import sys
+from unittest.mock import patch
+
+import pytest
+
+from mcp.core.python_script import PythonScriptMCP
+from mcp.core.scratch import ScratchManager, scratch_scope
+from mcp.core.table_transport import (
+    TABLE_REF_KEY,
+    check_table_refs,
+    is_table_ref,
+    materialize_table_refs,
+    run_table_dir,
+    summarize_table_refs,
+    table_ref_paths,
+)
+from mcp.core.types import PythonScriptConfig
+
+pytestmark = pytest.mark.skipif(sys.platform == "win32", reason="sandbox pipes need Unix")
+
+PRODUCER = """
+import pyarrow as pa
+
+def execute_mcp(inputs):
+    n = inputs["n"]
+    return {"table": pa.table({"id": list(range(n)), "name": [f"row{i}" for i in range(n)]})}
+"""
+
+CONSUMER = """
+def execute_mcp(inputs):
+    t = inputs["t"]
+    return {"kind": type(t).__name__, "rows": t.num_rows, "total": sum(t.column("id").to_pylist()), "same": t}
+"""
+
+REF = {TABLE_REF_KEY: {"path": "/scratch/t.arrow", "format": "arrow", "num_rows": 2, "schema": {"id": "int64"}}}
+
+
+@pytest.fixture(autouse=True)
+def manager(tmp_path):
+    manager = ScratchManager(base=str(tmp_path), quota_bytes=1024 * 1024 * 1024)
+    with patch("mcp.core.scratch._manager", manager):
+        yield manager
+
+
+def test_stored_results_keep_schema_and_row_count_only():
+    outputs = {"table": REF, "nested": [REF], "plain": 1}
+    assert summarize_table_refs(outputs) == {
+        "table": {TABLE_REF_KEY: {"num_rows": 2, "schema": {"id": "int64"}}},
+        "nested": [{TABLE_REF_KEY: {"num_rows": 2, "schema": {"id": "int64"}}}],
+        "plain": 1,
+    }
+    plain = {"a": [{"id": 1}]}
+    assert summarize_table_refs(plain) is plain
+
+
+def test_only_files_of_the_current_run_are_referenced(tmp_path):
+    secret = tmp_path / "secret.arrow"
+    secret.write_bytes(b"")
+    with scratch_scope("run-test"):
+        path = os.path.join(run_table_dir(), "t.arrow")
+        assert table_ref_paths({"t": {TABLE_REF_KEY: {**REF[TABLE_REF_KEY], "path": path}}}) == {"t": path}
+        for outside in ("/scratch/t.arrow", str(secret), os.path.join(run_table_dir(), "..", "t.arrow")):
+            ref = {TABLE_REF_KEY: {**REF[TABLE_REF_KEY], "path": outside}}
+            with pytest.raises(ValueError, match="not a file of the current run"):
+                table_ref_paths({"t": ref})
+            with pytest.raises(ValueError, match="not a file of the current run"):
+                materialize_table_refs([ref])
+            with pytest.raises(ValueError, match="not a file of the current run"):
+                check_table_refs({"t": ref})
+
+
+def test_tables_travel_as_arrow_files_within_a_run():
+    pytest.importorskip("pyarrow")
+    producer, consumer = (
+        PythonScriptMCP(PythonScriptConfig(name=name, script_content=source, table_transport=True))
+        for name, source in (("producer", PRODUCER), ("consumer", CONSUMER))
+    )
+
+    async def run():
+        with scratch_scope("run-test"):
+            produced = await producer.execute({"n": 1000})
+            ref = produced["result"]["table"]
+            consumed = await consumer.execute({"t": ref})
+            rows = materialize_table_refs({"t": ref})["t"]
+            return produced, consumed, rows
+
+    try:
+        produced, consumed, rows = asyncio.run(run())
+    finally:
+        producer.close()
+        consumer.close()
+
+    assert produced["success"] is True, produced
+    ref = produced["result"]["table"]
+    assert is_table_ref(ref)
+    assert ref[TABLE_REF_KEY]["num_rows"] == 1000
+    assert ref[TABLE_REF_KEY]["schema"] == {"id": "int64", "name": "string"}
+    assert not os.path.exists(ref[TABLE_REF_KEY]["path"])
+
+    assert consumed["success"] is True, consumed
+    assert consumed["result"]["kind"] == "Table"
+    assert consumed["result"]["rows"] == 1000
+    assert consumed["result"]["total"] == 1000 * 999 // 2
+    # Returning an input table unchanged references the same file
+    assert consumed["result"]["same"] == ref
+    assert rows[:2] == [{"id": 0, "name": "row0"}, {"id": 1, "name": "row1"}]
@@ -0,0 +1,104 @@
+import uuid
+
+import numpy as np
+import pytest
+
+from mcp.core.vector_index import VectorIndex
+
+DIM = 8
+
+
+def _unit(i: int) -> np.ndarray:
+    vector = np.zeros(DIM, dtype=np.float32)
+    vector[i] = 1.0
+    return vector
+
+
+@pytest.fixture(params=[False, True], ids=["float32", "int8"])
+def index(request, tmp_path) -> VectorIndex:
+    return VectorIndex(str(tmp_path / "index"), dim=DIM, quantize=request.param)
+
+
+def test_search_returns_most_similar_first(index: VectorIndex):
+    ids = [uuid.uuid4() for _ in range(3)]
+    index.upsert(ids[0], _unit(0))
+    index.upsert(ids[1], _unit(0) + 0.5 * _unit(1))
+    index.upsert(ids[2], _unit(2))
+
+    hits = index.search(_unit(0), k=2)
+
+    assert [mcp_id for mcp_id, _ in hits] == [ids[0], ids[1]]
+    assert hits[0][1] == pytest.approx(1.0, abs=1e-2)
+
+
+def test_upsert_replaces_existing_vector(index: VectorIndex):
+    mcp_id = uuid.uuid4()
+    index.upsert(mcp_id, _unit(0))
+    index.upsert(mcp_id, _unit(3))
+
+    assert len(index) == 1
+    assert index.search(_unit(3), k=1)[0][0] == mcp_id
+
+
+def test_remove_keeps_remaining_rows_searchable(index: VectorIndex):
+    ids = [uuid.uuid4() for _ in range(3)]
+    for i, mcp_id in enumerate(ids):
+        index.upsert(mcp_id, _unit(i))
+
+    assert index.remove(ids[0]) is True
+    assert index.remove(ids[0]) is False
+
+    assert len(index) == 2
+    assert ids[0] not in index
+    assert index.search(_unit(2), k=1)[0][0] == ids[2]
+
+
+def test_none_or_zero_embedding_removes_entry(index: VectorIndex):
+    mcp_id = uuid.uuid4()
+    index.upsert(mcp_id, _unit(1))
+    index.upsert(mcp_id, None)
+    assert mcp_id not in index
+
+    index.upsert(mcp_id, np.zeros(DIM))
+    assert len(index) == 0
+
+
+def test_dimension_mismatch_raises(index: VectorIndex):
+    with pytest.raises(ValueError):
+        index.upsert(uuid.uuid4(), [1.0, 2.0])
+
+
+def test_index_persists_and_grows(tmp_path):
+    path = str(tmp_path / "index")
+    index = VectorIndex(path, dim=DIM)
+    rng = np.random.default_rng(0)
+    vectors = {uuid.uuid4(): rng.normal(size=DIM) for _ in range(2500)}
+    index.upsert_many(vectors.items())
+    index.flush()
+
+    reopened = VectorIndex(path, dim=DIM)
+    assert len(reopened) == 2500
+    probe_id, probe_vector = next(iter(vectors.items()))
+    assert reopened.search(probe_vector, k=1)[0][0] == probe_id
+
+
+def test_rebuild_replaces_contents(index: VectorIndex):
+    index.upsert(uuid.uuid4(), _unit(0))
+    new_id = uuid.uuid4()
+
+    assert index.rebuild([(new_id, _unit(4))]) == 1
+    assert len(index) == 1
+    assert new_id in index
+
+
+def test_scores_for_only_scores_requested_ids(index: VectorIndex):
+    ids = [uuid.uuid4() for _ in range(3)]
+    for i, mcp_id in enumerate(ids):
+        index.upsert(mcp_id, _unit(i))
+    missing = uuid.uuid4()
+
+    scores = index.scores_for(_unit(1), [ids[1], ids[2], missing])
+
+    assert set(scores) == {ids[1], ids[2]}
+    assert scores[ids[1]] == pytest.approx(1.0, abs=1e-2)
+    assert scores[ids[2]] == pytest.approx(0.0, abs=1e-2)
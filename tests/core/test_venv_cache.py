@@ -0,0 +1,136 @@
+import asyncio
+import subprocess
+import sys
+import time
+import zipfile
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from mcp.core.python_script import PythonScriptMCP
+from mcp.core.types import PythonScriptConfig
+from mcp.core.venv_cache import (VenvBuildError, VenvCache, environment_key,
+                                 normalize_requirements)
+
+
+def _make_wheel(wheelhouse, name: str, version: str, source: str) -> None:
+    """Writes a minimal pure-Python wheel, so builds need no package index."""
+    dist_info = f"{name}-{version}.dist-info"
+    files = {
+        f"{name}.py": source,
+        f"{dist_info}/METADATA": f"Metadata-Version: 2.1\nName: {name}\nVersion: {version}\n",
+        f"{dist_info}/WHEEL": "Wheel-Version: 1.0\nGenerator: test\nRoot-Is-Purelib: true\nTag: py3-none-any\n",
+    }
+    files[f"{dist_info}/RECORD"] = "".join(f"{path},,\n" for path in files) + f"{dist_info}/RECORD,,\n"
+    with zipfile.ZipFile(wheelhouse / f"{name}-{version}-py3-none-any.whl", "w") as wheel:
+        for path, content in files.items():
+            wheel.writestr(path, content)
+
+
+@pytest.fixture
+def cache(tmp_path):
+    wheelhouse = tmp_path / "wheels"
+    wheelhouse.mkdir()
+    _make_wheel(wheelhouse, "toypkg", "1.0", "VALUE = 'toy'\n")
+    cache = VenvCache(str(tmp_path / "venvs"), wheelhouse=str(wheelhouse))
+    yield cache
+    cache.shutdown()
+
+
+def test_environment_key_ignores_order_duplicates_and_comments():
+    assert normalize_requirements(["b==1", "  A>=2 ", "# comment", "", "b==1  # pinned"]) == [
+        "A>=2",
+        "b==1",
+    ]
+    key = environment_key(["numpy==1.26.4", "pandas"], "cpython-3.11-x86_64")
+    assert key == environment_key(["pandas", "numpy==1.26.4", "pandas"], "cpython-3.11-x86_64")
+    assert key != environment_key(["numpy==1.26.4"], "cpython-3.11-x86_64")
+    assert key != environment_key(["numpy==1.26.4", "pandas"], "cpython-3.12-x86_64")
+
+
+def test_builds_from_wheelhouse_once_and_reuses_environment(cache):
+    with cache.acquire(["toypkg==1.0"], timeout=120) as python:
+        out = subprocess.run(
+            [python, "-c", "import toypkg; print(toypkg.VALUE)"], capture_output=True, text=True
+        )
+    assert out.stdout.strip() == "toy", out.stderr
+
+    [meta] = cache.list_environments()
+    assert meta["requirements"] == ["toypkg==1.0"]
+    assert "toypkg==1.0" in meta["installed"]
+
+    with patch.object(cache, "_build", side_effect=AssertionError("rebuilt")):
+        with cache.acquire(["toypkg==1.0  # same"], timeout=1) as python_again:
+            assert python_again == python
+
+
+def test_failed_build_raises_and_leaves_nothing_behind(cache):
+    with pytest.raises(VenvBuildError, match="pip install failed"):
+        with cache.acquire(["missingpkg==9.9"], timeout=120):
+            pass
+    assert cache.list_environments() == []
+    assert cache.lookup(["missingpkg==9.9"]) is None
+
+
+def test_evict_removes_least_recently_used_but_skips_environments_in_use(cache):
+    first = cache.ensure([])
+    second = cache.ensure(["toypkg==1.0"])
+    assert first != second
+
+    with cache.acquire([]):
+        # Everything is over a zero budget, but the environment in use is skipped
+        assert cache.evict(max_disk_bytes=0) == [cache.key_for(["toypkg==1.0"])]
+    assert cache.lookup(["toypkg==1.0"]) is None
+    assert cache.evict(max_disk_bytes=0) == [cache.key_for([])]
+    assert cache.list_environments() == []
+
+
+def test_python_script_runs_in_its_requirements_environment(cache):
+    mcp = PythonScriptMCP(
+        PythonScriptConfig(
+            name="toy",
+            script_content="import sys, toypkg\n\ndef execute_mcp(inputs):\n    return [toypkg.VALUE, sys.prefix]\n",
+            requirements=["toypkg==1.0"],
+        )
+    )
+    with patch("mcp.core.python_script.get_venv_cache", return_value=cache):
+        result = asyncio.run(mcp.execute({}))
+
+    assert result["success"] is True, result
+    assert result["result"] == ["toy", cache.env_path(cache.key_for(["toypkg==1.0"]))]
+
+
+
+class _SlowLease:
+    def __init__(self):
+        self.entered = self.exited = False
+
+    def __enter__(self):
+        time.sleep(0.3)  # e.g. waiting for the environment lock
+        self.entered = True
+        return sys.executable
+
+    def __exit__(self, *exc_info):
+        self.exited = True
+
+
+def test_cancelled_execution_gives_back_the_environment():
+    lease = _SlowLease()
+    cache = MagicMock()
+    cache.acquire.return_value = lease
+    mcp = PythonScriptMCP(
+        PythonScriptConfig(name="toy", script_content="def execute_mcp(inputs):\n    return 1\n", requirements=["toypkg==1.0"])
+    )
+
+    async def run():
+        task = asyncio.ensure_future(mcp.execute({}))
+        await asyncio.sleep(0.1)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        await asyncio.sleep(0.5)  # the lease is taken, then given back
+
+    with patch("mcp.core.python_script.get_venv_cache", return_value=cache):
+        asyncio.run(run())
+
+    assert lease.entered and lease.exited
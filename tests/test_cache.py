@@ -3,7 +3,7 @@ from datetime import datetime
 
 import pytest
 
-from mcp.utils.cache import Cache, FunctionCache
+from mcp.utils.cache import Cache, FunctionCache, LRUCache
 
 
 @pytest.fixture
@@ -184,3 +184,42 @@ def test_cache_key_collision(cache):
 
     # One of the values should be None due to collision
     assert value1 is None or value2 is None
+
+
+def test_lru_cache_evicts_least_recently_used():
+    """Test LRU eviction order."""
+    lru = LRUCache(maxsize=2)
+    lru.set("a", 1)
+    lru.set("b", 2)
+    assert lru.get("a") == 1  # "a" is now most recently used
+    lru.set("c", 3)
+
+    assert lru.get("b") is None
+    assert lru.get("a") == 1
+    assert lru.get("c") == 3
+    assert len(lru) == 2
+
+
+def test_lru_cache_ttl():
+    """Test LRU entry expiry."""
+    lru = LRUCache(maxsize=10, ttl=0.05)
+    lru.set("key", "value")
+    lru.set("long", "value", ttl=60)
+    assert lru.get("key") == "value"
+
+    time.sleep(0.1)
+    assert lru.get("key", "missing") == "missing"
+    assert lru.get("long") == "value"
+
+
+def test_lru_cache_stats():
+    """Test LRU hit/miss statistics."""
+    lru = LRUCache(maxsize=10)
+    lru.set("key", "value")
+    lru.get("key")
+    lru.get("other")
+
+    stats = lru.get_stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["hit_rate"] == 0.5